@@ -0,0 +1,333 @@
+"""
+Session Analytics Rollups for HU Counseling Service Bot
+Aggregates counseling_sessions into hourly and daily buckets (requests,
+wait times, durations, messages, ratings, end reasons) so trends can be
+shown and exported without scanning the sessions table
+"""
+
+import csv
+import io
+import json
+import logging
+import math
+import os
+import statistics
+import threading
+import weakref
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+
+from counseling_database import CounselingDatabase
+
+logger = logging.getLogger(__name__)
+
+# Buckets younger than this are recomputed on every run, so ratings given
+# and sessions ended after a bucket's hour are still counted in it
+ROLLUP_SETTLE_HOURS = int(os.getenv("ROLLUP_SETTLE_HOURS", "24"))
+
+ALL_TOPICS = '*'
+GRANULARITIES = ('hour', 'day')
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Columns of session_rollups after the key, in CSV order (times in seconds)
+METRIC_COLUMNS = (
+    'requests',
+    'matched', 'match_wait_p50', 'match_wait_p95',
+    'started', 'start_wait_p50', 'start_wait_p95',
+    'ended', 'duration_p50', 'duration_p95',
+    'messages', 'rating_count', 'rating_sum', 'end_reasons',
+)
+
+
+def _parse(value) -> Optional[datetime]:
+    """Stored UTC timestamp (string from SQLite, datetime from PostgreSQL) as naive UTC datetime"""
+    if value is None or value == '':
+        return None
+    if not isinstance(value, datetime):
+        try:
+            value = datetime.fromisoformat(str(value))
+        except ValueError:
+            return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _floor(moment: datetime, granularity: str) -> datetime:
+    moment = moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0) if granularity == 'day' else moment
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of already sorted values (None when empty)"""
+    if not values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(values)))
+    return values[rank - 1]
+
+
+class _Bucket:
+    """Raw values collected for one (granularity, bucket_start, topic) before summarizing"""
+
+    __slots__ = ('requests', 'match_waits', 'start_waits', 'durations', 'ended',
+                 'messages', 'rating_count', 'rating_sum', 'end_reasons')
+
+    def __init__(self):
+        self.requests = 0
+        self.match_waits: List[float] = []
+        self.start_waits: List[float] = []
+        self.durations: List[float] = []
+        self.ended = 0
+        self.messages = 0
+        self.rating_count = 0
+        self.rating_sum = 0
+        self.end_reasons = Counter()
+
+    def row(self) -> Dict:
+        match_waits, start_waits, durations = sorted(self.match_waits), sorted(self.start_waits), sorted(self.durations)
+        return {
+            'requests': self.requests,
+            'matched': len(match_waits),
+            'match_wait_p50': statistics.median(match_waits) if match_waits else None,
+            'match_wait_p95': percentile(match_waits, 95),
+            'started': len(start_waits),
+            'start_wait_p50': statistics.median(start_waits) if start_waits else None,
+            'start_wait_p95': percentile(start_waits, 95),
+            'ended': self.ended,
+            'duration_p50': statistics.median(durations) if durations else None,
+            'duration_p95': percentile(durations, 95),
+            'messages': self.messages,
+            'rating_count': self.rating_count,
+            'rating_sum': self.rating_sum,
+            'end_reasons': json.dumps(dict(sorted(self.end_reasons.items()))),
+        }
+
+
+class SessionRollups:
+    """
+    Incrementally maintained hourly/daily session analytics
+
+    Each session event is counted in the bucket of the hour/day it happened:
+    requests by created_at, match wait (created_at -> latest matched_at,
+    so a declined match still counts) by matched_at, start wait (created_at -> started_at) by started_at, and
+    duration, messages, rating and end reason by ended_at. Every bucket is
+    kept per topic plus an all-topics row (topic '*'), since medians and
+    percentiles cannot be added up afterwards.
+
+    A run recomputes every bucket from the start of the day containing the
+    watermark up to the current hour, in one pass over the sessions active
+    in that window, and replaces those rows. The watermark then moves to
+    ROLLUP_SETTLE_HOURS ago: older buckets are final and kept even after
+    session cleanup deletes the sessions behind them.
+    """
+
+    def __init__(self, db: CounselingDatabase, settle_hours: int = None):
+        self.db = db
+        self.settle_hours = settle_hours if settle_hours is not None else ROLLUP_SETTLE_HOURS
+        self._lock = threading.Lock()
+
+    # ==================== WATERMARK ====================
+
+    def get_watermark(self) -> Optional[datetime]:
+        """Start of the oldest bucket that is still recomputed (None before the first run)"""
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        ph = self.db.param_placeholder
+
+        cursor.execute(f"SELECT watermark FROM rollup_watermarks WHERE name = {ph}", ('sessions',))
+        row = cursor.fetchone()
+
+        conn.close()
+        return _parse(row['watermark']) if row else None
+
+    # ==================== ROLLING UP ====================
+
+    def run(self, now: datetime = None) -> Dict:
+        """
+        Bring the rollups up to date (blocking - run it on the DB executor)
+        Returns: {'window_start', 'buckets', 'sessions', 'watermark'}
+        """
+        now = _parse(now) if now is not None else _utcnow()
+        with self._lock:
+            conn = self.db.get_connection()
+            cursor = conn.cursor()
+            ph = self.db.param_placeholder
+
+            try:
+                cursor.execute(f"SELECT watermark FROM rollup_watermarks WHERE name = {ph}", ('sessions',))
+                row = cursor.fetchone()
+                watermark = _parse(row['watermark']) if row else None
+
+                if watermark is None:
+                    # First run: backfill from the oldest session still in the table
+                    cursor.execute("SELECT MIN(created_at) AS first FROM counseling_sessions")
+                    first = cursor.fetchone()
+                    watermark = _parse(first['first']) if first and first['first'] else now
+
+                window_start = _floor(watermark, 'day')
+                window_end = _floor(now, 'hour') + timedelta(hours=1)
+                start_text = window_start.strftime(TIME_FORMAT)
+
+                # Sessions with anything happening in the window: created in it, ended
+                # in it, or not ended yet (which covers matches and starts in it)
+                cursor.execute(f'''
+                    SELECT session_id, topic, created_at, matched_at, started_at, ended_at,
+                           end_reason, user_rating
+                    FROM counseling_sessions
+                    WHERE created_at >= {ph} OR ended_at >= {ph} OR ended_at IS NULL
+                ''', (start_text, start_text))
+                sessions = cursor.fetchall()
+
+                cursor.execute(f'''
+                    SELECT m.session_id, COUNT(*) AS count
+                    FROM session_messages m
+                    JOIN counseling_sessions s ON s.session_id = m.session_id
+                    WHERE s.ended_at >= {ph}
+                    GROUP BY m.session_id
+                ''', (start_text,))
+                message_counts = {row['session_id']: row['count'] for row in cursor.fetchall()}
+
+                buckets = self._collect(sessions, message_counts, window_start, window_end)
+
+                cursor.execute(f'''
+                    DELETE FROM session_rollups
+                    WHERE bucket_start >= {ph} AND bucket_start < {ph}
+                ''', (start_text, window_end.strftime(TIME_FORMAT)))
+                columns = ', '.join(METRIC_COLUMNS)
+                placeholders = ', '.join([ph] * (len(METRIC_COLUMNS) + 3))
+                cursor.executemany(f'''
+                    INSERT INTO session_rollups (granularity, bucket_start, topic, {columns})
+                    VALUES ({placeholders})
+                ''', [
+                    (granularity, bucket_start.strftime(TIME_FORMAT), topic)
+                    + tuple(bucket.row()[column] for column in METRIC_COLUMNS)
+                    for (granularity, bucket_start, topic), bucket in sorted(buckets.items())
+                ])
+
+                settled = _floor(now - timedelta(hours=self.settle_hours), 'hour')
+                new_watermark = max(watermark, settled)
+                cursor.execute(f'''
+                    INSERT INTO rollup_watermarks (name, watermark) VALUES ({ph}, {ph})
+                    ON CONFLICT (name) DO UPDATE SET watermark = excluded.watermark
+                ''', ('sessions', new_watermark.strftime(TIME_FORMAT)))
+
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.close()
+
+        logger.info(f"📈 Rolled up {len(sessions)} sessions into {len(buckets)} buckets since {start_text}")
+        return {
+            'window_start': window_start,
+            'buckets': len(buckets),
+            'sessions': len(sessions),
+            'watermark': new_watermark,
+        }
+
+    @staticmethod
+    def _collect(sessions: Iterable, message_counts: Dict[int, int],
+                 window_start: datetime, window_end: datetime) -> Dict[tuple, _Bucket]:
+        """Spread each session's events over the hourly and daily buckets of the window"""
+        buckets: Dict[tuple, _Bucket] = defaultdict(_Bucket)
+
+        def _targets(moment: Optional[datetime], topic: str):
+            if moment is None or not (window_start <= moment < window_end):
+                return []
+            return [buckets[(granularity, _floor(moment, granularity), key)]
+                    for granularity in GRANULARITIES for key in (topic, ALL_TOPICS)]
+
+        for session in sessions:
+            topic = session['topic']
+            created = _parse(session['created_at'])
+            matched = _parse(session['matched_at'])
+            started = _parse(session['started_at'])
+            ended = _parse(session['ended_at'])
+
+            for bucket in _targets(created, topic):
+                bucket.requests += 1
+            if created is not None:
+                for bucket in _targets(matched, topic):
+                    bucket.match_waits.append((matched - created).total_seconds())
+                for bucket in _targets(started, topic):
+                    bucket.start_waits.append((started - created).total_seconds())
+            for bucket in _targets(ended, topic):
+                bucket.ended += 1
+                if started is not None:
+                    bucket.durations.append((ended - started).total_seconds())
+                bucket.messages += message_counts.get(session['session_id'], 0)
+                if session['user_rating']:
+                    bucket.rating_count += 1
+                    bucket.rating_sum += session['user_rating']
+                bucket.end_reasons[session['end_reason'] or 'unknown'] += 1
+
+        return buckets
+
+    # ==================== READING ====================
+
+    def get_rollups(self, granularity: str = 'day', since: datetime = None,
+                    topic: Optional[str] = ALL_TOPICS) -> List[Dict]:
+        """
+        Rollup rows, oldest first
+        topic=None returns every topic (including the '*' rows)
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"granularity must be one of {GRANULARITIES}")
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        ph = self.db.param_placeholder
+
+        query = f"SELECT * FROM session_rollups WHERE granularity = {ph}"
+        params = [granularity]
+        if since is not None:
+            query += f" AND bucket_start >= {ph}"
+            params.append(_floor(_parse(since), granularity).strftime(TIME_FORMAT))
+        if topic is not None:
+            query += f" AND topic = {ph}"
+            params.append(topic)
+        query += " ORDER BY bucket_start, topic"
+
+        cursor.execute(query, params)
+        rows = [dict(row) for row in cursor.fetchall()]
+
+        conn.close()
+        for row in rows:
+            row['bucket_start'] = _parse(row['bucket_start'])
+            row['end_reasons'] = json.loads(row['end_reasons'] or '{}')
+            row['messages_per_session'] = round(row['messages'] / row['ended'], 2) if row['ended'] else None
+            row['avg_rating'] = round(row['rating_sum'] / row['rating_count'], 2) if row['rating_count'] else None
+        return rows
+
+    def export_csv(self, granularity: str = 'day', since: datetime = None,
+                   topic: Optional[str] = None) -> str:
+        """Rollup rows as CSV text (one column per metric, end reasons as JSON)"""
+        rows = self.get_rollups(granularity, since, topic)
+        header = ['granularity', 'bucket_start', 'topic'] + list(METRIC_COLUMNS) + ['messages_per_session', 'avg_rating']
+
+        out = io.StringIO()
+        writer = csv.writer(out)
+        writer.writerow(header)
+        for row in rows:
+            values = dict(row, bucket_start=row['bucket_start'].strftime(TIME_FORMAT),
+                          end_reasons=json.dumps(row['end_reasons']))
+            writer.writerow(['' if values[column] is None else values[column] for column in header])
+        return out.getvalue()
+
+
+_rollups = weakref.WeakKeyDictionary()
+_rollups_lock = threading.Lock()
+
+def get_session_rollups(db: CounselingDatabase) -> SessionRollups:
+    """Return the shared SessionRollups for a database instance"""
+    with _rollups_lock:
+        rollups = _rollups.get(db)
+        if rollups is None:
+            rollups = SessionRollups(db)
+            _rollups[db] = rollups
+        return rollups
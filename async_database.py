@@ -0,0 +1,88 @@
+"""
+Async Database Layer for HU Counseling Service Bot
+Runs CounselingDatabase calls on a dedicated bounded thread pool so
+handlers never block the event loop
+"""
+
+import asyncio
+import functools
+import logging
+import os
+import types
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from counseling_database import CounselingDatabase
+from db_retry import retry_async
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncCounselingDatabase:
+    """
+    Awaitable mirror of CounselingDatabase
+
+    Every public CounselingDatabase method is available under the same name
+    and signature, but returns a coroutine:
+
+        counselor = await async_db.get_counselor_by_user_id(user_id)
+
+    Calls run on a bounded executor (DB_EXECUTOR_WORKERS threads, default 8),
+    so a slow query only occupies one worker instead of freezing every
+    update the Application is processing. Methods decorated with
+    retry_on_locked back off with asyncio.sleep between attempts, so a locked
+    database does not park workers either. Plain attributes such as
+    param_placeholder and db_path are passed through unchanged.
+    """
+
+    def __init__(self, db: CounselingDatabase, max_workers: int = None):
+        self.db = db
+        if max_workers is None:
+            max_workers = int(os.getenv("DB_EXECUTOR_WORKERS", "8"))
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='db-worker')
+
+    def __getattr__(self, name):
+        attr = getattr(self.db, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+
+        policy = getattr(attr, 'retry_policy', None)
+        if policy is not None:
+            # Retry on the loop (asyncio.sleep) instead of sleeping in a worker
+            inner = types.MethodType(attr.__wrapped__, self.db)
+
+            @functools.wraps(attr)
+            async def method(*args, **kwargs):
+                return await retry_async(self.run, inner, policy, *args, **kwargs)
+        else:
+            @functools.wraps(attr)
+            async def method(*args, **kwargs):
+                return await self.run(attr, *args, **kwargs)
+
+        # Cache the wrapper so later lookups skip __getattr__
+        self.__dict__[name] = method
+        return method
+
+    async def run(self, func: Callable, *args, **kwargs):
+        """Run any blocking callable (e.g. a matcher method) on the DB executor"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    def shutdown(self, wait: bool = True):
+        """Stop the executor (call from post_shutdown)"""
+        self._executor.shutdown(wait=wait)
+        logger.info("Async database executor stopped")
+
+
+_async_databases = weakref.WeakKeyDictionary()
+
+
+def get_async_database(db: CounselingDatabase) -> AsyncCounselingDatabase:
+    """Return the shared AsyncCounselingDatabase for a database instance"""
+    async_db = _async_databases.get(db)
+    if async_db is None:
+        async_db = AsyncCounselingDatabase(db)
+        _async_databases[db] = async_db
+    return async_db
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the GCRA rate limiter
+Measures the per-check cost as the number of tracked users grows and compares
+it with the previous timestamp-list limiter
+
+Usage: python benchmark_rate_limiter.py [checks]
+"""
+
+import random
+import sys
+import time
+from collections import defaultdict
+
+from rate_limiter import MemoryRateLimiter
+
+USER_COUNTS = (1_000, 10_000, 100_000)
+
+
+class ListRateLimiter:
+    """The previous implementation: a timestamp list per user and action, filtered on every check"""
+
+    def __init__(self, limits):
+        self.limits = limits
+        self.user_actions = defaultdict(lambda: defaultdict(list))
+
+    def check_rate_limit(self, user_id, action_type, now):
+        max_actions, time_window = self.limits[action_type]
+        actions = self.user_actions[user_id][action_type]
+        actions[:] = [ts for ts in actions if now - ts < time_window]
+        if len(actions) >= max_actions:
+            return False, int(time_window - (now - min(actions)))
+        actions.append(now)
+        return True, 0
+
+
+def per_check_us(limiter, user_ids, start, checks):
+    """Average microseconds per check for `checks` random users, 1ms apart"""
+    began = time.perf_counter()
+    for i in range(checks):
+        limiter.check_rate_limit(user_ids[i], 'message', start + i * 0.001)
+    return (time.perf_counter() - began) / checks * 1e6
+
+
+def main():
+    checks = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    rng = random.Random(42)
+
+    print(f"Random 'message' checks per run: {checks}")
+    print("-" * 72)
+    print(f"{'users':>8} {'gcra us/check':>14} {'list us/check':>14} {'gcra keys':>10} {'list keys':>10}")
+
+    for users in USER_COUNTS:
+        gcra = MemoryRateLimiter(max_keys=users)
+        legacy = ListRateLimiter(gcra.limits)
+
+        # Every user already sent 15 messages in the current minute
+        for limiter in (gcra, legacy):
+            for burst in range(15):
+                for user_id in range(users):
+                    limiter.check_rate_limit(user_id, 'message', now=burst * 0.5)
+
+        user_ids = [rng.randrange(users) for _ in range(checks)]
+        gcra_us = per_check_us(gcra, user_ids, 10.0, checks)
+        legacy_us = per_check_us(legacy, user_ids, 10.0, checks)
+        print(f"{users:>8} {gcra_us:>14.2f} {legacy_us:>14.2f} "
+              f"{gcra.stats()['tracked_keys']:>10} {len(legacy.user_actions):>10}")
+
+        # An hour later only the users who are still active are tracked
+        for i in range(1000):
+            gcra.check_rate_limit(i % 10, 'message', now=3600 + i)
+        gcra.cleanup_old_data(now=3600 + 1000)
+        assert gcra.stats()['tracked_keys'] <= 10, "idle keys were not evicted"
+
+    print("-" * 72)
+    print("✅ GCRA cost stays flat and idle users are evicted")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
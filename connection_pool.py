@@ -0,0 +1,424 @@
+"""
+Connection Pool for HU Counseling Service Bot
+Reuses database connections instead of reconnecting for every query
+"""
+
+import os
+import sqlite3
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from typing import Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes free within the checkout timeout"""
+
+
+class PoolMetrics:
+    """
+    Counters describing pool usage
+    Updated under the owning pool's lock, read via snapshot()
+    """
+
+    def __init__(self):
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.connections_created = 0
+        self.connections_recycled = 0
+        self.health_check_failures = 0
+        self.timeouts = 0
+
+    def snapshot(self) -> Dict:
+        """Return a plain dict copy of the current counters"""
+        return {
+            'checkouts': self.checkouts,
+            'waits': self.waits,
+            'wait_time': round(self.wait_time, 4),
+            'max_wait_time': round(self.max_wait_time, 4),
+            'avg_wait_time': round(self.wait_time / self.waits, 4) if self.waits else 0.0,
+            'connections_created': self.connections_created,
+            'connections_recycled': self.connections_recycled,
+            'health_check_failures': self.health_check_failures,
+            'timeouts': self.timeouts,
+        }
+
+
+class PooledConnection:
+    """
+    Thin proxy around a DB-API connection checked out of a pool
+
+    Calling close() hands the connection back to the pool instead of closing
+    the socket/file, so existing `conn = db.get_connection() ... conn.close()`
+    code keeps working unchanged.
+    """
+
+    __slots__ = ('_conn', '_pool', '_released', 'outermost')
+
+    def __init__(self, conn, pool, outermost: bool = True):
+        self._conn = conn
+        self._pool = pool
+        self._released = False
+        self.outermost = outermost  # False for a nested checkout sharing the connection
+
+    def close(self):
+        """Return the connection to the pool"""
+        if not self._released:
+            self._released = True
+            self._pool._release(self._conn)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.rollback_if_outermost()
+        self.close()
+        return False
+
+    def rollback_if_outermost(self):
+        """Roll back after an error, unless an outer checkout on this thread owns the transaction"""
+        if not self.outermost:
+            return
+        try:
+            self._conn.rollback()
+        except Exception:
+            pass
+
+    def __del__(self):
+        # Handlers that raise before reaching conn.close() must not leak a slot
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class SQLiteConnectionPool:
+    """
+    One long-lived SQLite connection per thread
+
+    PRAGMAs are applied once when the connection is opened. Nested checkouts
+    on the same thread share the connection; uncommitted work is rolled back
+    only when the outermost checkout is released.
+    """
+
+    def __init__(self, db_path: str, timeout: float = 30.0, max_lifetime: float = 3600.0):
+        self.db_path = db_path
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.metrics = PoolMetrics()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._all_connections = []
+        self._depth = {}  # id(conn) -> number of outstanding checkouts
+
+    def _open(self):
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.timeout,  # Wait if database is locked
+            check_same_thread=False
+        )
+        conn.row_factory = sqlite3.Row
+
+        # Enable WAL mode for better concurrency
+        conn.execute('PRAGMA journal_mode=WAL')
+
+        # Set busy timeout (milliseconds)
+        conn.execute(f'PRAGMA busy_timeout={int(self.timeout * 1000)}')
+
+        with self._lock:
+            self.metrics.connections_created += 1
+            self._all_connections.append(conn)
+        return conn
+
+    def _discard(self, conn):
+        with self._lock:
+            if conn in self._all_connections:
+                self._all_connections.remove(conn)
+            if self._depth.get(id(conn), 0) > 0:
+                # Still checked out somewhere; _release() closes it
+                return
+            self._depth.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def acquire(self) -> PooledConnection:
+        """Check out this thread's connection"""
+        local = self._local
+        conn = getattr(local, 'conn', None)
+
+        if conn is not None and time.monotonic() - local.created_at > self.max_lifetime:
+            with self._lock:
+                idle = self._depth.get(id(conn), 0) == 0
+            if idle:
+                self._discard(conn)
+                with self._lock:
+                    self.metrics.connections_recycled += 1
+                conn = None
+
+        if conn is None:
+            conn = self._open()
+            local.conn = conn
+            local.created_at = time.monotonic()
+
+        with self._lock:
+            depth = self._depth.get(id(conn), 0) + 1
+            self._depth[id(conn)] = depth
+            self.metrics.checkouts += 1
+        return PooledConnection(conn, self, outermost=depth == 1)
+
+    def _release(self, conn):
+        with self._lock:
+            depth = self._depth.get(id(conn), 1) - 1
+            self._depth[id(conn)] = depth
+            orphaned = conn not in self._all_connections
+        if depth > 0:
+            return
+        if orphaned:
+            # Connection was recycled while checked out - close it now
+            with self._lock:
+                self._depth.pop(id(conn), None)
+            try:
+                conn.close()
+            except Exception:
+                pass
+            return
+        if conn.in_transaction:
+            try:
+                conn.rollback()
+            except sqlite3.Error as e:
+                logger.warning(f"Discarding broken SQLite connection: {e}")
+                self._discard(conn)
+                if getattr(self._local, 'conn', None) is conn:
+                    self._local.conn = None
+
+    def stats(self) -> Dict:
+        data = self.metrics.snapshot()
+        with self._lock:
+            data['open_connections'] = len(self._all_connections)
+        data['backend'] = 'sqlite'
+        return data
+
+    def close_all(self):
+        """Close every connection opened by this pool"""
+        with self._lock:
+            connections = list(self._all_connections)
+            self._all_connections.clear()
+            self._depth.clear()
+        for conn in connections:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        self._local = threading.local()
+
+
+class PostgresConnectionPool:
+    """
+    Bounded pool of PostgreSQL connections shared by all threads
+
+    Checkout blocks (up to checkout_timeout) when max_size connections are in
+    use. Idle connections are health-checked before reuse and recycled after
+    max_lifetime seconds.
+    """
+
+    def __init__(self, connect: Callable, min_size: int = 1, max_size: int = 10,
+                 max_lifetime: float = 1800.0, idle_check_after: float = 30.0,
+                 checkout_timeout: float = 30.0):
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.idle_check_after = idle_check_after
+        self.checkout_timeout = checkout_timeout
+        self.metrics = PoolMetrics()
+
+        self._cond = threading.Condition()
+        self._idle = []  # [(conn, created_at, last_used)]
+        self._created_at = {}  # id(conn) -> created_at
+        self._size = 0
+
+        for _ in range(min_size):
+            try:
+                conn = self._new_connection()
+                self._idle.append((conn, self._created_at[id(conn)], time.monotonic()))
+            except Exception as e:
+                logger.error(f"Failed to pre-open PostgreSQL connection: {e}")
+                break
+
+    def _new_connection(self):
+        conn = self._connect()
+        with self._cond:
+            self._size += 1
+            self._created_at[id(conn)] = time.monotonic()
+            self.metrics.connections_created += 1
+        return conn
+
+    def _drop(self, conn):
+        with self._cond:
+            self._size -= 1
+            self._created_at.pop(id(conn), None)
+            self._cond.notify()
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_healthy(self, conn, created_at: float, last_used: float) -> bool:
+        now = time.monotonic()
+        if conn.closed:
+            return False
+        if now - created_at > self.max_lifetime:
+            with self._cond:
+                self.metrics.connections_recycled += 1
+            return False
+        if now - last_used > self.idle_check_after:
+            try:
+                cursor = conn.cursor()
+                cursor.execute('SELECT 1')
+                cursor.fetchone()
+                conn.rollback()
+            except Exception as e:
+                logger.warning(f"Pooled PostgreSQL connection failed health check: {e}")
+                with self._cond:
+                    self.metrics.health_check_failures += 1
+                return False
+        return True
+
+    def acquire(self) -> PooledConnection:
+        """Check out a connection, waiting for a free slot if the pool is full"""
+        deadline = time.monotonic() + self.checkout_timeout
+        waited_since = None
+
+        while True:
+            candidate = None
+            open_new = False
+
+            with self._cond:
+                while not self._idle and self._size >= self.max_size:
+                    if waited_since is None:
+                        waited_since = time.monotonic()
+                        self.metrics.waits += 1
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.metrics.timeouts += 1
+                        raise PoolTimeout(
+                            f"No database connection available after {self.checkout_timeout}s "
+                            f"(pool size {self.max_size})"
+                        )
+                    self._cond.wait(remaining)
+
+                if self._idle:
+                    candidate = self._idle.pop()
+                else:
+                    # Reserve the slot before connecting outside the lock
+                    self._size += 1
+                    open_new = True
+
+            if open_new:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._created_at[id(conn)] = time.monotonic()
+                    self.metrics.connections_created += 1
+                break
+
+            conn, created_at, last_used = candidate
+            if self._is_healthy(conn, created_at, last_used):
+                break
+            self._drop(conn)
+
+        with self._cond:
+            self.metrics.checkouts += 1
+            if waited_since is not None:
+                waited = time.monotonic() - waited_since
+                self.metrics.wait_time += waited
+                self.metrics.max_wait_time = max(self.metrics.max_wait_time, waited)
+
+        return PooledConnection(conn, self)
+
+    def _release(self, conn):
+        if conn.closed:
+            self._drop(conn)
+            return
+        try:
+            # Never hand an open transaction to the next borrower
+            conn.rollback()
+        except Exception:
+            self._drop(conn)
+            return
+
+        with self._cond:
+            created_at = self._created_at.get(id(conn), time.monotonic())
+            self._idle.append((conn, created_at, time.monotonic()))
+            self._cond.notify()
+
+    def stats(self) -> Dict:
+        data = self.metrics.snapshot()
+        with self._cond:
+            data['open_connections'] = self._size
+            data['idle_connections'] = len(self._idle)
+        data['in_use'] = data['open_connections'] - data['idle_connections']
+        data['max_size'] = self.max_size
+        data['backend'] = 'postgres'
+        return data
+
+    def close_all(self):
+        """Close idle connections (checked-out ones close when released)"""
+        with self._cond:
+            idle = self._idle
+            self._idle = []
+        for conn, _, _ in idle:
+            self._drop(conn)
+
+
+def create_pool(use_postgres: bool, db_path: str = None, connect: Callable = None):
+    """Build the pool for the active backend using DB_POOL_* environment settings"""
+    if use_postgres:
+        return PostgresConnectionPool(
+            connect,
+            min_size=int(os.getenv("DB_POOL_MIN_SIZE", "1")),
+            max_size=int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+            max_lifetime=float(os.getenv("DB_POOL_MAX_LIFETIME", "1800")),
+            idle_check_after=float(os.getenv("DB_POOL_IDLE_CHECK_SECONDS", "30")),
+            checkout_timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        )
+    return SQLiteConnectionPool(
+        db_path,
+        timeout=30.0,
+        max_lifetime=float(os.getenv("DB_POOL_MAX_LIFETIME", "3600")),
+    )
+
+
+@contextmanager
+def checkout(pool):
+    """
+    Context manager form of pool.acquire(); rolls back on error
+
+    A nested checkout (same thread, same SQLite connection) leaves the
+    rollback to the outermost one, so an inner error cannot silently discard
+    writes the outer caller has not committed yet.
+    """
+    conn = pool.acquire()
+    try:
+        yield conn
+    except Exception:
+        conn.rollback_if_outermost()
+        raise
+    finally:
+        conn.close()
@@ -0,0 +1,353 @@
+"""
+Conversation State Store for HU Counseling Service Bot
+Holds each user's half-finished flow (registration steps, problem
+description, profile edits) with a TTL and an LRU bound, optionally
+persisted in the database so restarts and other workers see it
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+from async_database import get_async_database
+from counseling_database import CounselingDatabase
+
+logger = logging.getLogger(__name__)
+
+# Every key a flow may set - anything else is a typo and raises KeyError
+STATE_FIELDS = (
+    'topic', 'gender', 'description', 'awaiting_description', 'active_session_id',
+    'specializations', 'display_name', 'awaiting_display_name', 'awaiting_bio', 'editing',
+)
+
+BACKENDS = ('memory', 'database')
+
+
+class ConversationState:
+    """
+    One user's flow state with dict-style access (state['topic'], state.get(...),
+    'topic' in state, del state['topic'])
+
+    Fields live in __slots__, so a state costs a few pointers instead of a dict.
+    A field that was never set is missing, like an absent dict key. Writes made
+    through a state handed out by a ConversationStateStore are saved back to it
+    (and refresh the TTL); mutating a stored list in place is not, so assign it
+    back afterwards.
+    """
+
+    __slots__ = STATE_FIELDS + ('_store', '_user_id')
+
+    def __init__(self, values: Dict = None, **fields):
+        self._store = None
+        self._user_id = None
+        for key, value in dict(values or {}, **fields).items():
+            self._set(key, value)
+
+    def _set(self, key: str, value):
+        if key not in STATE_FIELDS:
+            raise KeyError(f"Unknown conversation state key: {key}")
+        setattr(self, key, value)
+
+    def _changed(self):
+        if self._store is not None:
+            self._store._save(self._user_id, self)
+
+    def __getitem__(self, key: str):
+        if key in STATE_FIELDS:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                pass
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value):
+        self._set(key, value)
+        self._changed()
+
+    def __delitem__(self, key: str):
+        if key not in self:
+            raise KeyError(key)
+        delattr(self, key)
+        self._changed()
+
+    def __contains__(self, key) -> bool:
+        return key in STATE_FIELDS and hasattr(self, key)
+
+    def __len__(self) -> int:
+        return len(self.keys())
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, ConversationState):
+            other = other.to_dict()
+        return isinstance(other, dict) and self.to_dict() == other
+
+    def __repr__(self) -> str:
+        return f"ConversationState({self.to_dict()!r})"
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return [key for key in STATE_FIELDS if hasattr(self, key)]
+
+    def to_dict(self) -> Dict:
+        return {key: getattr(self, key) for key in self.keys()}
+
+
+class _Entry:
+    """A cached state (None = known to be absent) with its expiry and last database check"""
+
+    __slots__ = ('state', 'expires_at', 'checked_at')
+
+    def __init__(self, state: Optional[ConversationState], expires_at: float, checked_at: float):
+        self.state = state
+        self.expires_at = expires_at
+        self.checked_at = checked_at
+
+
+class ConversationStateStore:
+    """
+    Dict-style store of ConversationState keyed by user id (drop-in for USER_STATE)
+
+    Assigning a dict stores it as a ConversationState. Entries expire `ttl`
+    seconds after their last write and the least recently used are evicted
+    beyond `max_entries`.
+
+    With the 'memory' backend (default) that is all: a restart drops every flow.
+    With the 'database' backend flows survive restarts and are shared by the
+    workers behind one webhook, without the dict interface ever touching the
+    database on the event loop:
+
+    - reads are served from memory; load() (run for every update by
+      handle_update in handler group -1) refreshes a user's entry on the DB
+      executor when it is older than `cache_seconds`
+    - writes update memory at once and are saved to the conversation_states
+      table by one background thread, in order and coalesced per user
+      (flush() waits for them, close() on shutdown)
+    """
+
+    def __init__(self, db: CounselingDatabase = None, backend: str = None, ttl: float = None,
+                 max_entries: int = None, cache_seconds: float = None):
+        self.backend = (backend or os.getenv("CONVERSATION_STATE_BACKEND", "memory")).lower()
+        if self.backend not in BACKENDS:
+            raise ValueError(f"Unknown conversation state backend: {self.backend} (expected one of {BACKENDS})")
+        if self.backend == 'database' and db is None:
+            raise ValueError("The database conversation state backend needs a CounselingDatabase")
+
+        self.db = db if self.backend == 'database' else None
+        self.async_db = get_async_database(db) if self.db is not None else None
+        self.ttl = ttl if ttl is not None else float(os.getenv("CONVERSATION_STATE_TTL_SECONDS", "86400"))
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("CONVERSATION_STATE_MAX_ENTRIES", "10000"))
+        self.cache_seconds = cache_seconds if cache_seconds is not None else float(os.getenv("CONVERSATION_STATE_CACHE_SECONDS", "5"))
+        self._lock = threading.RLock()
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()  # user_id -> entry (LRU order)
+        self._dirty: Dict[int, Optional[tuple]] = {}               # user_id -> (json, expires_at) or None (delete)
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="conversation-state") if self.db is not None else None
+
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.loads = 0
+        self.saves = 0
+        self.write_errors = 0
+
+    # ==================== DICT INTERFACE ====================
+
+    def __contains__(self, user_id) -> bool:
+        return self._lookup(user_id) is not None
+
+    def __getitem__(self, user_id: int) -> ConversationState:
+        state = self._lookup(user_id)
+        if state is None:
+            raise KeyError(user_id)
+        return state
+
+    def __setitem__(self, user_id: int, value):
+        state = ConversationState(value.to_dict() if isinstance(value, ConversationState) else value)
+        state._store = self
+        state._user_id = user_id
+        self._save(user_id, state)
+
+    def __delitem__(self, user_id: int):
+        if self._lookup(user_id) is None:
+            raise KeyError(user_id)
+        self.pop(user_id)
+
+    def __len__(self) -> int:
+        """Locally held states (expired ones count until touched or evicted)"""
+        with self._lock:
+            return sum(1 for entry in self._entries.values() if entry.state is not None)
+
+    def get(self, user_id: int, default=None):
+        state = self._lookup(user_id)
+        return default if state is None else state
+
+    def pop(self, user_id: int, default=None):
+        """Remove and return a user's state (default if there is none)"""
+        state = self._lookup(user_id)
+        with self._lock:
+            entry = self._entries.pop(user_id, None)
+            if entry is not None and entry.state is not None:
+                entry.state._store = None  # later writes through old references are dropped
+            if self.db is not None:
+                self._put(user_id, _Entry(None, 0.0, time.monotonic()))
+                self._write_behind(user_id, None)
+        return default if state is None else state
+
+    # ==================== DATABASE BACKEND ====================
+
+    async def load(self, user_id: int):
+        """Refresh a user's entry from the database if it is older than cache_seconds (no-op in memory mode)"""
+        if self.db is None:
+            return
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if user_id in self._dirty or (entry is not None and time.monotonic() - entry.checked_at < self.cache_seconds):
+                return
+
+        loaded = await self.async_db.run(self._load, user_id)
+        with self._lock:
+            # Our own writes made meanwhile are newer than what was read
+            if self._entries.get(user_id) is entry and user_id not in self._dirty:
+                self._put(user_id, loaded)
+
+    async def handle_update(self, update, context):
+        """TypeHandler callback: load the sender's state before the handlers run"""
+        if update.effective_user is not None:
+            await self.load(update.effective_user.id)
+
+    def flush(self, timeout: float = None):
+        """Wait until every write made so far is in the database"""
+        if self._writer is not None:
+            self._writer.submit(lambda: None).result(timeout)
+
+    def close(self):
+        """Write what is still pending and stop the writer thread (call on shutdown)"""
+        if self._writer is not None:
+            self._writer.shutdown(wait=True)
+            logger.info("Conversation state writer stopped")
+
+    def _write_behind(self, user_id: int, row: Optional[tuple]):
+        """Queue the latest value for user_id; one queued write per user (caller holds the lock)"""
+        queued = user_id in self._dirty
+        self._dirty[user_id] = row
+        if not queued:
+            self._writer.submit(self._write, user_id)
+
+    def _write(self, user_id: int):
+        while True:
+            with self._lock:
+                if user_id not in self._dirty:
+                    return
+                row = self._dirty[user_id]
+            try:
+                if row is None:
+                    self.db.delete_conversation_state(user_id)
+                else:
+                    self.db.save_conversation_state(user_id, row[0], row[1])
+            except Exception as e:
+                self.write_errors += 1
+                logger.error(f"❌ Could not save conversation state of {user_id}: {e}")
+            with self._lock:
+                # A newer value queued while we wrote goes out on the next pass
+                if self._dirty.get(user_id) is row:
+                    del self._dirty[user_id]
+                    return
+
+    def _load(self, user_id: int) -> _Entry:
+        row = self.db.get_conversation_state(user_id)
+        self.loads += 1
+        if row is None or row[1] <= time.time():
+            return _Entry(None, 0.0, time.monotonic())
+
+        state = ConversationState({key: value for key, value in json.loads(row[0]).items() if key in STATE_FIELDS})
+        state._store = self
+        state._user_id = user_id
+        return _Entry(state, row[1], time.monotonic())
+
+    # ==================== INTERNALS ====================
+
+    def _lookup(self, user_id: int) -> Optional[ConversationState]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            return self._live(user_id, entry)
+
+    def _live(self, user_id: int, entry: _Entry) -> Optional[ConversationState]:
+        """entry.state if it has not expired (caller holds the lock)"""
+        if entry.state is None:
+            self.misses += 1
+            return None
+        if entry.expires_at <= time.time():
+            # Abandoned flow; database rows are purged by the cleanup task
+            del self._entries[user_id]
+            entry.state._store = None
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return entry.state
+
+    def _put(self, user_id: int, entry: _Entry):
+        """Insert entry and evict beyond max_entries (caller holds the lock)"""
+        self._entries[user_id] = entry
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            _, evicted = self._entries.popitem(last=False)
+            if evicted.state is not None:
+                self.evictions += 1
+
+    def _save(self, user_id: int, state: ConversationState):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._put(user_id, _Entry(state, expires_at, time.monotonic()))
+            self.saves += 1
+            if self.db is not None:
+                self._write_behind(user_id, (json.dumps(state.to_dict()), expires_at))
+
+    # ==================== MONITORING ====================
+
+    def stats(self) -> Dict:
+        """Store counters for the admin panel / logs"""
+        with self._lock:
+            return {
+                'backend': self.backend,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'expirations': self.expirations,
+                'evictions': self.evictions,
+                'loads': self.loads,
+                'saves': self.saves,
+                'pending_writes': len(self._dirty),
+                'write_errors': self.write_errors,
+            }
+
+
+_stores = weakref.WeakKeyDictionary()
+_stores_lock = threading.Lock()
+
+
+def get_conversation_state_store(db: CounselingDatabase) -> ConversationStateStore:
+    """Return the shared ConversationStateStore for a database instance"""
+    with _stores_lock:
+        store = _stores.get(db)
+        if store is None:
+            store = ConversationStateStore(db)
+            _stores[db] = store
+            logger.info(f"💬 Conversation state store ready (backend: {store.backend}, ttl: {store.ttl:.0f}s)")
+        return store
@@ -3,16 +3,17 @@ Enhanced Database module for HU Counseling Service Bot
 Supports anonymous counseling sessions between users and counselors
 """
 
-import sqlite3
 import json
-import time
 import os
 import socket
+import time
 import urllib.parse
-from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Tuple
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional, List, Dict, Tuple
 import logging
-from functools import wraps
+from connection_pool import create_pool, checkout
+from db_retry import retry_on_locked, retry_metrics
 
 logger = logging.getLogger(__name__)
 
@@ -25,24 +26,6 @@ if USE_POSTGRES:
 else:
     logger.info("Using SQLite backend")
 
-def retry_on_locked(max_retries=3, delay=0.5):
-    """Decorator to retry database operations if locked"""
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            for attempt in range(max_retries):
-                try:
-                    return func(*args, **kwargs)
-                except sqlite3.OperationalError as e:
-                    if 'locked' in str(e).lower() and attempt < max_retries - 1:
-                        logger.warning(f"Database locked, retrying {func.__name__} (attempt {attempt + 1}/{max_retries})")
-                        time.sleep(delay * (attempt + 1))  # Exponential backoff
-                    else:
-                        raise
-            return func(*args, **kwargs)  # Final attempt
-        return wrapper
-    return decorator
-
 # Counseling topics for student gospel fellowship (6 high-level categories)
 COUNSELING_TOPICS = {
     'academic_career': {
@@ -105,6 +88,9 @@ DB_PATH = os.getenv("DB_PATH", "hu_counseling.db")
 class CounselingDatabase:
     def __init__(self, db_path: str = DB_PATH):
         self.db_path = db_path
+        self._database_url = self._resolve_database_url() if USE_POSTGRES else None
+        self.pool = create_pool(USE_POSTGRES, db_path=db_path, connect=self._connect_postgres)
+        self._listeners = []
         # Global limit for concurrent sessions per counselor (can be overridden via env)
         try:
             self.max_sessions_per_counselor = int(os.getenv("MAX_SESSIONS_PER_COUNSELOR", "3"))
@@ -112,47 +98,87 @@ class CounselingDatabase:
             self.max_sessions_per_counselor = 3
         self.init_database()
         self.migrate_add_gender_column()
+        self.migrate_message_delivery_columns()
+        self.migrate_counselor_specializations()
+        self.migrate_stat_counters()
+        self.migrate_session_activity_column()
+    
+    def _resolve_database_url(self) -> str:
+        """Read DATABASE_URL, tolerating a pasted psql command line"""
+        db_url = os.getenv("DATABASE_URL", "")
+        
+        # Fix common mistake where user pastes the full psql command
+        if db_url.strip().startswith("psql"):
+            logger.warning("Detected 'psql' command in DATABASE_URL. Attempting to extract connection string...")
+            parts = db_url.split()
+            for part in parts:
+                clean_part = part.strip("'\"")
+                if clean_part.startswith("postgres://") or clean_part.startswith("postgresql://"):
+                    db_url = clean_part
+                    logger.info(f"Extracted connection string: {db_url[:15]}...")
+                    break
+        return db_url
+    
+    def _connect_postgres(self):
+        """Open a new PostgreSQL connection (used by the pool)"""
+        try:
+            conn = psycopg2.connect(self._database_url)
+            # DictCursor so rows behave like dicts (similar to sqlite3.Row)
+            conn.cursor_factory = psycopg2.extras.DictCursor
+            return conn
+        except psycopg2.OperationalError as e:
+            logger.error(f"Failed to connect to PostgreSQL: {e}")
+            raise
     
     def get_connection(self):
-        """Get database connection with proper timeout and WAL mode"""
-        if USE_POSTGRES:
-            db_url = os.getenv("DATABASE_URL", "")
-            
-            # Fix common mistake where user pastes the full psql command
-            if db_url.strip().startswith("psql"):
-                logger.warning("Detected 'psql' command in DATABASE_URL. Attempting to extract connection string...")
-                parts = db_url.split()
-                for part in parts:
-                    clean_part = part.strip("'\"")
-                    if clean_part.startswith("postgres://") or clean_part.startswith("postgresql://"):
-                        db_url = clean_part
-                        logger.info(f"Extracted connection string: {db_url[:15]}...")
-                        break
-            
+        """
+        Check out a pooled connection
+        
+        conn.close() returns it to the pool; prefer `with db.connection() as conn:`
+        in new code so the connection is released even if a query fails.
+        """
+        return self.pool.acquire()
+    
+    def connection(self):
+        """Context manager that checks out a pooled connection and always releases it"""
+        return checkout(self.pool)
+    
+    def get_pool_stats(self) -> Dict:
+        """Connection pool metrics (checkouts, waits, wait time, open connections)"""
+        return self.pool.stats()
+    
+    def get_retry_stats(self) -> Dict:
+        """Transient-error retry metrics (retries, give-ups, time spent backing off)"""
+        return retry_metrics.snapshot()
+    
+    def close(self):
+        """Close all pooled connections"""
+        self.pool.close_all()
+    
+    def add_listener(self, callback: Callable):
+        """
+        Register callback(event, **payload), called after each committed write
+        
+        Used by in-process caches (e.g. CounselorIndex) to stay in sync without
+        re-querying. Events: counselor_registered, counselor_availability_changed,
+        counselor_status_changed, counselor_updated, session_requested, session_matched,
+        session_started, session_ended, session_released, session_rated, session_activity.
+        """
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+    
+    def remove_listener(self, callback: Callable):
+        """Unregister a callback added with add_listener()"""
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+    
+    def _notify(self, event: str, **payload):
+        """Deliver a write event to listeners; a failing listener never fails the write"""
+        for callback in list(self._listeners):
             try:
-                conn = psycopg2.connect(db_url)
-                # DictCursor so rows behave like dicts (similar to sqlite3.Row)
-                conn.cursor_factory = psycopg2.extras.DictCursor
-                return conn
-            except psycopg2.OperationalError as e:
-                logger.error(f"Failed to connect to PostgreSQL: {e}")
-                raise
-
-        else:
-            conn = sqlite3.connect(
-                self.db_path,
-                timeout=30.0,  # Wait up to 30 seconds if database is locked
-                check_same_thread=False  # Allow connection across threads
-            )
-            conn.row_factory = sqlite3.Row
-            
-            # Enable WAL mode for better concurrency
-            conn.execute('PRAGMA journal_mode=WAL')
-            
-            # Set busy timeout
-            conn.execute('PRAGMA busy_timeout=30000')  # 30 seconds in milliseconds
-            
-            return conn
+                callback(event, **payload)
+            except Exception as e:
+                logger.error(f"Database listener failed on {event}: {e}")
     
     @property
     def param_placeholder(self):
@@ -164,6 +190,9 @@ class CounselingDatabase:
         conn = self.get_connection()
         cursor = conn.cursor()
         
+        # SQLite only auto-assigns ids for INTEGER PRIMARY KEY columns
+        pk = "SERIAL PRIMARY KEY" if USE_POSTGRES else "INTEGER PRIMARY KEY AUTOINCREMENT"
+        
         # Users table (seekers of counseling)
         cursor.execute(f'''
             CREATE TABLE IF NOT EXISTS users (
@@ -183,7 +212,7 @@ class CounselingDatabase:
         # Counselors table
         cursor.execute(f'''
             CREATE TABLE IF NOT EXISTS counselors (
-                counselor_id SERIAL PRIMARY KEY,
+                counselor_id {pk},
                 user_id BIGINT UNIQUE NOT NULL,
                 display_name TEXT,
                 bio TEXT,
@@ -201,10 +230,21 @@ class CounselingDatabase:
             )
         ''')
         
+        # Normalized counselor specializations (one row per topic) so topic
+        # filtering happens in SQL instead of decoding JSON for every counselor
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS counselor_specializations (
+                counselor_id INTEGER NOT NULL,
+                topic TEXT NOT NULL,
+                PRIMARY KEY (counselor_id, topic),
+                FOREIGN KEY (counselor_id) REFERENCES counselors(counselor_id)
+            )
+        ''')
+        
         # Counseling sessions table
         cursor.execute(f'''
             CREATE TABLE IF NOT EXISTS counseling_sessions (
-                session_id SERIAL PRIMARY KEY,
+                session_id {pk},
                 user_id BIGINT NOT NULL,
                 counselor_id INTEGER,
                 topic TEXT NOT NULL,
@@ -215,6 +255,7 @@ class CounselingDatabase:
                 matched_at TIMESTAMP,
                 started_at TIMESTAMP,
                 ended_at TIMESTAMP,
+                last_message_at TIMESTAMP,
                 end_reason TEXT,
                 user_rating INTEGER,
                 user_feedback TEXT,
@@ -226,12 +267,14 @@ class CounselingDatabase:
         # Session messages table
         cursor.execute(f'''
             CREATE TABLE IF NOT EXISTS session_messages (
-                message_id SERIAL PRIMARY KEY,
+                message_id {pk},
                 session_id INTEGER NOT NULL,
                 sender_role TEXT NOT NULL,
                 sender_id BIGINT NOT NULL,
                 message_text TEXT NOT NULL,
                 is_read INTEGER DEFAULT 0,
+                delivery_status TEXT DEFAULT 'sent',
+                relay_key TEXT,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 FOREIGN KEY (session_id) REFERENCES counseling_sessions(session_id)
             )
@@ -240,7 +283,7 @@ class CounselingDatabase:
         # Counselor availability table
         cursor.execute(f'''
             CREATE TABLE IF NOT EXISTS counselor_availability (
-                id SERIAL PRIMARY KEY,
+                id {pk},
                 counselor_id INTEGER NOT NULL,
                 day_of_week INTEGER NOT NULL,
                 start_time TEXT NOT NULL,
@@ -259,30 +302,72 @@ class CounselingDatabase:
             )
         ''')
         
-        # Initialize bot stats
-        if USE_POSTGRES:
-            cursor.execute('''
-                INSERT INTO bot_stats (stat_name, stat_value) 
-                VALUES 
-                    ('total_users', 0),
-                    ('total_counselors', 0),
-                    ('active_counselors', 0),
-                    ('total_sessions', 0),
-                    ('active_sessions', 0),
-                    ('completed_sessions', 0)
-                ON CONFLICT (stat_name) DO NOTHING
-            ''')
-        else:
-            cursor.execute('''
-                INSERT OR IGNORE INTO bot_stats (stat_name, stat_value) 
-                VALUES 
-                    ('total_users', 0),
-                    ('total_counselors', 0),
-                    ('active_counselors', 0),
-                    ('total_sessions', 0),
-                    ('active_sessions', 0),
-                    ('completed_sessions', 0)
-            ''')
+        # Session lifecycle log: one row per requested/matched/accepted/
+        # declined/transferred/ended step, with who did it
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS session_events (
+                event_id {pk},
+                session_id INTEGER NOT NULL,
+                event_type TEXT NOT NULL,
+                actor_role TEXT NOT NULL,
+                actor_id BIGINT,
+                counselor_id INTEGER,
+                detail TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (session_id) REFERENCES counseling_sessions(session_id)
+            )
+        ''')
+        
+        # Hourly/daily session analytics (maintained by analytics_rollups.py)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS session_rollups (
+                granularity TEXT NOT NULL,
+                bucket_start TIMESTAMP NOT NULL,
+                topic TEXT NOT NULL,
+                requests INTEGER DEFAULT 0,
+                matched INTEGER DEFAULT 0,
+                match_wait_p50 REAL,
+                match_wait_p95 REAL,
+                started INTEGER DEFAULT 0,
+                start_wait_p50 REAL,
+                start_wait_p95 REAL,
+                ended INTEGER DEFAULT 0,
+                duration_p50 REAL,
+                duration_p95 REAL,
+                messages INTEGER DEFAULT 0,
+                rating_count INTEGER DEFAULT 0,
+                rating_sum INTEGER DEFAULT 0,
+                end_reasons TEXT,
+                PRIMARY KEY (granularity, bucket_start, topic)
+            )
+        ''')
+        
+        # How far the rollups are final
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS rollup_watermarks (
+                name TEXT PRIMARY KEY,
+                watermark TIMESTAMP NOT NULL
+            )
+        ''')
+        
+        # Half-finished conversation flows (registration, descriptions, profile edits)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS conversation_states (
+                user_id BIGINT PRIMARY KEY,
+                state TEXT NOT NULL,
+                expires_at DOUBLE PRECISION NOT NULL
+            )
+        ''')
+        
+        # Shared rate limits: theoretical arrival time of each user's next action (GCRA)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS rate_limits (
+                user_id BIGINT NOT NULL,
+                action_type TEXT NOT NULL,
+                tat DOUBLE PRECISION NOT NULL,
+                PRIMARY KEY (user_id, action_type)
+            )
+        ''')
         
         # Admin/moderator table
         cursor.execute(f'''
@@ -306,15 +391,28 @@ class CounselingDatabase:
         cursor = conn.cursor()
         
         try:
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_sessions_status ON counseling_sessions(status)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_sessions_user ON counseling_sessions(user_id)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_sessions_counselor ON counseling_sessions(counselor_id)')
+            # Session indexes follow the lifecycle queries: the pending queue
+            # (status, priority DESC, created_at), a user's/counselor's open
+            # sessions, and cleanup of sessions ended before a cutoff
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_sessions_pending ON counseling_sessions(status, priority DESC, created_at)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_sessions_user_status ON counseling_sessions(user_id, status, created_at)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_sessions_status_ended ON counseling_sessions(status, ended_at)')
+            # Leading columns of the composite indexes above/below
+            cursor.execute('DROP INDEX IF EXISTS idx_sessions_status')
+            cursor.execute('DROP INDEX IF EXISTS idx_sessions_user')
+            cursor.execute('DROP INDEX IF EXISTS idx_sessions_counselor')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_messages_session ON session_messages(session_id)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_counselors_status ON counselors(status)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_counselors_available ON counselors(is_available)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_counselors_user ON counselors(user_id)')  # New index
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_id ON users(user_id)')  # New index
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_admins_id ON admins(user_id)')  # New index
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_sessions_counselor_status ON counseling_sessions(counselor_id, status)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_specializations_topic ON counselor_specializations(topic, counselor_id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_sessions_created ON counseling_sessions(created_at)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_sessions_ended ON counseling_sessions(ended_at)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_session_events_session ON session_events(session_id, created_at)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_session_events_type ON session_events(event_type, created_at)')
             
             conn.commit()
             logger.info("Database indexes created successfully")
@@ -391,6 +489,138 @@ class CounselingDatabase:
         finally:
             conn.close()
     
+    def migrate_message_delivery_columns(self):
+        """Add delivery tracking columns to session_messages if they don't exist"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            if USE_POSTGRES:
+                cursor.execute("""
+                    SELECT column_name 
+                    FROM information_schema.columns 
+                    WHERE table_name = 'session_messages'
+                """)
+                columns = [row['column_name'] for row in cursor.fetchall()]
+            else:
+                cursor.execute("PRAGMA table_info(session_messages)")
+                columns = [column[1] for column in cursor.fetchall()]
+            
+            if 'delivery_status' not in columns:
+                logger.info("Adding delivery_status column to session_messages table...")
+                cursor.execute("ALTER TABLE session_messages ADD COLUMN delivery_status TEXT DEFAULT 'sent'")
+            if 'relay_key' not in columns:
+                logger.info("Adding relay_key column to session_messages table...")
+                cursor.execute("ALTER TABLE session_messages ADD COLUMN relay_key TEXT")
+            
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_messages_relay_key ON session_messages(relay_key)')
+            conn.commit()
+        except Exception as e:
+            logger.error(f"Error adding message delivery columns: {e}")
+        finally:
+            conn.close()
+    
+    def migrate_session_activity_column(self):
+        """Add counseling_sessions.last_message_at, filled from the messages of open sessions"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            if USE_POSTGRES:
+                cursor.execute("""
+                    SELECT column_name 
+                    FROM information_schema.columns 
+                    WHERE table_name = 'counseling_sessions'
+                """)
+                columns = [row['column_name'] for row in cursor.fetchall()]
+            else:
+                cursor.execute("PRAGMA table_info(counseling_sessions)")
+                columns = [column[1] for column in cursor.fetchall()]
+            
+            if 'last_message_at' not in columns:
+                logger.info("Adding last_message_at column to counseling_sessions table...")
+                cursor.execute("ALTER TABLE counseling_sessions ADD COLUMN last_message_at TIMESTAMP")
+                cursor.execute("""
+                    UPDATE counseling_sessions 
+                    SET last_message_at = (
+                        SELECT MAX(created_at) FROM session_messages 
+                        WHERE session_messages.session_id = counseling_sessions.session_id
+                    )
+                    WHERE status IN ('matched', 'active')
+                """)
+            conn.commit()
+        except Exception as e:
+            logger.error(f"Error adding last_message_at column: {e}")
+        finally:
+            conn.close()
+    
+    def migrate_stat_counters(self):
+        """Replace the old bot_stats rows with namespaced counters, filled from the tables"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("SELECT COUNT(*) AS count FROM bot_stats WHERE stat_name = 'users.total'")
+            initialized = cursor.fetchone()['count'] > 0
+            cursor.execute("DELETE FROM bot_stats WHERE stat_name NOT LIKE '%.%'")
+            conn.commit()
+        except Exception as e:
+            logger.error(f"Error migrating statistics counters: {e}")
+            return
+        finally:
+            conn.close()
+        
+        if not initialized:
+            logger.info("Initializing statistics counters...")
+            self.reconcile_stats()
+    
+    def migrate_counselor_specializations(self):
+        """Populate counselor_specializations from the JSON specializations column"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            # Only counselors that have no normalized rows yet
+            cursor.execute('''
+                SELECT c.counselor_id, c.specializations FROM counselors c
+                WHERE c.counselor_id IS NOT NULL
+                AND NOT EXISTS (
+                    SELECT 1 FROM counselor_specializations cs
+                    WHERE cs.counselor_id = c.counselor_id
+                )
+            ''')
+            rows = cursor.fetchall()
+            
+            migrated = 0
+            for row in rows:
+                try:
+                    specializations = json.loads(row['specializations'] or '[]')
+                except (TypeError, ValueError):
+                    logger.warning(f"Counselor {row['counselor_id']} has invalid specializations JSON, skipping")
+                    continue
+                if specializations:
+                    self._replace_specializations(cursor, row['counselor_id'], specializations)
+                    migrated += 1
+            
+            conn.commit()
+            if migrated:
+                logger.info(f"Migrated specializations for {migrated} counselors")
+        except Exception as e:
+            logger.error(f"Error migrating counselor specializations: {e}")
+        finally:
+            conn.close()
+    
+    def _replace_specializations(self, cursor, counselor_id: int, specializations: List[str]):
+        """Rewrite a counselor's rows in counselor_specializations (caller commits)"""
+        ph = self.param_placeholder
+        cursor.execute(f'DELETE FROM counselor_specializations WHERE counselor_id = {ph}', (counselor_id,))
+        topics = list(dict.fromkeys(specializations))
+        if topics:
+            cursor.executemany(
+                f'INSERT INTO counselor_specializations (counselor_id, topic) VALUES ({ph}, {ph})',
+                [(counselor_id, topic) for topic in topics]
+            )
+    
     # ==================== USER MANAGEMENT ====================
     
     def add_user(self, user_id: int, username: str = None, first_name: str = None, 
@@ -400,7 +630,7 @@ class CounselingDatabase:
         cursor = conn.cursor()
         ph = self.param_placeholder
         
-        # Use INSERT OR REPLACE (SQLite) or ON CONFLICT (PostgreSQL) for better performance
+        # The write itself tells whether the user is new (users.total), no extra SELECT
         if USE_POSTGRES:
             cursor.execute(f'''
                 INSERT INTO users (user_id, username, first_name, last_name, language_code, last_active)
@@ -412,13 +642,28 @@ class CounselingDatabase:
                     last_name = EXCLUDED.last_name, 
                     language_code = EXCLUDED.language_code,
                     last_active = CURRENT_TIMESTAMP
+                RETURNING (xmax = 0) AS inserted
             ''', (user_id, None, None, None, language_code))
+            is_new = bool(cursor.fetchone()[0])
         else:
             cursor.execute(f'''
-                INSERT OR REPLACE INTO users 
+                INSERT INTO users 
                 (user_id, username, first_name, last_name, language_code, last_active)
                 VALUES ({ph}, {ph}, {ph}, {ph}, {ph}, CURRENT_TIMESTAMP)
+                ON CONFLICT (user_id) DO NOTHING
             ''', (user_id, None, None, None, language_code))
+            is_new = cursor.rowcount == 1
+            if not is_new:
+                # Same columns as the PostgreSQL upsert; the rest of the row is kept
+                cursor.execute(f'''
+                    UPDATE users 
+                    SET username = {ph}, first_name = {ph}, last_name = {ph}, language_code = {ph},
+                        last_active = CURRENT_TIMESTAMP
+                    WHERE user_id = {ph}
+                ''', (None, None, None, language_code, user_id))
+        
+        if is_new:
+            self._bump_stats(cursor, {'users.total': 1})
         
         conn.commit()
         conn.close()
@@ -482,6 +727,71 @@ class CounselingDatabase:
         
         return row and row['is_banned'] == 1
     
+    # Columns returned by get_user_context (prefixed to avoid name clashes in the join)
+    _CONTEXT_COUNSELOR_COLUMNS = ('counselor_id', 'user_id', 'display_name', 'bio', 'gender', 'specializations',
+                                  'status', 'is_available', 'total_sessions', 'rating_sum', 'rating_count',
+                                  'approved_by', 'approved_at', 'created_at')
+    _CONTEXT_SESSION_COLUMNS = ('session_id', 'user_id', 'counselor_id', 'topic', 'description', 'status',
+                                'priority', 'created_at', 'matched_at', 'started_at', 'ended_at', 'last_message_at', 'end_reason',
+                                'user_rating', 'user_feedback')
+    
+    def get_user_context(self, user_id: int) -> Dict:
+        """
+        Everything menus and routing need to know about a user, in one query
+        
+        Returns: {
+            'is_registered', 'is_banned', 'is_admin' (admins table only),
+            'counselor' (row with parsed specializations, or None),
+            'counselor_status', 'is_counselor' (approved),
+            'active_session' (latest matched/active session as a user, or None)
+        }
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        ph = self.param_placeholder
+        
+        counselor_cols = ', '.join(f'c.{col} AS c_{col}' for col in self._CONTEXT_COUNSELOR_COLUMNS)
+        session_cols = ', '.join(f's.{col} AS s_{col}' for col in self._CONTEXT_SESSION_COLUMNS)
+        
+        cursor.execute(f'''
+            SELECT u.user_id AS u_user_id, u.is_banned AS u_is_banned,
+                   a.user_id AS a_user_id,
+                   {counselor_cols},
+                   {session_cols}
+            FROM (SELECT CAST({ph} AS BIGINT) AS user_id) q
+            LEFT JOIN users u ON u.user_id = q.user_id
+            LEFT JOIN admins a ON a.user_id = q.user_id
+            LEFT JOIN counselors c ON c.user_id = q.user_id
+            LEFT JOIN counseling_sessions s ON s.session_id = (
+                SELECT session_id FROM counseling_sessions 
+                WHERE user_id = q.user_id AND status IN ('matched', 'active')
+                ORDER BY created_at DESC LIMIT 1
+            )
+        ''', (user_id,))
+        
+        row = dict(cursor.fetchone())
+        conn.close()
+        
+        counselor = None
+        if row['c_counselor_id'] is not None:
+            counselor = {col: row[f'c_{col}'] for col in self._CONTEXT_COUNSELOR_COLUMNS}
+            counselor['specializations'] = json.loads(counselor['specializations'] or '[]')
+        
+        session = None
+        if row['s_session_id'] is not None:
+            session = {col: row[f's_{col}'] for col in self._CONTEXT_SESSION_COLUMNS}
+        
+        return {
+            'user_id': user_id,
+            'is_registered': row['u_user_id'] is not None,
+            'is_banned': row['u_is_banned'] == 1,
+            'is_admin': row['a_user_id'] is not None,
+            'counselor': counselor,
+            'counselor_status': counselor['status'] if counselor else None,
+            'is_counselor': bool(counselor and counselor['status'] == 'approved'),
+            'active_session': session,
+        }
+    
     # ==================== COUNSELOR MANAGEMENT ====================
     
     def register_counselor(self, user_id: int, display_name: str, bio: str, 
@@ -493,16 +803,27 @@ class CounselingDatabase:
         
         spec_json = json.dumps(specializations)
         
-        cursor.execute(f'''
+        insert_sql = f'''
             INSERT INTO counselors (user_id, display_name, bio, gender, specializations, status)
             VALUES ({ph}, {ph}, {ph}, {ph}, {ph}, 'pending')
-        ''', (user_id, display_name, bio, gender, spec_json))
+        '''
+        params = (user_id, display_name, bio, gender, spec_json)
+        
+        if USE_POSTGRES:
+            # psycopg2 has no lastrowid for SERIAL keys
+            cursor.execute(insert_sql + ' RETURNING counselor_id', params)
+            counselor_id = cursor.fetchone()[0]
+        else:
+            cursor.execute(insert_sql, params)
+            counselor_id = cursor.lastrowid
         
-        counselor_id = cursor.lastrowid
+        self._replace_specializations(cursor, counselor_id, specializations)
+        self._bump_stats(cursor, {'counselors.status.pending': 1})
         conn.commit()
         conn.close()
         
         logger.info(f"Counselor registered: user_id={user_id}, gender={gender}")
+        self._notify('counselor_registered', counselor_id=counselor_id, user_id=user_id)
         return counselor_id
     
     def approve_counselor(self, counselor_id: int, admin_id: int):
@@ -511,21 +832,19 @@ class CounselingDatabase:
         cursor = conn.cursor()
         ph = self.param_placeholder
         
+        deltas = self._counselor_stat_deltas(cursor, counselor_id, status='approved', is_available=True)
         cursor.execute(f'''
             UPDATE counselors 
             SET status = 'approved', is_available = 1, 
                 approved_by = {ph}, approved_at = CURRENT_TIMESTAMP
             WHERE counselor_id = {ph}
         ''', (admin_id, counselor_id))
-        
-        cursor.execute('''
-            UPDATE bot_stats 
-            SET stat_value = stat_value + 1, updated_at = CURRENT_TIMESTAMP
-            WHERE stat_name IN ('total_counselors', 'active_counselors')
-        ''')
+        self._bump_stats(cursor, deltas)
         
         conn.commit()
         conn.close()
+        
+        self._notify('counselor_status_changed', counselor_id=counselor_id, status='approved', is_available=True)
     
     def reject_counselor(self, counselor_id: int):
         """Reject a counselor application"""
@@ -533,12 +852,16 @@ class CounselingDatabase:
         cursor = conn.cursor()
         ph = self.param_placeholder
         
+        deltas = self._counselor_stat_deltas(cursor, counselor_id, status='rejected')
         cursor.execute(f'''
             UPDATE counselors SET status = 'rejected' WHERE counselor_id = {ph}
         ''', (counselor_id,))
+        self._bump_stats(cursor, deltas)
         
         conn.commit()
         conn.close()
+        
+        self._notify('counselor_status_changed', counselor_id=counselor_id, status='rejected', is_available=False)
     
     def deactivate_counselor(self, counselor_id: int, admin_id: int):
         """Temporarily deactivate a counselor (can be reactivated)"""
@@ -546,15 +869,18 @@ class CounselingDatabase:
         cursor = conn.cursor()
         ph = self.param_placeholder
         
+        deltas = self._counselor_stat_deltas(cursor, counselor_id, status='deactivated', is_available=False)
         cursor.execute(f'''
             UPDATE counselors 
             SET status = 'deactivated', is_available = 0
             WHERE counselor_id = {ph}
         ''', (counselor_id,))
+        self._bump_stats(cursor, deltas)
         
         conn.commit()
         conn.close()
         
+        self._notify('counselor_status_changed', counselor_id=counselor_id, status='deactivated', is_available=False)
         logger.info(f"Counselor {counselor_id} deactivated by admin {admin_id}")
     
     def reactivate_counselor(self, counselor_id: int, admin_id: int):
@@ -563,15 +889,18 @@ class CounselingDatabase:
         cursor = conn.cursor()
         ph = self.param_placeholder
         
+        deltas = self._counselor_stat_deltas(cursor, counselor_id, status='approved', is_available=False)
         cursor.execute(f'''
             UPDATE counselors 
             SET status = 'approved', is_available = 0
             WHERE counselor_id = {ph}
         ''', (counselor_id,))
+        self._bump_stats(cursor, deltas)
         
         conn.commit()
         conn.close()
         
+        self._notify('counselor_status_changed', counselor_id=counselor_id, status='approved', is_available=False)
         logger.info(f"Counselor {counselor_id} reactivated by admin {admin_id}")
     
     def ban_counselor(self, counselor_id: int, admin_id: int, reason: str = ''):
@@ -580,16 +909,20 @@ class CounselingDatabase:
         cursor = conn.cursor()
         ph = self.param_placeholder
         
+        deltas = self._counselor_stat_deltas(cursor, counselor_id, status='banned', is_available=False)
         cursor.execute(f'''
             UPDATE counselors 
             SET status = 'banned', is_available = 0
             WHERE counselor_id = {ph}
         ''', (counselor_id,))
+        self._bump_stats(cursor, deltas)
         
         # Log the ban
         conn.commit()
         conn.close()
         
+        self._notify('counselor_status_changed', counselor_id=counselor_id, status='banned', is_available=False)
+        
         logger.warning(f"Counselor {counselor_id} BANNED by admin {admin_id}. Reason: {reason}")
 
     def delete_counselor(self, counselor_id: int, admin_id: int) -> bool:
@@ -606,7 +939,6 @@ class CounselingDatabase:
             conn.close()
             return True  # Already removed
 
-        status = row['status'] if isinstance(row, dict) else row[0]
         user_id = row['user_id'] if isinstance(row, dict) else row[1]
 
         # Block delete if counselor has active or matched sessions
@@ -620,76 +952,32 @@ class CounselingDatabase:
             conn.close()
             return False
 
+        deltas = self._counselor_stat_deltas(cursor, counselor_id, deleted=True)
+
         # Reset matched sessions to requested and nullify counselor reference
         cursor.execute(f'''
             UPDATE counseling_sessions
             SET status = 'requested', counselor_id = NULL
             WHERE counselor_id = {ph} AND status = 'matched'
         ''', (counselor_id,))
+        deltas.update(self._session_stat_deltas('matched', 'requested', cursor.rowcount))
 
         # Nullify counselor reference for all remaining sessions (should be safe since no active/matched)
         cursor.execute(f'''UPDATE counseling_sessions SET counselor_id = NULL WHERE counselor_id = {ph}''', (counselor_id,))
 
-        # Remove availability rows
+        # Remove availability and specialization rows
         cursor.execute(f'DELETE FROM counselor_availability WHERE counselor_id = {ph}', (counselor_id,))
+        cursor.execute(f'DELETE FROM counselor_specializations WHERE counselor_id = {ph}', (counselor_id,))
 
         # Finally delete counselor
         cursor.execute(f'DELETE FROM counselors WHERE counselor_id = {ph}', (counselor_id,))
+        self._bump_stats(cursor, deltas)
 
         # Do NOT ban the underlying user; allow them to keep using the bot as a normal user
 
-        # Adjust stats (backend-specific safe decrement)
-        try:
-            if status == 'approved':
-                if USE_POSTGRES:
-                    cursor.execute('''
-                        UPDATE bot_stats
-                        SET stat_value = CASE 
-                            WHEN stat_name = 'total_counselors' THEN GREATEST(stat_value - 1, 0)
-                            WHEN stat_name = 'active_counselors' THEN GREATEST(stat_value - 1, 0)
-                            ELSE stat_value
-                        END,
-                            updated_at = CURRENT_TIMESTAMP
-                        WHERE stat_name IN ('total_counselors', 'active_counselors')
-                    ''')
-                else:
-                    cursor.execute('''
-                        UPDATE bot_stats
-                        SET stat_value = CASE 
-                            WHEN stat_name = 'total_counselors' THEN MAX(stat_value - 1, 0)
-                            WHEN stat_name = 'active_counselors' THEN MAX(stat_value - 1, 0)
-                            ELSE stat_value
-                        END,
-                            updated_at = CURRENT_TIMESTAMP
-                        WHERE stat_name IN ('total_counselors', 'active_counselors')
-                    ''')
-            else:
-                if USE_POSTGRES:
-                    cursor.execute('''
-                        UPDATE bot_stats
-                        SET stat_value = CASE 
-                            WHEN stat_name = 'total_counselors' THEN GREATEST(stat_value - 1, 0)
-                            ELSE stat_value
-                        END,
-                            updated_at = CURRENT_TIMESTAMP
-                        WHERE stat_name IN ('total_counselors')
-                    ''')
-                else:
-                    cursor.execute('''
-                        UPDATE bot_stats
-                        SET stat_value = CASE 
-                            WHEN stat_name = 'total_counselors' THEN MAX(stat_value - 1, 0)
-                            ELSE stat_value
-                        END,
-                            updated_at = CURRENT_TIMESTAMP
-                        WHERE stat_name IN ('total_counselors')
-                    ''')
-        except Exception:
-            # Be resilient if bot_stats rows do not exist
-            pass
-
         conn.commit()
         conn.close()
+        self._notify('counselor_status_changed', counselor_id=counselor_id, status='deleted', is_available=False)
         logger.warning(f"Counselor {counselor_id} DELETED by admin {admin_id}")
         return True
     
@@ -710,7 +998,7 @@ class CounselingDatabase:
             updates.append(f"bio = {ph}")
             params.append(bio)
         
-        if specializations:
+        if specializations is not None:
             updates.append(f"specializations = {ph}")
             params.append(json.dumps(specializations))
 
@@ -722,10 +1010,14 @@ class CounselingDatabase:
             query = f"UPDATE counselors SET {', '.join(updates)} WHERE counselor_id = {ph}"
             params.append(counselor_id)
             cursor.execute(query, params)
+            if specializations is not None:
+                self._replace_specializations(cursor, counselor_id, specializations)
             conn.commit()
         
         conn.close()
         
+        if updates:
+            self._notify('counselor_updated', counselor_id=counselor_id)
         logger.info(f"Counselor {counselor_id} info updated")
     
     def get_counselor_by_user_id(self, user_id: int) -> Optional[Dict]:
@@ -767,41 +1059,53 @@ class CounselingDatabase:
         cursor = conn.cursor()
         ph = self.param_placeholder
         
+        deltas = self._counselor_stat_deltas(cursor, counselor_id, is_available=bool(is_available))
         cursor.execute(f'''
             UPDATE counselors SET is_available = {ph} WHERE counselor_id = {ph}
         ''', (1 if is_available else 0, counselor_id))
+        self._bump_stats(cursor, deltas)
         
         conn.commit()
         conn.close()
+        
+        self._notify('counselor_availability_changed', counselor_id=counselor_id, is_available=bool(is_available))
     
     def get_available_counselors(self, topic: str = None) -> List[Dict]:
-        """Get list of available counselors, optionally filtered by topic"""
+        """
+        Get available counselors with spare capacity, optionally filtered by topic
+        
+        Current load comes from one grouped subquery joined in (not a COUNT per
+        counselor) and the topic filter uses the indexed counselor_specializations
+        table. Each result carries active_session_count.
+        """
         conn = self.get_connection()
         cursor = conn.cursor()
         ph = self.param_placeholder
         
+        topic_join = ''
+        params = []
         if topic:
-            cursor.execute(f'''
-                SELECT c.* FROM counselors c
-                WHERE c.status = 'approved' AND c.is_available = 1
-                AND (
-                    SELECT COUNT(*) FROM counseling_sessions s 
-                    WHERE s.counselor_id = c.counselor_id 
-                    AND s.status IN ('matched', 'active')
-                ) < {ph}
-                ORDER BY c.total_sessions ASC, c.rating_sum DESC
-            ''', (self.max_sessions_per_counselor,))
-        else:
-            cursor.execute(f'''
-                SELECT c.* FROM counselors c
-                WHERE c.status = 'approved' AND c.is_available = 1
-                AND (
-                    SELECT COUNT(*) FROM counseling_sessions s 
-                    WHERE s.counselor_id = c.counselor_id 
-                    AND s.status IN ('matched', 'active')
-                ) < {ph}
-                ORDER BY c.total_sessions ASC
-            ''', (self.max_sessions_per_counselor,))
+            topic_join = f'''
+                JOIN counselor_specializations cs
+                    ON cs.counselor_id = c.counselor_id AND cs.topic = {ph}'''
+            params.append(topic)
+        params.append(self.max_sessions_per_counselor)
+        
+        order_by = 'c.total_sessions ASC, c.rating_sum DESC' if topic else 'c.total_sessions ASC'
+        
+        cursor.execute(f'''
+            SELECT c.*, COALESCE(session_load.active_session_count, 0) AS active_session_count
+            FROM counselors c{topic_join}
+            LEFT JOIN (
+                SELECT counselor_id, COUNT(*) AS active_session_count
+                FROM counseling_sessions
+                WHERE status IN ('matched', 'active') AND counselor_id IS NOT NULL
+                GROUP BY counselor_id
+            ) session_load ON session_load.counselor_id = c.counselor_id
+            WHERE c.status = 'approved' AND c.is_available = 1
+            AND COALESCE(session_load.active_session_count, 0) < {ph}
+            ORDER BY {order_by}
+        ''', params)
         
         rows = cursor.fetchall()
         conn.close()
@@ -810,11 +1114,6 @@ class CounselingDatabase:
         for row in rows:
             data = dict(row)
             data['specializations'] = json.loads(data['specializations'])
-            
-            # Filter by topic if specified
-            if topic and topic not in data['specializations']:
-                continue
-            
             counselors.append(data)
         
         return counselors
@@ -837,8 +1136,85 @@ class CounselingDatabase:
         
         return [dict(row) for row in rows]
     
+    def get_counselors_overview(self, limit: int = 10) -> List[Dict]:
+        """Get a compact list of all counselors for the admin management screen"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        ph = self.param_placeholder
+        
+        cursor.execute(f'''
+            SELECT counselor_id, display_name, status, is_available, total_sessions
+            FROM counselors 
+            ORDER BY status, counselor_id
+            LIMIT {ph}
+        ''', (limit,))
+        
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [dict(row) for row in rows]
+    
+    def get_approved_counselors(self, limit: Optional[int] = 20) -> List[Dict]:
+        """Get approved counselors (online first, least busy first); limit=None returns all"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        ph = self.param_placeholder
+        
+        query = '''
+            SELECT * FROM counselors 
+            WHERE status = 'approved'
+            ORDER BY is_available DESC, total_sessions ASC
+        '''
+        if limit is None:
+            cursor.execute(query)
+        else:
+            cursor.execute(query + f' LIMIT {ph}', (limit,))
+        
+        rows = cursor.fetchall()
+        conn.close()
+        
+        counselors = []
+        for row in rows:
+            data = dict(row)
+            try:
+                data['specializations'] = json.loads(data['specializations']) if data['specializations'] else []
+            except (TypeError, ValueError):
+                data['specializations'] = []
+            counselors.append(data)
+        return counselors
+    
     # ==================== SESSION MANAGEMENT ====================
     
+    def _log_session_events(self, cursor, events: List[Tuple]):
+        """
+        Append to the session lifecycle log inside the caller's transaction
+        events: (session_id, event_type, actor_role, actor_id, counselor_id, detail)
+        """
+        if not events:
+            return
+        ph = self.param_placeholder
+        cursor.executemany(f'''
+            INSERT INTO session_events (session_id, event_type, actor_role, actor_id, counselor_id, detail)
+            VALUES ({ph}, {ph}, {ph}, {ph}, {ph}, {ph})
+        ''', events)
+    
+    def get_session_events(self, session_id: int) -> List[Dict]:
+        """A session's lifecycle, oldest first"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        ph = self.param_placeholder
+        
+        cursor.execute(f'''
+            SELECT * FROM session_events 
+            WHERE session_id = {ph}
+            ORDER BY created_at, event_id
+        ''', (session_id,))
+        
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [dict(row) for row in rows]
+    
     def create_session_request(self, user_id: int, topic: str, description: str = None) -> int:
         """Create a new counseling session request"""
         conn = self.get_connection()
@@ -854,94 +1230,512 @@ class CounselingDatabase:
                 priority = 10
         
         ph = self.param_placeholder
-        cursor.execute(f'''
-            INSERT INTO counseling_sessions (user_id, topic, description, status, priority)
-            VALUES ({ph}, {ph}, {ph}, 'requested', {ph})
-        ''', (user_id, topic, description, priority))
+        # Same format as CURRENT_TIMESTAMP, set here so the event carries it too
+        created_at = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        insert_sql = f'''
+            INSERT INTO counseling_sessions (user_id, topic, description, status, priority, created_at)
+            VALUES ({ph}, {ph}, {ph}, 'requested', {ph}, {ph})
+        '''
+        params = (user_id, topic, description, priority, created_at)
         
-        session_id = cursor.lastrowid
+        if USE_POSTGRES:
+            # psycopg2 has no lastrowid for SERIAL keys
+            cursor.execute(insert_sql + ' RETURNING session_id', params)
+            session_id = cursor.fetchone()[0]
+        else:
+            cursor.execute(insert_sql, params)
+            session_id = cursor.lastrowid
         
-        cursor.execute('''
-            UPDATE bot_stats 
-            SET stat_value = stat_value + 1, updated_at = CURRENT_TIMESTAMP
-            WHERE stat_name = 'total_sessions'
-        ''')
+        self._bump_stats(cursor, {'sessions.status.requested': 1, f'sessions.topic.{topic}': 1})
+        self._log_session_events(cursor, [(session_id, 'requested', 'user', user_id, None, topic)])
         
         conn.commit()
         conn.close()
         
+        self._notify('session_requested', session_id=session_id, user_id=user_id, topic=topic,
+                     description=description, priority=priority, created_at=created_at)
         return session_id
     
     @retry_on_locked(max_retries=3, delay=0.5)
-    def match_session_with_counselor(self, session_id: int, counselor_id: int):
-        """Match a session with a counselor"""
+    def match_session_with_counselor(self, session_id: int, counselor_id: int,
+                                     actor_role: str = 'system', actor_id: int = None):
+        """Match a session with a counselor (unconditionally, e.g. an admin assignment)"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            ph = self.param_placeholder
+            
+            cursor.execute(f'SELECT user_id, status FROM counseling_sessions WHERE session_id = {ph}', (session_id,))
+            row = cursor.fetchone()
+            
+            cursor.execute(f'''
+                UPDATE counseling_sessions 
+                SET counselor_id = {ph}, status = 'matched', matched_at = CURRENT_TIMESTAMP
+                WHERE session_id = {ph}
+            ''', (counselor_id, session_id))
+            
+            if row:
+                self._bump_stats(cursor, self._session_stat_deltas(row['status'], 'matched'))
+                self._log_session_events(cursor, [(session_id, 'matched', actor_role, actor_id, counselor_id, None)])
+            
+            conn.commit()
+        
+        self._notify('session_matched', session_id=session_id, counselor_id=counselor_id,
+                     user_id=row['user_id'] if row else None)
+
+    def _claim_sql(self) -> str:
+        """Conditional match: session still waiting, counselor online and under capacity"""
+        ph = self.param_placeholder
+        return f'''
+            UPDATE counseling_sessions 
+            SET counselor_id = {ph}, status = 'matched', matched_at = CURRENT_TIMESTAMP
+            WHERE session_id = {ph} AND status = 'requested'
+            AND EXISTS (
+                SELECT 1 FROM counselors 
+                WHERE counselor_id = {ph} AND status = 'approved' AND is_available = 1
+            )
+            AND (
+                SELECT COUNT(*) FROM counseling_sessions 
+                WHERE counselor_id = {ph} AND status IN ('matched', 'active')
+            ) < {ph}
+        '''
+    
+    def _begin_immediate(self, conn):
+        """SQLite: take the write lock up front so check-and-update cannot interleave"""
+        if not USE_POSTGRES and not conn.in_transaction:
+            conn.execute('BEGIN IMMEDIATE')
+    
+    def claim_session(self, session_id: int, candidate_ids: List[int]) -> Optional[int]:
+        """
+        Atomically match a waiting session with the first candidate that has capacity
+        
+        Candidates are tried in order inside one transaction. On PostgreSQL each
+        counselor row is locked with FOR UPDATE SKIP LOCKED, so a counselor being
+        claimed by a concurrent transaction is skipped rather than waited on; on
+        SQLite BEGIN IMMEDIATE serializes claims. Never over-assigns a counselor
+        past max_sessions_per_counselor and needs no retry loop.
+        Returns: the claimed counselor_id, or None
+        """
+        if not candidate_ids:
+            return None
+        
         conn = self.get_connection()
         cursor = conn.cursor()
         ph = self.param_placeholder
+        claim_sql = self._claim_sql()
+        claimed = None
         
-        cursor.execute(f'''
-            UPDATE counseling_sessions 
-            SET counselor_id = {ph}, status = 'matched'
-            WHERE session_id = {ph}
-        ''', (counselor_id, session_id))
+        try:
+            self._begin_immediate(conn)
+            lock = ' FOR UPDATE' if USE_POSTGRES else ''
+            cursor.execute(f'SELECT status, user_id FROM counseling_sessions WHERE session_id = {ph}{lock}', (session_id,))
+            row = cursor.fetchone()
+            
+            if row and row['status'] == 'requested':
+                for counselor_id in candidate_ids:
+                    if USE_POSTGRES:
+                        cursor.execute(f'''
+                            SELECT counselor_id FROM counselors 
+                            WHERE counselor_id = {ph} FOR UPDATE SKIP LOCKED
+                        ''', (counselor_id,))
+                        if cursor.fetchone() is None:
+                            continue  # Another claim holds this counselor - try the next one
+                    cursor.execute(claim_sql, (counselor_id, session_id, counselor_id, counselor_id,
+                                               self.max_sessions_per_counselor))
+                    if cursor.rowcount:
+                        claimed = counselor_id
+                        break
+            
+            if claimed is not None:
+                self._bump_stats(cursor, self._session_stat_deltas('requested', 'matched'))
+                self._log_session_events(cursor, [(session_id, 'matched', 'system', None, claimed, None)])
+            conn.commit()
+        finally:
+            conn.close()
         
-        conn.commit()
-        conn.close()
+        if claimed is not None:
+            self._notify('session_matched', session_id=session_id, counselor_id=claimed, user_id=row['user_id'])
+        return claimed
+    
+    def match_sessions_bulk(self, assignments: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """
+        Match many (session_id, counselor_id) pairs in a single transaction
+        Uses the same conditional claim as claim_session(): sessions no longer
+        waiting, and counselors that are offline, full or being claimed by a
+        concurrent transaction (PostgreSQL), are skipped.
+        Returns: the pairs that were actually matched
+        """
+        if not assignments:
+            return []
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        ph = self.param_placeholder
+        claim_sql = self._claim_sql()
+        
+        matched = []
+        try:
+            self._begin_immediate(conn)
+            claimable = None
+            if USE_POSTGRES:
+                counselor_ids = sorted({counselor_id for _, counselor_id in assignments})
+                cursor.execute(f'''
+                    SELECT counselor_id FROM counselors 
+                    WHERE counselor_id = ANY({ph}) FOR UPDATE SKIP LOCKED
+                ''', (counselor_ids,))
+                claimable = {row['counselor_id'] for row in cursor.fetchall()}
+            
+            for session_id, counselor_id in assignments:
+                if claimable is not None and counselor_id not in claimable:
+                    continue
+                cursor.execute(claim_sql, (counselor_id, session_id, counselor_id, counselor_id,
+                                           self.max_sessions_per_counselor))
+                if cursor.rowcount:
+                    matched.append((session_id, counselor_id))
+            
+            # Session owners for listeners, in one query
+            owners = {}
+            if matched:
+                placeholders = ', '.join([ph] * len(matched))
+                cursor.execute(f'''
+                    SELECT session_id, user_id FROM counseling_sessions WHERE session_id IN ({placeholders})
+                ''', [session_id for session_id, _ in matched])
+                owners = {row['session_id']: row['user_id'] for row in cursor.fetchall()}
+            
+            self._bump_stats(cursor, self._session_stat_deltas('requested', 'matched', len(matched)))
+            self._log_session_events(cursor, [(session_id, 'matched', 'system', None, counselor_id, None)
+                                              for session_id, counselor_id in matched])
+            conn.commit()
+        finally:
+            conn.close()
+        
+        for session_id, counselor_id in matched:
+            self._notify('session_matched', session_id=session_id, counselor_id=counselor_id,
+                         user_id=owners.get(session_id))
+        return matched
+
+    @retry_on_locked(max_retries=3, delay=0.5)
+    def start_session(self, session_id: int, actor_role: str = 'counselor', actor_id: int = None):
+        """Mark session as active (the counselor accepted it)"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            ph = self.param_placeholder
+            
+            cursor.execute(f'''
+                SELECT counselor_id, user_id, status FROM counseling_sessions WHERE session_id = {ph}
+            ''', (session_id,))
+            row = cursor.fetchone()
+            counselor_id = row['counselor_id'] if row else None
+            user_id = row['user_id'] if row else None
+            
+            cursor.execute(f'''
+                UPDATE counseling_sessions 
+                SET status = 'active', started_at = CURRENT_TIMESTAMP
+                WHERE session_id = {ph}
+            ''', (session_id,))
+            if row:
+                self._bump_stats(cursor, self._session_stat_deltas(row['status'], 'active'))
+                self._log_session_events(cursor, [(session_id, 'accepted', actor_role, actor_id, counselor_id, None)])
+            
+            # Update counselor session count
+            if counselor_id:
+                cursor.execute(f'''
+                    UPDATE counselors 
+                    SET total_sessions = total_sessions + 1
+                    WHERE counselor_id = {ph}
+                ''', (counselor_id,))
+            
+            # Update user session count
+            if user_id:
+                cursor.execute(f'''
+                    UPDATE users 
+                    SET total_sessions = total_sessions + 1, last_active = CURRENT_TIMESTAMP
+                    WHERE user_id = {ph}
+                ''', (user_id,))
+            
+            conn.commit()
+        
+        self._notify('session_started', session_id=session_id, counselor_id=counselor_id, user_id=user_id)
+
+    @retry_on_locked(max_retries=3, delay=0.5)
+    def end_session(self, session_id: int, reason: str = 'completed',
+                    actor_role: str = 'system', actor_id: int = None):
+        """End a session"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            ph = self.param_placeholder
+            
+            # Prior state for listeners (which counselor is freed up)
+            cursor.execute(f'''
+                SELECT counselor_id, user_id, status FROM counseling_sessions WHERE session_id = {ph}
+            ''', (session_id,))
+            row = cursor.fetchone()
+            
+            cursor.execute(f'''
+                UPDATE counseling_sessions 
+                SET status = 'ended', ended_at = CURRENT_TIMESTAMP, end_reason = {ph}
+                WHERE session_id = {ph}
+            ''', (reason, session_id))
+            if row:
+                self._bump_stats(cursor, self._session_stat_deltas(row['status'], 'ended'))
+                self._log_session_events(cursor, [(session_id, 'ended', actor_role, actor_id, row['counselor_id'], reason)])
+            
+            conn.commit()
+        
+        if row:
+            self._notify('session_ended', session_id=session_id, counselor_id=row['counselor_id'],
+                         user_id=row['user_id'], previous_status=row['status'], reason=reason)
 
     @retry_on_locked(max_retries=3, delay=0.5)
-    def start_session(self, session_id: int):
-        """Mark session as active"""
+    def release_session(self, session_id: int, reason: str = 'declined',
+                        actor_role: str = 'counselor', actor_id: int = None):
+        """
+        Put a session back in the waiting queue
+        reason: 'declined' (before accepting) or 'transferred' (during the session)
+        matched_at keeps the time of the latest match; every match is in session_events.
+        """
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            ph = self.param_placeholder
+            
+            cursor.execute(f'''
+                SELECT counselor_id, user_id, status FROM counseling_sessions WHERE session_id = {ph}
+            ''', (session_id,))
+            row = cursor.fetchone()
+            
+            cursor.execute(f'''
+                UPDATE counseling_sessions 
+                SET status = 'requested', counselor_id = NULL
+                WHERE session_id = {ph}
+            ''', (session_id,))
+            if row:
+                self._bump_stats(cursor, self._session_stat_deltas(row['status'], 'requested'))
+                self._log_session_events(cursor, [(session_id, reason, actor_role, actor_id, row['counselor_id'], None)])
+            
+            conn.commit()
+        
+        if row:
+            self._notify('session_released', session_id=session_id, counselor_id=row['counselor_id'],
+                         user_id=row['user_id'], reason=reason)
+
+    # Columns whose latest value is a session's last activity
+    _ACTIVITY_COLUMNS = ('created_at', 'matched_at', 'started_at', 'last_message_at')
+    
+    @retry_on_locked(max_retries=3, delay=0.5)
+    def end_idle_sessions(self, session_ids: List[int], idle_before: datetime,
+                          reason: str = 'timeout') -> List[Dict]:
+        """
+        End, in one transaction, those of session_ids that are still matched or
+        active and have had no activity since idle_before (UTC)
+        Activity checked again here, so a message that just arrived keeps its session open.
+        Returns: the ended session rows (as they were before ending)
+        """
+        if not session_ids:
+            return []
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        ph = self.param_placeholder
+        cutoff = idle_before.strftime('%Y-%m-%d %H:%M:%S')
+        placeholders = ', '.join([ph] * len(session_ids))
+        idle = ' AND '.join(f'({col} IS NULL OR {col} < {ph})' for col in self._ACTIVITY_COLUMNS)
+        
+        try:
+            self._begin_immediate(conn)
+            lock = ' FOR UPDATE' if USE_POSTGRES else ''
+            cursor.execute(f'''
+                SELECT * FROM counseling_sessions 
+                WHERE session_id IN ({placeholders}) AND status IN ('matched', 'active') AND {idle}{lock}
+            ''', list(session_ids) + [cutoff] * len(self._ACTIVITY_COLUMNS))
+            ended = [dict(row) for row in cursor.fetchall()]
+            
+            if ended:
+                cursor.executemany(f'''
+                    UPDATE counseling_sessions 
+                    SET status = 'ended', ended_at = CURRENT_TIMESTAMP, end_reason = {ph}
+                    WHERE session_id = {ph}
+                ''', [(reason, row['session_id']) for row in ended])
+                deltas = Counter()
+                for row in ended:
+                    deltas.update(self._session_stat_deltas(row['status'], 'ended'))
+                self._bump_stats(cursor, deltas)
+                self._log_session_events(cursor, [(row['session_id'], 'ended', 'system', None, row['counselor_id'], reason)
+                                                  for row in ended])
+            conn.commit()
+        finally:
+            conn.close()
+        
+        for row in ended:
+            self._notify('session_ended', session_id=row['session_id'], counselor_id=row['counselor_id'],
+                         user_id=row['user_id'], previous_status=row['status'], reason=reason)
+        return ended
+    
+    def delete_ended_sessions_before(self, cutoff: datetime) -> Tuple[int, int]:
+        """
+        Delete ended sessions (and their messages) that ended before cutoff
+        Returns: (deleted_sessions, deleted_messages)
+        """
         conn = self.get_connection()
         cursor = conn.cursor()
         ph = self.param_placeholder
         
         cursor.execute(f'''
-            UPDATE counseling_sessions 
-            SET status = 'active', started_at = CURRENT_TIMESTAMP
-            WHERE session_id = {ph}
-        ''', (session_id,))
+            SELECT topic, COUNT(*) AS count FROM counseling_sessions 
+            WHERE status = 'ended' AND ended_at < {ph}
+            GROUP BY topic
+        ''', (cutoff.isoformat(),))
+        deleted_topics = {row['topic']: row['count'] for row in cursor.fetchall()}
         
-        # Update counselor session count
         cursor.execute(f'''
-            SELECT counselor_id FROM counseling_sessions WHERE session_id = {ph}
-        ''', (session_id,))
-        row = cursor.fetchone()
+            DELETE FROM session_messages 
+            WHERE session_id IN (
+                SELECT session_id FROM counseling_sessions 
+                WHERE status = 'ended' AND ended_at < {ph}
+            )
+        ''', (cutoff.isoformat(),))
         
-        if row and row['counselor_id']:
-            cursor.execute(f'''
-                UPDATE counselors 
-                SET total_sessions = total_sessions + 1
-                WHERE counselor_id = {ph}
-            ''', (row['counselor_id'],))
+        deleted_messages = cursor.rowcount
         
-        # Update user session count
         cursor.execute(f'''
-            SELECT user_id FROM counseling_sessions WHERE session_id = {ph}
-        ''', (session_id,))
-        row = cursor.fetchone()
+            DELETE FROM session_events 
+            WHERE session_id IN (
+                SELECT session_id FROM counseling_sessions 
+                WHERE status = 'ended' AND ended_at < {ph}
+            )
+        ''', (cutoff.isoformat(),))
         
-        if row and row['user_id']:
-            cursor.execute(f'''
-                UPDATE users 
-                SET total_sessions = total_sessions + 1, last_active = CURRENT_TIMESTAMP
-                WHERE user_id = {ph}
-            ''', (row['user_id'],))
+        cursor.execute(f'''
+            DELETE FROM counseling_sessions 
+            WHERE status = 'ended' AND ended_at < {ph}
+        ''', (cutoff.isoformat(),))
+        
+        deleted_sessions = cursor.rowcount
+        
+        deltas = Counter({'sessions.status.ended': -deleted_sessions, 'messages.total': -deleted_messages})
+        for topic, count in deleted_topics.items():
+            deltas[f'sessions.topic.{topic}'] -= count
+        self._bump_stats(cursor, deltas)
         
         conn.commit()
         conn.close()
+        
+        return deleted_sessions, deleted_messages
 
-    @retry_on_locked(max_retries=3, delay=0.5)
-    def end_session(self, session_id: int, reason: str = 'completed'):
-        """End a session"""
+    # ==================== CONVERSATION STATE ====================
+    
+    def get_conversation_state(self, user_id: int) -> Optional[Tuple[str, float]]:
+        """Get a user's saved conversation state as (state_json, expires_at epoch), or None"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        ph = self.param_placeholder
+        
+        cursor.execute(f'SELECT state, expires_at FROM conversation_states WHERE user_id = {ph}', (user_id,))
+        row = cursor.fetchone()
+        conn.close()
+        
+        return (row['state'], float(row['expires_at'])) if row else None
+    
+    def save_conversation_state(self, user_id: int, state: str, expires_at: float):
+        """Insert or replace a user's conversation state (state is JSON text)"""
         conn = self.get_connection()
         cursor = conn.cursor()
         ph = self.param_placeholder
         
         cursor.execute(f'''
-            UPDATE counseling_sessions 
-            SET status = 'ended', ended_at = CURRENT_TIMESTAMP, end_reason = {ph}
-            WHERE session_id = {ph}
-        ''', (reason, session_id))
+            INSERT INTO conversation_states (user_id, state, expires_at) VALUES ({ph}, {ph}, {ph})
+            ON CONFLICT (user_id) DO UPDATE SET state = excluded.state, expires_at = excluded.expires_at
+        ''', (user_id, state, expires_at))
+        
+        conn.commit()
+        conn.close()
+    
+    def delete_conversation_state(self, user_id: int):
+        """Forget a user's conversation state"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        ph = self.param_placeholder
+        
+        cursor.execute(f'DELETE FROM conversation_states WHERE user_id = {ph}', (user_id,))
+        
+        conn.commit()
+        conn.close()
+    
+    def delete_expired_conversation_states(self, now: float = None) -> int:
+        """Delete conversation states past their expiry. Returns: number deleted"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        ph = self.param_placeholder
+        
+        cursor.execute(f'DELETE FROM conversation_states WHERE expires_at <= {ph}',
+                       (time.time() if now is None else now,))
+        deleted = cursor.rowcount
+        
+        conn.commit()
+        conn.close()
+        
+        return deleted
+
+    # ==================== RATE LIMITS ====================
+    
+    @retry_on_locked(max_retries=3, delay=0.1)
+    def take_rate_limit(self, user_id: int, action_type: str, now: float, interval: float, burst: float) -> float:
+        """
+        Atomically spend one action of a GCRA limit shared by every process
+        
+        interval: seconds one action costs (time_window / max_actions)
+        burst: how far the TAT may run ahead of now (time_window - interval)
+        Returns: 0.0 if allowed, else seconds until the next action is allowed
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        ph = self.param_placeholder
+        
+        try:
+            # The update only happens (and returns a row) while the user is within the limit
+            cursor.execute(f'''
+                INSERT INTO rate_limits (user_id, action_type, tat) VALUES ({ph}, {ph}, {ph})
+                ON CONFLICT (user_id, action_type) DO UPDATE
+                SET tat = (CASE WHEN rate_limits.tat > {ph} THEN rate_limits.tat ELSE {ph} END) + {ph}
+                WHERE rate_limits.tat - {ph} <= {ph}
+                RETURNING tat
+            ''', (user_id, action_type, now + interval, now, now, interval, burst, now))
+            if cursor.fetchone() is not None:
+                conn.commit()
+                return 0.0
+            
+            cursor.execute(f'''
+                SELECT tat FROM rate_limits WHERE user_id = {ph} AND action_type = {ph}
+            ''', (user_id, action_type))
+            row = cursor.fetchone()
+            conn.commit()
+            return max(float(row['tat']) - burst - now, 0.0) if row else 0.0
+        finally:
+            conn.close()
+    
+    def delete_idle_rate_limits(self, now: float) -> int:
+        """Delete rate limit rows whose users have their full allowance back. Returns: number deleted"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        ph = self.param_placeholder
+        
+        cursor.execute(f'DELETE FROM rate_limits WHERE tat <= {ph}', (now,))
+        deleted = cursor.rowcount
+        
+        conn.commit()
+        conn.close()
+        
+        return deleted
+    
+    def reset_rate_limits(self, user_id: int, action_type: str = None):
+        """Give a user their full allowance back (for one action, or all of them)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        ph = self.param_placeholder
+        
+        if action_type:
+            cursor.execute(f'DELETE FROM rate_limits WHERE user_id = {ph} AND action_type = {ph}',
+                           (user_id, action_type))
+        else:
+            cursor.execute(f'DELETE FROM rate_limits WHERE user_id = {ph}', (user_id,))
         
         conn.commit()
         conn.close()
@@ -975,6 +1769,53 @@ class CounselingDatabase:
         
         return dict(row) if row else None
 
+    def get_open_session_assignments(self) -> List[Tuple[int, int]]:
+        """(session_id, counselor_id) for every matched or active session"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT session_id, counselor_id FROM counseling_sessions
+            WHERE status IN ('matched', 'active') AND counselor_id IS NOT NULL
+        ''')
+        
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [(row['session_id'], row['counselor_id']) for row in rows]
+    
+    def get_open_session_activity(self) -> List[Dict]:
+        """session_id, status and activity timestamps of every matched or active session"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute(f'''
+            SELECT session_id, status, {', '.join(self._ACTIVITY_COLUMNS)} FROM counseling_sessions
+            WHERE status IN ('matched', 'active')
+        ''')
+        
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [dict(row) for row in rows]
+    
+    def get_open_session_by_user(self, user_id: int) -> Optional[Dict]:
+        """Get user's latest session that is still waiting, matched or active"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        ph = self.param_placeholder
+        
+        cursor.execute(f'''
+            SELECT * FROM counseling_sessions 
+            WHERE user_id = {ph} AND status IN ('requested', 'matched', 'active')
+            ORDER BY created_at DESC LIMIT 1
+        ''', (user_id,))
+        
+        row = cursor.fetchone()
+        conn.close()
+        
+        return dict(row) if row else None
+
     def get_active_session_by_counselor(self, counselor_id: int) -> Optional[Dict]:
         """Get counselor's active session"""
         conn = self.get_connection()
@@ -992,18 +1833,36 @@ class CounselingDatabase:
         
         return dict(row) if row else None
 
-    def get_pending_sessions(self, limit: int = 10) -> List[Dict]:
-        """Get pending session requests ordered by priority"""
+    def count_active_sessions_by_counselor(self, counselor_id: int) -> int:
+        """Count a counselor's sessions that are currently active (accepted)"""
         conn = self.get_connection()
         cursor = conn.cursor()
         ph = self.param_placeholder
         
         cursor.execute(f'''
+            SELECT COUNT(*) as count FROM counseling_sessions 
+            WHERE counselor_id = {ph} AND status = 'active'
+        ''', (counselor_id,))
+        count = cursor.fetchone()['count']
+        conn.close()
+        
+        return count
+
+    def get_pending_sessions(self, limit: Optional[int] = 10) -> List[Dict]:
+        """Get pending session requests ordered by priority; limit=None returns all"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        ph = self.param_placeholder
+        
+        query = '''
             SELECT * FROM counseling_sessions 
             WHERE status = 'requested'
             ORDER BY priority DESC, created_at ASC
-            LIMIT {ph}
-        ''', (limit,))
+        '''
+        if limit is None:
+            cursor.execute(query)
+        else:
+            cursor.execute(query + f' LIMIT {ph}', (limit,))
         
         rows = cursor.fetchall()
         conn.close()
@@ -1034,28 +1893,85 @@ class CounselingDatabase:
                 SET rating_sum = rating_sum + {ph}, rating_count = rating_count + 1
                 WHERE counselor_id = {ph}
             ''', (rating, row['counselor_id']))
+            if cursor.rowcount:
+                self._bump_stats(cursor, {'ratings.count': 1, 'ratings.sum': rating})
         
         conn.commit()
         conn.close()
+        
+        if row and row['counselor_id']:
+            self._notify('session_rated', session_id=session_id, counselor_id=row['counselor_id'], rating=rating)
 
     @retry_on_locked(max_retries=3, delay=0.5)
     def add_message(self, session_id: int, sender_role: str, sender_id: int, message_text: str) -> int:
         """Add a message to a session"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        ph = self.param_placeholder
-        
-        cursor.execute(f'''
-            INSERT INTO session_messages (session_id, sender_role, sender_id, message_text)
-            VALUES ({ph}, {ph}, {ph}, {ph})
-        ''', (session_id, sender_role, sender_id, message_text))
-        
-        message_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            ph = self.param_placeholder
+            
+            cursor.execute(f'''
+                INSERT INTO session_messages (session_id, sender_role, sender_id, message_text)
+                VALUES ({ph}, {ph}, {ph}, {ph})
+            ''', (session_id, sender_role, sender_id, message_text))
+            
+            message_id = cursor.lastrowid
+            last_message_at = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+            cursor.execute(f'''
+                UPDATE counseling_sessions SET last_message_at = {ph} WHERE session_id = {ph}
+            ''', (last_message_at, session_id))
+            self._bump_stats(cursor, {'messages.total': 1})
+            conn.commit()
         
+        self._notify('session_activity', session_id=session_id, last_message_at=last_message_at)
         return message_id
 
+    @retry_on_locked(max_retries=3, delay=0.5)
+    def add_messages_bulk(self, messages: List[Tuple], status_updates: List[Tuple[str, str]] = None) -> int:
+        """
+        Insert many messages and apply delivery status changes in one transaction
+        messages: (session_id, sender_role, sender_id, message_text, created_at,
+                   relay_key, delivery_status) tuples
+        status_updates: (delivery_status, relay_key) pairs for messages already written
+        Returns: number of messages written
+        """
+        if not messages and not status_updates:
+            return 0
+        
+        # A failed batch must leave nothing behind (the journal retries or splits it)
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            ph = self.param_placeholder
+            
+            if messages:
+                cursor.executemany(f'''
+                    INSERT INTO session_messages 
+                    (session_id, sender_role, sender_id, message_text, created_at, relay_key, delivery_status)
+                    VALUES ({ph}, {ph}, {ph}, {ph}, {ph}, {ph}, {ph})
+                ''', messages)
+            
+            # Latest message per session, for the inactivity timeout
+            activity = {}
+            for message in messages or ():
+                created_at = message[4] or datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+                activity[message[0]] = max(activity.get(message[0], created_at), created_at)
+            if activity:
+                cursor.executemany(f'''
+                    UPDATE counseling_sessions SET last_message_at = {ph} 
+                    WHERE session_id = {ph} AND (last_message_at IS NULL OR last_message_at < {ph})
+                ''', [(created_at, session_id, created_at) for session_id, created_at in sorted(activity.items())])
+            
+            if status_updates:
+                cursor.executemany(f'''
+                    UPDATE session_messages SET delivery_status = {ph} WHERE relay_key = {ph}
+                ''', status_updates)
+            
+            self._bump_stats(cursor, {'messages.total': len(messages or ())})
+            conn.commit()
+        
+        for session_id, created_at in activity.items():
+            self._notify('session_activity', session_id=session_id, last_message_at=created_at)
+        return len(messages or ())
+
     def get_session_messages(self, session_id: int, limit: int = 100) -> List[Dict]:
         """Get messages for a session"""
         conn = self.get_connection()
@@ -1074,6 +1990,18 @@ class CounselingDatabase:
         
         return [dict(row) for row in rows]
 
+    def count_session_messages(self, session_id: int) -> int:
+        """Count messages exchanged in a session"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        ph = self.param_placeholder
+        
+        cursor.execute(f'SELECT COUNT(*) as count FROM session_messages WHERE session_id = {ph}', (session_id,))
+        count = cursor.fetchone()['count']
+        conn.close()
+        
+        return count
+
     # ==================== ADMIN MANAGEMENT ====================
     
     def add_admin(self, user_id: int, added_by: int, role: str = 'admin'):
@@ -1116,25 +2044,191 @@ class CounselingDatabase:
 
     # ==================== STATISTICS ====================
     
-    def get_bot_stats(self) -> Dict:
-        """Get bot statistics"""
+    # bot_stats holds namespaced counters that every write method updates in
+    # its own transaction (users.total, counselors.status.<status>,
+    # counselors.online, sessions.status.<status>, sessions.topic.<topic>,
+    # ratings.count, ratings.sum, messages.total); reconcile_stats() repairs
+    # drift from writes that bypass this class
+    
+    def _bump_stats(self, cursor, deltas: Dict[str, int]):
+        """Add deltas to counters inside the caller's transaction"""
+        rows = sorted((name, delta) for name, delta in deltas.items() if delta)
+        if not rows:
+            return
+        ph = self.param_placeholder
+        # Sorted, so concurrent transactions lock counter rows in the same order
+        cursor.executemany(f'''
+            INSERT INTO bot_stats (stat_name, stat_value, updated_at) 
+            VALUES ({ph}, {ph}, CURRENT_TIMESTAMP)
+            ON CONFLICT (stat_name) DO UPDATE 
+            SET stat_value = bot_stats.stat_value + excluded.stat_value, updated_at = CURRENT_TIMESTAMP
+        ''', rows)
+    
+    def _counselor_stat_deltas(self, cursor, counselor_id: int, status: str = None,
+                               is_available: bool = None, deleted: bool = False) -> Counter:
+        """Counter changes for a counselor status/availability update (call before the UPDATE)"""
+        ph = self.param_placeholder
+        cursor.execute(f'''
+            SELECT status, is_available, rating_sum, rating_count FROM counselors WHERE counselor_id = {ph}
+        ''', (counselor_id,))
+        row = cursor.fetchone()
+        deltas = Counter()
+        if not row:
+            return deltas
+        
+        old_status, old_available = row['status'], bool(row['is_available'])
+        new_status = None if deleted else (status or old_status)
+        new_available = old_available if is_available is None else is_available
+        
+        if new_status != old_status:
+            deltas[f'counselors.status.{old_status}'] -= 1
+            if new_status:
+                deltas[f'counselors.status.{new_status}'] += 1
+        was_online = old_status == 'approved' and old_available
+        is_online = new_status == 'approved' and new_available
+        deltas['counselors.online'] += int(is_online) - int(was_online)
+        
+        if deleted:
+            deltas['ratings.count'] -= row['rating_count'] or 0
+            deltas['ratings.sum'] -= row['rating_sum'] or 0
+        return deltas
+    
+    @staticmethod
+    def _session_stat_deltas(old_status: str, new_status: str, count: int = 1) -> Counter:
+        """Counter changes for count sessions moving from old_status to new_status"""
+        deltas = Counter()
+        if old_status != new_status and count:
+            deltas[f'sessions.status.{old_status}'] -= count
+            deltas[f'sessions.status.{new_status}'] += count
+        return deltas
+    
+    def _count_stats(self, cursor) -> Dict[str, int]:
+        """Every counter recomputed from the tables"""
+        actual = {}
+        
+        cursor.execute('SELECT COUNT(*) AS count FROM users')
+        actual['users.total'] = cursor.fetchone()['count']
+        
+        cursor.execute('SELECT status, COUNT(*) AS count FROM counselors GROUP BY status')
+        for row in cursor.fetchall():
+            actual[f"counselors.status.{row['status']}"] = row['count']
+        
+        cursor.execute("SELECT COUNT(*) AS count FROM counselors WHERE status = 'approved' AND is_available = 1")
+        actual['counselors.online'] = cursor.fetchone()['count']
+        
+        cursor.execute('SELECT SUM(rating_count) AS count, SUM(rating_sum) AS total FROM counselors')
+        row = cursor.fetchone()
+        actual['ratings.count'] = row['count'] or 0
+        actual['ratings.sum'] = row['total'] or 0
+        
+        cursor.execute('SELECT status, COUNT(*) AS count FROM counseling_sessions GROUP BY status')
+        for row in cursor.fetchall():
+            actual[f"sessions.status.{row['status']}"] = row['count']
+        
+        cursor.execute('SELECT topic, COUNT(*) AS count FROM counseling_sessions GROUP BY topic')
+        for row in cursor.fetchall():
+            actual[f"sessions.topic.{row['topic']}"] = row['count']
+        
+        cursor.execute('SELECT COUNT(*) AS count FROM session_messages')
+        actual['messages.total'] = cursor.fetchone()['count']
+        return actual
+    
+    def reconcile_stats(self) -> Dict[str, Tuple[int, int]]:
+        """
+        Recount every counter from the tables and fix the ones that drifted
+        Returns: {stat_name: (stored, actual)} for each counter that was wrong
+        """
         conn = self.get_connection()
         cursor = conn.cursor()
+        ph = self.param_placeholder
         
-        cursor.execute('SELECT stat_name, stat_value FROM bot_stats')
-        rows = cursor.fetchall()
+        try:
+            self._begin_immediate(conn)
+            actual = self._count_stats(cursor)
+            cursor.execute("SELECT stat_name, stat_value FROM bot_stats WHERE stat_name LIKE '%.%'")
+            stored = {row['stat_name']: row['stat_value'] for row in cursor.fetchall()}
+            
+            drift = {}
+            for name in sorted(set(actual) | set(stored)):
+                if stored.get(name) != actual.get(name, 0):
+                    drift[name] = (stored.get(name, 0), actual.get(name, 0))
+            
+            if drift:
+                cursor.executemany(f'''
+                    INSERT INTO bot_stats (stat_name, stat_value, updated_at) 
+                    VALUES ({ph}, {ph}, CURRENT_TIMESTAMP)
+                    ON CONFLICT (stat_name) DO UPDATE 
+                    SET stat_value = excluded.stat_value, updated_at = CURRENT_TIMESTAMP
+                ''', [(name, value) for name, (_, value) in drift.items()])
+            conn.commit()
+        finally:
+            conn.close()
         
-        stats = {row['stat_name']: row['stat_value'] for row in rows}
+        return drift
+    
+    def get_stat_counters(self) -> Dict[str, int]:
+        """All namespaced counters in one read"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
         
-        # Get additional stats
-        cursor.execute('SELECT COUNT(*) as count FROM users')
-        stats['total_users'] = cursor.fetchone()['count']
+        cursor.execute("SELECT stat_name, stat_value FROM bot_stats WHERE stat_name LIKE '%.%'")
+        counters = {row['stat_name']: row['stat_value'] for row in cursor.fetchall()}
         
+        conn.close()
+        return counters
+    
+    @staticmethod
+    def _sum_prefix(counters: Dict[str, int], prefix: str) -> int:
+        return sum(value for name, value in counters.items() if name.startswith(prefix))
+    
+    def get_bot_stats(self) -> Dict:
+        """Get bot statistics (admin panel summary)"""
+        counters = self.get_stat_counters()
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
         cursor.execute('''
             SELECT COUNT(*) as count FROM users 
             WHERE DATE(last_active) = DATE('now')
         ''')
-        stats['active_today'] = cursor.fetchone()['count']
-        
+        active_today = cursor.fetchone()['count']
         conn.close()
+        
+        return {
+            'total_users': counters.get('users.total', 0),
+            'total_counselors': counters.get('counselors.status.approved', 0),
+            'active_counselors': counters.get('counselors.online', 0),
+            'total_sessions': self._sum_prefix(counters, 'sessions.status.'),
+            'active_sessions': counters.get('sessions.status.active', 0),
+            'completed_sessions': counters.get('sessions.status.ended', 0),
+            'active_today': active_today,
+        }
+
+    def get_detailed_stats(self) -> Dict:
+        """Get the full statistics set shown on the admin detailed stats screen (one read)"""
+        counters = self.get_stat_counters()
+        stats = {
+            'total_users': counters.get('users.total', 0),
+            'total_counselors': self._sum_prefix(counters, 'counselors.status.'),
+            'online_counselors': counters.get('counselors.online', 0),
+        }
+        for status in ('approved', 'pending', 'rejected', 'deactivated', 'banned'):
+            stats[f'{status}_counselors'] = counters.get(f'counselors.status.{status}', 0)
+        
+        stats['total_sessions'] = self._sum_prefix(counters, 'sessions.status.')
+        stats['active_sessions'] = counters.get('sessions.status.active', 0)
+        stats['completed_sessions'] = counters.get('sessions.status.ended', 0)
+        stats['pending_sessions'] = counters.get('sessions.status.requested', 0)
+        stats['matched_sessions'] = counters.get('sessions.status.matched', 0)
+        
+        topics = [(name[len('sessions.topic.'):], value) for name, value in counters.items()
+                  if name.startswith('sessions.topic.') and value > 0]
+        topics.sort(key=lambda item: (-item[1], item[0]))
+        stats['top_topics'] = topics[:5]
+        
+        # Average over all ratings
+        total_ratings = counters.get('ratings.count', 0)
+        stats['avg_rating'] = counters.get('ratings.sum', 0) / total_ratings if total_ratings else 0
+        stats['total_ratings'] = total_ratings
+        stats['total_messages'] = counters.get('messages.total', 0)
         return stats
@@ -0,0 +1,247 @@
+"""
+Counselor Availability Index for HU Counseling Service Bot
+Keeps approved counselors and their live session load in memory so
+matching does not have to query the database
+"""
+
+import logging
+import threading
+import time
+import weakref
+from typing import Dict, List, Optional
+
+from counseling_database import CounselingDatabase
+
+logger = logging.getLogger(__name__)
+
+
+class CounselorIndex:
+    """
+    In-process view of approved counselors, bucketed by specialization
+
+    Built once from the database (lazily, on first use) and then kept current
+    from CounselingDatabase write events: availability toggles, status
+    changes, session match/start/end/release and ratings. Looking up the
+    candidates for a topic only touches counselors in that topic's bucket.
+
+    The index only sees writes made through this process's CounselingDatabase,
+    so rebuild() should be called periodically when other processes (admin
+    scripts, a second bot instance) also write to the database.
+    """
+
+    def __init__(self, db: CounselingDatabase):
+        self.db = db
+        self._lock = threading.RLock()
+        self._load_lock = threading.Lock()  # one lazy load at a time, never held with _lock
+        self._loaded = False
+        self.last_rebuild = None
+
+        self._counselors: Dict[int, Dict] = {}   # counselor_id -> counselor row (+ active_session_count)
+        self._by_topic: Dict[str, set] = {}       # topic -> ids of available counselors
+        self._sessions: Dict[int, int] = {}       # open session_id -> counselor_id
+
+        # Events seen while a rebuild's queries run, replayed on its snapshot
+        self._version = 0
+        self._rebuilds = 0
+        self._recent: List[tuple] = []            # (version, event, payload)
+
+        db.add_listener(self.handle_event)
+
+    # ==================== LOADING ====================
+
+    def rebuild(self):
+        """Reload every approved counselor and open session from the database"""
+        start = time.monotonic()
+        # Query without the lock: listeners run on writer threads that may hold
+        # a pooled connection, so waiting for one under the lock can deadlock
+        with self._lock:
+            self._rebuilds += 1
+            since = self._version
+        try:
+            counselors = self.db.get_approved_counselors(limit=None)
+            assignments = self.db.get_open_session_assignments()
+
+            with self._lock:
+                self._counselors = {}
+                self._by_topic = {}
+                self._sessions = {}
+                for counselor in counselors:
+                    counselor['active_session_count'] = 0
+                    self._counselors[counselor['counselor_id']] = counselor
+                for session_id, counselor_id in assignments:
+                    self._assign(session_id, counselor_id)
+                for counselor_id in self._counselors:
+                    self._reindex(counselor_id)
+
+                # Events committed while we queried; assignments are idempotent,
+                # rating/session counters may be counted twice until the next rebuild
+                for version, event, payload in self._recent:
+                    if version > since:
+                        self._apply(event, payload)
+                self._loaded = True
+                self.last_rebuild = time.time()
+        finally:
+            with self._lock:
+                self._rebuilds -= 1
+                if not self._rebuilds:
+                    self._recent = []
+
+        logger.info(f"Counselor index rebuilt: {len(counselors)} counselors, "
+                    f"{len(assignments)} open sessions ({(time.monotonic() - start) * 1000:.1f} ms)")
+
+    def ensure_loaded(self):
+        if not self._loaded:
+            with self._load_lock:
+                if not self._loaded:
+                    self.rebuild()
+
+    # ==================== LOOKUPS ====================
+
+    def get_candidates(self, topic: str = None) -> List[Dict]:
+        """
+        Available counselors with spare capacity (copies, safe to mutate)
+
+        Same contract as CounselingDatabase.get_available_counselors()
+        """
+        self.ensure_loaded()
+        limit = self.db.max_sessions_per_counselor
+        with self._lock:
+            if topic:
+                ids = self._by_topic.get(topic, ())
+            else:
+                ids = {cid for bucket in self._by_topic.values() for cid in bucket}
+            candidates = [
+                dict(self._counselors[cid]) for cid in ids
+                if self._counselors[cid]['active_session_count'] < limit
+            ]
+        candidates.sort(key=lambda c: (c.get('total_sessions') or 0, -(c.get('rating_sum') or 0), c['counselor_id']))
+        return candidates
+
+    def get_counselor(self, counselor_id: int) -> Optional[Dict]:
+        self.ensure_loaded()
+        with self._lock:
+            counselor = self._counselors.get(counselor_id)
+            return dict(counselor) if counselor else None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'counselors': len(self._counselors),
+                'available': sum(1 for c in self._counselors.values() if c.get('is_available')),
+                'open_sessions': len(self._sessions),
+                'topics': {topic: len(ids) for topic, ids in self._by_topic.items()},
+                'last_rebuild': self.last_rebuild,
+            }
+
+    # ==================== INCREMENTAL UPDATES ====================
+
+    def handle_event(self, event: str, **payload):
+        """CounselingDatabase listener"""
+        if event in ('counselor_updated', 'counselor_status_changed') and payload.get('status', 'approved') == 'approved':
+            if not self._loaded and not self._rebuilds:
+                return
+            # Admin actions are rare, so a query is fine - but never under the lock
+            payload['counselor'] = self.db.get_counselor(payload.get('counselor_id'))
+
+        with self._lock:
+            self._version += 1
+            if self._rebuilds:
+                self._recent.append((self._version, event, payload))
+            if not self._loaded:
+                return  # First lookup loads everything anyway
+            self._apply(event, payload)
+
+    def _apply(self, event: str, payload: Dict):
+        """Apply one event to the index (caller holds the lock)"""
+        counselor_id = payload.get('counselor_id')
+        session_id = payload.get('session_id')
+
+        if 'counselor' in payload:
+            self._refresh_counselor(counselor_id, payload['counselor'])
+
+        elif event == 'counselor_availability_changed':
+            counselor = self._counselors.get(counselor_id)
+            if counselor is None:
+                # Not approved (or unknown) - nothing to index
+                return
+            counselor['is_available'] = 1 if payload['is_available'] else 0
+            self._reindex(counselor_id)
+
+        elif event == 'counselor_status_changed':
+            self._drop_counselor(counselor_id)
+
+        elif event == 'session_matched':
+            self._assign(session_id, counselor_id)
+
+        elif event == 'session_started':
+            if counselor_id:
+                self._assign(session_id, counselor_id)
+                counselor = self._counselors.get(counselor_id)
+                if counselor is not None:
+                    counselor['total_sessions'] = (counselor.get('total_sessions') or 0) + 1
+
+        elif event in ('session_ended', 'session_released'):
+            self._unassign(session_id)
+
+        elif event == 'session_rated':
+            counselor = self._counselors.get(counselor_id)
+            if counselor is not None:
+                counselor['rating_sum'] = (counselor.get('rating_sum') or 0) + payload['rating']
+                counselor['rating_count'] = (counselor.get('rating_count') or 0) + 1
+
+    def _refresh_counselor(self, counselor_id: int, counselor: Optional[Dict]):
+        """Install a counselor row re-read after an admin action (caller holds the lock)"""
+        if not counselor or counselor.get('status') != 'approved':
+            self._drop_counselor(counselor_id)
+            return
+        counselor = dict(counselor)
+        counselor['active_session_count'] = sum(1 for cid in self._sessions.values() if cid == counselor_id)
+        self._counselors[counselor_id] = counselor
+        self._reindex(counselor_id)
+
+    def _drop_counselor(self, counselor_id: int):
+        self._counselors.pop(counselor_id, None)
+        for bucket in self._by_topic.values():
+            bucket.discard(counselor_id)
+
+    def _reindex(self, counselor_id: int):
+        """Put the counselor in (or take it out of) its topic buckets"""
+        for bucket in self._by_topic.values():
+            bucket.discard(counselor_id)
+        counselor = self._counselors.get(counselor_id)
+        if counselor is None or not counselor.get('is_available'):
+            return
+        for topic in counselor.get('specializations') or []:
+            self._by_topic.setdefault(topic, set()).add(counselor_id)
+
+    def _assign(self, session_id: int, counselor_id: int):
+        """Record an open session; idempotent so replayed events never double count"""
+        previous = self._sessions.get(session_id)
+        if previous == counselor_id:
+            return
+        if previous is not None:
+            self._unassign(session_id)
+        self._sessions[session_id] = counselor_id
+        counselor = self._counselors.get(counselor_id)
+        if counselor is not None:
+            counselor['active_session_count'] += 1
+
+    def _unassign(self, session_id: int):
+        counselor_id = self._sessions.pop(session_id, None)
+        counselor = self._counselors.get(counselor_id)
+        if counselor is not None and counselor['active_session_count'] > 0:
+            counselor['active_session_count'] -= 1
+
+
+_indexes = weakref.WeakKeyDictionary()
+_indexes_lock = threading.Lock()
+
+
+def get_counselor_index(db: CounselingDatabase) -> CounselorIndex:
+    """Return the shared CounselorIndex for a database instance"""
+    with _indexes_lock:
+        index = _indexes.get(db)
+        if index is None:
+            index = CounselorIndex(db)
+            _indexes[db] = index
+        return index
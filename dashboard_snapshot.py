@@ -0,0 +1,145 @@
+"""
+Admin Dashboard Snapshots for HU Counseling Service Bot
+Computes the admin statistics in the background so the admin screens read a
+ready-made, immutable snapshot instead of querying on every click
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+import weakref
+from datetime import datetime
+from types import MappingProxyType
+from typing import Dict, Mapping, NamedTuple, Optional
+
+from async_database import get_async_database
+from counseling_database import CounselingDatabase
+from matching_system import CounselingMatcher
+
+logger = logging.getLogger(__name__)
+
+
+class DashboardSnapshot(NamedTuple):
+    """Everything the admin screens show, as of computed_at (read-only)"""
+    computed_at: datetime
+    summary: Mapping            # CounselingDatabase.get_bot_stats()
+    detailed: Mapping           # CounselingDatabase.get_detailed_stats()
+    matching: Mapping           # CounselingMatcher.get_matching_statistics()
+    topic_distribution: Mapping  # topic -> number of sessions
+    compute_ms: float
+
+    def age_seconds(self) -> float:
+        return (datetime.now() - self.computed_at).total_seconds()
+
+
+class DashboardSnapshotService:
+    """
+    Recomputes a DashboardSnapshot every `interval` seconds in a background task
+
+    `current` returns the latest snapshot without touching the database.
+    refresh() recomputes on demand (e.g. the admin's Refresh button);
+    concurrent refreshes share one computation. Snapshots are replaced, never
+    modified, so a handler can hold on to one while a new one is built.
+    start() runs from post_init and stop() on shutdown.
+    """
+
+    def __init__(self, db: CounselingDatabase, matcher: CounselingMatcher = None, interval: float = None):
+        self.db = db
+        self.async_db = get_async_database(db)
+        self.matcher = matcher or CounselingMatcher(db)
+        self.interval = interval if interval is not None else float(os.getenv("DASHBOARD_REFRESH_SECONDS", "60"))
+
+        self._snapshot: Optional[DashboardSnapshot] = None
+        self._refreshing: Optional[asyncio.Task] = None
+        self._task: Optional[asyncio.Task] = None
+        self.refreshes = 0
+
+    # ==================== COMPUTING ====================
+
+    def compute(self) -> DashboardSnapshot:
+        """Build a snapshot from the database (blocking - run it on the DB executor)"""
+        start = time.monotonic()
+        summary = self.db.get_bot_stats()
+        detailed = self.db.get_detailed_stats()
+        matching = self.matcher.get_matching_statistics(stats=summary)
+        topics = self.matcher.get_topic_distribution()
+        return DashboardSnapshot(
+            computed_at=datetime.now(),
+            summary=MappingProxyType(summary),
+            detailed=MappingProxyType(detailed),
+            matching=MappingProxyType(matching),
+            topic_distribution=MappingProxyType(topics),
+            compute_ms=round((time.monotonic() - start) * 1000, 1),
+        )
+
+    async def refresh(self) -> DashboardSnapshot:
+        """Recompute now; callers arriving during a refresh wait for the same one"""
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.create_task(self._refresh())
+        return await asyncio.shield(self._refreshing)
+
+    async def _refresh(self) -> DashboardSnapshot:
+        snapshot = await self.async_db.run(self.compute)
+        self._snapshot = snapshot
+        self.refreshes += 1
+        return snapshot
+
+    # ==================== READING ====================
+
+    @property
+    def current(self) -> Optional[DashboardSnapshot]:
+        """Latest snapshot (None until the first one is computed); no database access"""
+        return self._snapshot
+
+    async def get(self, force: bool = False) -> DashboardSnapshot:
+        """Latest snapshot, computing one first if forced or none exists yet"""
+        if force or self._snapshot is None:
+            return await self.refresh()
+        return self._snapshot
+
+    # ==================== LIFECYCLE ====================
+
+    async def start(self):
+        """Refresh every interval until stop() is called"""
+        logger.info(f"✅ Dashboard snapshots started (every {self.interval:.0f}s)")
+        self._task = asyncio.current_task()
+        while True:
+            try:
+                await self.refresh()
+                await asyncio.sleep(self.interval)
+            except asyncio.CancelledError:
+                logger.info("Dashboard snapshot task cancelled")
+                break
+            except Exception as e:
+                logger.error(f"Error computing dashboard snapshot: {e}")
+                await asyncio.sleep(self.interval)
+
+    async def stop(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    def stats(self) -> Dict:
+        snapshot = self._snapshot
+        return {
+            'refreshes': self.refreshes,
+            'computed_at': snapshot.computed_at.isoformat() if snapshot else None,
+            'age_seconds': round(snapshot.age_seconds(), 1) if snapshot else None,
+            'compute_ms': snapshot.compute_ms if snapshot else None,
+        }
+
+
+_services = weakref.WeakKeyDictionary()
+_services_lock = threading.Lock()
+
+def get_dashboard_snapshots(db: CounselingDatabase) -> DashboardSnapshotService:
+    """Return the shared DashboardSnapshotService for a database instance"""
+    with _services_lock:
+        service = _services.get(db)
+        if service is None:
+            service = DashboardSnapshotService(db)
+            _services[db] = service
+        return service
@@ -0,0 +1,222 @@
+"""
+Database Retry Policy for HU Counseling Service Bot
+Retries transient database errors (locks, serialization failures, deadlocks)
+with jittered exponential backoff, for both sync and async callers
+"""
+
+import asyncio
+import functools
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# PostgreSQL SQLSTATE codes worth retrying
+PG_SERIALIZATION_FAILURE = '40001'
+PG_DEADLOCK_DETECTED = '40P01'
+
+
+def classify_error(exc: BaseException) -> Optional[str]:
+    """
+    Name the kind of transient error, or None if retrying would not help
+
+    Only lock/busy errors from SQLite and serialization failures or deadlocks
+    from PostgreSQL are transient; everything else (syntax errors, constraint
+    violations, lost connections) is raised immediately.
+    """
+    if isinstance(exc, sqlite3.OperationalError):
+        message = str(exc).lower()
+        if 'locked' in message:
+            return 'sqlite_locked'
+        if 'busy' in message:
+            return 'sqlite_busy'
+        return None
+
+    # psycopg2 errors carry the SQLSTATE in pgcode (no import needed)
+    pgcode = getattr(exc, 'pgcode', None)
+    if pgcode == PG_SERIALIZATION_FAILURE:
+        return 'pg_serialization_failure'
+    if pgcode == PG_DEADLOCK_DETECTED:
+        return 'pg_deadlock'
+    return None
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter: sleep uniform(0, min(max_delay, base * 2^attempt))"""
+
+    def __init__(self, max_retries: int = None, base_delay: float = None, max_delay: float = None):
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("DB_RETRY_MAX", "3"))
+        self.base_delay = base_delay if base_delay is not None else float(os.getenv("DB_RETRY_BASE_DELAY", "0.05"))
+        self.max_delay = max_delay if max_delay is not None else float(os.getenv("DB_RETRY_MAX_DELAY", "2.0"))
+
+    def backoff(self, attempt: int) -> float:
+        """Delay before retry number attempt + 1"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class RetryMetrics:
+    """Process-wide retry counters, read via snapshot()"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.retries = 0
+            self.giveups = 0
+            self.recovered = 0
+            self.sleep_time = 0.0
+            self.by_error: Dict[str, int] = {}
+            self.by_function: Dict[str, int] = {}
+
+    def record_retry(self, name: str, kind: str, delay: float):
+        with self._lock:
+            self.retries += 1
+            self.sleep_time += delay
+            self.by_error[kind] = self.by_error.get(kind, 0) + 1
+            self.by_function[name] = self.by_function.get(name, 0) + 1
+
+    def record_giveup(self):
+        with self._lock:
+            self.giveups += 1
+
+    def record_recovered(self):
+        with self._lock:
+            self.recovered += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                'retries': self.retries,
+                'recovered': self.recovered,
+                'giveups': self.giveups,
+                'sleep_time': round(self.sleep_time, 4),
+                'by_error': dict(self.by_error),
+                'by_function': dict(self.by_function),
+            }
+
+
+retry_metrics = RetryMetrics()
+
+
+def _retry_delay(exc: BaseException, attempt: int, policy: RetryPolicy, name: str) -> Optional[float]:
+    """Backoff before the next attempt, or None if exc should propagate"""
+    kind = classify_error(exc)
+    if kind is None:
+        return None
+    if attempt >= policy.max_retries:
+        retry_metrics.record_giveup()
+        logger.error(f"{name}: giving up after {attempt + 1} attempts ({kind}: {exc})")
+        return None
+
+    delay = policy.backoff(attempt)
+    retry_metrics.record_retry(name, kind, delay)
+    logger.warning(f"{name}: {kind}, retrying in {delay * 1000:.0f} ms (attempt {attempt + 1}/{policy.max_retries})")
+    return delay
+
+
+def retry_on_transient(max_retries: int = None, base_delay: float = None, max_delay: float = None):
+    """
+    Decorator retrying transient database errors with jittered backoff
+
+    max_retries counts retries, so a call runs at most max_retries + 1 times.
+    Decorated database methods must release their connection themselves
+    (`with self.connection() as conn:`) so nothing is held while backing off.
+
+    Works on plain and async functions. Sync callers sleep with time.sleep; the
+    async path (and AsyncCounselingDatabase, via retry_async) uses asyncio.sleep
+    so the event loop keeps running. The undecorated function is available as
+    __wrapped__ and the policy as retry_policy.
+    """
+    policy = RetryPolicy(max_retries, base_delay, max_delay)
+
+    def decorator(func):
+        name = func.__qualname__
+
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                attempt = 0
+                while True:
+                    try:
+                        result = await func(*args, **kwargs)
+                        if attempt:
+                            retry_metrics.record_recovered()
+                        return result
+                    except Exception as e:
+                        delay = _retry_delay(e, attempt, policy, name)
+                        if delay is None:
+                            raise
+                    await asyncio.sleep(delay)
+                    attempt += 1
+
+            async_wrapper.retry_policy = policy
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            attempt = 0
+            while True:
+                try:
+                    result = func(*args, **kwargs)
+                    if attempt:
+                        retry_metrics.record_recovered()
+                    return result
+                except Exception as e:
+                    delay = _retry_delay(e, attempt, policy, name)
+                    if delay is None:
+                        raise
+                # Sleep outside the except block so the exception is released first
+                time.sleep(delay)
+                attempt += 1
+
+        wrapper.retry_policy = policy
+        return wrapper
+
+    return decorator
+
+
+def _attempt(func: Callable, attempt: int, policy: RetryPolicy, name: str, args, kwargs):
+    """One try on a worker thread: ('ok', result) or ('retry', delay); other errors raise"""
+    try:
+        return 'ok', func(*args, **kwargs)
+    except Exception as e:
+        delay = _retry_delay(e, attempt, policy, name)
+        if delay is None:
+            raise
+    return 'retry', delay
+
+
+async def retry_async(run: Callable, func: Callable, policy: RetryPolicy, *args, **kwargs):
+    """
+    Retry a blocking call from async code without holding a thread while waiting
+
+    run(fn, *args) must execute fn off the event loop (e.g. AsyncCounselingDatabase.run).
+    Each attempt runs on a worker; backoff happens on the loop with asyncio.sleep.
+    """
+    name = getattr(func, '__qualname__', repr(func))
+    attempt = 0
+    while True:
+        status, value = await run(_attempt, func, attempt, policy, name, args, kwargs)
+        if status == 'ok':
+            if attempt:
+                retry_metrics.record_recovered()
+            return value
+        await asyncio.sleep(value)
+        attempt += 1
+
+
+def retry_on_locked(max_retries=3, delay=0.5):
+    """
+    Backwards-compatible name for retry_on_transient
+
+    Keeps its old meaning: max_retries is the total number of attempts, and
+    delay is the base backoff.
+    """
+    return retry_on_transient(max_retries=max(max_retries - 1, 0), base_delay=delay)
@@ -14,6 +14,15 @@ import os
 from dotenv import load_dotenv
 from counseling_database import CounselingDatabase, COUNSELING_TOPICS
 from matching_system import CounselingMatcher
+from async_database import get_async_database
+from routing_cache import get_routing_cache
+from message_journal import get_message_journal
+from relay_pipeline import RelayPipeline
+from outbound_dispatcher import OutboundDispatcher
+from dashboard_snapshot import get_dashboard_snapshots
+from conversation_state import get_conversation_state_store
+from rate_limiter import get_rate_limiter, rate_limit
+from rate_limit_gate import RateLimitGate
 
 # Load environment variables
 load_dotenv()
@@ -34,8 +43,34 @@ ADMIN_IDS = [int(id.strip()) for id in ADMIN_IDS_STR.split(',') if id.strip()] i
 db = CounselingDatabase()
 matcher = CounselingMatcher(db)
 
-# User states
-USER_STATE = {}
+# Awaitable view of db for handlers - queries run on a bounded thread pool
+async_db = get_async_database(db)
+
+# Who each user is and where their messages go (invalidated by db writes)
+routing_cache = get_routing_cache(db)
+
+# Chat messages are queued and written in batches (flushed on shutdown)
+message_journal = get_message_journal(db)
+
+# Every message the bot sends on its own goes through one rate-limited queue
+# (bound to application.bot in post_init)
+outbound = OutboundDispatcher()
+
+# Forwards chat messages while the journal saves them, retrying failed sends
+relay_pipeline = RelayPipeline(message_journal)
+
+# Admin statistics, recomputed in the background (started in post_init)
+dashboard = get_dashboard_snapshots(db)
+
+# Spam limits (RATE_LIMIT_BACKEND=database shares them between processes)
+rate_limiter = get_rate_limiter(db)
+
+# Drops over-limit updates before any handler runs (registered at group -2)
+rate_limit_gate = RateLimitGate(rate_limiter, exempt_user_ids=ADMIN_IDS)
+
+# Half-finished flows per user: expiring and bounded, optionally kept in the
+# database (CONVERSATION_STATE_BACKEND=database) to survive restarts
+USER_STATE = get_conversation_state_store(db)
 
 # ==================== KEYBOARD HELPERS ====================
 
@@ -130,8 +165,8 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not user:
         return
     
-    # Add user to database (non-blocking)
-    db.add_user(
+    # Add user to database (runs on the DB executor, off the event loop)
+    await async_db.add_user(
         user_id=user.id,
         username=user.username,
         first_name=user.first_name,
@@ -159,27 +194,15 @@ Neither party will see personal information about the other.
 Choose an option below to get started:
 """
     
-    # Check if user is banned (quick check)
-    if db.is_user_banned(user.id):
+    # Ban, counselor, admin and active session status in one query
+    user_context = await async_db.get_user_context(user.id)
+    if user_context['is_banned']:
         await update.message.reply_text("⚠️ You have been banned from using this service.")
         return
     
-    # Check if user is counselor and admin (in parallel for performance)
-    import asyncio
-    
-    # Run database checks concurrently
-    counselor_task = asyncio.create_task(asyncio.to_thread(db.get_counselor_by_user_id, user.id))
-    admin_task = asyncio.create_task(asyncio.to_thread(db.is_admin, user.id))
-    session_task = asyncio.create_task(asyncio.to_thread(db.get_active_session_by_user, user.id))
-    
-    # Get results
-    counselor = await counselor_task
-    is_admin_db = await admin_task
-    active_session = await session_task
-    
-    is_counselor = counselor and counselor['status'] == 'approved'
-    is_admin = is_admin_db or user.id in ADMIN_IDS
-    has_active_session = active_session is not None
+    is_counselor = user_context['is_counselor']
+    is_admin = user_context['is_admin'] or user.id in ADMIN_IDS
+    has_active_session = user_context['active_session'] is not None
     
     keyboard = create_main_menu_keyboard(is_counselor, is_admin, has_active_session)
     await update.message.reply_text(welcome_text, reply_markup=keyboard, parse_mode='Markdown')
@@ -274,7 +297,7 @@ async def request_counseling(update: Update, context: ContextTypes.DEFAULT_TYPE)
     user_id = query.from_user.id
     
     # Check if user already has a pending or active session
-    active_session = db.get_active_session_by_user(user_id)
+    active_session = await async_db.get_active_session_by_user(user_id)
     if active_session:
         await query.edit_message_text(
             "⚠️ You already have a pending or active counseling request.\n\n"
@@ -353,7 +376,7 @@ async def user_gender_selected(update: Update, context: ContextTypes.DEFAULT_TYP
     gender = query.data.replace('user_gender_', '')
     
     # Save gender to database
-    db.update_user_gender(user_id, gender)
+    await async_db.update_user_gender(user_id, gender)
     
     # Store in state
     if user_id not in USER_STATE:
@@ -416,6 +439,7 @@ Would you like to briefly describe your situation? This helps us match you with
     await query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode='Markdown')
     USER_STATE[user_id]['awaiting_description'] = True
 
+@rate_limit('session_request', exempt_user_ids=ADMIN_IDS)
 async def handle_description(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle user's description message"""
     user_id = update.effective_user.id
@@ -433,16 +457,15 @@ async def handle_description(update: Update, context: ContextTypes.DEFAULT_TYPE)
 async def initiate_matching_process(user_id: int, topic: str, description: str, response_handler):
     """Initiate the matching process for a counseling session"""
     # Create session in database
-    session_id = db.create_session_request(user_id, topic, description)
+    session_id = await async_db.create_session_request(user_id, topic, description)
     
     # Try to match with a counselor
-    counselor_id = matcher.find_best_match(session_id)
+    counselor_id = await async_db.run(matcher.match_session, session_id)
     
     if counselor_id:
-        db.match_session_with_counselor(session_id, counselor_id)
         
         # Get counselor info
-        counselor = db.get_counselor(counselor_id)
+        counselor = await async_db.get_counselor(counselor_id)
         counselor_user_id = counselor['user_id']
         
         topic_data = COUNSELING_TOPICS.get(topic, {})
@@ -472,7 +495,7 @@ async def initiate_matching_process(user_id: int, topic: str, description: str,
         desc_preview = description[:100] + "..." if description and len(description) > 100 else (description or "No description provided")
         
         # Get user's gender
-        user_data = db.get_user(user_id)
+        user_data = await async_db.get_user(user_id)
         user_gender = user_data.get('gender', 'anonymous') if user_data else 'anonymous'
         gender_display = {
             'male': '👨 Male',
@@ -518,6 +541,7 @@ async def initiate_matching_process(user_id: int, topic: str, description: str,
                 reply_markup=create_main_menu_keyboard()
             )
 
+@rate_limit('session_request', exempt_user_ids=ADMIN_IDS)
 async def skip_description(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Skip description and proceed to match"""
     query = update.callback_query
@@ -550,16 +574,15 @@ async def create_counseling_session(update: Update, context: ContextTypes.DEFAUL
         return
     
     # Create session in database
-    session_id = db.create_session_request(user_id, topic, description)
+    session_id = await async_db.create_session_request(user_id, topic, description)
     
     # Try to match with a counselor
-    counselor_id = matcher.find_best_match(session_id)
+    counselor_id = await async_db.run(matcher.match_session, session_id)
     
     if counselor_id:
-        db.match_session_with_counselor(session_id, counselor_id)
         
         # Notify counselor
-        counselor = db.get_counselor(counselor_id)
+        counselor = await async_db.get_counselor(counselor_id)
         counselor_user_id = counselor['user_id']
         
         topic_data = COUNSELING_TOPICS.get(topic, {})
@@ -578,7 +601,7 @@ async def create_counseling_session(update: Update, context: ContextTypes.DEFAUL
         desc_preview = description[:100] + "..." if description and len(description) > 100 else (description or "No description provided")
         
         # Get user's gender
-        user_data = db.get_user(user_id)
+        user_data = await async_db.get_user(user_id)
         user_gender = user_data.get('gender', 'anonymous') if user_data else 'anonymous'
         gender_display = {
             'male': '👨 Male',
@@ -591,7 +614,7 @@ async def create_counseling_session(update: Update, context: ContextTypes.DEFAUL
             InlineKeyboardButton("❌ Decline", callback_data=f'decline_session_{session_id}')
         ]]
         
-        await context.bot.send_message(
+        outbound.notify(
             chat_id=counselor_user_id,
             text=f"**🔔 New Counseling Request**\n\n"
                  f"**Topic:** {topic_data['icon']} {topic_data['name']}\n"
@@ -631,15 +654,14 @@ async def create_counseling_session_from_callback(query, context: ContextTypes.D
         return
 
     # Create session in database
-    session_id = db.create_session_request(user_id, topic, description)
+    session_id = await async_db.create_session_request(user_id, topic, description)
     
     # Try to match with a counselor
-    counselor_id = matcher.find_best_match(session_id)
+    counselor_id = await async_db.run(matcher.match_session, session_id)
     
     if counselor_id:
-        db.match_session_with_counselor(session_id, counselor_id)
         
-        counselor = db.get_counselor(counselor_id)
+        counselor = await async_db.get_counselor(counselor_id)
         counselor_user_id = counselor['user_id']
         
         topic_data = COUNSELING_TOPICS.get(topic, {})
@@ -656,7 +678,7 @@ async def create_counseling_session_from_callback(query, context: ContextTypes.D
         desc_preview = description[:100] + "..." if description and len(description) > 100 else (description or "No description provided")
         
         # Get user's gender
-        user_data = db.get_user(user_id)
+        user_data = await async_db.get_user(user_id)
         user_gender = user_data.get('gender', 'anonymous') if user_data else 'anonymous'
         gender_display = {
             'male': '👨 Male',
@@ -669,7 +691,7 @@ async def create_counseling_session_from_callback(query, context: ContextTypes.D
             InlineKeyboardButton("❌ Decline", callback_data=f'decline_session_{session_id}')
         ]]
         
-        await context.bot.send_message(
+        outbound.notify(
             chat_id=counselor_user_id,
             text=f"**🔔 New Counseling Request**\n\n"
                  f"**Topic:** {topic_data['icon']} {topic_data['name']}\n"
@@ -702,13 +724,13 @@ async def accept_session(update: Update, context: ContextTypes.DEFAULT_TYPE):
     session_id = int(query.data.replace('accept_session_', ''))
     counselor_user_id = query.from_user.id
     
-    session = db.get_session(session_id)
+    session = await async_db.get_session(session_id)
     if not session or session['status'] != 'matched':
         await query.edit_message_text("⚠️ This session is no longer available.")
         return
     
     # Start the session
-    db.start_session(session_id)
+    await async_db.start_session(session_id, actor_id=counselor_user_id)
     # Set this session as the counselor's currently active reply target
     if counselor_user_id not in USER_STATE:
         USER_STATE[counselor_user_id] = {}
@@ -719,7 +741,7 @@ async def accept_session(update: Update, context: ContextTypes.DEFAULT_TYPE):
     topic_data = COUNSELING_TOPICS.get(session['topic'], {})
     
     # Notify user
-    await context.bot.send_message(
+    outbound.notify(
         chat_id=user_id,
         text=f"✅ **Session Started!**\n\n"
              f"Your counselor has joined. You can now begin your conversation.\n\n"
@@ -734,7 +756,7 @@ async def accept_session(update: Update, context: ContextTypes.DEFAULT_TYPE):
     desc = session.get('description', 'No description provided')
     
     # Get user's gender
-    user_data = db.get_user(user_id)
+    user_data = await async_db.get_user(user_id)
     user_gender = user_data.get('gender', 'anonymous') if user_data else 'anonymous'
     gender_display = {
         'male': '👨 Male',
@@ -759,28 +781,22 @@ async def decline_session(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     session_id = int(query.data.replace('decline_session_', ''))
     
-    session = db.get_session(session_id)
+    session = await async_db.get_session(session_id)
     if not session:
         await query.edit_message_text("⚠️ This session is no longer available.")
         return
     
     # Reset session to requested state and try to find another counselor
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    ph = db.param_placeholder
-    
-    cursor.execute(f'UPDATE counseling_sessions SET status = {ph}, counselor_id = NULL WHERE session_id = {ph}',
-                  ('requested', session_id))
-    conn.commit()
-    conn.close()
+    await async_db.release_session(session_id, 'declined', actor_id=query.from_user.id)
     
     await query.edit_message_text("You've declined this session. Looking for another counselor...")
     
     # Try to find another match
-    new_counselor_id = matcher.find_best_match(session_id)
+    new_counselor_id = await async_db.run(matcher.match_session, session_id, session=session,
+                                          exclude=(session['counselor_id'],))
     if new_counselor_id:
-        db.match_session_with_counselor(session_id, new_counselor_id)
         # Notify new counselor (similar to above)
+        logger.info(f"Declined session {session_id} re-matched with counselor {new_counselor_id}")
 
 async def handle_session_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle messages during an active session"""
@@ -796,11 +812,13 @@ async def handle_session_message(update: Update, context: ContextTypes.DEFAULT_T
     # IMPORTANT: Check counselor FIRST before user
     # This prevents counselors from matching as users in their own sessions
     logger.info(f"🔍 Checking if user {user_id} is a counselor...")
-    counselor = db.get_counselor_by_user_id(user_id)
+    route = await routing_cache.get_route_async(user_id, async_db)
+    user_context = route['context']
+    counselor = user_context['counselor']
     
     if counselor and counselor.get('status') == 'approved':
         logger.info(f"✅ User {user_id} IS counselor {counselor['counselor_id']}, status: approved")
-        counselor_sessions = db.get_active_sessions_by_counselor(counselor['counselor_id'])
+        counselor_sessions = route['counselor_sessions']
         session = None
         selected_session_id = None
         if user_id in USER_STATE:
@@ -812,7 +830,7 @@ async def handle_session_message(update: Update, context: ContextTypes.DEFAULT_T
                     break
         if session is None:
             # Fallback: if they only have ONE active session, default to it
-            active_sessions = db.get_active_sessions_by_counselor(counselor['counselor_id'])
+            active_sessions = counselor_sessions
             if len(active_sessions) == 1:
                 session = active_sessions[0]
                 # Auto-set state for convenience
@@ -848,26 +866,18 @@ async def handle_session_message(update: Update, context: ContextTypes.DEFAULT_T
             
             logger.info(f"📤 Preparing to send counselor message to user {client_user_id}")
             
-            # Save message
-            db.add_message(session_id, 'counselor', user_id, message_text)
-            logger.info(f"💾 Message saved to database")
-            
-            # Forward to user with anonymous display name
-            try:
-                await context.bot.send_message(
-                    chat_id=client_user_id,
-                    text=f"Counselor #{counselor['counselor_id']}\\n\n{message_text}",
-                    parse_mode='Markdown'
-                )
+            # Save and forward to user with anonymous display name
+            delivered = await relay_pipeline.relay(
+                context.bot, session_id, 'counselor', user_id, message_text,
+                chat_id=client_user_id,
+                text=f"Counselor #{counselor['counselor_id']}\\n\n{message_text}"
+            )
+            if delivered:
                 logger.info(f"✅ SUCCESS! Counselor {counselor['counselor_id']} message sent to user {client_user_id}")
-            except Exception as e:
-                logger.error(f"❌ ERROR sending counselor message: {e}")
-                import traceback
-                logger.error(traceback.format_exc())
             return
     
     # Now check if user is in an active session (as a regular user, not counselor)
-    session = db.get_active_session_by_user(user_id)
+    session = user_context['active_session']
     if session:
         status = session.get('status')
         session_id = session['session_id']
@@ -884,26 +894,20 @@ async def handle_session_message(update: Update, context: ContextTypes.DEFAULT_T
 
         # User is sending a message in an active session
         logger.info(f"✅ User {user_id} is in active session {session_id}")
-        counselor = db.get_counselor(session['counselor_id'])
-        counselor_user_id = counselor['user_id']
-        
-        # Save message
-        db.add_message(session_id, 'user', user_id, message_text)
+        counselor_user_id = route['counselor_user_id']
         
         # Get topic info for clearer notification
         topic_data = COUNSELING_TOPICS.get(session['topic'], {})
         topic_name = topic_data.get('name', session['topic'])
         
-        # Forward to counselor with context info
-        try:
-            await context.bot.send_message(
-                chat_id=counselor_user_id,
-                text=f"**User (Session #{session_id})**\nTopic: {topic_name}\n\n{message_text}",
-                parse_mode='Markdown'
-            )
+        # Save and forward to counselor with context info
+        delivered = await relay_pipeline.relay(
+            context.bot, session_id, 'user', user_id, message_text,
+            chat_id=counselor_user_id,
+            text=f"**User (Session #{session_id})**\nTopic: {topic_name}\n\n{message_text}"
+        )
+        if delivered:
             logger.info(f"✅ User {user_id} sent message to counselor {counselor_user_id}")
-        except Exception as e:
-            logger.error(f"❌ Error sending user message: {e}")
         return
     
     # No active session found as either user or counselor
@@ -920,39 +924,21 @@ async def end_session_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
     
     user_id = query.from_user.id
     
-    # Check if user has an active session
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    ph = db.param_placeholder
-    
-    # Check as user
-    cursor.execute(f'''
-        SELECT * FROM counseling_sessions 
-        WHERE user_id = {ph} AND status IN ('requested', 'matched', 'active')
-        ORDER BY created_at DESC LIMIT 1
-    ''', (user_id,))
-    session = cursor.fetchone()
+    # Check if user has an active session (as user first)
+    session = await async_db.get_open_session_by_user(user_id)
     
     is_counselor = False
     if not session:
         # Check if counselor
-        counselor = db.get_counselor_by_user_id(user_id)
+        counselor = await async_db.get_counselor_by_user_id(user_id)
         if counselor:
-            cursor.execute(f'''
-                SELECT * FROM counseling_sessions 
-                WHERE counselor_id = {ph} AND status IN ('matched', 'active')
-                ORDER BY created_at DESC LIMIT 1
-            ''', (counselor['counselor_id'],))
-            session = cursor.fetchone()
+            session = await async_db.get_active_session_by_counselor(counselor['counselor_id'])
             is_counselor = True
     
-    conn.close()
-    
     if not session:
         await query.edit_message_text("⚠️ You don't have an active session.")
         return
     
-    session = dict(session)
     session_id = session['session_id']
     status = session['status']
     
@@ -982,7 +968,7 @@ async def confirm_end_session(update: Update, context: ContextTypes.DEFAULT_TYPE
     await query.answer()
     
     session_id = int(query.data.replace('confirm_end_', ''))
-    session = db.get_session(session_id)
+    session = await async_db.get_session(session_id)
     
     if not session or session['status'] == 'ended':
         await query.edit_message_text("⚠️ This session has already ended.")
@@ -990,11 +976,12 @@ async def confirm_end_session(update: Update, context: ContextTypes.DEFAULT_TYPE
     
     status = session['status']
     user_id = session['user_id']
+    actor_role = 'user' if query.from_user.id == user_id else 'counselor'
     
     # Handle based on status
     if status == 'requested':
         # Just waiting for matching - simply cancel
-        db.end_session(session_id, 'user_cancelled')
+        await async_db.end_session(session_id, 'user_cancelled', actor_role, query.from_user.id)
         
         await query.edit_message_text(
             "✅ **Request Cancelled**\n\n"
@@ -1007,23 +994,20 @@ async def confirm_end_session(update: Update, context: ContextTypes.DEFAULT_TYPE
         
     elif status == 'matched':
         # Counselor matched but hasn't accepted - cancel and notify counselor
-        db.end_session(session_id, 'user_cancelled')
+        await async_db.end_session(session_id, 'user_cancelled', actor_role, query.from_user.id)
         
-        counselor = db.get_counselor(session['counselor_id'])
+        counselor = await async_db.get_counselor(session['counselor_id'])
         counselor_user_id = counselor['user_id']
         
         # Notify counselor
-        try:
-            await context.bot.send_message(
-                chat_id=counselor_user_id,
-                text="⚠️ **Session Cancelled**\n\n"
-                     "The user has cancelled their counseling request before you could accept.\n\n"
-                     "No action needed from you.",
-                reply_markup=create_main_menu_keyboard(is_counselor=True),
-                parse_mode='Markdown'
-            )
-        except Exception as e:
-            logger.error(f"Error notifying counselor of cancellation: {e}")
+        outbound.notify(
+            chat_id=counselor_user_id,
+            text="⚠️ **Session Cancelled**\n\n"
+                 "The user has cancelled their counseling request before you could accept.\n\n"
+                 "No action needed from you.",
+            reply_markup=create_main_menu_keyboard(is_counselor=True),
+            parse_mode='Markdown'
+        )
         
         await query.edit_message_text(
             "✅ **Request Cancelled**\n\n"
@@ -1036,13 +1020,13 @@ async def confirm_end_session(update: Update, context: ContextTypes.DEFAULT_TYPE
         
     else:  # status == 'active'
         # Active session - end normally with rating
-        db.end_session(session_id, 'user_ended')
+        await async_db.end_session(session_id, 'user_ended', actor_role, query.from_user.id)
         
-        counselor = db.get_counselor(session['counselor_id'])
+        counselor = await async_db.get_counselor(session['counselor_id'])
         counselor_user_id = counselor['user_id']
         
         # Notify user with rating option
-        await context.bot.send_message(
+        outbound.notify(
             chat_id=user_id,
             text="**Session Ended**\n\n"
                  "Thank you for using HU Counseling Service.\n\n"
@@ -1055,7 +1039,7 @@ async def confirm_end_session(update: Update, context: ContextTypes.DEFAULT_TYPE
         )
         
         # Notify counselor
-        await context.bot.send_message(
+        outbound.notify(
             chat_id=counselor_user_id,
             text="**Session Ended**\n\n"
                  "The user has ended the session. Great work! 🙏",
@@ -1076,14 +1060,15 @@ async def session_info_handler(update: Update, context: ContextTypes.DEFAULT_TYP
     user_id = query.from_user.id
     
     # Find active session
-    session = db.get_active_session_by_user(user_id)
+    user_context = await async_db.get_user_context(user_id)
+    session = user_context['active_session']
     is_counselor = False
     
     if not session:
         # Check if counselor
-        counselor = db.get_counselor_by_user_id(user_id)
+        counselor = user_context['counselor']
         if counselor:
-            session = db.get_active_session_by_counselor(counselor['counselor_id'])
+            session = await async_db.get_active_session_by_counselor(counselor['counselor_id'])
             is_counselor = True
     
     if not session:
@@ -1093,13 +1078,9 @@ async def session_info_handler(update: Update, context: ContextTypes.DEFAULT_TYP
     topic_data = COUNSELING_TOPICS.get(session['topic'], {})
     started_at = session.get('started_at', 'Unknown')
     
-    # Get message count
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    ph = db.param_placeholder
-    cursor.execute(f'SELECT COUNT(*) as count FROM session_messages WHERE session_id = {ph}', (session['session_id'],))
-    message_count = cursor.fetchone()['count']
-    conn.close()
+    # Get message count (including messages the journal has not written yet)
+    message_count = await async_db.count_session_messages(session['session_id'])
+    message_count += message_journal.pending_count(session['session_id'])
     
     text = f"""
 **Session Information** 📋
@@ -1127,14 +1108,15 @@ async def current_session_handler(update: Update, context: ContextTypes.DEFAULT_
     user_id = query.from_user.id
     
     # Find active session
-    session = db.get_active_session_by_user(user_id)
+    user_context = await async_db.get_user_context(user_id)
+    session = user_context['active_session']
     is_counselor = False
     
     if not session:
         # Check if counselor
-        counselor = db.get_counselor_by_user_id(user_id)
+        counselor = user_context['counselor']
         if counselor:
-            session = db.get_active_session_by_counselor(counselor['counselor_id'])
+            session = await async_db.get_active_session_by_counselor(counselor['counselor_id'])
             is_counselor = True
     
     if not session:
@@ -1168,13 +1150,13 @@ async def switch_session_handler(update: Update, context: ContextTypes.DEFAULT_T
     
     user_id = query.from_user.id
     
-    counselor = db.get_counselor_by_user_id(user_id)
+    counselor = await async_db.get_counselor_by_user_id(user_id)
     if not counselor or counselor['status'] != 'approved':
         await query.answer("⚠️ Only counselors can switch sessions.", show_alert=True)
         return
     
     session_id = int(query.data.replace('switch_session_', ''))
-    session = db.get_session(session_id)
+    session = await async_db.get_session(session_id)
     
     if not session or session.get('counselor_id') != counselor['counselor_id'] or session.get('status') not in ('matched', 'active'):
         await query.answer("⚠️ This session is no longer available.", show_alert=True)
@@ -1210,13 +1192,13 @@ async def transfer_session_handler(update: Update, context: ContextTypes.DEFAULT
     user_id = query.from_user.id
     
     # Check if user is a counselor
-    counselor = db.get_counselor_by_user_id(user_id)
+    counselor = await async_db.get_counselor_by_user_id(user_id)
     if not counselor or counselor['status'] != 'approved':
         await query.answer("⚠️ Only counselors can transfer sessions.", show_alert=True)
         return
     
     # Get active session
-    session = db.get_active_session_by_counselor(counselor['counselor_id'])
+    session = await async_db.get_active_session_by_counselor(counselor['counselor_id'])
     if not session:
         await query.answer("⚠️ You don't have an active session to transfer.", show_alert=True)
         return
@@ -1251,30 +1233,23 @@ async def confirm_transfer_handler(update: Update, context: ContextTypes.DEFAULT
     await query.answer()
     
     session_id = int(query.data.replace('confirm_transfer_', ''))
-    session = db.get_session(session_id)
+    session = await async_db.get_session(session_id)
     
     if not session or session['status'] != 'active':
         await query.answer("⚠️ Session is no longer active.", show_alert=True)
         return
     
     # Reset session to requested and find new match
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    ph = db.param_placeholder
-    
-    cursor.execute(f'UPDATE counseling_sessions SET status = {ph}, counselor_id = NULL WHERE session_id = {ph}',
-                  ('requested', session_id))
-    conn.commit()
-    conn.close()
+    await async_db.release_session(session_id, 'transferred', actor_id=query.from_user.id)
     
     # Try to find a new counselor
-    new_counselor_id = matcher.find_best_match(session_id)
+    new_counselor_id = await async_db.run(matcher.match_session, session_id, session=session,
+                                          exclude=(session['counselor_id'],))
     
     if new_counselor_id:
-        db.match_session_with_counselor(session_id, new_counselor_id)
         
         # Notify user
-        await context.bot.send_message(
+        outbound.notify(
             chat_id=session['user_id'],
             text="🔄 **Counselor Change**\n\n"
                  "Your session is being transferred to another counselor who may be better suited to help.\n\n"
@@ -1283,7 +1258,7 @@ async def confirm_transfer_handler(update: Update, context: ContextTypes.DEFAULT
         )
         
         # Notify new counselor (similar to normal matching)
-        counselor = db.get_counselor(new_counselor_id)
+        counselor = await async_db.get_counselor(new_counselor_id)
         topic_data = COUNSELING_TOPICS.get(session['topic'], {})
         
         keyboard = [[
@@ -1291,7 +1266,7 @@ async def confirm_transfer_handler(update: Update, context: ContextTypes.DEFAULT
             InlineKeyboardButton("❌ Decline", callback_data=f'decline_session_{session_id}')
         ]]
         
-        await context.bot.send_message(
+        outbound.notify(
             chat_id=counselor['user_id'],
             text=f"**🔔 Transferred Session Request**\n\n"
                  f"**Topic:** {topic_data['icon']} {topic_data['name']}\n"
@@ -2,10 +2,13 @@
 HU Counseling Bot - Part 2: Counselor Registration & Admin Functions
 """
 
+import logging
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from counseling_database import COUNSELING_TOPICS
 
+logger = logging.getLogger(__name__)
+
 # This file contains the continuation of hu_counseling_bot.py
 # Import and integrate these functions into the main bot file
 
@@ -19,8 +22,8 @@ async def register_counselor_start(update: Update, context: ContextTypes.DEFAULT
     user_id = query.from_user.id
     
     # Check if already a counselor
-    from hu_counseling_bot import db
-    counselor = db.get_counselor_by_user_id(user_id)
+    from hu_counseling_bot import async_db
+    counselor = await async_db.get_counselor_by_user_id(user_id)
     if counselor:
         status = counselor['status']
         if status == 'pending':
@@ -238,7 +241,7 @@ Users will typically see "Counselor #ID" to maintain anonymity, though this name
 async def handle_counselor_display_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle counselor display name submission"""
     user_id = update.effective_user.id
-    from hu_counseling_bot import USER_STATE, db
+    from hu_counseling_bot import USER_STATE, async_db
     
     if user_id not in USER_STATE or not USER_STATE[user_id].get('awaiting_display_name'):
         return
@@ -314,7 +317,7 @@ async def handle_counselor_bio(update: Update, context: ContextTypes.DEFAULT_TYP
     """Handle counselor bio submission"""
     user_id = update.effective_user.id
     
-    from hu_counseling_bot import USER_STATE, db
+    from hu_counseling_bot import USER_STATE, async_db
     
     if user_id not in USER_STATE or not USER_STATE[user_id].get('awaiting_bio'):
         return
@@ -338,7 +341,7 @@ async def handle_counselor_bio(update: Update, context: ContextTypes.DEFAULT_TYP
     gender = USER_STATE[user_id].get('gender', 'anonymous')
     display_name = USER_STATE[user_id].get('display_name') or f"{update.effective_user.first_name or 'Counselor'}"
     
-    counselor_id = db.register_counselor(user_id, display_name, bio, selected, gender)
+    counselor_id = await async_db.register_counselor(user_id, display_name, bio, selected, gender)
     
     # Clear state
     USER_STATE[user_id] = {}
@@ -357,7 +360,7 @@ async def handle_counselor_bio(update: Update, context: ContextTypes.DEFAULT_TYP
     )
     
     # Notify all admins about new application
-    from hu_counseling_bot import ADMIN_IDS
+    from hu_counseling_bot import ADMIN_IDS, outbound
     topics_list = ', '.join([COUNSELING_TOPICS[s]['name'] for s in selected[:3]])
     if len(selected) > 3:
         topics_list += f" (+{len(selected)-3} more)"
@@ -372,17 +375,11 @@ async def handle_counselor_bio(update: Update, context: ContextTypes.DEFAULT_TYP
     )
     
     for admin_id in ADMIN_IDS:
-        try:
-            await context.bot.send_message(
-                chat_id=admin_id,
-                text=admin_message,
-                parse_mode='Markdown'
-            )
-        except Exception as e:
-            # Admin might have blocked the bot or doesn't exist
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.warning(f"Failed to notify admin {admin_id} about counselor application: {e}")
+        outbound.notify(
+            chat_id=admin_id,
+            text=admin_message,
+            parse_mode='Markdown'
+        )
 
 # ==================== COUNSELOR DASHBOARD ====================
 
@@ -393,8 +390,8 @@ async def counselor_dashboard(update: Update, context: ContextTypes.DEFAULT_TYPE
     
     user_id = query.from_user.id
     
-    from hu_counseling_bot import db
-    counselor = db.get_counselor_by_user_id(user_id)
+    from hu_counseling_bot import async_db
+    counselor = await async_db.get_counselor_by_user_id(user_id)
     
     if not counselor or counselor['status'] != 'approved':
         await query.edit_message_text(
@@ -413,7 +410,7 @@ async def counselor_dashboard(update: Update, context: ContextTypes.DEFAULT_TYPE
     rating_sum = counselor['rating_sum']
     avg_rating = (rating_sum / rating_count) if rating_count > 0 else 0
     
-    active_sessions = db.get_active_sessions_by_counselor(counselor_id)
+    active_sessions = await async_db.get_active_sessions_by_counselor(counselor_id)
     
     status_icon = "🟢" if is_available else "🔴"
     status_text = "Available" if is_available else "Unavailable"
@@ -463,8 +460,8 @@ async def toggle_availability(update: Update, context: ContextTypes.DEFAULT_TYPE
     
     user_id = query.from_user.id
     
-    from hu_counseling_bot import db
-    counselor = db.get_counselor_by_user_id(user_id)
+    from hu_counseling_bot import async_db
+    counselor = await async_db.get_counselor_by_user_id(user_id)
     
     if not counselor:
         return
@@ -475,58 +472,14 @@ async def toggle_availability(update: Update, context: ContextTypes.DEFAULT_TYPE
     
     # Check if has any pending or active session
     if current_status and new_status is False:
-        active_sessions = db.get_active_sessions_by_counselor(counselor_id)
+        active_sessions = await async_db.get_active_sessions_by_counselor(counselor_id)
         if active_sessions:
             await query.answer("You cannot go offline while you have a pending or active session!", show_alert=True)
             return
     
-    db.set_counselor_availability(counselor_id, new_status)
-    
-    # If counselor just came online, immediately try to auto-match pending sessions
-    if new_status:
-        from hu_counseling_bot import matcher
-        pending_sessions = db.get_pending_sessions(limit=20)
-        for session in pending_sessions:
-            session_id = session['session_id']
-            matched_counselor_id = matcher.find_best_match(session_id)
-            if not matched_counselor_id:
-                continue
-
-            db.match_session_with_counselor(session_id, matched_counselor_id)
-            counselor_match = db.get_counselor(matched_counselor_id)
-            if not counselor_match:
-                continue
-
-            topic_data = COUNSELING_TOPICS.get(session['topic'], {})
-            desc = session.get('description') or 'No description provided'
-            preview = desc[:100] + ('...' if len(desc) > 100 else '')
-
-            # Get user's gender
-            user_data = db.get_user(session['user_id'])
-            user_gender = user_data.get('gender', 'anonymous') if user_data else 'anonymous'
-            gender_display = {
-                'male': '👨 Male',
-                'female': '👩 Female',
-                'anonymous': '🔒 Anonymous'
-            }.get(user_gender, '🔒 Anonymous')
-
-            keyboard = InlineKeyboardMarkup([[
-                InlineKeyboardButton("✅ Accept Session", callback_data=f'accept_session_{session_id}'),
-                InlineKeyboardButton("❌ Decline", callback_data=f'decline_session_{session_id}')
-            ]])
-
-            await context.bot.send_message(
-                chat_id=counselor_match['user_id'],
-                text=(
-                    f"**🔔 New Counseling Request**\n\n"
-                    f"**Topic:** {topic_data.get('icon', '💬')} {topic_data.get('name', session['topic'])}\n"
-                    f"**User Gender:** {gender_display}\n"
-                    f"**Description:** {preview}\n\n"
-                    f"Would you like to accept this session?"
-                ),
-                reply_markup=keyboard,
-                parse_mode='Markdown'
-            )
+    # Coming online wakes the matching event bus, which assigns waiting sessions
+    # and notifies the counselors they go to
+    await async_db.set_counselor_availability(counselor_id, new_status)
     
     status_text = "🟢 Online" if new_status else "🔴 Offline"
     await query.answer(f"Status changed to {status_text}")
@@ -541,8 +494,8 @@ async def counselor_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     user_id = query.from_user.id
     
-    from hu_counseling_bot import db
-    counselor = db.get_counselor_by_user_id(user_id)
+    from hu_counseling_bot import async_db
+    counselor = await async_db.get_counselor_by_user_id(user_id)
     
     if not counselor:
         return
@@ -609,8 +562,8 @@ async def submit_rating(update: Update, context: ContextTypes.DEFAULT_TYPE):
     session_id = int(data_parts[0])
     rating = int(data_parts[1])
     
-    from hu_counseling_bot import db
-    db.add_session_rating(session_id, rating)
+    from hu_counseling_bot import async_db
+    await async_db.add_session_rating(session_id, rating)
     
     await query.edit_message_text(
         f"✅ **Thank you for your feedback!**\n\n"
@@ -621,6 +574,10 @@ async def submit_rating(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 # ==================== ADMIN PANEL ====================
 
+def format_snapshot_time(snapshot) -> str:
+    """'Updated HH:MM:SS (Ns ago)' footer for screens built from a dashboard snapshot"""
+    return f"🕒 Updated {snapshot.computed_at:%H:%M:%S} ({snapshot.age_seconds():.0f}s ago)"
+
 async def admin_panel(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show admin panel"""
     query = update.callback_query
@@ -628,12 +585,14 @@ async def admin_panel(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     user_id = query.from_user.id
     
-    from hu_counseling_bot import db, ADMIN_IDS
-    if not db.is_admin(user_id) and user_id not in ADMIN_IDS:
+    from hu_counseling_bot import async_db, dashboard, ADMIN_IDS
+    if not await async_db.is_admin(user_id) and user_id not in ADMIN_IDS:
         await query.answer("⚠️ You don't have admin access.", show_alert=True)
         return
     
-    stats = db.get_bot_stats()
+    # Precomputed in the background; only the very first view waits for it
+    snapshot = await dashboard.get()
+    stats = snapshot.summary
     
     text = f"""
 **Admin Panel** 🛡️
@@ -648,12 +607,15 @@ async def admin_panel(update: Update, context: ContextTypes.DEFAULT_TYPE):
 🔄 Active: {stats.get('active_sessions', 0)}
 ✅ Completed: {stats.get('completed_sessions', 0)}
 
+{format_snapshot_time(snapshot)}
+
 **Choose an action:**
 """
     
     keyboard = [
         [InlineKeyboardButton("📋 Pending Applications", callback_data='admin_pending_counselors')],
         [InlineKeyboardButton("📊 Detailed Statistics", callback_data='admin_detailed_stats')],
+        [InlineKeyboardButton("📈 Trends", callback_data='admin_trends')],
         [InlineKeyboardButton("👥 Manage Counselors", callback_data='admin_manage_counselors')],
         [InlineKeyboardButton("🔔 Pending Sessions", callback_data='admin_pending_sessions')],
         [InlineKeyboardButton("◀️ Back", callback_data='main_menu')]
@@ -666,8 +628,8 @@ async def admin_pending_counselors(update: Update, context: ContextTypes.DEFAULT
     query = update.callback_query
     await query.answer()
     
-    from hu_counseling_bot import db
-    pending = db.get_pending_counselors()
+    from hu_counseling_bot import async_db
+    pending = await async_db.get_pending_counselors()
     
     if not pending:
         text = "📋 **No Pending Applications**\n\nThere are currently no counselor applications waiting for review."
@@ -700,8 +662,8 @@ async def review_counselor(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     counselor_id = int(query.data.replace('review_counselor_', ''))
     
-    from hu_counseling_bot import db
-    counselor = db.get_counselor(counselor_id)
+    from hu_counseling_bot import async_db
+    counselor = await async_db.get_counselor(counselor_id)
     
     if not counselor:
         await query.edit_message_text("⚠️ Application not found.")
@@ -748,17 +710,17 @@ async def approve_counselor_handler(update: Update, context: ContextTypes.DEFAUL
     counselor_id = int(query.data.replace('approve_counselor_', ''))
     admin_id = query.from_user.id
     
-    from hu_counseling_bot import db
-    counselor = db.get_counselor(counselor_id)
+    from hu_counseling_bot import async_db, outbound
+    counselor = await async_db.get_counselor(counselor_id)
     
     if not counselor:
         await query.edit_message_text("⚠️ Application not found.")
         return
     
-    db.approve_counselor(counselor_id, admin_id)
+    await async_db.approve_counselor(counselor_id, admin_id)
     
     # Notify the counselor
-    await context.bot.send_message(
+    outbound.notify(
         chat_id=counselor['user_id'],
         text="🎉 **Congratulations!**\n\n"
              "Your counselor application has been approved!\n\n"
@@ -783,17 +745,17 @@ async def reject_counselor_handler(update: Update, context: ContextTypes.DEFAULT
     
     counselor_id = int(query.data.replace('reject_counselor_', ''))
     
-    from hu_counseling_bot import db
-    counselor = db.get_counselor(counselor_id)
+    from hu_counseling_bot import async_db, outbound
+    counselor = await async_db.get_counselor(counselor_id)
     
     if not counselor:
         await query.edit_message_text("⚠️ Application not found.")
         return
     
-    db.reject_counselor(counselor_id)
+    await async_db.reject_counselor(counselor_id)
     
     # Notify the applicant
-    await context.bot.send_message(
+    outbound.notify(
         chat_id=counselor['user_id'],
         text="**Application Update**\n\n"
              "Thank you for your interest in becoming a counselor. "
@@ -820,104 +782,39 @@ async def admin_detailed_stats(update: Update, context: ContextTypes.DEFAULT_TYP
     
     user_id = query.from_user.id
     
-    from hu_counseling_bot import db, ADMIN_IDS
-    if not db.is_admin(user_id) and user_id not in ADMIN_IDS:
+    from hu_counseling_bot import async_db, dashboard, rate_limit_gate, ADMIN_IDS
+    if not await async_db.is_admin(user_id) and user_id not in ADMIN_IDS:
         await query.answer("⚠️ You don't have admin access.", show_alert=True)
         return
     
-    # Get REAL statistics directly from database
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    
-    # Total users
-    cursor.execute('SELECT COUNT(*) as count FROM users')
-    total_users = cursor.fetchone()['count']
-    
-    # Total counselors
-    cursor.execute('SELECT COUNT(*) as count FROM counselors')
-    total_counselors = cursor.fetchone()['count']
-    
-    # Approved counselors
-    cursor.execute("SELECT COUNT(*) as count FROM counselors WHERE status = 'approved'")
-    approved_counselors = cursor.fetchone()['count']
-    
-    # Currently online counselors
-    cursor.execute("SELECT COUNT(*) as count FROM counselors WHERE status = 'approved' AND is_available = 1")
-    online_counselors = cursor.fetchone()['count']
-    
-    # Pending counselors
-    cursor.execute("SELECT COUNT(*) as count FROM counselors WHERE status = 'pending'")
-    pending_counselors = cursor.fetchone()['count']
-    
-    # Rejected counselors
-    cursor.execute("SELECT COUNT(*) as count FROM counselors WHERE status = 'rejected'")
-    rejected_counselors = cursor.fetchone()['count']
-    
-    # Deactivated counselors
-    cursor.execute("SELECT COUNT(*) as count FROM counselors WHERE status = 'deactivated'")
-    deactivated_counselors = cursor.fetchone()['count']
-    
-    # Banned counselors
-    cursor.execute("SELECT COUNT(*) as count FROM counselors WHERE status = 'banned'")
-    banned_counselors = cursor.fetchone()['count']
-    
-    # Total sessions
-    cursor.execute('SELECT COUNT(*) as count FROM counseling_sessions')
-    total_sessions = cursor.fetchone()['count']
-    
-    # Active sessions
-    cursor.execute("SELECT COUNT(*) as count FROM counseling_sessions WHERE status = 'active'")
-    active_sessions = cursor.fetchone()['count']
-    
-    # Completed/ended sessions
-    cursor.execute("SELECT COUNT(*) as count FROM counseling_sessions WHERE status = 'ended'")
-    completed_sessions = cursor.fetchone()['count']
-    
-    # Pending sessions (waiting for counselor)
-    cursor.execute("SELECT COUNT(*) as count FROM counseling_sessions WHERE status = 'requested'")
-    pending_sessions = cursor.fetchone()['count']
-    
-    # Matched sessions (counselor matched but not accepted yet)
-    cursor.execute("SELECT COUNT(*) as count FROM counseling_sessions WHERE status = 'matched'")
-    matched_sessions = cursor.fetchone()['count']
-    
-    # Top topics
-    cursor.execute('''
-        SELECT topic, COUNT(*) as count 
-        FROM counseling_sessions 
-        GROUP BY topic 
-        ORDER BY count DESC 
-        LIMIT 5
-    ''')
-    top_topics = cursor.fetchall()
-    
-    # Average rating
-    cursor.execute('''
-        SELECT AVG(CAST(rating_sum AS FLOAT) / NULLIF(rating_count, 0)) as avg_rating,
-               SUM(rating_count) as total_ratings
-        FROM counselors 
-        WHERE rating_count > 0
-    ''')
-    rating_row = cursor.fetchone()
-    avg_rating = rating_row['avg_rating'] if rating_row['avg_rating'] else 0
-    total_ratings = rating_row['total_ratings'] if rating_row['total_ratings'] else 0
-    
-    # Total messages exchanged
-    cursor.execute('SELECT COUNT(*) as count FROM session_messages')
-    total_messages = cursor.fetchone()['count']
-    
-    conn.close()
+    # Read the background snapshot; the Refresh button recomputes it first
+    snapshot = await dashboard.get(force=query.data == 'admin_detailed_stats_refresh')
+    stats = snapshot.detailed
+    total_users = stats['total_users']
+    total_counselors = stats['total_counselors']
+    approved_counselors = stats['approved_counselors']
+    online_counselors = stats['online_counselors']
+    pending_counselors = stats['pending_counselors']
+    rejected_counselors = stats['rejected_counselors']
+    deactivated_counselors = stats['deactivated_counselors']
+    banned_counselors = stats['banned_counselors']
+    total_sessions = stats['total_sessions']
+    active_sessions = stats['active_sessions']
+    completed_sessions = stats['completed_sessions']
+    pending_sessions = stats['pending_sessions']
+    matched_sessions = stats['matched_sessions']
+    top_topics = stats['top_topics']
+    avg_rating = stats['avg_rating']
+    total_ratings = stats['total_ratings']
+    total_messages = stats['total_messages']
     
     # Format top topics
     topics_text = '\n'.join([
-        f"• {COUNSELING_TOPICS.get(row['topic'], {}).get('icon', '💬')} {COUNSELING_TOPICS.get(row['topic'], {}).get('name', row['topic'])}: {row['count']}" 
-        for row in top_topics
+        f"• {COUNSELING_TOPICS.get(topic, {}).get('icon', '💬')} {COUNSELING_TOPICS.get(topic, {}).get('name', topic)}: {count}" 
+        for topic, count in top_topics
     ])
     
-    # Calculate completion rate
-    completion_rate = 0
-    if total_sessions > 0:
-        completion_rate = (completed_sessions / total_sessions) * 100
+    completion_rate = snapshot.matching['completion_rate']
     
     text = f"""
 **📊 Detailed System Statistics**
@@ -951,15 +848,94 @@ async def admin_detailed_stats(update: Update, context: ContextTypes.DEFAULT_TYP
 {topics_text if topics_text else '• No sessions yet'}
 
 **🏥 System Health:** ✅ Operational
+• Spam updates dropped (this process): **{rate_limit_gate.stats()['dropped_total']}**
+
+{format_snapshot_time(snapshot)}
 """
     
     keyboard = [
-        [InlineKeyboardButton("🔄 Refresh", callback_data='admin_detailed_stats')],
+        [InlineKeyboardButton("🔄 Refresh", callback_data='admin_detailed_stats_refresh')],
         [InlineKeyboardButton("◀️ Back to Admin Panel", callback_data='admin_panel')]
     ]
     
     await query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode='Markdown')
 
+def format_duration(seconds) -> str:
+    """Compact duration for the trends view ('—' when there is no data)"""
+    if seconds is None:
+        return '—'
+    if seconds < 60:
+        return f"{seconds:.0f}s"
+    if seconds < 3600:
+        return f"{seconds / 60:.0f}m"
+    return f"{seconds / 3600:.1f}h"
+
+async def admin_trends(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Show the last 7 days of session analytics from the daily rollups"""
+    query = update.callback_query
+    await query.answer()
+    
+    user_id = query.from_user.id
+    
+    from hu_counseling_bot import async_db, db, ADMIN_IDS
+    if not await async_db.is_admin(user_id) and user_id not in ADMIN_IDS:
+        await query.answer("⚠️ You don't have admin access.", show_alert=True)
+        return
+    
+    from datetime import datetime, timedelta, timezone
+    from analytics_rollups import get_session_rollups
+    rollups = get_session_rollups(db)
+    days = await async_db.run(rollups.get_rollups, 'day', datetime.now(timezone.utc) - timedelta(days=6))
+    
+    lines = []
+    for day in reversed(days):
+        rating = f"⭐ {day['avg_rating']:.1f}" if day['avg_rating'] is not None else "⭐ —"
+        lines.append(
+            f"**{day['bucket_start']:%a %d %b}:** {day['requests']} requests, {day['ended']} ended\n"
+            f"  ⏳ wait {format_duration(day['start_wait_p50'])} (p95 {format_duration(day['start_wait_p95'])})"
+            f" · ⏱ {format_duration(day['duration_p50'])} · 💬 {day['messages_per_session'] or 0} · {rating}"
+        )
+    
+    text = f"""
+**📈 Session Trends (last 7 days, UTC)**
+
+{chr(10).join(lines) if lines else '• No session activity yet'}
+
+_Wait = request to session start (median, p95); ⏱ = median session length; 💬 = messages per session._
+"""
+    
+    keyboard = [
+        [InlineKeyboardButton("📄 Export CSV", callback_data='admin_trends_export')],
+        [InlineKeyboardButton("◀️ Back to Admin Panel", callback_data='admin_panel')]
+    ]
+    
+    await query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode='Markdown')
+
+async def admin_trends_export(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Send the hourly and daily rollups as CSV files"""
+    query = update.callback_query
+    await query.answer()
+    
+    user_id = query.from_user.id
+    
+    from hu_counseling_bot import async_db, db, ADMIN_IDS
+    if not await async_db.is_admin(user_id) and user_id not in ADMIN_IDS:
+        await query.answer("⚠️ You don't have admin access.", show_alert=True)
+        return
+    
+    from datetime import datetime, timedelta, timezone
+    from analytics_rollups import get_session_rollups
+    rollups = get_session_rollups(db)
+    since = datetime.now(timezone.utc) - timedelta(days=30)
+    
+    for granularity in ('day', 'hour'):
+        csv_text = await async_db.run(rollups.export_csv, granularity, since)
+        await query.message.reply_document(
+            document=csv_text.encode('utf-8'),
+            filename=f"session_rollups_{granularity}_{datetime.now(timezone.utc):%Y%m%d}.csv",
+            caption=f"📄 {granularity.capitalize()} session rollups, last 30 days (UTC)"
+        )
+
 async def admin_manage_counselors(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Manage all counselors"""
     query = update.callback_query
@@ -967,22 +943,13 @@ async def admin_manage_counselors(update: Update, context: ContextTypes.DEFAULT_
     
     user_id = query.from_user.id
     
-    from hu_counseling_bot import db, ADMIN_IDS
-    if not db.is_admin(user_id) and user_id not in ADMIN_IDS:
+    from hu_counseling_bot import async_db, ADMIN_IDS
+    if not await async_db.is_admin(user_id) and user_id not in ADMIN_IDS:
         await query.answer("⚠️ You don't have admin access.", show_alert=True)
         return
     
     # Get all counselors
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT counselor_id, display_name, status, is_available, total_sessions
-        FROM counselors 
-        ORDER BY status, counselor_id
-        LIMIT 10
-    ''')
-    counselors = cursor.fetchall()
-    conn.close()
+    counselors = await async_db.get_counselors_overview(limit=10)
     
     if not counselors:
         text = "**Counselor Management** 👥\n\nNo counselors in the system yet."
@@ -1022,12 +989,13 @@ async def admin_pending_sessions(update: Update, context: ContextTypes.DEFAULT_T
     
     user_id = query.from_user.id
     
-    from hu_counseling_bot import db, ADMIN_IDS
-    if not db.is_admin(user_id) and user_id not in ADMIN_IDS:
+    from hu_counseling_bot import async_db, matcher, ADMIN_IDS
+    if not await async_db.is_admin(user_id) and user_id not in ADMIN_IDS:
         await query.answer("⚠️ You don't have admin access.", show_alert=True)
         return
     
-    pending = db.get_pending_sessions(limit=10)
+    # Served from the in-memory pending queue (loads from the database once)
+    pending = await async_db.run(matcher.queue.peek, 10)
     
     if not pending:
         text = "**Pending Sessions** 🔔\n\nNo pending sessions waiting for counselors."
@@ -1075,8 +1043,8 @@ async def admin_view_pending_session(update: Update, context: ContextTypes.DEFAU
     except ValueError:
         return
 
-    from hu_counseling_bot import db, ADMIN_IDS
-    session = db.get_session(session_id)
+    from hu_counseling_bot import async_db, ADMIN_IDS
+    session = await async_db.get_session(session_id)
     
     if not session or session['status'] != 'requested':
         await query.edit_message_text(
@@ -1086,7 +1054,7 @@ async def admin_view_pending_session(update: Update, context: ContextTypes.DEFAU
         return
 
     # Get user gender for context
-    user_data = db.get_user(session['user_id'])
+    user_data = await async_db.get_user(session['user_id'])
     user_gender = user_data.get('gender', 'anonymous') if user_data else 'anonymous'
     gender_display = {
         'male': '👨 Male',
@@ -1121,7 +1089,7 @@ async def admin_view_pending_session(update: Update, context: ContextTypes.DEFAU
     keyboard = []
     
     # Check if admin is also a counselor
-    counselor = db.get_counselor_by_user_id(query.from_user.id)
+    counselor = await async_db.get_counselor_by_user_id(query.from_user.id)
     if counselor and counselor['status'] == 'approved':
         keyboard.append([InlineKeyboardButton("✅ Accept Session Myself", callback_data=f'admin_accept_session_{session_id}')])
     
@@ -1140,10 +1108,10 @@ async def admin_accept_session_as_counselor(update: Update, context: ContextType
     session_id = int(query.data.replace('admin_accept_session_', ''))
     user_id = query.from_user.id
     
-    from hu_counseling_bot import db, USER_STATE, create_session_control_keyboard
+    from hu_counseling_bot import async_db, USER_STATE, create_session_control_keyboard, outbound
     
     # 1. Get admin's counselor profile
-    counselor = db.get_counselor_by_user_id(user_id)
+    counselor = await async_db.get_counselor_by_user_id(user_id)
     if not counselor or counselor['status'] != 'approved':
         await query.answer("⚠️ You must be a registered counselor to accept sessions.", show_alert=True)
         return
@@ -1152,10 +1120,10 @@ async def admin_accept_session_as_counselor(update: Update, context: ContextType
     # We maintain the flow: Requested -> Matched -> Active
     
     # First match it
-    db.match_session_with_counselor(session_id, counselor['counselor_id'])
+    await async_db.match_session_with_counselor(session_id, counselor['counselor_id'], 'admin', user_id)
     
     # Then start it manually
-    db.start_session(session_id)
+    await async_db.start_session(session_id, 'admin', user_id)
     
     # Set active session state for admin
     if user_id not in USER_STATE:
@@ -1163,31 +1131,27 @@ async def admin_accept_session_as_counselor(update: Update, context: ContextType
     USER_STATE[user_id]['active_session_id'] = session_id
     
     # 3. Notify User (The Client)
-    session = db.get_session(session_id)
+    session = await async_db.get_session(session_id)
     client_user_id = session['user_id']
     from counseling_database import COUNSELING_TOPICS
     topic_data = COUNSELING_TOPICS.get(session['topic'], {})
     
-    try:
-        await context.bot.send_message(
-            chat_id=client_user_id,
-            text=f"✅ **Session Started!**\n\n"
-                 f"Your counselor (Admin) has accepted your request. You can now begin your conversation.\n\n"
-                 f"**Topic:** {topic_data.get('icon', '💬')} {topic_data.get('name', session['topic'])}\n\n"
-                 f"🔒 Remember: Everything is anonymous and confidential.\n\n"
-                 f"*Type your message below to start.*",
-            reply_markup=create_session_control_keyboard(is_user=True),
-            parse_mode='Markdown'
-        )
-    except Exception as e:
-        # User might have blocked bot
-        pass
+    outbound.notify(
+        chat_id=client_user_id,
+        text=f"✅ **Session Started!**\n\n"
+             f"Your counselor (Admin) has accepted your request. You can now begin your conversation.\n\n"
+             f"**Topic:** {topic_data.get('icon', '💬')} {topic_data.get('name', session['topic'])}\n\n"
+             f"🔒 Remember: Everything is anonymous and confidential.\n\n"
+             f"*Type your message below to start.*",
+        reply_markup=create_session_control_keyboard(is_user=True),
+        parse_mode='Markdown'
+    )
         
     # 4. Update Admin's View to "Session Started" (Counselor View)
     desc = session.get('description', 'No description provided')
     
     # Get user's gender
-    user_data = db.get_user(client_user_id)
+    user_data = await async_db.get_user(client_user_id)
     user_gender = user_data.get('gender', 'anonymous') if user_data else 'anonymous'
     gender_display = {
         'male': '👨 Male',
@@ -1212,26 +1176,16 @@ async def admin_assign_session_start(update: Update, context: ContextTypes.DEFAU
     
     session_id = int(query.data.replace('admin_assign_start_', ''))
     
-    from hu_counseling_bot import db
+    from hu_counseling_bot import async_db
     
     # Get session to check topic
-    session = db.get_session(session_id)
+    session = await async_db.get_session(session_id)
     if not session:
         return
     session_topic = session['topic']
     
     # Get all potential counselors with specs
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT counselor_id, display_name, is_available, total_sessions, specializations
-        FROM counselors 
-        WHERE status = 'approved'
-        ORDER BY is_available DESC, total_sessions ASC
-        LIMIT 20
-    ''')
-    counselors = cursor.fetchall()
-    conn.close()
+    counselors = await async_db.get_approved_counselors(limit=20)
     
     if not counselors:
         await query.edit_message_text(
@@ -1244,18 +1198,8 @@ async def admin_assign_session_start(update: Update, context: ContextTypes.DEFAU
     
     keyboard = []
     
-    import json
-    
     for c in counselors:
-        # Parse specs
-        specs = []
-        try:
-            val = c['specializations']
-            if val:
-                specs = json.loads(val)
-        except:
-            pass
-            
+        specs = c['specializations']
         is_spec = session_topic in specs or 'other' in specs
         spec_mark = "⭐" if session_topic in specs else ""
         
@@ -1279,19 +1223,19 @@ async def admin_assign_session_confirm(update: Update, context: ContextTypes.DEF
     except:
         return
         
-    from hu_counseling_bot import db, COUNSELING_TOPICS
+    from hu_counseling_bot import async_db, COUNSELING_TOPICS, outbound
     
     # Check if session is still pending
-    session = db.get_session(session_id)
+    session = await async_db.get_session(session_id)
     if not session or session['status'] != 'requested':
         await query.edit_message_text("⚠️ Session is no longer pending.")
         return
         
     # Match in DB
-    db.match_session_with_counselor(session_id, counselor_id)
+    await async_db.match_session_with_counselor(session_id, counselor_id, 'admin', query.from_user.id)
     
     # Notify the counselor
-    counselor = db.get_counselor(counselor_id)
+    counselor = await async_db.get_counselor(counselor_id)
     if not counselor:
         await query.edit_message_text("⚠️ Create counselor error.")
         return
@@ -1300,33 +1244,30 @@ async def admin_assign_session_confirm(update: Update, context: ContextTypes.DEF
     desc = session.get('description') or 'No description provided'
     
     # Get user gender
-    user_data = db.get_user(session['user_id'])
+    user_data = await async_db.get_user(session['user_id'])
     user_gender = user_data.get('gender', 'anonymous') if user_data else 'anonymous'
     gender_display = {'male': '👨 Male', 'female': '👩 Female'}.get(user_gender, '🔒 Anonymous')
     
     # Send notification to assigned counselor
-    try:
-        keyboard = [[
-            InlineKeyboardButton("✅ Accept Session", callback_data=f'accept_session_{session_id}'),
-            InlineKeyboardButton("❌ Decline", callback_data=f'decline_session_{session_id}')
-        ]]
-        
-        await context.bot.send_message(
-            chat_id=counselor['user_id'],
-            text=(
-                f"**🔔 Session Assigned by Admin**\n\n"
-                f"An admin has manually assigned you a session.\n\n"
-                f"**Topic:** {topic_data.get('icon', '💬')} {topic_data.get('name', session['topic'])}\n"
-                f"**User Gender:** {gender_display}\n"
-                f"**Description:** {desc[:100]}...\n\n"
-                f"Please accept or decline below."
-            ),
-            reply_markup=InlineKeyboardMarkup(keyboard),
-            parse_mode='Markdown'
-        )
-        msg = f"✅ **Assigned!**\n\nSession #{session_id} has been assigned to {counselor['display_name']}."
-    except Exception as e:
-        msg = f"⚠️ Assigned but failed to notify counselor: {e}"
+    keyboard = [[
+        InlineKeyboardButton("✅ Accept Session", callback_data=f'accept_session_{session_id}'),
+        InlineKeyboardButton("❌ Decline", callback_data=f'decline_session_{session_id}')
+    ]]
+    
+    outbound.notify(
+        chat_id=counselor['user_id'],
+        text=(
+            f"**🔔 Session Assigned by Admin**\n\n"
+            f"An admin has manually assigned you a session.\n\n"
+            f"**Topic:** {topic_data.get('icon', '💬')} {topic_data.get('name', session['topic'])}\n"
+            f"**User Gender:** {gender_display}\n"
+            f"**Description:** {desc[:100]}...\n\n"
+            f"Please accept or decline below."
+        ),
+        reply_markup=InlineKeyboardMarkup(keyboard),
+        parse_mode='Markdown'
+    )
+    msg = f"✅ **Assigned!**\n\nSession #{session_id} has been assigned to {counselor['display_name']}."
     
     keyboard = [[InlineKeyboardButton("◀️ Back to List", callback_data='admin_pending_sessions')]]
     await query.edit_message_text(msg, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode='Markdown')
@@ -1340,8 +1281,8 @@ async def admin_view_counselor(update: Update, context: ContextTypes.DEFAULT_TYP
     
     counselor_id = int(query.data.replace('admin_view_counselor_', ''))
     
-    from hu_counseling_bot import db
-    counselor = db.get_counselor(counselor_id)
+    from hu_counseling_bot import async_db
+    counselor = await async_db.get_counselor(counselor_id)
     
     if not counselor:
         await query.edit_message_text("⚠️ Counselor not found.")
@@ -1358,24 +1299,13 @@ async def admin_view_counselor(update: Update, context: ContextTypes.DEFAULT_TYP
             specs_value = []
     counselor['specializations'] = specs_value
     
-    # Get additional info
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    ph = db.param_placeholder
-    
     # Get rating info
     rating_avg = 0
     if counselor['rating_count'] > 0:
         rating_avg = counselor['rating_sum'] / counselor['rating_count']
     
     # Get active session count
-    cursor.execute(f'''
-        SELECT COUNT(*) as count FROM counseling_sessions 
-        WHERE counselor_id = {ph} AND status = 'active'
-    ''', (counselor_id,))
-    active_sessions = cursor.fetchone()['count']
-    
-    conn.close()
+    active_sessions = await async_db.count_active_sessions_by_counselor(counselor_id)
     
     # Format specializations
     specs = counselor['specializations']
@@ -1450,17 +1380,17 @@ async def admin_deactivate_counselor(update: Update, context: ContextTypes.DEFAU
     counselor_id = int(query.data.replace('admin_deactivate_', ''))
     admin_id = query.from_user.id
     
-    from hu_counseling_bot import db
-    counselor = db.get_counselor(counselor_id)
+    from hu_counseling_bot import async_db, outbound
+    counselor = await async_db.get_counselor(counselor_id)
     
     if not counselor:
         await query.edit_message_text("⚠️ Counselor not found.")
         return
     
-    db.deactivate_counselor(counselor_id, admin_id)
+    await async_db.deactivate_counselor(counselor_id, admin_id)
     
     # Notify counselor
-    await context.bot.send_message(
+    outbound.notify(
         chat_id=counselor['user_id'],
         text="⚠️ **Account Deactivated**\n\n"
              "Your counselor account has been temporarily deactivated by an administrator.\n\n"
@@ -1486,17 +1416,17 @@ async def admin_reactivate_counselor(update: Update, context: ContextTypes.DEFAU
     counselor_id = int(query.data.replace('admin_reactivate_', ''))
     admin_id = query.from_user.id
     
-    from hu_counseling_bot import db
-    counselor = db.get_counselor(counselor_id)
+    from hu_counseling_bot import async_db, outbound
+    counselor = await async_db.get_counselor(counselor_id)
     
     if not counselor:
         await query.edit_message_text("⚠️ Counselor not found.")
         return
     
-    db.reactivate_counselor(counselor_id, admin_id)
+    await async_db.reactivate_counselor(counselor_id, admin_id)
     
     # Notify counselor
-    await context.bot.send_message(
+    outbound.notify(
         chat_id=counselor['user_id'],
         text="✅ **Account Reactivated**\n\n"
              "Your counselor account has been reactivated!\n\n"
@@ -1522,26 +1452,23 @@ async def admin_delete_counselor(update: Update, context: ContextTypes.DEFAULT_T
     counselor_id = int(query.data.replace('admin_delete_', ''))
     admin_id = query.from_user.id
     
-    from hu_counseling_bot import db
-    counselor = db.get_counselor(counselor_id)
+    from hu_counseling_bot import async_db, outbound
+    counselor = await async_db.get_counselor(counselor_id)
     
     if not counselor:
         await query.edit_message_text("⚠️ Counselor not found.")
         return
     
-    ok = db.delete_counselor(counselor_id, admin_id)
+    ok = await async_db.delete_counselor(counselor_id, admin_id)
     if not ok:
         await query.answer("Cannot delete: counselor has active or matched sessions.", show_alert=True)
         return
 
-    try:
-        await context.bot.send_message(
-            chat_id=counselor['user_id'],
-            text="🗑️ **Account Deleted**\n\nYour counselor account has been removed by an admin.",
-            parse_mode='Markdown'
-        )
-    except Exception:
-        pass
+    outbound.notify(
+        chat_id=counselor['user_id'],
+        text="🗑️ **Account Deleted**\n\nYour counselor account has been removed by an admin.",
+        parse_mode='Markdown'
+    )
 
     await query.edit_message_text(
         f"🗑️ **Counselor Deleted**\n\n"
@@ -1559,8 +1486,8 @@ async def admin_edit_counselor(update: Update, context: ContextTypes.DEFAULT_TYP
     
     counselor_id = int(query.data.replace('admin_edit_', ''))
     
-    from hu_counseling_bot import db
-    counselor = db.get_counselor(counselor_id)
+    from hu_counseling_bot import async_db
+    counselor = await async_db.get_counselor(counselor_id)
     
     if not counselor:
         await query.edit_message_text("⚠️ Counselor not found.")
@@ -1597,8 +1524,8 @@ async def counselor_edit_profile(update: Update, context: ContextTypes.DEFAULT_T
     
     user_id = query.from_user.id
     
-    from hu_counseling_bot import db
-    counselor = db.get_counselor_by_user_id(user_id)
+    from hu_counseling_bot import async_db
+    counselor = await async_db.get_counselor_by_user_id(user_id)
     
     if not counselor or counselor['status'] != 'approved':
         await query.edit_message_text(
@@ -1678,8 +1605,8 @@ async def edit_counselor_bio(update: Update, context: ContextTypes.DEFAULT_TYPE)
     
     user_id = query.from_user.id
     
-    from hu_counseling_bot import db
-    counselor = db.get_counselor_by_user_id(user_id)
+    from hu_counseling_bot import async_db
+    counselor = await async_db.get_counselor_by_user_id(user_id)
     
     text = f"""
 **Edit Bio** 📝
@@ -1713,8 +1640,8 @@ async def edit_counselor_specs(update: Update, context: ContextTypes.DEFAULT_TYP
     
     user_id = query.from_user.id
     
-    from hu_counseling_bot import db, USER_STATE, create_counselor_specialization_keyboard
-    counselor = db.get_counselor_by_user_id(user_id)
+    from hu_counseling_bot import async_db, USER_STATE, create_counselor_specialization_keyboard
+    counselor = await async_db.get_counselor_by_user_id(user_id)
     
     if user_id not in USER_STATE:
         USER_STATE[user_id] = {}
@@ -1747,8 +1674,8 @@ async def edit_counselor_gender(update: Update, context: ContextTypes.DEFAULT_TY
     
     user_id = query.from_user.id
     
-    from hu_counseling_bot import db
-    counselor = db.get_counselor_by_user_id(user_id)
+    from hu_counseling_bot import async_db
+    counselor = await async_db.get_counselor_by_user_id(user_id)
     
     current_gender = counselor.get('gender', 'anonymous')
     gender_display = {
@@ -1785,7 +1712,7 @@ async def handle_counselor_edit_message(update: Update, context: ContextTypes.DE
     """Handle counselor profile edit text inputs"""
     user_id = update.effective_user.id
     
-    from hu_counseling_bot import USER_STATE, db
+    from hu_counseling_bot import USER_STATE, async_db
     
     if user_id not in USER_STATE or 'editing' not in USER_STATE[user_id]:
         return
@@ -1803,8 +1730,8 @@ async def handle_counselor_edit_message(update: Update, context: ContextTypes.DE
             await update.message.reply_text("⚠️ Display name is too long. Please keep it under 50 characters.")
             return
         
-        counselor = db.get_counselor_by_user_id(user_id)
-        db.update_counselor_info(counselor['counselor_id'], display_name=new_name)
+        counselor = await async_db.get_counselor_by_user_id(user_id)
+        await async_db.update_counselor_info(counselor['counselor_id'], display_name=new_name)
         
         USER_STATE[user_id] = {}
         
@@ -1833,8 +1760,8 @@ async def handle_counselor_edit_message(update: Update, context: ContextTypes.DE
             )
             return
         
-        counselor = db.get_counselor_by_user_id(user_id)
-        db.update_counselor_info(counselor['counselor_id'], bio=new_bio)
+        counselor = await async_db.get_counselor_by_user_id(user_id)
+        await async_db.update_counselor_info(counselor['counselor_id'], bio=new_bio)
         
         USER_STATE[user_id] = {}
         
@@ -1856,7 +1783,7 @@ async def toggle_edit_specialization(update: Update, context: ContextTypes.DEFAU
     user_id = query.from_user.id
     spec = query.data.replace('spec_', '')
     
-    from hu_counseling_bot import USER_STATE, db, create_counselor_specialization_keyboard
+    from hu_counseling_bot import USER_STATE, async_db, create_counselor_specialization_keyboard
     
     if user_id not in USER_STATE or USER_STATE[user_id].get('editing') != 'specs':
         # Not in edit mode, use the regular toggle for registration
@@ -1873,8 +1800,8 @@ async def toggle_edit_specialization(update: Update, context: ContextTypes.DEFAU
             return
         
         # Save the updated specializations
-        counselor = db.get_counselor_by_user_id(user_id)
-        db.update_counselor_info(counselor['counselor_id'], specializations=selected)
+        counselor = await async_db.get_counselor_by_user_id(user_id)
+        await async_db.update_counselor_info(counselor['counselor_id'], specializations=selected)
         
         specs_text = '\n'.join([f"• {COUNSELING_TOPICS[s]['icon']} {COUNSELING_TOPICS[s]['name']}" for s in selected])
         
@@ -1924,11 +1851,11 @@ async def edit_gender_selected(update: Update, context: ContextTypes.DEFAULT_TYP
     user_id = query.from_user.id
     new_gender = query.data.replace('edit_gender_', '')
     
-    from hu_counseling_bot import db
-    counselor = db.get_counselor_by_user_id(user_id)
+    from hu_counseling_bot import async_db
+    counselor = await async_db.get_counselor_by_user_id(user_id)
     
     # Update gender in database using the unified method
-    db.update_counselor_info(counselor['counselor_id'], gender=new_gender)
+    await async_db.update_counselor_info(counselor['counselor_id'], gender=new_gender)
     
     gender_display = {
         'male': '👨 Male',
@@ -6,8 +6,8 @@ Combines all modules and starts the bot
 import logging
 import asyncio
 import os
-from telegram import BotCommand
-from telegram.ext import ApplicationBuilder, CommandHandler, MessageHandler, CallbackQueryHandler, filters
+from telegram import BotCommand, Update
+from telegram.ext import ApplicationBuilder, CommandHandler, MessageHandler, CallbackQueryHandler, TypeHandler, filters
 
 # Import production-ready modules
 from logging_config import setup_logging
@@ -21,7 +21,7 @@ from hu_counseling_bot import (
     accept_session, decline_session, handle_session_message,
     end_session_handler, confirm_end_session,
     session_info_handler, current_session_handler, switch_session_handler, transfer_session_handler, confirm_transfer_handler,
-    BOT_TOKEN, db, matcher, create_main_menu_keyboard, create_session_control_keyboard,
+    BOT_TOKEN, db, async_db, matcher, dashboard, message_journal, relay_pipeline, outbound, rate_limit_gate, USER_STATE, create_main_menu_keyboard, create_session_control_keyboard,
     ADMIN_IDS
 )
 
@@ -30,7 +30,7 @@ from hu_counseling_bot_part2 import (
     gender_selected, handle_counselor_bio, counselor_dashboard, toggle_availability, counselor_stats,
     rate_session_start, submit_rating, admin_panel, admin_pending_counselors,
     review_counselor, approve_counselor_handler, reject_counselor_handler,
-    admin_detailed_stats, admin_manage_counselors, admin_pending_sessions,
+    admin_detailed_stats, admin_trends, admin_trends_export, admin_manage_counselors, admin_pending_sessions,
     admin_view_counselor, admin_deactivate_counselor, admin_reactivate_counselor,
     admin_delete_counselor, admin_edit_counselor,
     counselor_edit_profile, edit_counselor_name, edit_counselor_bio, edit_counselor_specs,
@@ -51,15 +51,11 @@ async def main_menu_handler(update, context):
     
     user_id = query.from_user.id
     
-    # Check counselor status
-    counselor = db.get_counselor_by_user_id(user_id)
-    is_counselor = counselor and counselor['status'] == 'approved'
-    
-    # Check admin status
-    is_admin = db.is_admin(user_id) or user_id in ADMIN_IDS
-    
-    # Check active session status
-    active_session_exists = db.get_active_session_by_user(user_id) is not None
+    # Counselor, admin and active session status in one query
+    user_context = await async_db.get_user_context(user_id)
+    is_counselor = user_context['is_counselor']
+    is_admin = user_context['is_admin'] or user_id in ADMIN_IDS
+    active_session_exists = user_context['active_session'] is not None
     
     text = """
 **HU Counseling Service** 🙏
@@ -76,15 +72,11 @@ async def menu_command(update, context):
     """Handle /menu command - shows main menu"""
     user_id = update.effective_user.id
     
-    # Check counselor status
-    counselor = db.get_counselor_by_user_id(user_id)
-    is_counselor = counselor and counselor['status'] == 'approved'
-    
-    # Check admin status
-    is_admin = db.is_admin(user_id) or user_id in ADMIN_IDS
-    
-    # Check active session status
-    active_session_exists = db.get_active_session_by_user(user_id) is not None
+    # Counselor, admin and active session status in one query
+    user_context = await async_db.get_user_context(user_id)
+    is_counselor = user_context['is_counselor']
+    is_admin = user_context['is_admin'] or user_id in ADMIN_IDS
+    active_session_exists = user_context['active_session'] is not None
     
     text = """
 **HU Counseling Service** 🙏
@@ -105,10 +97,7 @@ async def cancel_end_handler(update, context):
     user_id = query.from_user.id
     
     # Check if user or counselor
-    is_counselor = False
-    counselor = db.get_counselor_by_user_id(user_id)
-    if counselor and counselor.get('status') == 'approved':
-        is_counselor = True
+    is_counselor = (await async_db.get_user_context(user_id))['is_counselor']
     
     await query.edit_message_text(
         "✅ **Session Continues**\n\nType your message below to continue the conversation:",
@@ -134,23 +123,42 @@ async def post_init(application):
     except Exception as e:
         logger.warning(f"Initial backup failed: {e}")
     
+    # Route outbound sends through the rate-limited dispatcher
+    outbound.bind(application.bot)
+    
+    # Start the background writer for chat messages and the relay retry loop
+    # (relays use the bot directly: no per-chat bucket wait, no coalescing)
+    message_journal.start()
+    asyncio.create_task(relay_pipeline.start(application.bot))
+    
     # Start session timeout manager
     timeout_manager = SessionTimeoutManager(
         db=db,
         bot_context=application,
-        timeout_hours=24
+        timeout_hours=24,
+        bot=outbound
     )
     application.bot_data['timeout_manager'] = timeout_manager
     asyncio.create_task(timeout_manager.start())
     logger.info("✅ Session timeout manager started")
     
-    # Start scheduled tasks manager
+    # Start scheduled tasks manager (notifications go through the running bot's dispatcher)
     from scheduled_tasks import ScheduledTasksManager
-    scheduled_tasks_manager = ScheduledTasksManager(db)
+    scheduled_tasks_manager = ScheduledTasksManager(db, bot=outbound)
     application.bot_data['scheduled_tasks_manager'] = scheduled_tasks_manager
     asyncio.create_task(scheduled_tasks_manager.start())
     logger.info("✅ Scheduled tasks manager started")
     
+    # Re-match waiting sessions as soon as a counselor frees up or a request
+    # arrives (the scheduled sweep above is only the safety net)
+    from matching_events import MatchingEventBus
+    matching_bus = MatchingEventBus(db, matcher, on_matched=scheduled_tasks_manager.notify_matches)
+    application.bot_data['matching_bus'] = matching_bus
+    matching_bus.start()
+    
+    # Recompute the admin dashboard in the background
+    asyncio.create_task(dashboard.start())
+    
     # Start health ping service (only in Render environment)
     import os
     if os.getenv("RENDER") == "true":  # Render sets this automatically
@@ -168,6 +176,13 @@ async def post_shutdown(application):
     if 'health_ping_service' in application.bot_data:
         await application.bot_data['health_ping_service'].stop()
     
+    # Stop dashboard snapshots
+    await dashboard.stop()
+    
+    # Stop event-driven matching
+    if 'matching_bus' in application.bot_data:
+        await application.bot_data['matching_bus'].stop()
+    
     # Stop scheduled tasks manager
     if 'scheduled_tasks_manager' in application.bot_data:
         await application.bot_data['scheduled_tasks_manager'].stop()
@@ -176,6 +191,21 @@ async def post_shutdown(application):
     if 'timeout_manager' in application.bot_data:
         await application.bot_data['timeout_manager'].stop()
     
+    # Stop retrying deliveries and let queued sends go out, then write
+    # queued chat messages before the database goes away
+    await relay_pipeline.stop()
+    await outbound.drain(timeout=10)
+    logger.info(f"Outbound dispatcher stats: {outbound.stats()}")
+    try:
+        message_journal.close()
+    except Exception as e:
+        logger.error(f"❌ Failed to flush queued messages on shutdown: {e}")
+    USER_STATE.close()
+    
+    # Drain the database executor and close pooled connections
+    async_db.shutdown()
+    db.close()
+    
     logger.info("All background services stopped")
 
 def _build_application():
@@ -183,6 +213,13 @@ def _build_application():
     # Build application
     app = ApplicationBuilder().token(BOT_TOKEN).post_init(post_init).post_shutdown(post_shutdown).build()
     
+    # Spam gate: runs before every other group and stops over-limit updates
+    app.add_handler(TypeHandler(Update, rate_limit_gate), group=-2)
+    
+    # Then the sender's conversation state is loaded off the event loop
+    # (a no-op unless CONVERSATION_STATE_BACKEND=database)
+    app.add_handler(TypeHandler(Update, USER_STATE.handle_update), group=-1)
+    
     # Command handlers
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CommandHandler("menu", menu_command))
@@ -241,7 +278,9 @@ def _build_application():
     app.add_handler(CallbackQueryHandler(review_counselor, pattern='^review_counselor_'))
     app.add_handler(CallbackQueryHandler(approve_counselor_handler, pattern='^approve_counselor_'))
     app.add_handler(CallbackQueryHandler(reject_counselor_handler, pattern='^reject_counselor_'))
-    app.add_handler(CallbackQueryHandler(admin_detailed_stats, pattern='^admin_detailed_stats$'))
+    app.add_handler(CallbackQueryHandler(admin_detailed_stats, pattern='^admin_detailed_stats(_refresh)?$'))
+    app.add_handler(CallbackQueryHandler(admin_trends, pattern='^admin_trends$'))
+    app.add_handler(CallbackQueryHandler(admin_trends_export, pattern='^admin_trends_export$'))
     app.add_handler(CallbackQueryHandler(admin_manage_counselors, pattern='^admin_manage_counselors$'))
     app.add_handler(CallbackQueryHandler(admin_pending_sessions, pattern='^admin_pending_sessions$'))
     app.add_handler(CallbackQueryHandler(admin_view_pending_session, pattern='^admin_view_session_'))
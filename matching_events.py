@@ -0,0 +1,198 @@
+"""
+Matching Event Bus for HU Counseling Service Bot
+Re-runs matching as soon as something changes that could let a waiting
+session be matched, instead of waiting for the periodic sweep
+"""
+
+import asyncio
+import logging
+import os
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from async_database import get_async_database
+from counseling_database import CounselingDatabase
+from matching_system import CounselingMatcher
+
+logger = logging.getLogger(__name__)
+
+
+class MatchingEventBus:
+    """
+    Turns CounselingDatabase write events into debounced matching passes
+
+    Triggers:
+        session_requested              -> a new session is waiting
+        session_released               -> a declined/transferred session is waiting again
+        counselor_availability_changed -> a counselor came online
+        counselor_status_changed       -> a counselor was approved
+        session_ended                  -> the session's counselor has a free slot
+
+    Events arriving within `debounce` seconds of the first one are folded
+    into a single pass. A pass is targeted and never queries the waiting
+    sessions: from the in-memory PendingQueue it takes, for each counselor
+    that came online or freed up, as many sessions as they have spare slots
+    from the topics they serve, and for each new/released session the head
+    of that session's topic. These go through CounselingMatcher.match_sessions
+    (one transaction) and newly matched pairs are handed to on_matched (e.g.
+    ScheduledTasksManager.notify_matches).
+
+    Only writes made through this process's CounselingDatabase are seen, so
+    the periodic auto-match sweep stays on as a safety net. start() runs from
+    post_init (it needs the running loop) and stop() on shutdown.
+    """
+
+    def __init__(self, db: CounselingDatabase, matcher: CounselingMatcher = None,
+                 on_matched: Callable[[List[Tuple[int, int]]], Awaitable] = None,
+                 debounce: float = None, max_batch: int = None):
+        self.db = db
+        self.async_db = get_async_database(db)
+        self.matcher = matcher or CounselingMatcher(db)
+        self.on_matched = on_matched
+        self.debounce = debounce if debounce is not None else float(os.getenv("MATCH_DEBOUNCE_SECONDS", "2"))
+        self.max_batch = max_batch if max_batch is not None else int(os.getenv("MATCH_EVENT_BATCH", "50"))
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._pass_task: Optional[asyncio.Task] = None
+        self._sessions: Set[int] = set()     # sessions that started waiting since the last pass
+        self._counselors: Set[int] = set()   # counselors that gained capacity since the last pass
+
+        self.events = 0
+        self.passes = 0
+        self.matched = 0
+
+    # ==================== LIFECYCLE ====================
+
+    def start(self, loop: asyncio.AbstractEventLoop = None):
+        """Subscribe to database events; passes run on the given (or running) loop"""
+        self._loop = loop or asyncio.get_running_loop()
+        self.db.add_listener(self.handle_event)
+        logger.info(f"✅ Matching event bus started (debounce: {self.debounce}s)")
+
+    async def stop(self):
+        """Unsubscribe and let a pass that is already running finish"""
+        self.db.remove_listener(self.handle_event)
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._pass_task is not None and not self._pass_task.done():
+            await asyncio.gather(self._pass_task, return_exceptions=True)
+        self._loop = None
+
+    # ==================== EVENTS ====================
+
+    def handle_event(self, event: str, **payload):
+        """CounselingDatabase listener (called on whichever thread did the write)"""
+        session_id = counselor_id = None
+        if event in ('session_requested', 'session_released'):
+            session_id = payload.get('session_id')
+        elif event == 'counselor_availability_changed' and payload.get('is_available'):
+            counselor_id = payload.get('counselor_id')
+        elif event == 'counselor_status_changed' and payload.get('status') == 'approved':
+            counselor_id = payload.get('counselor_id')
+        elif event == 'session_ended':
+            counselor_id = payload.get('counselor_id')
+
+        if session_id is None and counselor_id is None:
+            return
+
+        loop = self._loop
+        if loop is None:
+            return
+        try:
+            loop.call_soon_threadsafe(self._mark, session_id, counselor_id)
+        except RuntimeError:
+            pass  # Loop already closed during shutdown
+
+    def _mark(self, session_id: Optional[int], counselor_id: Optional[int]):
+        """Record a trigger and arm the debounce timer (event loop thread)"""
+        self.events += 1
+        if session_id is not None:
+            self._sessions.add(session_id)
+        if counselor_id is not None:
+            self._counselors.add(counselor_id)
+        self._arm()
+
+    def _arm(self):
+        if self._timer is None and self._loop is not None:
+            self._timer = self._loop.call_later(self.debounce, self._launch)
+
+    def _launch(self):
+        self._timer = None
+        if self._pass_task is not None and not self._pass_task.done():
+            return  # The running pass re-arms when it finishes
+        self._pass_task = asyncio.create_task(self._run_pass())
+
+    # ==================== MATCHING ====================
+
+    async def _run_pass(self):
+        sessions, counselors = self._sessions, self._counselors
+        self._sessions, self._counselors = set(), set()
+        try:
+            matched_pairs = await self.async_db.run(self._match, sessions, counselors)
+            self.passes += 1
+            if matched_pairs:
+                self.matched += len(matched_pairs)
+                logger.info(f"⚡ Event-matched {len(matched_pairs)} pending sessions")
+                if self.on_matched is not None:
+                    await self.on_matched(matched_pairs)
+        except Exception as e:
+            logger.error(f"Error in event-driven matching pass: {e}")
+        finally:
+            if self._sessions or self._counselors:
+                self._arm()
+
+    def _match(self, sessions: Set[int], counselors: Set[int]) -> List[Tuple[int, int]]:
+        """Match what the events made matchable, taken from the pending queue"""
+        queue = self.matcher.queue
+        picked: Dict[int, Dict] = {}
+
+        # A freed counselor takes from the head of the topics they serve
+        for counselor_id in counselors:
+            counselor = self.matcher.index.get_counselor(counselor_id)
+            spare = self._spare_capacity(counselor)
+            if spare:
+                for session in queue.peek(spare, topics=counselor.get('specializations') or []):
+                    picked[session['session_id']] = session
+
+        # A new or released session only competes with its own topic's line
+        by_topic: Dict[str, int] = {}
+        for session_id in sessions:
+            session = queue.get(session_id)
+            if session is None:
+                continue  # Already matched (e.g. inline by the request handler)
+            by_topic[session['topic']] = by_topic.get(session['topic'], 0) + 1
+        for topic, count in by_topic.items():
+            for session in queue.peek(count, topics=[topic]):
+                picked[session['session_id']] = session
+
+        if not picked:
+            return []
+        return self.matcher.match_sessions(list(picked.values())[:self.max_batch])
+
+    def _spare_capacity(self, counselor: Optional[Dict]) -> int:
+        if not counselor or not counselor.get('is_available'):
+            return 0
+        return max(0, self.db.max_sessions_per_counselor - counselor.get('active_session_count', 0))
+
+    async def run_pending(self):
+        """Run a pass now for everything recorded so far (skips the debounce wait)"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._pass_task is not None and not self._pass_task.done():
+            await asyncio.gather(self._pass_task, return_exceptions=True)
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._sessions or self._counselors:
+            self._pass_task = asyncio.create_task(self._run_pass())
+            await self._pass_task
+
+    def stats(self) -> Dict:
+        return {
+            'events': self.events,
+            'passes': self.passes,
+            'matched': self.matched,
+            'waiting_triggers': len(self._sessions) + len(self._counselors),
+        }
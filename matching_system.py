@@ -4,12 +4,20 @@ Intelligently matches users with the best available counselor
 """
 
 import logging
+import os
 from typing import Optional, Dict, List, Tuple
 from counseling_database import CounselingDatabase, COUNSELING_TOPICS
+from counselor_index import CounselorIndex, get_counselor_index
+from pending_queue import PendingQueue, aging_key, get_pending_queue
+from scoring_engine import ScoringEngine
 import random
 
 logger = logging.getLogger(__name__)
 
+# Score deducted per session a counselor has already been given in the same
+# batch pass, so one top-rated counselor does not absorb the whole backlog
+BATCH_LOAD_PENALTY = float(os.getenv("MATCH_BATCH_LOAD_PENALTY", "15"))
+
 class CounselingMatcher:
     """
     Advanced matching algorithm with multiple strategies:
@@ -20,34 +28,68 @@ class CounselingMatcher:
     5. Availability-based (only match available counselors)
     """
     
-    def __init__(self, db: CounselingDatabase):
+    def __init__(self, db: CounselingDatabase, index: CounselorIndex = None, queue: PendingQueue = None):
         self.db = db
+        # Shared in-memory view of available counselors (kept in sync by db events)
+        self.index = index or get_counselor_index(db)
+        # Shared in-memory queue of waiting sessions (kept in sync by db events)
+        self.queue = queue or get_pending_queue(db)
+        # Scores all candidates at once (NumPy when installed)
+        self.scoring = ScoringEngine(self._calculate_counselor_score)
     
-    def find_best_match(self, session_id: int) -> Optional[int]:
+    def find_best_match(self, session_id: int, session: Dict = None) -> Optional[int]:
         """
         Find the best counselor for a session using advanced matching algorithm
+        Pass the session row if the caller already has it to skip the lookup.
+        Read-only: use match_session() to actually assign the session.
         Returns: counselor_id or None if no match found
         """
-        session = self.db.get_session(session_id)
+        ranked = self.rank_counselors(session_id, session=session)
+        return ranked[0] if ranked else None
+    
+    def match_session(self, session_id: int, session: Dict = None, exclude: Tuple[int, ...] = ()) -> Optional[int]:
+        """
+        Rank candidates and atomically claim the best one that still has capacity
+        
+        If a concurrent match fills the top counselor first, the claim falls
+        through to the next candidate in the same transaction.
+        Returns: matched counselor_id or None if nobody could take the session
+        """
+        ranked = [cid for cid in self.rank_counselors(session_id, session=session) if cid not in exclude]
+        if not ranked:
+            return None
+        
+        counselor_id = self.db.claim_session(session_id, ranked)
+        if counselor_id is None:
+            logger.warning(f"Session {session_id}: all {len(ranked)} candidates were claimed concurrently or went offline")
+        elif counselor_id != ranked[0]:
+            logger.info(f"Session {session_id}: top counselor {ranked[0]} unavailable, claimed {counselor_id}")
+        return counselor_id
+    
+    def rank_counselors(self, session_id: int, session: Dict = None) -> List[int]:
+        """Candidate counselor_ids for a session, best first"""
+        if session is None:
+            session = self.db.get_session(session_id)
         if not session:
             logger.error(f"Session {session_id} not found")
-            return None
+            return []
         
         topic = session['topic']
         priority = session.get('priority', 0)
         
-        # Get available counselors
-        available_counselors = self.db.get_available_counselors(topic)
+        # Get available counselors (served from the in-memory index)
+        available_counselors = self.index.get_candidates(topic)
         
         if not available_counselors:
             logger.warning(f"No available counselors for topic: {topic}")
-            return None
+            return []
         
         # Score each counselor
-        scored_counselors = []
-        for counselor in available_counselors:
-            score = self._calculate_counselor_score(counselor, topic, priority)
-            scored_counselors.append((counselor['counselor_id'], score, counselor))
+        scores = self.scoring.score_counselors(available_counselors, topic, priority)
+        scored_counselors = [
+            (counselor['counselor_id'], score, counselor)
+            for counselor, score in zip(available_counselors, scores)
+        ]
         
         # Sort by score (highest first)
         scored_counselors.sort(key=lambda x: x[1], reverse=True)
@@ -56,9 +98,7 @@ class CounselingMatcher:
         logger.info(f"Matching session {session_id} (topic: {topic}, priority: {priority})")
         logger.info(f"Top 3 counselors: {[(c[0], c[1]) for c in scored_counselors[:3]]}")
         
-        # Return the best match
-        best_counselor_id = scored_counselors[0][0]
-        return best_counselor_id
+        return [c[0] for c in scored_counselors]
     
     def _calculate_counselor_score(self, counselor: Dict, topic: str, priority: int) -> float:
         """
@@ -114,27 +154,50 @@ class CounselingMatcher:
         
         return score
     
-    def auto_match_pending_sessions(self) -> List[Tuple[int, int]]:
+    def auto_match_pending_sessions(self, limit: int = 50) -> List[Tuple[int, int]]:
         """
         Automatically match all pending sessions with available counselors
         Returns: List of (session_id, counselor_id) tuples
         """
-        pending_sessions = self.db.get_pending_sessions(limit=50)
-        matched_pairs = []
+        pending_sessions = self.queue.peek(limit)
+        return self.match_sessions(pending_sessions)
+    
+    def match_sessions(self, sessions: List[Dict]) -> List[Tuple[int, int]]:
+        """
+        Assign a batch of pending sessions in one pass and one transaction
+        
+        Sessions are taken in queue order (priority with aging, see
+        pending_queue.aging_key). Each one goes to its best-scoring counselor
+        that still has capacity, where capacity counts sessions handed out
+        earlier in this pass and every earlier assignment costs
+        BATCH_LOAD_PENALTY points.
+        Returns: List of (session_id, counselor_id) tuples actually matched
+        """
+        if not sessions:
+            return []
         
-        for session in pending_sessions:
-            session_id = session['session_id']
-            counselor_id = self.find_best_match(session_id)
-            
-            if counselor_id:
-                # Match the session
-                self.db.match_session_with_counselor(session_id, counselor_id)
-                matched_pairs.append((session_id, counselor_id))
-                
-                logger.info(f"Auto-matched session {session_id} with counselor {counselor_id}")
+        assignments = self.plan_assignments(sessions)
+        if not assignments:
+            return []
+        
+        # Only sessions still waiting get matched (another worker may have won)
+        matched_pairs = self.db.match_sessions_bulk(assignments)
+        for session_id, counselor_id in matched_pairs:
+            logger.info(f"Auto-matched session {session_id} with counselor {counselor_id}")
         
         return matched_pairs
     
+    def plan_assignments(self, sessions: List[Dict]) -> List[Tuple[int, int]]:
+        """Greedy capacity-aware assignment of sessions to counselors (no writes)"""
+        max_sessions = self.db.max_sessions_per_counselor
+        candidates = self.index.get_candidates()
+        capacity = [max_sessions - c.get('active_session_count', 0) for c in candidates]
+        
+        ordered = sorted(sessions, key=lambda s: aging_key(s, self.queue.aging_seconds))
+        
+        # Scores every session x counselor pair up front, then assigns greedily
+        return self.scoring.assign(ordered, candidates, capacity, BATCH_LOAD_PENALTY)
+    
     def get_counselor_workload(self, counselor_id: int) -> Dict:
         """
         Get current workload statistics for a counselor
@@ -163,11 +226,13 @@ class CounselingMatcher:
         
         return round(rating_sum / rating_count, 2)
     
-    def get_matching_statistics(self) -> Dict:
+    def get_matching_statistics(self, stats: Optional[Dict] = None) -> Dict:
         """
         Get statistics about the matching system performance
+        Pass an already fetched get_bot_stats() result to avoid reading it again
         """
-        stats = self.db.get_bot_stats()
+        if stats is None:
+            stats = self.db.get_bot_stats()
         
         # Calculate matching efficiency
         total_sessions = stats.get('total_sessions', 0)
@@ -236,21 +301,15 @@ class CounselingMatcher:
     def get_topic_distribution(self) -> Dict[str, int]:
         """
         Get distribution of sessions by topic
+        Read from the sessions.topic.* counters instead of scanning the sessions table
         """
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT topic, COUNT(*) as count 
-            FROM counseling_sessions 
-            GROUP BY topic
-            ORDER BY count DESC
-        ''')
-        
-        rows = cursor.fetchall()
-        conn.close()
+        prefix = 'sessions.topic.'
+        counters = self.db.get_stat_counters()
+        counts = [(name[len(prefix):], value) for name, value in counters.items()
+                  if name.startswith(prefix) and value > 0]
+        counts.sort(key=lambda item: item[1], reverse=True)
         
-        return {row['topic']: row['count'] for row in rows}
+        return dict(counts)
     
     def recommend_counselor_training(self) -> List[str]:
         """
@@ -259,7 +318,7 @@ class CounselingMatcher:
         topic_dist = self.get_topic_distribution()
         
         # Get all counselors and their specializations
-        available = self.db.get_available_counselors()
+        available = self.index.get_candidates()
         
         specialization_count = {}
         for counselor in available:
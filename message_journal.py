@@ -0,0 +1,272 @@
+"""
+Write-Behind Message Journal for HU Counseling Service Bot
+Buffers session chat messages in memory and writes them in batches,
+so relaying a message never waits for a database commit
+"""
+
+import logging
+import os
+import threading
+import time
+import weakref
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, List
+
+from counseling_database import CounselingDatabase
+from db_retry import classify_error
+
+logger = logging.getLogger(__name__)
+
+
+class MessageJournal:
+    """
+    Batches session_messages inserts
+
+    append() only queues the row (with its timestamp taken at append time, so
+    ordering is unchanged). A background thread writes queued rows with one
+    executemany transaction whenever batch_size rows are waiting or
+    flush_interval seconds have passed, whichever comes first - a crash can
+    lose at most flush_interval seconds of chat. close() writes everything
+    that is still queued and must be called on shutdown.
+
+    Delivery status changes (see RelayPipeline) are applied to the queued row
+    when it has not been written yet, otherwise they ride along with the next
+    flush as an UPDATE in the same transaction.
+
+    A flush that fails with a transient error (see db_retry.classify_error)
+    keeps its rows at the front of the queue and is retried on the next tick.
+    Any other error is assumed to come from the rows themselves: the batch is
+    split in halves until the rows that cannot be written are isolated, and
+    those are logged and kept in dead_letters instead of blocking the queue.
+    At most max_pending rows wait; beyond that new rows are dropped (and
+    logged) until the database catches up.
+    """
+
+    def __init__(self, db: CounselingDatabase, batch_size: int = None, flush_interval: float = None,
+                 max_pending: int = None):
+        self.db = db
+        self.batch_size = batch_size if batch_size is not None else int(os.getenv("MESSAGE_JOURNAL_BATCH_SIZE", "100"))
+        self.flush_interval = flush_interval if flush_interval is not None else float(os.getenv("MESSAGE_JOURNAL_FLUSH_INTERVAL", "0.5"))
+        self.max_pending = max_pending if max_pending is not None else int(os.getenv("MESSAGE_JOURNAL_MAX_PENDING", "10000"))
+
+        self._pending = deque()                  # rows waiting to be written, oldest first
+        self._pending_by_key: Dict[str, list] = {}  # relay_key -> queued row
+        self._status_updates: Dict[str, str] = {}   # relay_key -> status for rows already written
+        self._lock = threading.Lock()            # guards _pending and counters
+        self._flush_lock = threading.Lock()      # one flush at a time keeps rows in order
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._closed = False
+        self.dead_letters = deque(maxlen=100)   # (row, error) of rows that could not be written
+
+        self.appended = 0
+        self.written = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.dropped = 0
+        self.dead_lettered = 0
+
+    # ==================== WRITING ====================
+
+    def append(self, session_id: int, sender_role: str, sender_id: int, message_text: str,
+               relay_key: str = None, delivery_status: str = 'sent') -> bool:
+        """
+        Queue a message for the next flush (never blocks on the database)
+        Returns: False if the queue is full and the message was dropped
+        """
+        created_at = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        row = [session_id, sender_role, sender_id, message_text, created_at, relay_key, delivery_status]
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("MessageJournal is closed")
+            dropped = 0
+            if len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                dropped = self.dropped
+            else:
+                self._pending.append(row)
+                if relay_key:
+                    self._pending_by_key[relay_key] = row
+                self.appended += 1
+            full = len(self._pending) >= self.batch_size
+
+        if dropped:
+            # Once per 100 drops, so an outage does not also flood the log
+            if dropped % 100 == 1:
+                logger.error(f"❌ Message journal full ({self.max_pending} waiting), "
+                             f"dropping messages ({dropped} so far)")
+            self._wakeup.set()
+            return False
+
+        self.start()
+        if full:
+            self._wakeup.set()
+        return True
+
+    def set_delivery_status(self, relay_key: str, delivery_status: str):
+        """Record a message's delivery state (queued/sent/failed) without a write of its own"""
+        with self._lock:
+            row = self._pending_by_key.get(relay_key)
+            if row is not None:
+                row[6] = delivery_status
+            else:
+                self._status_updates[relay_key] = delivery_status
+        self.start()
+
+    def flush(self) -> int:
+        """Write everything queued so far; returns the number of rows written"""
+        with self._flush_lock:
+            with self._lock:
+                batch = [tuple(row) for row in self._pending]
+                self._pending.clear()
+                self._pending_by_key = {}
+                updates = self._status_updates
+                self._status_updates = {}
+            if not batch and not updates:
+                return 0
+
+            try:
+                self.db.add_messages_bulk(batch, [(status, key) for key, status in updates.items()])
+                written = len(batch)
+            except Exception as e:
+                if classify_error(e) is not None:
+                    self._requeue(batch, updates)
+                    raise
+                logger.error(f"❌ Message journal batch of {len(batch)} failed ({e}), isolating bad rows")
+                written = self._write_split(batch, updates)
+                self._write_updates(updates)
+
+            with self._lock:
+                self.written += written
+                self.flushes += 1
+            return written
+
+    def _requeue(self, rows: List[tuple], updates: Dict[str, str] = None):
+        """Put rows back at the front of the queue; changes made meanwhile win over ours"""
+        restored = [list(row) for row in rows]
+        with self._lock:
+            self._pending.extendleft(reversed(restored))
+            for row in restored:
+                if row[5]:
+                    self._pending_by_key.setdefault(row[5], row)
+            for key, status in (updates or {}).items():
+                self._status_updates.setdefault(key, status)
+            self.failed_flushes += 1
+
+    def _write_split(self, rows: List[tuple], updates: Dict[str, str]) -> int:
+        """
+        Write rows in halves, dead-lettering single rows that fail for good
+        A transient error requeues whatever is not written yet (and updates) and is raised.
+        Returns: number of rows written
+        """
+        written = 0
+        chunks = [rows]  # stack - the next chunk to write is last
+        while chunks:
+            chunk = chunks.pop()
+            try:
+                self.db.add_messages_bulk(chunk)
+                written += len(chunk)
+            except Exception as e:
+                if classify_error(e) is not None:
+                    remaining = [row for pending in reversed(chunks + [chunk]) for row in pending]
+                    self._requeue(remaining, updates)
+                    with self._lock:
+                        self.written += written
+                    raise
+                if len(chunk) == 1:
+                    self._dead_letter(chunk[0], e)
+                else:
+                    middle = len(chunk) // 2
+                    chunks.append(chunk[middle:])
+                    chunks.append(chunk[:middle])
+        return written
+
+    def _write_updates(self, updates: Dict[str, str]):
+        """Delivery status changes of a batch that had to be split"""
+        if not updates:
+            return
+        try:
+            self.db.add_messages_bulk([], [(status, key) for key, status in updates.items()])
+        except Exception as e:
+            if classify_error(e) is not None:
+                self._requeue([], updates)
+                raise
+            logger.error(f"❌ Dropped {len(updates)} delivery status updates: {e}")
+
+    def _dead_letter(self, row: tuple, error: Exception):
+        logger.error(f"❌ Message for session {row[0]} from {row[1]} {row[2]} at {row[4]} "
+                     f"could not be written and was dropped: {error}")
+        with self._lock:
+            self.dead_letters.append((row, repr(error)))
+            self.dead_lettered += 1
+
+    def pending_count(self, session_id: int = None) -> int:
+        """Messages not yet written (optionally for one session)"""
+        with self._lock:
+            if session_id is None:
+                return len(self._pending)
+            return sum(1 for row in self._pending if row[0] == session_id)
+
+    # ==================== LIFECYCLE ====================
+
+    def start(self):
+        """Start the background flusher (idempotent)"""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None or self._closed:
+                return
+            self._thread = threading.Thread(target=self._run, name="message-journal", daemon=True)
+            self._thread.start()
+        logger.info(f"Message journal started (batch {self.batch_size}, every {self.flush_interval}s)")
+
+    def close(self):
+        """Stop the flusher and write everything still queued"""
+        with self._lock:
+            self._closed = True
+            thread = self._thread
+        self._wakeup.set()
+        if thread is not None:
+            thread.join()
+        written = self.flush()
+        logger.info(f"Message journal closed ({written} messages flushed on shutdown)")
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"❌ Message journal flush failed, will retry: {e}")
+                time.sleep(self.flush_interval)
+            if self._closed:
+                return
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'pending': len(self._pending),
+                'appended': self.appended,
+                'written': self.written,
+                'flushes': self.flushes,
+                'failed_flushes': self.failed_flushes,
+                'dropped': self.dropped,
+                'dead_lettered': self.dead_lettered,
+                'avg_batch': round(self.written / self.flushes, 1) if self.flushes else 0.0,
+            }
+
+
+_journals = weakref.WeakKeyDictionary()
+_journals_lock = threading.Lock()
+
+
+def get_message_journal(db: CounselingDatabase) -> MessageJournal:
+    """Return the shared MessageJournal for a database instance"""
+    with _journals_lock:
+        journal = _journals.get(db)
+        if journal is None:
+            journal = MessageJournal(db)
+            _journals[db] = journal
+        return journal
@@ -0,0 +1,254 @@
+"""
+Outbound Message Dispatcher for HU Counseling Service Bot
+Central, rate-limited send queue for every message the bot sends on its own
+(match notifications, session updates, admin alerts)
+"""
+
+import asyncio
+import functools
+import logging
+import os
+import time
+from collections import deque
+from typing import Dict, Optional
+
+from telegram.error import RetryAfter
+
+logger = logging.getLogger(__name__)
+
+# Longest text Telegram accepts in one message
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+# Per-chat buckets kept before idle ones are pruned
+MAX_IDLE_BUCKETS = 10000
+
+
+class TokenBucket:
+    """Classic token bucket: rate tokens per second, up to capacity banked"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """Seconds until a token is available (0 if one is available now)"""
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self._refill()
+        self.tokens -= 1
+
+
+class OutboundDispatcher:
+    """
+    Per-chat ordered send queue with Telegram flood control
+
+    Handlers call notify(), which queues the message and returns at once:
+    updates are processed one at a time, so a handler waiting on a chat's
+    bucket would hold up every other user. send_message() has the same
+    signature as Bot.send_message and waits for delivery, for background
+    senders that expect a bot (scheduled tasks, session timeouts).
+
+    Each chat gets its own FIFO queue and worker task, so messages to one
+    chat are delivered in order while other chats proceed independently.
+    Sends take a token from a
+    global bucket and from the chat's bucket (defaults follow Telegram's
+    limits: ~30 messages/second overall, ~1/second per chat); a RetryAfter from Telegram
+    pauses all sending for the requested time and the message is retried in
+    place.
+
+    When a backlog builds up for a chat, consecutive plain-text messages
+    (same parse mode, no keyboard) are coalesced into one send, up to
+    Telegram's message size limit. Everyone awaiting a coalesced message gets
+    the same Message back.
+
+    bind() the Application's bot in post_init; drain() on shutdown waits for
+    what is still queued.
+    """
+
+    def __init__(self, bot=None, global_rate: float = None, per_chat_rate: float = None,
+                 per_chat_burst: float = None, max_retries: int = None, coalesce: bool = None):
+        self.bot = bot
+        self.global_rate = global_rate if global_rate is not None else float(os.getenv("OUTBOUND_GLOBAL_RATE", "30"))
+        self.per_chat_rate = per_chat_rate if per_chat_rate is not None else float(os.getenv("OUTBOUND_PER_CHAT_RATE", "1"))
+        self.per_chat_burst = per_chat_burst if per_chat_burst is not None else float(os.getenv("OUTBOUND_PER_CHAT_BURST", "3"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("OUTBOUND_MAX_RETRIES", "3"))
+        self.coalesce = coalesce if coalesce is not None else os.getenv("OUTBOUND_COALESCE", "1") == "1"
+
+        self._global_bucket = TokenBucket(self.global_rate, self.global_rate)
+        self._chat_buckets: Dict[int, TokenBucket] = {}
+        self._queues: Dict[int, deque] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+        self._paused_until = 0.0
+
+        self.sent = 0
+        self.failed = 0
+        self.coalesced = 0
+        self.retry_after_count = 0
+        self.retry_after_time = 0.0
+        self.max_queue_depth = 0
+        self._latencies = deque(maxlen=1000)   # enqueue -> delivered, seconds
+
+    def bind(self, bot):
+        """Attach the Bot that performs the actual sends (done in post_init)"""
+        self.bot = bot
+
+    # ==================== SENDING ====================
+
+    def enqueue(self, chat_id: int, text: str, **kwargs) -> asyncio.Future:
+        """Queue a message; the returned future resolves to the sent Message"""
+        future = asyncio.get_running_loop().create_future()
+        item = {'chat_id': chat_id, 'text': text, 'kwargs': kwargs,
+                'futures': [future], 'enqueued_at': time.monotonic()}
+
+        queue = self._queues.setdefault(chat_id, deque())
+        if not (self.coalesce and queue and self._merge(queue[-1], item)):
+            queue.append(item)
+
+        depth = self.queue_depth()
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+
+        if chat_id not in self._workers:
+            self._workers[chat_id] = asyncio.create_task(self._run_chat(chat_id))
+        return future
+
+    async def send_message(self, chat_id: int, text: str, **kwargs):
+        """Drop-in for Bot.send_message that goes through the queue"""
+        return await self.enqueue(chat_id, text, **kwargs)
+
+    def notify(self, chat_id: int, text: str, **kwargs) -> asyncio.Future:
+        """Queue a message without waiting for it (for handlers); failures are logged"""
+        future = self.enqueue(chat_id, text, **kwargs)
+        future.add_done_callback(functools.partial(self._log_failure, chat_id))
+        return future
+
+    @staticmethod
+    def _log_failure(chat_id: int, future: asyncio.Future):
+        if not future.cancelled() and future.exception() is not None:
+            logger.warning(f"❌ Could not send message to chat {chat_id}: {future.exception()}")
+
+    def _merge(self, last: Dict, item: Dict) -> bool:
+        """Fold item into the last queued message for the chat if both are plain text"""
+        if last.get('in_flight') or 'reply_markup' in last['kwargs'] or 'reply_markup' in item['kwargs']:
+            return False
+        if last['kwargs'] != item['kwargs']:
+            return False
+        merged = f"{last['text']}\n\n{item['text']}"
+        if len(merged) > TELEGRAM_MESSAGE_LIMIT:
+            return False
+        last['text'] = merged
+        last['futures'].extend(item['futures'])
+        self.coalesced += 1
+        return True
+
+    async def _run_chat(self, chat_id: int):
+        """Deliver one chat's queue in order; exits when the queue is empty"""
+        queue = self._queues[chat_id]
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= MAX_IDLE_BUCKETS:
+                self._prune_buckets()
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.per_chat_rate, self.per_chat_burst)
+        try:
+            while queue:
+                item = queue[0]
+                item['in_flight'] = True
+                await self._deliver(item, bucket)
+                queue.popleft()
+        finally:
+            self._workers.pop(chat_id, None)
+            self._queues.pop(chat_id, None)
+
+    def _prune_buckets(self):
+        """Forget chats whose bucket has refilled completely (they start full anyway)"""
+        for chat_id, bucket in list(self._chat_buckets.items()):
+            if chat_id not in self._workers and bucket.delay() == 0 and bucket.tokens >= bucket.capacity:
+                del self._chat_buckets[chat_id]
+
+    async def _deliver(self, item: Dict, bucket: TokenBucket):
+        attempt = 0
+        while True:
+            await self._wait_for_tokens(bucket)
+            try:
+                message = await self.bot.send_message(chat_id=item['chat_id'], text=item['text'], **item['kwargs'])
+            except RetryAfter as e:
+                retry_after = e.retry_after.total_seconds() if hasattr(e.retry_after, 'total_seconds') else float(e.retry_after)
+                self.retry_after_count += 1
+                self.retry_after_time += retry_after
+                if attempt < self.max_retries:
+                    attempt += 1
+                    self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+                    logger.warning(f"⚠️ Telegram flood control: pausing sends for {retry_after:.1f}s "
+                                   f"(chat {item['chat_id']}, attempt {attempt}/{self.max_retries})")
+                    continue
+                self._settle(item, error=e)
+                return
+            except Exception as e:
+                self._settle(item, error=e)
+                return
+            self._settle(item, message=message)
+            return
+
+    async def _wait_for_tokens(self, bucket: TokenBucket):
+        while True:
+            wait = max(self._paused_until - time.monotonic(), bucket.delay(), self._global_bucket.delay())
+            if wait <= 0:
+                bucket.take()
+                self._global_bucket.take()
+                return
+            await asyncio.sleep(wait)
+
+    def _settle(self, item: Dict, message=None, error: Exception = None):
+        if error is None:
+            self.sent += 1
+            self._latencies.append(time.monotonic() - item['enqueued_at'])
+        else:
+            self.failed += 1
+        for future in item['futures']:
+            if future.done():
+                continue
+            if error is None:
+                future.set_result(message)
+            else:
+                future.set_exception(error)
+
+    # ==================== LIFECYCLE & METRICS ====================
+
+    async def drain(self, timeout: Optional[float] = None):
+        """Wait until every queued message has been sent (or timeout seconds pass)"""
+        workers = list(self._workers.values())
+        if not workers:
+            return
+        done, pending = await asyncio.wait(workers, timeout=timeout)
+        if pending:
+            logger.warning(f"Outbound dispatcher stopped with {self.queue_depth()} messages unsent")
+
+    def queue_depth(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def stats(self) -> Dict:
+        latencies = sorted(self._latencies)
+        return {
+            'queue_depth': self.queue_depth(),
+            'max_queue_depth': self.max_queue_depth,
+            'active_chats': len(self._workers),
+            'sent': self.sent,
+            'failed': self.failed,
+            'coalesced': self.coalesced,
+            'retry_after_count': self.retry_after_count,
+            'retry_after_time': round(self.retry_after_time, 2),
+            'latency_p50_ms': round(latencies[len(latencies) // 2] * 1000, 1) if latencies else 0.0,
+            'latency_p95_ms': round(latencies[int(len(latencies) * 0.95)] * 1000, 1) if latencies else 0.0,
+            'latency_max_ms': round(latencies[-1] * 1000, 1) if latencies else 0.0,
+        }
@@ -0,0 +1,299 @@
+"""
+Pending Session Queue for HU Counseling Service Bot
+Keeps waiting session requests in memory, ordered by priority with aging,
+so matching and the admin view do not re-sort counseling_sessions each time
+"""
+
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+import weakref
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from counseling_database import CounselingDatabase
+
+logger = logging.getLogger(__name__)
+
+# Waiting this many seconds counts as much as one priority level, so a
+# crisis request (priority 10) jumps ahead of anything younger than
+# 10 x PENDING_AGING_SECONDS, and nothing waits behind newer requests forever
+PENDING_AGING_SECONDS = float(os.getenv("PENDING_AGING_SECONDS", "120"))
+
+
+def _timestamp(created_at) -> float:
+    """created_at (UTC string from SQLite or datetime from PostgreSQL) as epoch seconds"""
+    if isinstance(created_at, datetime):
+        dt = created_at
+    elif created_at:
+        try:
+            dt = datetime.fromisoformat(str(created_at))
+        except ValueError:
+            return 0.0
+    else:
+        return 0.0
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def aging_key(session: Dict, aging_seconds: float = PENDING_AGING_SECONDS) -> Tuple[float, int]:
+    """
+    Sort key for waiting sessions (smallest first)
+
+    Each priority level moves a request aging_seconds earlier in line; since
+    the key never changes while the session waits, it can live in a heap.
+    """
+    priority = session.get('priority') or 0
+    return _timestamp(session.get('created_at')) - priority * aging_seconds, session['session_id']
+
+
+class PendingQueue:
+    """
+    In-memory priority queue of sessions with status 'requested'
+
+    One binary heap per topic, so a counselor's candidates come only from
+    the topics they serve; push is O(log n), and taking the first k sessions
+    is O(k log n). Removals are lazy: the session is forgotten at once and
+    its heap entry is skipped when it reaches the top.
+
+    Loaded from the database on first use and kept current from
+    CounselingDatabase write events (session requested, matched, released,
+    ended; counselor deleted). Like CounselorIndex it only sees this
+    process's writes, so rebuild() should run periodically - the auto-match
+    sweep does this before every pass.
+    """
+
+    def __init__(self, db: CounselingDatabase, aging_seconds: float = None):
+        self.db = db
+        self.aging_seconds = aging_seconds if aging_seconds is not None else PENDING_AGING_SECONDS
+        self._lock = threading.RLock()
+        self._load_lock = threading.Lock()  # one lazy load at a time, never held with _lock
+        self._loaded = False
+        self.last_rebuild = None
+
+        self._sessions: Dict[int, Dict] = {}   # session_id -> session row
+        self._entries: Dict[int, Tuple] = {}   # session_id -> its live heap entry
+        self._heaps: Dict[str, List[Tuple]] = {}  # topic -> heap of (key, session_id, seq)
+        self._seq = itertools.count()          # tells a re-queued session's entries apart
+        self._stale = 0                        # dead entries still in the heaps
+
+        # Events seen while a rebuild's query runs, replayed on its snapshot
+        self._version = 0
+        self._rebuilds = 0
+        self._recent: List[Tuple] = []         # (version, event, payload)
+
+        db.add_listener(self.handle_event)
+
+    # ==================== LOADING ====================
+
+    def rebuild(self):
+        """Reload every waiting session from the database"""
+        start = time.monotonic()
+        # Query without the lock: listeners run on writer threads that may hold
+        # a pooled connection, so waiting for one under the lock can deadlock
+        with self._lock:
+            self._rebuilds += 1
+            since = self._version
+        try:
+            sessions = self.db.get_pending_sessions(limit=None)
+
+            with self._lock:
+                self._sessions, self._entries, self._heaps, self._stale = {}, {}, {}, 0
+                for session in sessions:
+                    self._add(session)
+                for heap in self._heaps.values():
+                    heapq.heapify(heap)
+
+                # Events committed while we queried (push/remove are idempotent)
+                for version, event, payload in self._recent:
+                    if version > since:
+                        self._apply(event, payload)
+                self._loaded = True
+                self.last_rebuild = time.time()
+        finally:
+            with self._lock:
+                self._rebuilds -= 1
+                if not self._rebuilds:
+                    self._recent = []
+
+        logger.info(f"Pending queue rebuilt: {len(sessions)} waiting sessions "
+                    f"({(time.monotonic() - start) * 1000:.1f} ms)")
+
+    def ensure_loaded(self):
+        if not self._loaded:
+            with self._load_lock:
+                if not self._loaded:
+                    self.rebuild()
+
+    # ==================== QUEUE OPERATIONS ====================
+
+    def _entry(self, session: Dict) -> Tuple:
+        entry = aging_key(session, self.aging_seconds) + (next(self._seq),)
+        self._sessions[session['session_id']] = session
+        self._entries[session['session_id']] = entry
+        return entry
+
+    def _add(self, session: Dict):
+        """Insert without restoring heap order (rebuild heapifies afterwards)"""
+        self._heaps.setdefault(session['topic'], []).append(self._entry(session))
+
+    def push(self, session: Dict):
+        """Add a waiting session (replaces an older entry for the same session)"""
+        with self._lock:
+            self._discard(session['session_id'])
+            heapq.heappush(self._heaps.setdefault(session['topic'], []), self._entry(dict(session)))
+
+    def remove(self, session_id: int) -> bool:
+        """Forget a session that is no longer waiting; False if it was not queued"""
+        with self._lock:
+            removed = self._discard(session_id)
+            if self._stale > max(64, len(self._sessions)):
+                self._compact()
+            return removed
+
+    def _discard(self, session_id: int) -> bool:
+        if self._sessions.pop(session_id, None) is None:
+            return False
+        del self._entries[session_id]
+        self._stale += 1
+        return True
+
+    def _compact(self):
+        """Drop dead heap entries once they outnumber the live ones"""
+        for topic, heap in list(self._heaps.items()):
+            live = [entry for entry in heap if self._entries.get(entry[1]) == entry]
+            if live:
+                heapq.heapify(live)
+                self._heaps[topic] = live
+            else:
+                del self._heaps[topic]
+        self._stale = 0
+
+    def _top(self, heap: List[Tuple]) -> Optional[Tuple]:
+        """First live entry of a heap, popping dead ones on the way"""
+        while heap:
+            entry = heap[0]
+            if self._entries.get(entry[1]) == entry:
+                return entry
+            heapq.heappop(heap)
+            self._stale -= 1
+        return None
+
+    def peek(self, limit: int = 10, topics: Iterable[str] = None) -> List[Dict]:
+        """
+        First `limit` waiting sessions in queue order, without removing them
+
+        topics restricts the result to those sub-queues (e.g. a counselor's
+        specializations). Returns copies, safe to mutate.
+        """
+        self.ensure_loaded()
+        with self._lock:
+            if topics is None:
+                heaps = list(self._heaps.values())
+            else:
+                heaps = [self._heaps[topic] for topic in set(topics) if topic in self._heaps]
+
+            result, taken = [], []
+            while len(result) < limit:
+                best_heap, best_entry = None, None
+                for heap in heaps:
+                    entry = self._top(heap)
+                    if entry is not None and (best_entry is None or entry < best_entry):
+                        best_heap, best_entry = heap, entry
+                if best_heap is None:
+                    break
+                heapq.heappop(best_heap)
+                taken.append((best_heap, best_entry))
+                result.append(dict(self._sessions[best_entry[1]]))
+
+            # Put back what was taken to look at
+            for heap, entry in taken:
+                heapq.heappush(heap, entry)
+            return result
+
+    def get(self, session_id: int) -> Optional[Dict]:
+        """The waiting session, or None if it is not in the queue"""
+        self.ensure_loaded()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            return dict(session) if session else None
+
+    def __len__(self) -> int:
+        self.ensure_loaded()
+        with self._lock:
+            return len(self._sessions)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            topics = {}
+            for session in self._sessions.values():
+                topics[session['topic']] = topics.get(session['topic'], 0) + 1
+            return {
+                'waiting': len(self._sessions),
+                'topics': topics,
+                'stale_entries': self._stale,
+                'last_rebuild': self.last_rebuild,
+            }
+
+    # ==================== INCREMENTAL UPDATES ====================
+
+    def handle_event(self, event: str, **payload):
+        """CounselingDatabase listener"""
+        if event == 'session_released':
+            if not self._loaded and not self._rebuilds:
+                return
+            # Queries never run under the lock
+            payload['session'] = self.db.get_session(payload.get('session_id'))
+
+        with self._lock:
+            self._version += 1
+            if self._rebuilds:
+                self._recent.append((self._version, event, payload))
+            if not self._loaded:
+                return  # First lookup loads everything anyway
+            self._apply(event, payload)
+
+        if event == 'counselor_status_changed' and payload.get('status') == 'deleted':
+            # Deleting a counselor puts their matched sessions back in line
+            self.rebuild()
+
+    def _apply(self, event: str, payload: Dict):
+        """Apply one event to the queue (caller holds the lock)"""
+        session_id = payload.get('session_id')
+
+        if event == 'session_requested':
+            self.push({
+                'session_id': session_id,
+                'user_id': payload.get('user_id'),
+                'topic': payload.get('topic'),
+                'description': payload.get('description'),
+                'priority': payload.get('priority', 0),
+                'created_at': payload.get('created_at'),
+                'status': 'requested',
+            })
+
+        elif event in ('session_matched', 'session_ended'):
+            self.remove(session_id)
+
+        elif event == 'session_released':
+            session = payload['session']
+            if session and session.get('status') == 'requested':
+                self.push(session)
+
+
+_queues = weakref.WeakKeyDictionary()
+_queues_lock = threading.Lock()
+
+
+def get_pending_queue(db: CounselingDatabase) -> PendingQueue:
+    """Return the shared PendingQueue for a database instance"""
+    with _queues_lock:
+        queue = _queues.get(db)
+        if queue is None:
+            queue = PendingQueue(db)
+            _queues[db] = queue
+        return queue
@@ -0,0 +1,101 @@
+"""
+Rate Limit Gate for HU Counseling Service Bot
+Rejects over-limit updates before any handler runs, so a spamming client
+costs a dictionary lookup instead of database work
+"""
+
+import logging
+import threading
+from collections import Counter
+from typing import Dict, Iterable, Optional
+
+from telegram import Update
+from telegram.ext import ApplicationHandlerStop, ContextTypes
+
+from rate_limiter import MemoryRateLimiter, RateLimiter, get_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+
+def classify_update(update: Update) -> Optional[str]:
+    """
+    Limiter action for an update: 'button_click', 'message' or None (not limited)
+
+    Creating a session is charged as 'session_request' by the handlers that
+    submit one (@rate_limit), since a description message can only be told
+    apart from a chat message by its conversation state.
+    """
+    if update.callback_query is not None:
+        return 'button_click'
+    if update.effective_message is not None:
+        return 'message'
+    return None
+
+
+class RateLimitGate:
+    """
+    TypeHandler callback for group -2 (runs before every other handler)
+
+    Each update from a non-admin user is charged to one limiter action (see
+    classify_update). Over the limit, button presses get an alert, messages
+    get a warning at most once a minute, and ApplicationHandlerStop
+    keeps the update away from the later groups. Checks use the
+    configured limiter (RATE_LIMIT_BACKEND); limits come from its
+    RATE_LIMIT_<ACTION> settings.
+    """
+
+    def __init__(self, limiter: RateLimiter = None, exempt_user_ids: Iterable[int] = ()):
+        self._limiter = limiter
+        self.exempt_user_ids = frozenset(exempt_user_ids)
+        self._notices = MemoryRateLimiter()
+        self._notices.limits = {'message': (1, 60)}  # at most one "too quickly" reply per user per minute
+        self._lock = threading.Lock()
+
+        self.passed: Counter = Counter()
+        self.dropped: Counter = Counter()
+
+    @property
+    def limiter(self) -> RateLimiter:
+        return self._limiter or get_rate_limiter()
+
+    async def __call__(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        user = update.effective_user
+        action_type = classify_update(update)
+        if user is None or action_type is None or user.id in self.exempt_user_ids:
+            return
+
+        allowed, seconds_until_reset = await self.limiter.check_async(user.id, action_type)
+        with self._lock:
+            (self.passed if allowed else self.dropped)[action_type] += 1
+        if allowed:
+            return
+
+        try:
+            await self._notify(update, user.id, action_type, seconds_until_reset)
+        except Exception as e:
+            logger.debug(f"Could not send rate limit notice to {user.id}: {e}")
+        raise ApplicationHandlerStop
+
+    async def _notify(self, update: Update, user_id: int, action_type: str, seconds_until_reset: int):
+        if update.callback_query is not None:
+            # Always answer, or the button keeps spinning
+            await update.callback_query.answer(
+                f"⚠️ Too many requests. Please wait {seconds_until_reset} seconds.",
+                show_alert=True
+            )
+            return
+
+        if self._notices.check_rate_limit(user_id, 'message')[0]:
+            await update.effective_message.reply_text(
+                f"⚠️ You're sending messages too quickly. "
+                f"Please wait {seconds_until_reset} seconds before trying again."
+            )
+
+    def stats(self) -> Dict:
+        """Passed/dropped update counts per action"""
+        with self._lock:
+            return {
+                'passed': dict(self.passed),
+                'dropped': dict(self.dropped),
+                'dropped_total': sum(self.dropped.values()),
+            }
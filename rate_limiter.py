@@ -3,23 +3,52 @@ Rate Limiter for HU Counseling Service Bot
 Prevents spam and abuse
 """
 
+import functools
+import math
+import os
+import threading
 import time
-from collections import defaultdict
-from typing import Dict, Tuple
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
 
+# 'memory' limits each process on its own; 'database' shares limits between
+# every process using the same database (gunicorn workers, the bot thread)
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+BACKENDS = ('memory', 'database')
+
+def parse_limit(value: str, default: Tuple[int, int]) -> Tuple[int, int]:
+    """Parse "max_actions/time_window_seconds" (default if malformed)"""
+    try:
+        max_actions, time_window = (int(part) for part in value.split('/'))
+        if max_actions > 0 and time_window > 0:
+            return max_actions, time_window
+    except ValueError:
+        pass
+    logger.warning(f"Invalid rate limit '{value}' (expected max_actions/seconds), using {default[0]}/{default[1]}")
+    return default
+
 class RateLimiter:
     """
-    Simple rate limiter to prevent spam
-    Tracks actions per user within time windows
+    Rate limiter interface (GCRA - generic cell rate algorithm)
+    
+    A limit of max_actions per time_window lets a user burst max_actions at
+    once and then earn one action back every time_window / max_actions
+    seconds. Per user and action only one float is kept: the theoretical
+    arrival time (TAT) of the next action, so a check is O(1) whatever the
+    user did before. A TAT in the past means the full allowance is back, so
+    such keys can be dropped at any time.
+    
+    Backends implement check_rate_limit, reset_user and cleanup_old_data;
+    handlers should await check_async, which keeps database backends off the
+    event loop.
     """
     
+    backend = None
+    
     def __init__(self):
-        # user_id -> {action_type: [(timestamp, count)]}
-        self.user_actions: Dict[int, Dict[str, list]] = defaultdict(lambda: defaultdict(list))
-        
         # Rate limits: (max_actions, time_window_seconds)
         self.limits = {
             'message': (20, 60),           # 20 messages per minute
@@ -27,48 +56,35 @@ class RateLimiter:
             'button_click': (30, 60),       # 30 button clicks per minute
             'counselor_register': (2, 86400) # 2 registration attempts per day
         }
+        # Overrides as "max_actions/time_window_seconds", e.g. RATE_LIMIT_MESSAGE=30/60
+        for action_type, default in list(self.limits.items()):
+            configured = os.getenv(f"RATE_LIMIT_{action_type.upper()}")
+            if configured:
+                self.limits[action_type] = parse_limit(configured, default)
+        
+        self.allowed = 0
+        self.limited = 0
+        self.expired_keys = 0
     
-    def check_rate_limit(self, user_id: int, action_type: str) -> Tuple[bool, int]:
+    def check_rate_limit(self, user_id: int, action_type: str, now: float = None) -> Tuple[bool, int]:
         """
         Check if user has exceeded rate limit for an action
         
         Args:
             user_id: Telegram user ID
             action_type: Type of action (message, session_request, etc.)
+            now: Current time in the backend's clock (for tests/benchmarks)
             
         Returns:
             Tuple of (is_allowed, seconds_until_reset)
             - is_allowed: True if action is allowed
-            - seconds_until_reset: Seconds until rate limit resets (0 if allowed)
+            - seconds_until_reset: Seconds until the next action is allowed (0 if allowed)
         """
-        if action_type not in self.limits:
-            logger.warning(f"Unknown action type: {action_type}")
-            return True, 0
-        
-        max_actions, time_window = self.limits[action_type]
-        current_time = time.time()
-        
-        # Get user's action history for this type
-        actions = self.user_actions[user_id][action_type]
-        
-        # Remove old actions outside time window
-        actions[:] = [ts for ts in actions if current_time - ts < time_window]
-        
-        # Check if limit exceeded
-        if len(actions) >= max_actions:
-            # Calculate when the oldest action will expire
-            oldest_action = min(actions)
-            seconds_until_reset = int(time_window - (current_time - oldest_action))
-            
-            logger.warning(
-                f"Rate limit exceeded for user {user_id}, action: {action_type}. "
-                f"Reset in {seconds_until_reset}s"
-            )
-            return False, seconds_until_reset
-        
-        # Add current action
-        actions.append(current_time)
-        return True, 0
+        raise NotImplementedError
+    
+    async def check_async(self, user_id: int, action_type: str) -> Tuple[bool, int]:
+        """check_rate_limit for handlers"""
+        return self.check_rate_limit(user_id, action_type)
     
     def reset_user(self, user_id: int, action_type: str = None):
         """
@@ -78,63 +94,250 @@ class RateLimiter:
             user_id: User ID to reset
             action_type: Specific action type to reset (None = reset all)
         """
-        if action_type:
-            if user_id in self.user_actions:
-                self.user_actions[user_id][action_type] = []
-        else:
-            if user_id in self.user_actions:
-                del self.user_actions[user_id]
-        
-        logger.info(f"Rate limit reset for user {user_id}, action: {action_type or 'all'}")
+        raise NotImplementedError
     
-    def cleanup_old_data(self, max_age_seconds: int = 86400):
+    def cleanup_old_data(self, now: float = None) -> int:
         """
-        Clean up old tracking data (run periodically)
+        Drop every idle key now (backends also do this on their own as checks go by)
         
-        Args:
-            max_age_seconds: Remove data older than this (default: 24 hours)
+        Returns: number of keys removed
         """
-        current_time = time.time()
-        users_to_remove = []
-        
-        for user_id, actions_dict in self.user_actions.items():
-            for action_type, timestamps in list(actions_dict.items()):
-                # Remove old timestamps
-                timestamps[:] = [ts for ts in timestamps if current_time - ts < max_age_seconds]
-                
-                # Remove empty action types
-                if not timestamps:
-                    del actions_dict[action_type]
+        raise NotImplementedError
+    
+    def _limit(self, action_type: str) -> Optional[Tuple[int, int]]:
+        limit = self.limits.get(action_type)
+        if limit is None:
+            logger.warning(f"Unknown action type: {action_type}")
+        return limit
+    
+    def _result(self, user_id: int, action_type: str, wait: float) -> Tuple[bool, int]:
+        """Count and format a check that has to wait `wait` seconds (0 = allowed)"""
+        if wait <= 0:
+            self.allowed += 1
+            return True, 0
+        
+        self.limited += 1
+        seconds_until_reset = math.ceil(wait)
+        # debug: under a flood a warning per rejected update costs more than the check
+        logger.debug(
+            f"Rate limit exceeded for user {user_id}, action: {action_type}. "
+            f"Reset in {seconds_until_reset}s"
+        )
+        return False, seconds_until_reset
+    
+    def stats(self) -> Dict:
+        """Limiter counters for the admin panel / logs"""
+        return {
+            'backend': self.backend,
+            'allowed': self.allowed,
+            'limited': self.limited,
+            'expired_keys': self.expired_keys,
+        }
+
+class MemoryRateLimiter(RateLimiter):
+    """
+    Per-process limiter keeping TATs in memory (time.monotonic clock)
+    
+    Each action type has its own table in least-recently-used order. Keys
+    whose TAT has passed are dropped from the old end as checks go by (a key
+    is kept at most time_window after the user's last action), and a table
+    never holds more than max_keys users.
+    """
+    
+    backend = 'memory'
+    
+    def __init__(self, max_keys: int = None):
+        super().__init__()
+        self.max_keys = max_keys if max_keys is not None else int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+        
+        self._lock = threading.Lock()
+        # action_type -> {user_id: tat} (LRU order)
+        self._tables: Dict[str, "OrderedDict[int, float]"] = {}
+        
+        self.evicted_keys = 0
+    
+    def check_rate_limit(self, user_id: int, action_type: str, now: float = None) -> Tuple[bool, int]:
+        limit = self._limit(action_type)
+        if limit is None:
+            return True, 0
+        
+        max_actions, time_window = limit
+        interval = time_window / max_actions
+        if now is None:
+            now = time.monotonic()
+        
+        with self._lock:
+            table = self._tables.get(action_type)
+            if table is None:
+                table = self._tables[action_type] = OrderedDict()
+            
+            tat = table.get(user_id, now)
+            if tat < now:
+                tat = now
             
-            # Mark users with no actions for removal
-            if not actions_dict:
-                users_to_remove.append(user_id)
+            # Allowed while the TAT is at most one window (minus this action) ahead
+            wait = tat - (time_window - interval) - now
+            if wait <= 0:
+                table[user_id] = tat + interval
+                table.move_to_end(user_id)
+                self._expire(table, now, limit=2)
         
-        # Remove users with no tracked actions
-        for user_id in users_to_remove:
-            del self.user_actions[user_id]
+        return self._result(user_id, action_type, wait)
+    
+    def _expire(self, table: "OrderedDict[int, float]", now: float, limit: int = None):
+        """Drop keys whose TAT has passed from the old end, then enforce max_keys (caller holds the lock)"""
+        removed = 0
+        while table and (limit is None or removed < limit):
+            user_id, tat = next(iter(table.items()))
+            if tat > now:
+                break
+            del table[user_id]
+            removed += 1
+        self.expired_keys += removed
+        
+        while len(table) > self.max_keys:
+            table.popitem(last=False)
+            self.evicted_keys += 1
+    
+    def reset_user(self, user_id: int, action_type: str = None):
+        with self._lock:
+            for name, table in self._tables.items():
+                if action_type is None or name == action_type:
+                    table.pop(user_id, None)
+        
+        logger.info(f"Rate limit reset for user {user_id}, action: {action_type or 'all'}")
+    
+    def cleanup_old_data(self, now: float = None) -> int:
+        if now is None:
+            now = time.monotonic()
+        
+        with self._lock:
+            before = self.expired_keys
+            for table in self._tables.values():
+                self._expire(table, now)
+            removed = self.expired_keys - before
         
-        if users_to_remove:
-            logger.info(f"Cleaned up rate limiter data for {len(users_to_remove)} users")
+        if removed:
+            logger.info(f"Cleaned up {removed} idle rate limiter keys")
+        return removed
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = super().stats()
+            stats['tracked_keys'] = sum(len(table) for table in self._tables.values())
+            stats['evicted_keys'] = self.evicted_keys
+            return stats
 
-# Global rate limiter instance
-rate_limiter = RateLimiter()
+class SQLRateLimiter(RateLimiter):
+    """
+    Limiter shared by every process using the same CounselingDatabase (time.time clock)
+    
+    A check is one atomic upsert on the rate_limits table that only advances
+    the TAT while the user is within the limit. Idle rows are deleted in one
+    statement at most every expire_interval seconds rather than per check.
+    If the database fails, the check allows the action (and logs it): spam
+    protection must not take the bot down with it.
+    """
+    
+    backend = 'database'
+    
+    def __init__(self, db, expire_interval: float = None):
+        # Imported here so the in-memory limiter does not load the database stack
+        from async_database import get_async_database
+        
+        super().__init__()
+        self.db = db
+        self.async_db = get_async_database(db)
+        self.expire_interval = expire_interval if expire_interval is not None else float(os.getenv("RATE_LIMIT_EXPIRE_SECONDS", "300"))
+        self._next_expiry = 0.0
+        self.errors = 0
+    
+    def check_rate_limit(self, user_id: int, action_type: str, now: float = None) -> Tuple[bool, int]:
+        limit = self._limit(action_type)
+        if limit is None:
+            return True, 0
+        
+        max_actions, time_window = limit
+        interval = time_window / max_actions
+        if now is None:
+            now = time.time()
+        
+        try:
+            wait = self.db.take_rate_limit(user_id, action_type, now, interval, time_window - interval)
+            if now >= self._next_expiry:
+                self._next_expiry = now + self.expire_interval
+                self.expired_keys += self.db.delete_idle_rate_limits(now)
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"❌ Rate limit check failed for user {user_id} ({action_type}), allowing: {e}")
+            return True, 0
+        
+        return self._result(user_id, action_type, wait)
+    
+    async def check_async(self, user_id: int, action_type: str) -> Tuple[bool, int]:
+        return await self.async_db.run(self.check_rate_limit, user_id, action_type)
+    
+    def reset_user(self, user_id: int, action_type: str = None):
+        self.db.reset_rate_limits(user_id, action_type)
+        logger.info(f"Rate limit reset for user {user_id}, action: {action_type or 'all'}")
+    
+    def cleanup_old_data(self, now: float = None) -> int:
+        removed = self.db.delete_idle_rate_limits(time.time() if now is None else now)
+        self.expired_keys += removed
+        if removed:
+            logger.info(f"Cleaned up {removed} idle rate limiter keys")
+        return removed
+    
+    def stats(self) -> Dict:
+        stats = super().stats()
+        stats['errors'] = self.errors
+        return stats
+
+# Global rate limiter instance (replaced by get_rate_limiter(db) for the database backend)
+rate_limiter: RateLimiter = MemoryRateLimiter()
+_rate_limiter_lock = threading.Lock()
+
+def get_rate_limiter(db=None) -> RateLimiter:
+    """
+    Return the limiter selected by RATE_LIMIT_BACKEND
+    
+    The database backend is created by the first call that passes a
+    CounselingDatabase (hu_counseling_bot does at import); until then, and
+    for the memory backend, the in-process limiter is returned.
+    """
+    global rate_limiter
+    if db is not None and RATE_LIMIT_BACKEND == 'database' and not isinstance(rate_limiter, SQLRateLimiter):
+        with _rate_limiter_lock:
+            if not isinstance(rate_limiter, SQLRateLimiter):
+                rate_limiter = SQLRateLimiter(db)
+                logger.info("🚦 Rate limits are shared through the database")
+    elif RATE_LIMIT_BACKEND not in BACKENDS:
+        logger.warning(f"Unknown RATE_LIMIT_BACKEND '{RATE_LIMIT_BACKEND}', using memory (expected one of {BACKENDS})")
+    return rate_limiter
 
 # Decorator for rate limiting
-def rate_limit(action_type: str):
+def rate_limit(action_type: str, exempt_user_ids: Iterable[int] = ()):
     """
     Decorator to add rate limiting to handler functions
     
+    exempt_user_ids (e.g. ADMIN_IDS, as for RateLimitGate) are never charged.
+    
     Usage:
         @rate_limit('message')
         async def handle_message(update, context):
             ...
     """
+    exempt = frozenset(exempt_user_ids)
+    
     def decorator(func):
+        @functools.wraps(func)
         async def wrapper(update, context, *args, **kwargs):
             user_id = update.effective_user.id
+            if user_id in exempt:
+                return await func(update, context, *args, **kwargs)
             
-            allowed, seconds_until_reset = rate_limiter.check_rate_limit(user_id, action_type)
+            limiter = get_rate_limiter()
+            allowed, seconds_until_reset = await limiter.check_async(user_id, action_type)
             
             if not allowed:
                 # User exceeded rate limit
@@ -155,18 +358,3 @@ def rate_limit(action_type: str):
         
         return wrapper
     return decorator
-
-# Example usage:
-"""
-from rate_limiter import rate_limit, rate_limiter
-
-@rate_limit('message')
-async def handle_session_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    # Your message handling code
-    ...
-
-@rate_limit('session_request')
-async def request_counseling(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    # Your session request code
-    ...
-"""
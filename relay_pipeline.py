@@ -0,0 +1,168 @@
+"""
+Message Relay Pipeline for HU Counseling Service Bot
+Forwards session chat messages to Telegram while the journal persists them,
+and retries deliveries that failed
+"""
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import deque
+from typing import Dict, Optional
+
+from telegram.error import BadRequest, Forbidden, RetryAfter
+
+from message_journal import MessageJournal
+
+logger = logging.getLogger(__name__)
+
+# Delivery states stored in session_messages.delivery_status
+QUEUED = 'queued'
+SENT = 'sent'
+FAILED = 'failed'
+
+
+class RelayPipeline:
+    """
+    Persist-and-forward for chat messages
+
+    relay() queues the message in the MessageJournal (no database wait) and
+    sends it to the other party straight away, so relay latency is the
+    Telegram call alone. Pass the Bot itself, not the OutboundDispatcher: its
+    per-chat bucket would add waits and its coalescing would merge two
+    Markdown messages into one send that fails or succeeds for both. The row
+    starts as 'queued' and is marked 'sent' or 'failed' once the send settles.
+
+    Transient failures (timeouts, network errors, flood control) go to a
+    bounded in-memory retry queue processed by start(); permanent ones
+    (bot blocked, bad request) are marked failed at once. A delivery still
+    waiting when the bot stops (stop()) stays 'queued' in the database.
+    """
+
+    def __init__(self, journal: MessageJournal, max_attempts: int = None, retry_interval: float = None,
+                 max_queue: int = None):
+        self.journal = journal
+        self.max_attempts = max_attempts if max_attempts is not None else int(os.getenv("RELAY_MAX_ATTEMPTS", "5"))
+        self.retry_interval = retry_interval if retry_interval is not None else float(os.getenv("RELAY_RETRY_INTERVAL", "5"))
+        self.max_queue = max_queue if max_queue is not None else int(os.getenv("RELAY_RETRY_QUEUE_MAX", "1000"))
+        self._retry_queue = deque()
+        self.is_running = False
+
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+
+    # ==================== RELAY ====================
+
+    async def relay(self, bot, session_id: int, sender_role: str, sender_id: int, message_text: str,
+                    chat_id: Optional[int], text: str, parse_mode: str = 'Markdown') -> bool:
+        """
+        Persist message_text for the session and forward text to chat_id
+
+        Returns: True if Telegram accepted the message now (False means it was
+        queued for retry or failed permanently)
+        """
+        relay_key = uuid.uuid4().hex
+        self.journal.append(session_id, sender_role, sender_id, message_text,
+                            relay_key=relay_key, delivery_status=QUEUED)
+
+        item = {
+            'relay_key': relay_key,
+            'session_id': session_id,
+            'chat_id': chat_id,
+            'text': text,
+            'parse_mode': parse_mode,
+            'attempts': 0,
+            'next_attempt': 0.0,
+        }
+        return await self._deliver(bot, item)
+
+    async def _deliver(self, bot, item: Dict) -> bool:
+        item['attempts'] += 1
+        if item['chat_id'] is None:
+            self._settle(item, FAILED, "no recipient")
+            return False
+
+        try:
+            await bot.send_message(chat_id=item['chat_id'], text=item['text'], parse_mode=item['parse_mode'])
+        except RetryAfter as e:
+            retry_after = e.retry_after.total_seconds() if hasattr(e.retry_after, 'total_seconds') else e.retry_after
+            self._schedule_retry(item, float(retry_after), e)
+            return False
+        except (Forbidden, BadRequest) as e:
+            self._settle(item, FAILED, e)
+            return False
+        except Exception as e:
+            self._schedule_retry(item, self.retry_interval * (2 ** (item['attempts'] - 1)), e)
+            return False
+
+        self._settle(item, SENT)
+        return True
+
+    def _settle(self, item: Dict, status: str, error=None):
+        self.journal.set_delivery_status(item['relay_key'], status)
+        if status == SENT:
+            self.sent += 1
+        else:
+            self.failed += 1
+            logger.error(f"❌ Message for session {item['session_id']} not delivered "
+                         f"after {item['attempts']} attempt(s): {error}")
+
+    def _schedule_retry(self, item: Dict, delay: float, error):
+        if item['attempts'] >= self.max_attempts:
+            self._settle(item, FAILED, error)
+            return
+        if len(self._retry_queue) >= self.max_queue:
+            self._settle(self._retry_queue.popleft(), FAILED, "retry queue full")
+        item['next_attempt'] = time.monotonic() + delay
+        self._retry_queue.append(item)
+        logger.warning(f"⚠️ Delivery for session {item['session_id']} failed ({error}), "
+                       f"retrying in {delay:.1f}s (attempt {item['attempts']}/{self.max_attempts})")
+
+    # ==================== RETRIES ====================
+
+    async def retry_failed(self, bot) -> int:
+        """Retry every delivery that is due; returns how many went through"""
+        now = time.monotonic()
+        due = [item for item in self._retry_queue if item['next_attempt'] <= now]
+        if not due:
+            return 0
+        self._retry_queue = deque(item for item in self._retry_queue if item['next_attempt'] > now)
+
+        delivered = 0
+        for item in due:
+            self.retried += 1
+            if await self._deliver(bot, item):
+                delivered += 1
+        if delivered:
+            logger.info(f"✅ Redelivered {delivered}/{len(due)} queued messages")
+        return delivered
+
+    async def start(self, bot):
+        """Start the retry loop"""
+        self.is_running = True
+        logger.info(f"Relay retry loop started (every {self.retry_interval}s, max {self.max_attempts} attempts)")
+
+        while self.is_running:
+            try:
+                await self.retry_failed(bot)
+            except Exception as e:
+                logger.error(f"Error in relay retry loop: {e}")
+            await asyncio.sleep(self.retry_interval)
+
+    async def stop(self):
+        """Stop the retry loop"""
+        self.is_running = False
+        if self._retry_queue:
+            logger.warning(f"Relay stopped with {len(self._retry_queue)} deliveries still queued")
+        logger.info("Relay retry loop stopped")
+
+    def stats(self) -> Dict:
+        return {
+            'sent': self.sent,
+            'failed': self.failed,
+            'retried': self.retried,
+            'retry_queue': len(self._retry_queue),
+        }
@@ -0,0 +1,213 @@
+"""
+Message Routing Cache for HU Counseling Service Bot
+Remembers who each user is and which session their messages go to, so
+relaying a chat message does not have to query the database
+"""
+
+import logging
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from counseling_database import CounselingDatabase
+
+logger = logging.getLogger(__name__)
+
+
+class RoutingCache:
+    """
+    Per-user routing entries with a TTL and write-through invalidation
+
+    An entry holds the user's context (see CounselingDatabase.get_user_context),
+    the open sessions of an approved counselor, and the Telegram id of the
+    counselor serving the user's own active session. Entries are dropped as
+    soon as a CounselingDatabase write event touches them: counselor
+    registration, approval/deactivation/ban, profile edits, and session
+    match/start/end/release (transfers are a release plus a match).
+
+    The TTL only bounds staleness from writes made by other processes.
+    Entries are shared - treat them as read-only.
+    """
+
+    def __init__(self, db: CounselingDatabase, ttl: float = None, max_entries: int = None):
+        self.db = db
+        self.ttl = ttl if ttl is not None else float(os.getenv("ROUTING_CACHE_TTL", "300"))
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("ROUTING_CACHE_MAX_USERS", "10000"))
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, Dict]" = OrderedDict()  # user_id -> route (LRU order)
+        self._counselor_users: Dict[int, int] = {}               # counselor_id -> user_id
+
+        # While loads are in flight: the event sequence number at which each
+        # user / counselor was last written, so a load only skips caching when
+        # its own user changed underneath it
+        self._seq = 0
+        self._loading = 0
+        self._cleared_at = 0
+        self._touched_users: Dict[int, int] = {}
+        self._touched_counselors: Dict[int, int] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+        db.add_listener(self.handle_event)
+
+    # ==================== LOOKUPS ====================
+
+    def lookup(self, user_id: int) -> Optional[Dict]:
+        """Cached route, or None on a miss (never touches the database)"""
+        with self._lock:
+            route = self._entries.get(user_id)
+            if route is None or route['expires_at'] <= time.monotonic():
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return route
+
+    def load(self, user_id: int) -> Dict:
+        """
+        Read a user's route from the database and cache it
+
+        Blocking - call through AsyncCounselingDatabase.run() from handlers.
+        Returns: {'user_id', 'context', 'counselor_sessions', 'counselor_user_id'}
+        """
+        with self._lock:
+            self._loading += 1
+            started_at = self._seq
+
+        try:
+            context = self.db.get_user_context(user_id)
+            counselor_sessions = []
+            if context['is_counselor']:
+                counselor_sessions = self.db.get_active_sessions_by_counselor(context['counselor']['counselor_id'])
+
+            counselor_user_id = None
+            session = context['active_session']
+            if session and session.get('counselor_id'):
+                partner = self.db.get_counselor(session['counselor_id'])
+                counselor_user_id = partner['user_id'] if partner else None
+        except Exception:
+            with self._lock:
+                self._load_done()
+            raise
+
+        route = {
+            'user_id': user_id,
+            'context': context,
+            'counselor_sessions': counselor_sessions,
+            'counselor_user_id': counselor_user_id,
+            'expires_at': time.monotonic() + self.ttl,
+        }
+
+        with self._lock:
+            counselor_id = context['counselor']['counselor_id'] if context['counselor'] else None
+            stale = (self._cleared_at > started_at
+                     or self._touched_users.get(user_id, 0) > started_at
+                     or self._touched_counselors.get(counselor_id, 0) > started_at)
+            self._load_done()
+            # A write to this user landed while we were reading: serve this
+            # result once but don't cache it, the next lookup will reload
+            if not stale:
+                self._entries[user_id] = route
+                self._entries.move_to_end(user_id)
+                if context['counselor']:
+                    self._counselor_users[context['counselor']['counselor_id']] = user_id
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return route
+
+    def get_route(self, user_id: int) -> Dict:
+        """Cached route, loading it on a miss (blocking)"""
+        return self.lookup(user_id) or self.load(user_id)
+
+    async def get_route_async(self, user_id: int, async_db) -> Dict:
+        """Cached route; a miss is loaded on the database executor"""
+        route = self.lookup(user_id)
+        if route is None:
+            route = await async_db.run(self.load, user_id)
+        return route
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._invalidate(user_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._counselor_users.clear()
+            self._seq += 1
+            self._cleared_at = self._seq
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'invalidations': self.invalidations,
+            }
+
+    # ==================== INVALIDATION ====================
+
+    def handle_event(self, event: str, **payload):
+        """CounselingDatabase listener"""
+        counselor_id = payload.get('counselor_id')
+        user_id = payload.get('user_id')
+
+        with self._lock:
+            if event == 'counselor_registered':
+                self._counselor_users[counselor_id] = user_id
+                self._invalidate(user_id)
+                self._touch_counselor(counselor_id)
+
+            elif event in ('counselor_status_changed', 'counselor_updated'):
+                self._invalidate(self._counselor_users.get(counselor_id))
+                self._touch_counselor(counselor_id)
+
+            elif event in ('session_matched', 'session_started', 'session_ended', 'session_released'):
+                # Both ends of the session route differently now
+                self._invalidate(user_id)
+                self._invalidate(self._counselor_users.get(counselor_id))
+                self._touch_counselor(counselor_id)
+
+    def _invalidate(self, user_id: Optional[int]):
+        if user_id is None:
+            return
+        if self._loading:
+            self._seq += 1
+            self._touched_users[user_id] = self._seq
+        if self._entries.pop(user_id, None) is not None:
+            self.invalidations += 1
+
+    def _touch_counselor(self, counselor_id: Optional[int]):
+        """Catch loads of a counselor not mapped to a user yet (caller holds the lock)"""
+        if counselor_id is not None and self._loading:
+            self._seq += 1
+            self._touched_counselors[counselor_id] = self._seq
+
+    def _load_done(self):
+        """Forget write marks once no load can still be using them (caller holds the lock)"""
+        self._loading -= 1
+        if not self._loading:
+            self._touched_users.clear()
+            self._touched_counselors.clear()
+
+
+_caches = weakref.WeakKeyDictionary()
+_caches_lock = threading.Lock()
+
+
+def get_routing_cache(db: CounselingDatabase) -> RoutingCache:
+    """Return the shared RoutingCache for a database instance"""
+    with _caches_lock:
+        cache = _caches.get(db)
+        if cache is None:
+            cache = RoutingCache(db)
+            _caches[db] = cache
+        return cache
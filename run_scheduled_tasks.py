@@ -7,7 +7,7 @@ Can be used for testing or manual execution
 import asyncio
 import logging
 from counseling_database import CounselingDatabase
-from scheduled_tasks import ScheduledTasksManager
+from scheduled_tasks import ScheduledTasksManager, close_shared_bot
 from matching_system import CounselingMatcher
 
 # Set up logging
@@ -33,31 +33,8 @@ async def run_manual_session_cleanup():
     
     # Clean up old ended sessions (older than 30 days)
     from datetime import datetime, timedelta
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    ph = db.param_placeholder
-    
     thirty_days_ago = datetime.now() - timedelta(days=30)
-    
-    cursor.execute(f'''
-        DELETE FROM session_messages 
-        WHERE session_id IN (
-            SELECT session_id FROM counseling_sessions 
-            WHERE status = 'ended' AND ended_at < {ph}
-        )
-    ''', (thirty_days_ago.isoformat(),))
-    
-    deleted_messages = cursor.rowcount
-    
-    cursor.execute(f'''
-        DELETE FROM counseling_sessions 
-        WHERE status = 'ended' AND ended_at < {ph}
-    ''', (thirty_days_ago.isoformat(),))
-    
-    deleted_sessions = cursor.rowcount
-    
-    conn.commit()
-    conn.close()
+    deleted_sessions, deleted_messages = db.delete_ended_sessions_before(thirty_days_ago)
     
     logger.info(f"✅ Cleaned up {deleted_sessions} old sessions and {deleted_messages} messages")
 
@@ -72,11 +49,39 @@ async def run_manual_auto_match():
     
     if matched_pairs:
         logger.info(f"✅ Auto-matched {len(matched_pairs)} pending sessions")
-        for session_id, counselor_id in matched_pairs:
-            logger.info(f"  Session {session_id} -> Counselor {counselor_id}")
+        # Notify counselors over one shared client
+        try:
+            await ScheduledTasksManager(db).notify_matches(matched_pairs)
+        finally:
+            await close_shared_bot()
     else:
         logger.info("ℹ️ No pending sessions to match")
 
+async def run_manual_stats_reconcile():
+    """Manually recount the statistics counters"""
+    logger.info("Running manual statistics reconcile...")
+    db = CounselingDatabase()
+    
+    drift = db.reconcile_stats()
+    for stat_name, (stored, actual) in drift.items():
+        logger.info(f"  {stat_name}: {stored} -> {actual}")
+    logger.info(f"✅ Statistics reconciled ({len(drift)} counters repaired)")
+
+async def run_manual_rollups(export_path: str = None):
+    """Manually update the analytics rollups, optionally exporting the daily rows as CSV"""
+    logger.info("Running manual analytics rollup...")
+    db = CounselingDatabase()
+    
+    from analytics_rollups import get_session_rollups
+    rollups = get_session_rollups(db)
+    result = rollups.run()
+    logger.info(f"✅ Rolled up {result['sessions']} sessions into {result['buckets']} buckets")
+    
+    if export_path:
+        with open(export_path, 'w', newline='') as f:
+            f.write(rollups.export_csv('day'))
+        logger.info(f"✅ Daily rollups exported to {export_path}")
+
 async def run_all_tasks():
     """Run all scheduled tasks manually"""
     logger.info("Running all scheduled tasks...")
@@ -84,6 +89,8 @@ async def run_all_tasks():
     await run_manual_backup()
     await run_manual_session_cleanup()
     await run_manual_auto_match()
+    await run_manual_stats_reconcile()
+    await run_manual_rollups()
     
     logger.info("✅ All scheduled tasks completed")
 
@@ -98,9 +105,13 @@ if __name__ == "__main__":
             asyncio.run(run_manual_session_cleanup())
         elif task == "match":
             asyncio.run(run_manual_auto_match())
+        elif task == "stats":
+            asyncio.run(run_manual_stats_reconcile())
+        elif task == "rollups":
+            asyncio.run(run_manual_rollups(sys.argv[2] if len(sys.argv) > 2 else None))
         elif task == "all":
             asyncio.run(run_all_tasks())
         else:
-            print(f"Usage: python run_scheduled_tasks.py [backup|cleanup|match|all]")
+            print(f"Usage: python run_scheduled_tasks.py [backup|cleanup|match|stats|rollups [export.csv]|all]")
     else:
-        print(f"Usage: python run_scheduled_tasks.py [backup|cleanup|match|all]")
\ No newline at end of file
+        print(f"Usage: python run_scheduled_tasks.py [backup|cleanup|match|stats|rollups [export.csv]|all]")
\ No newline at end of file
@@ -10,19 +10,71 @@ import os
 from backup_database import backup_database
 from counseling_database import CounselingDatabase
 from matching_system import CounselingMatcher
+from async_database import get_async_database
+from counselor_index import get_counselor_index
+from analytics_rollups import get_session_rollups
+from counseling_database import COUNSELING_TOPICS
 
 logger = logging.getLogger(__name__)
 
+# Notifications sent at once by the scheduled tasks
+NOTIFY_CONCURRENCY = int(os.getenv("NOTIFY_CONCURRENCY", "8"))
+
+# ==================== SHARED BOT CLIENT ====================
+
+_shared_bot = None
+_shared_bot_lock = asyncio.Lock()
+
+
+async def get_shared_bot():
+    """
+    One Bot (and one pooled, keep-alive HTTP client) for standalone runs
+    
+    Inside the bot process the scheduled tasks use the Application's bot
+    instead; this is for run_scheduled_tasks.py and other scripts.
+    Returns None if BOT_TOKEN is not set.
+    """
+    global _shared_bot
+    async with _shared_bot_lock:
+        if _shared_bot is None:
+            bot_token = os.getenv('BOT_TOKEN')
+            if not bot_token:
+                return None
+            from telegram import Bot
+            from telegram.request import HTTPXRequest
+            bot = Bot(token=bot_token, request=HTTPXRequest(connection_pool_size=NOTIFY_CONCURRENCY))
+            await bot.initialize()
+            _shared_bot = bot
+        return _shared_bot
+
+
+async def close_shared_bot():
+    """Close the standalone client's connections"""
+    global _shared_bot
+    async with _shared_bot_lock:
+        if _shared_bot is not None:
+            await _shared_bot.shutdown()
+            _shared_bot = None
+
 class ScheduledTasksManager:
     """
     Manages all scheduled/background tasks for the bot
     Runs continuously in the background
     """
     
-    def __init__(self, db: CounselingDatabase):
+    def __init__(self, db: CounselingDatabase, bot=None):
+        """
+        Args:
+            db: Database instance
+            bot: Anything with Bot.send_message (the Application's bot or the
+                 outbound dispatcher); defaults to the shared standalone client
+        """
         self.db = db
+        self.async_db = get_async_database(db)
+        self.bot = bot
         self.is_running = False
         self.tasks = []
+        self._notify_semaphore = asyncio.Semaphore(NOTIFY_CONCURRENCY)
         
     async def start(self):
         """Start all scheduled tasks"""
@@ -34,6 +86,9 @@ class ScheduledTasksManager:
             asyncio.create_task(self.database_backup_task()),
             asyncio.create_task(self.session_cleanup_task()),
             asyncio.create_task(self.pending_session_auto_match_task()),
+            asyncio.create_task(self.counselor_index_refresh_task()),
+            asyncio.create_task(self.stats_reconcile_task()),
+            asyncio.create_task(self.analytics_rollup_task()),
         ]
         
         # Wait for all tasks (they should run indefinitely)
@@ -64,7 +119,7 @@ class ScheduledTasksManager:
         while self.is_running:
             try:
                 # Perform backup
-                backup_path = backup_database(self.db.db_path)
+                backup_path = await self.async_db.run(backup_database, self.db.db_path)
                 if backup_path:
                     logger.info(f"Database backed up to: {backup_path}")
                 else:
@@ -88,35 +143,17 @@ class ScheduledTasksManager:
         while self.is_running:
             try:
                 # Clean up old ended sessions (older than 30 days)
-                conn = self.db.get_connection()
-                cursor = conn.cursor()
-                ph = self.db.param_placeholder
-                
                 thirty_days_ago = datetime.now() - timedelta(days=30)
-                
-                cursor.execute(f'''
-                    DELETE FROM session_messages 
-                    WHERE session_id IN (
-                        SELECT session_id FROM counseling_sessions 
-                        WHERE status = 'ended' AND ended_at < {ph}
-                    )
-                ''', (thirty_days_ago.isoformat(),))
-                
-                deleted_messages = cursor.rowcount
-                
-                cursor.execute(f'''
-                    DELETE FROM counseling_sessions 
-                    WHERE status = 'ended' AND ended_at < {ph}
-                ''', (thirty_days_ago.isoformat(),))
-                
-                deleted_sessions = cursor.rowcount
-                
-                conn.commit()
-                conn.close()
+                deleted_sessions, deleted_messages = await self.async_db.delete_ended_sessions_before(thirty_days_ago)
                 
                 if deleted_sessions > 0 or deleted_messages > 0:
                     logger.info(f"Cleaned up {deleted_sessions} old sessions and {deleted_messages} messages")
                 
+                # Drop abandoned conversation flows (only written in the database state backend)
+                deleted_states = await self.async_db.delete_expired_conversation_states()
+                if deleted_states > 0:
+                    logger.info(f"Cleaned up {deleted_states} expired conversation states")
+                
                 # Wait for next interval
                 await asyncio.sleep(cleanup_interval * 60)  # Convert minutes to seconds
                 
@@ -128,65 +165,26 @@ class ScheduledTasksManager:
                 await asyncio.sleep(300)  # Wait 5 minutes before retrying
     
     async def pending_session_auto_match_task(self):
-        """Automatically match pending sessions with available counselors"""
-        match_interval = int(os.getenv("MATCH_INTERVAL_MINUTES", "5"))  # Default: 5 minutes
+        """
+        Safety-net sweep over all pending sessions
+        
+        Matching normally happens within seconds through MatchingEventBus; this
+        catches what it cannot see (writes from other processes, failed passes).
+        """
+        match_interval = int(os.getenv("MATCH_INTERVAL_MINUTES", "15"))  # Default: 15 minutes
         logger.info(f"Pending session auto-match task started (interval: {match_interval} minutes)")
         
         matcher = CounselingMatcher(self.db)
         
         while self.is_running:
             try:
-                # Auto-match pending sessions
-                matched_pairs = matcher.auto_match_pending_sessions()
+                # Pick up requests written by other processes, then auto-match
+                await self.async_db.run(matcher.queue.rebuild)
+                matched_pairs = await self.async_db.run(matcher.auto_match_pending_sessions)
                 
                 if matched_pairs:
                     logger.info(f"Auto-matched {len(matched_pairs)} pending sessions")
-                    for session_id, counselor_id in matched_pairs:
-                        logger.info(f"  Session {session_id} -> Counselor {counselor_id}")
-                        
-                        # Notify counselor of new match
-                        try:
-                            session = self.db.get_session(session_id)
-                            counselor = self.db.get_counselor(counselor_id)
-                            
-                            if session and counselor:
-                                from telegram import Bot
-                                
-                                bot_token = os.getenv('BOT_TOKEN')
-                                if bot_token:
-                                    bot = Bot(token=bot_token)
-                                    
-                                    # Get session details
-                                    from counseling_database import COUNSELING_TOPICS
-                                    topic_data = COUNSELING_TOPICS.get(session['topic'], {})
-                                    
-                                    # Send notification to counselor
-                                    keyboard = [[
-                                        {"text": "✅ Accept Session", "callback_data": f"accept_session_{session_id}"},
-                                        {"text": "❌ Decline", "callback_data": f"decline_session_{session_id}"}
-                                    ]]
-                                    
-                                    # Get user's gender
-                                    user_data = self.db.get_user(session['user_id'])
-                                    user_gender = user_data.get('gender', 'anonymous') if user_data else 'anonymous'
-                                    gender_display = {
-                                        'male': '👨 Male',
-                                        'female': '👩 Female',
-                                        'anonymous': '🔒 Anonymous'
-                                    }.get(user_gender, '🔒 Anonymous')
-
-                                    await bot.send_message(
-                                        chat_id=counselor['user_id'],
-                                        text=f"**🔔 New Counseling Request**\n\n"
-                                             f"**Topic:** {topic_data.get('icon', '💬')} {topic_data.get('name', session['topic'])}\n"
-                                             f"**User Gender:** {gender_display}\n"
-                                             f"**Description:** {session.get('description', 'No description provided')[:100]}{'...' if len(session.get('description', '')) > 100 else ''}\n\n"
-                                             f"Would you like to accept this session?",
-                                        reply_markup={"inline_keyboard": keyboard},
-                                        parse_mode='Markdown'
-                                    )
-                        except Exception as notify_error:
-                            logger.error(f"Failed to notify counselor {counselor_id} about session {session_id}: {notify_error}")
+                    await self.notify_matches(matched_pairs)
                 
                 # Wait for next interval
                 await asyncio.sleep(match_interval * 60)  # Convert minutes to seconds
@@ -198,15 +196,126 @@ class ScheduledTasksManager:
                 logger.error(f"Error in pending session auto-match task: {e}")
                 await asyncio.sleep(300)  # Wait 5 minutes before retrying
 
+    async def notify_matches(self, matched_pairs):
+        """Tell counselors about their new sessions, NOTIFY_CONCURRENCY at a time"""
+        bot = self.bot or await get_shared_bot()
+        if bot is None:
+            logger.warning("BOT_TOKEN not set - skipping match notifications")
+            return
+        
+        results = await asyncio.gather(
+            *(self._notify_match(bot, session_id, counselor_id) for session_id, counselor_id in matched_pairs),
+            return_exceptions=True
+        )
+        for (session_id, counselor_id), result in zip(matched_pairs, results):
+            if isinstance(result, Exception):
+                logger.error(f"Failed to notify counselor {counselor_id} about session {session_id}: {result}")
+    
+    async def _notify_match(self, bot, session_id: int, counselor_id: int):
+        async with self._notify_semaphore:
+            logger.info(f"  Session {session_id} -> Counselor {counselor_id}")
+            session = await self.async_db.get_session(session_id)
+            counselor = await self.async_db.get_counselor(counselor_id)
+            if not session or not counselor:
+                return
+            
+            topic_data = COUNSELING_TOPICS.get(session['topic'], {})
+            
+            # Send notification to counselor
+            keyboard = [[
+                {"text": "✅ Accept Session", "callback_data": f"accept_session_{session_id}"},
+                {"text": "❌ Decline", "callback_data": f"decline_session_{session_id}"}
+            ]]
+            
+            # Get user's gender
+            user_data = await self.async_db.get_user(session['user_id'])
+            user_gender = user_data.get('gender', 'anonymous') if user_data else 'anonymous'
+            gender_display = {
+                'male': '👨 Male',
+                'female': '👩 Female',
+                'anonymous': '🔒 Anonymous'
+            }.get(user_gender, '🔒 Anonymous')
+            
+            description = session.get('description') or 'No description provided'
+            await bot.send_message(
+                chat_id=counselor['user_id'],
+                text=f"**🔔 New Counseling Request**\n\n"
+                     f"**Topic:** {topic_data.get('icon', '💬')} {topic_data.get('name', session['topic'])}\n"
+                     f"**User Gender:** {gender_display}\n"
+                     f"**Description:** {description[:100]}{'...' if len(description) > 100 else ''}\n\n"
+                     f"Would you like to accept this session?",
+                reply_markup={"inline_keyboard": keyboard},
+                parse_mode='Markdown'
+            )
+    
+    async def counselor_index_refresh_task(self):
+        """Rebuild the in-memory counselor index to pick up writes from other processes"""
+        refresh_interval = int(os.getenv("COUNSELOR_INDEX_REFRESH_MINUTES", "10"))  # Default: 10 minutes
+        logger.info(f"Counselor index refresh task started (interval: {refresh_interval} minutes)")
+        
+        index = get_counselor_index(self.db)
+        
+        while self.is_running:
+            try:
+                await asyncio.sleep(refresh_interval * 60)  # Convert minutes to seconds
+                await self.async_db.run(index.rebuild)
+                
+            except asyncio.CancelledError:
+                logger.info("Counselor index refresh task cancelled")
+                break
+            except Exception as e:
+                logger.error(f"Error in counselor index refresh task: {e}")
+                await asyncio.sleep(300)  # Wait 5 minutes before retrying
+
+    async def stats_reconcile_task(self):
+        """Recount the bot_stats counters to repair drift from writes made outside CounselingDatabase"""
+        reconcile_interval = int(os.getenv("STATS_RECONCILE_MINUTES", "60"))  # Default: 1 hour
+        logger.info(f"Statistics reconcile task started (interval: {reconcile_interval} minutes)")
+        
+        while self.is_running:
+            try:
+                await asyncio.sleep(reconcile_interval * 60)  # Convert minutes to seconds
+                drift = await self.async_db.reconcile_stats()
+                if drift:
+                    logger.warning(f"Repaired {len(drift)} drifted statistics counters: {drift}")
+                
+            except asyncio.CancelledError:
+                logger.info("Statistics reconcile task cancelled")
+                break
+            except Exception as e:
+                logger.error(f"Error in statistics reconcile task: {e}")
+                await asyncio.sleep(300)  # Wait 5 minutes before retrying
+
+    async def analytics_rollup_task(self):
+        """Fold new session activity into the hourly/daily analytics rollups"""
+        rollup_interval = int(os.getenv("ROLLUP_INTERVAL_MINUTES", "60"))  # Default: 1 hour
+        logger.info(f"Analytics rollup task started (interval: {rollup_interval} minutes)")
+        
+        rollups = get_session_rollups(self.db)
+        
+        while self.is_running:
+            try:
+                await self.async_db.run(rollups.run)
+                
+                # Wait for next interval
+                await asyncio.sleep(rollup_interval * 60)  # Convert minutes to seconds
+                
+            except asyncio.CancelledError:
+                logger.info("Analytics rollup task cancelled")
+                break
+            except Exception as e:
+                logger.error(f"Error in analytics rollup task: {e}")
+                await asyncio.sleep(300)  # Wait 5 minutes before retrying
+
 # Integration example
 """
 To integrate this with your bot, add this to the post_init function in main_counseling_bot.py:
 
 async def post_init(application):
     
-    # Start scheduled tasks manager
+    # Start scheduled tasks manager (notifications reuse the running bot)
     from scheduled_tasks import ScheduledTasksManager
-    scheduled_tasks_manager = ScheduledTasksManager(db)
+    scheduled_tasks_manager = ScheduledTasksManager(db, bot=application.bot)
     application.bot_data['scheduled_tasks_manager'] = scheduled_tasks_manager
     asyncio.create_task(scheduled_tasks_manager.start())
     logger.info("✅ Scheduled tasks manager started")
@@ -0,0 +1,182 @@
+"""
+Vectorized Counselor Scoring for HU Counseling Service Bot
+Computes CounselingMatcher scores for many counselors (and many sessions)
+at once with NumPy (in requirements.txt); without it every score goes
+through the per-counselor scorer, which is logged once at import
+"""
+
+import logging
+from typing import Dict, List, Sequence, Tuple
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:  # Optional dependency
+    np = None
+    HAS_NUMPY = False
+
+logger = logging.getLogger(__name__)
+
+if not HAS_NUMPY:
+    logger.warning("NumPy is not installed - batch matching uses the scalar scorer")
+
+CRISIS_PRIORITY = 10
+CRISIS_SPECIALIZATIONS = ('crisis_substance', 'mental_emotional')
+
+
+class ScoringEngine:
+    """
+    Batch version of CounselingMatcher._calculate_counselor_score
+
+    Each scoring term (specialization, load, rating, experience, crisis) is
+    computed as an array over all candidates and added in the same order as
+    the scalar scorer, so scores are bit-for-bit identical. score_matrix()
+    scores every session against every counselor in one go for batch matching.
+    """
+
+    def __init__(self, scalar_scorer, use_numpy: bool = None):
+        """
+        Args:
+            scalar_scorer: fn(counselor, topic, priority) -> float, used when NumPy is unavailable
+            use_numpy: force (True) or disable (False) NumPy; default uses it when installed
+        """
+        self.scalar_scorer = scalar_scorer
+        self.use_numpy = HAS_NUMPY if use_numpy is None else (use_numpy and HAS_NUMPY)
+
+    # ==================== SINGLE SESSION ====================
+
+    def score_counselors(self, counselors: Sequence[Dict], topic: str, priority: int) -> List[float]:
+        """
+        Score every counselor for one session
+
+        Always scalar: building the feature arrays costs as much as scoring
+        the row directly, so vectorizing only pays off across many sessions.
+        """
+        return [self.scalar_scorer(c, topic, priority) for c in counselors]
+
+    # ==================== SESSIONS x COUNSELORS ====================
+
+    def score_matrix(self, sessions: Sequence[Dict], counselors: Sequence[Dict]):
+        """
+        Score all sessions against all counselors
+
+        Returns: (scores, eligible) - row per session, column per counselor.
+        eligible marks counselors specialized in the session's topic. NumPy
+        arrays when available, otherwise nested lists.
+        """
+        if self.use_numpy:
+            return self._matrix(sessions, counselors)
+
+        scores, eligible = [], []
+        for session in sessions:
+            topic = session['topic']
+            priority = session.get('priority', 0)
+            scores.append([self.scalar_scorer(c, topic, priority) for c in counselors])
+            eligible.append([topic in c.get('specializations', []) for c in counselors])
+        return scores, eligible
+
+    def assign(self, sessions: Sequence[Dict], counselors: Sequence[Dict],
+               capacity: Sequence[int], load_penalty: float) -> List[Tuple[int, int]]:
+        """
+        Greedy assignment in session order (caller sorts by priority)
+
+        Each session takes the highest-scoring eligible counselor with capacity
+        left; ties go to the earlier counselor. Every assignment lowers that
+        counselor's score by load_penalty for the rest of the pass.
+        Returns: list of (session_id, counselor_id)
+        """
+        if not sessions or not counselors:
+            return []
+
+        scores, eligible = self.score_matrix(sessions, counselors)
+        counselor_ids = [c['counselor_id'] for c in counselors]
+        assignments = []
+
+        if self.use_numpy:
+            remaining = np.asarray(capacity, dtype=np.int64).copy()
+            batch_load = np.zeros(len(counselors), dtype=np.float64)
+            for i, session in enumerate(sessions):
+                allowed = eligible[i] & (remaining > 0)
+                if not allowed.any():
+                    continue
+                row = np.where(allowed, scores[i] - batch_load * load_penalty, -np.inf)
+                j = int(np.argmax(row))  # first maximum, like the scalar loop
+                remaining[j] -= 1
+                batch_load[j] += 1
+                assignments.append((session['session_id'], counselor_ids[j]))
+            return assignments
+
+        remaining = list(capacity)
+        batch_load = [0] * len(counselors)
+        for i, session in enumerate(sessions):
+            best_j, best_score = None, None
+            for j in range(len(counselors)):
+                if remaining[j] <= 0 or not eligible[i][j]:
+                    continue
+                score = scores[i][j] - batch_load[j] * load_penalty
+                if best_score is None or score > best_score:
+                    best_j, best_score = j, score
+            if best_j is None:
+                continue
+            remaining[best_j] -= 1
+            batch_load[best_j] += 1
+            assignments.append((session['session_id'], counselor_ids[best_j]))
+        return assignments
+
+    # ==================== NUMPY KERNEL ====================
+
+    def _matrix(self, sessions: Sequence[Dict], counselors: Sequence[Dict]):
+        n = len(counselors)
+        topics = {}
+        session_topic = np.array([topics.setdefault(s['topic'], len(topics)) for s in sessions], dtype=np.int64)
+        crisis_session = np.array([(s.get('priority') or 0) >= CRISIS_PRIORITY for s in sessions], dtype=bool)
+
+        has_topic = np.zeros((len(topics), n), dtype=bool)
+        is_primary = np.zeros((len(topics), n), dtype=bool)
+        has_other = np.zeros(n, dtype=bool)
+        crisis_capable = np.zeros(n, dtype=bool)
+        total_sessions = np.empty(n, dtype=np.float64)
+        rating_sum = np.empty(n, dtype=np.float64)
+        rating_count = np.empty(n, dtype=np.float64)
+
+        for j, counselor in enumerate(counselors):
+            specializations = counselor.get('specializations', []) or []
+            for spec in specializations:
+                t = topics.get(spec)
+                if t is not None:
+                    has_topic[t, j] = True
+            if specializations:
+                t = topics.get(specializations[0])
+                if t is not None:
+                    is_primary[t, j] = True
+            has_other[j] = 'other' in specializations
+            crisis_capable[j] = any(spec in specializations for spec in CRISIS_SPECIALIZATIONS)
+            total_sessions[j] = counselor.get('total_sessions', 0) or 0
+            rating_sum[j] = counselor.get('rating_sum', 0) or 0
+            rating_count[j] = counselor.get('rating_count', 0) or 0
+
+        # 1. Specialization match, per topic (0-50)
+        spec_by_topic = np.where(has_topic, np.where(is_primary, 50.0, 40.0), np.where(has_other, 20.0, 0.0))
+
+        # 2. Load balancing (0-20)
+        load = np.maximum(0.0, 20.0 - total_sessions * 0.5)
+
+        # 3. Rating quality (4-20, neutral 12 when unrated)
+        rated = rating_count > 0
+        avg_rating = np.divide(rating_sum, rating_count, out=np.zeros(n), where=rated)
+        rating = np.where(rated, (avg_rating / 5.0) * 20, 12.0)
+
+        # 4. Experience bonus (0-10)
+        experience = np.where(total_sessions >= 5, np.minimum(10.0, total_sessions * 0.5), 0.0)
+
+        # 5. Crisis handling bonus (0-10)
+        crisis = np.where(crisis_session[:, None] & crisis_capable[None, :], 10.0, 0.0)
+
+        # Same addition order as the scalar scorer keeps results identical
+        scores = spec_by_topic[session_topic] + load
+        scores = scores + rating
+        scores = scores + experience
+        scores = scores + crisis
+
+        eligible = has_topic[session_topic]
+        return scores, eligible
@@ -4,19 +4,45 @@ Automatically ends stale sessions after inactivity
 """
 
 import asyncio
+import heapq
 import logging
-from datetime import datetime, timedelta
-from typing import Optional
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from async_database import get_async_database
 
 logger = logging.getLogger(__name__)
 
+
+def _epoch(value) -> Optional[float]:
+    """Stored UTC timestamp (string from SQLite, datetime from PostgreSQL) as epoch seconds"""
+    if value is None or value == '':
+        return None
+    if not isinstance(value, datetime):
+        try:
+            value = datetime.fromisoformat(str(value))
+        except ValueError:
+            return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
 class SessionTimeoutManager:
     """
     Manages automatic session timeouts
     Runs in background to check for inactive sessions
+    
+    Every matched or active session has a deadline: its last activity
+    (match, start or latest message) plus timeout_hours. Deadlines live in a
+    min-heap, so the manager sleeps exactly until the next one is due instead
+    of polling; database events (session_matched/started/activity/ended/
+    released) move or drop deadlines as they happen. Superseded heap entries
+    are skipped when popped. The heap is reloaded from the database every
+    resync_interval seconds to pick up writes from other processes.
     """
     
-    def __init__(self, db, bot_context, timeout_hours: int = 24):
+    def __init__(self, db, bot_context, timeout_hours: int = 24, bot=None):
         """
         Initialize timeout manager
         
@@ -24,81 +50,221 @@ class SessionTimeoutManager:
             db: Database instance
             bot_context: Bot application context for sending messages
             timeout_hours: Hours of inactivity before auto-ending (default: 24)
+            bot: Anything with Bot.send_message (e.g. the outbound dispatcher);
+                 defaults to bot_context.bot
         """
         self.db = db
+        self.async_db = get_async_database(db)
         self.bot_context = bot_context
+        self.bot = bot
         self.timeout_hours = timeout_hours
         self.is_running = False
-        self.check_interval = 300  # Check every 5 minutes
+        self.resync_interval = 3600  # Reload deadlines from the database hourly
+        
+        self._deadlines: Dict[int, float] = {}  # session_id -> current deadline (epoch seconds)
+        self._heap: List[tuple] = []             # (deadline, session_id), may hold superseded entries
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.timed_out = 0
+    
+    @property
+    def timeout_seconds(self) -> float:
+        return self.timeout_hours * 3600
     
     async def start(self):
-        """Start the timeout checker loop"""
+        """Start the timeout scheduler loop"""
         self.is_running = True
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.current_task()
+        self.db.add_listener(self.handle_event)
         logger.info(f"Session timeout manager started (timeout: {self.timeout_hours} hours)")
         
+        next_resync = 0.0
         while self.is_running:
             try:
+                if self._loop.time() >= next_resync:
+                    await self.load_deadlines()
+                    next_resync = self._loop.time() + self.resync_interval
+                
                 await self.check_timeouts()
-                await asyncio.sleep(self.check_interval)
+                
+                # Sleep until the earliest deadline, an earlier one arriving, or the next resync
+                self._wakeup.clear()
+                delay = min(self.seconds_until_next(), next_resync - self._loop.time())
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=max(0.0, delay))
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                break
             except Exception as e:
                 logger.error(f"Error in timeout manager: {e}")
                 await asyncio.sleep(60)  # Wait 1 minute before retrying
+        
+        self.db.remove_listener(self.handle_event)
     
     async def stop(self):
-        """Stop the timeout checker loop"""
+        """Stop the timeout scheduler loop"""
         self.is_running = False
+        self.db.remove_listener(self.handle_event)
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
         logger.info("Session timeout manager stopped")
     
+    # ==================== DEADLINES ====================
+    
+    async def load_deadlines(self):
+        """Rebuild the heap from every matched or active session in the database"""
+        rows = await self.async_db.get_open_session_activity()
+        deadlines = {}
+        for row in rows:
+            timestamps = (_epoch(value) for column, value in row.items() if column not in ('session_id', 'status'))
+            last_activity = max(filter(None, timestamps), default=None)
+            if last_activity is not None:
+                deadlines[row['session_id']] = last_activity + self.timeout_seconds
+        self._deadlines = deadlines
+        self._heap = [(deadline, session_id) for session_id, deadline in deadlines.items()]
+        heapq.heapify(self._heap)
+        logger.info(f"Tracking inactivity deadlines for {len(deadlines)} open sessions")
+    
+    def touch(self, session_id: int, last_activity: float = None):
+        """Move a session's deadline to last_activity (default: now) plus the timeout"""
+        deadline = (last_activity if last_activity is not None else datetime.now(timezone.utc).timestamp()) + self.timeout_seconds
+        current = self._deadlines.get(session_id)
+        if current is not None and current >= deadline:
+            return
+        self._deadlines[session_id] = deadline
+        heapq.heappush(self._heap, (deadline, session_id))
+        if self._heap[0][1] == session_id and self._wakeup is not None:
+            self._wakeup.set()  # Earlier than what the loop is sleeping for
+    
+    def forget(self, session_id: int):
+        """Stop tracking a session (its heap entry is skipped when popped)"""
+        self._deadlines.pop(session_id, None)
+    
+    def seconds_until_next(self) -> float:
+        """Seconds until the earliest live deadline (inf when nothing is tracked)"""
+        self._drop_superseded()
+        if not self._heap:
+            return float('inf')
+        return max(0.0, self._heap[0][0] - datetime.now(timezone.utc).timestamp())
+    
+    def _drop_superseded(self):
+        while self._heap and self._deadlines.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+    
+    def pop_due(self, now: float = None) -> List[int]:
+        """Remove and return the sessions whose deadline has passed"""
+        now = now if now is not None else datetime.now(timezone.utc).timestamp()
+        due = []
+        self._drop_superseded()
+        while self._heap and self._heap[0][0] <= now:
+            _, session_id = heapq.heappop(self._heap)
+            del self._deadlines[session_id]
+            due.append(session_id)
+            self._drop_superseded()
+        return due
+    
+    # ==================== EVENTS ====================
+    
+    def handle_event(self, event: str, **payload):
+        """CounselingDatabase listener (called on whichever thread did the write)"""
+        session_id = payload.get('session_id')
+        if session_id is None or self._loop is None:
+            return
+        if event in ('session_matched', 'session_started'):
+            action, args = self.touch, (session_id,)
+        elif event == 'session_activity':
+            action, args = self.touch, (session_id, _epoch(payload.get('last_message_at')))
+        elif event in ('session_ended', 'session_released'):
+            action, args = self.forget, (session_id,)
+        else:
+            return
+        try:
+            self._loop.call_soon_threadsafe(action, *args)
+        except RuntimeError:
+            pass  # Loop already closed during shutdown
+    
+    # ==================== TIMEOUTS ====================
+    
     async def check_timeouts(self):
-        """Check for and end timed-out sessions"""
-        return
+        """End every session whose deadline has passed (one transaction) and notify both sides"""
+        due = self.pop_due()
+        if not due:
+            return []
+        
+        idle_before = datetime.now(timezone.utc) - timedelta(hours=self.timeout_hours)
+        ended = await self.async_db.end_idle_sessions(due, idle_before)
+        if len(ended) < len(due):
+            # Some had activity this process did not see (e.g. another instance) - re-read them
+            await self.load_deadlines()
+        if not ended:
+            return []
+        
+        self.timed_out += len(ended)
+        logger.info(f"⏰ Timed out {len(ended)} inactive sessions")
+        await asyncio.gather(*(self.notify_timeout(session) for session in ended))
+        return ended
     
     async def timeout_session(self, session):
         """
         End a session due to timeout and notify parties
         
+        Args:
+            session: Session record from database
+        """
+        session_id = session['session_id']
+        
+        try:
+            # End the session in database
+            await self.async_db.end_session(session_id, 'timeout')
+            await self.notify_timeout(session)
+        except Exception as e:
+            logger.error(f"Error timing out session {session_id}: {e}")
+    
+    async def notify_timeout(self, session):
+        """
+        Tell the user (and the counselor, if the session had started) that it timed out
+        
         Args:
             session: Session record from database
         """
         session_id = session['session_id']
         user_id = session['user_id']
         counselor_id = session['counselor_id']
+        bot = self.bot or self.bot_context.bot
         
+        # Notify user
         try:
-            # End the session in database
-            self.db.end_session(session_id, 'timeout')
-            
-            # Notify user
+            await bot.send_message(
+                chat_id=user_id,
+                text="⏰ **Session Timeout**\n\n"
+                     f"Your counseling session has been automatically ended due to {self.timeout_hours} hours of inactivity.\n\n"
+                     "If you still need support, feel free to request a new session anytime. 🙏",
+                parse_mode='Markdown'
+            )
+        except Exception as e:
+            logger.warning(f"Could not notify user {user_id} of timeout: {e}")
+        
+        # Notify counselor if session was active
+        if counselor_id and session['started_at']:
             try:
-                await self.bot_context.bot.send_message(
-                    chat_id=user_id,
-                    text="⏰ **Session Timeout**\n\n"
-                         f"Your counseling session has been automatically ended due to {self.timeout_hours} hours of inactivity.\n\n"
-                         "If you still need support, feel free to request a new session anytime. 🙏",
-                    parse_mode='Markdown'
-                )
+                counselor = await self.async_db.get_counselor(counselor_id)
+                if counselor:
+                    await bot.send_message(
+                        chat_id=counselor['user_id'],
+                        text="⏰ **Session Timeout**\n\n"
+                             f"Your counseling session (ID: #{session_id}) has been automatically ended due to inactivity.\n\n"
+                             "No action needed from you.",
+                        parse_mode='Markdown'
+                    )
             except Exception as e:
-                logger.warning(f"Could not notify user {user_id} of timeout: {e}")
-            
-            # Notify counselor if session was active
-            if counselor_id and session['started_at']:
-                try:
-                    counselor = self.db.get_counselor(counselor_id)
-                    if counselor:
-                        await self.bot_context.bot.send_message(
-                            chat_id=counselor['user_id'],
-                            text="⏰ **Session Timeout**\n\n"
-                                 f"Your counseling session (ID: #{session_id}) has been automatically ended due to inactivity.\n\n"
-                                 "No action needed from you.",
-                            parse_mode='Markdown'
-                        )
-                except Exception as e:
-                    logger.warning(f"Could not notify counselor {counselor_id} of timeout: {e}")
-            
-            logger.info(f"Session {session_id} timed out and ended")
-            
-        except Exception as e:
-            logger.error(f"Error timing out session {session_id}: {e}")
+                logger.warning(f"Could not notify counselor {counselor_id} of timeout: {e}")
+        
+        logger.info(f"Session {session_id} timed out and ended")
 
 # Example integration in main bot:
 """
@@ -109,7 +275,8 @@ async def post_init(application):
     timeout_manager = SessionTimeoutManager(
         db=db, 
         bot_context=application,
-        timeout_hours=24
+        timeout_hours=24,
+        bot=outbound  # Rate-limited sends (defaults to application.bot)
     )
     
     # Store in application context for later access
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Test script for the session analytics rollups
+Verifies bucket metrics, incremental runs with the watermark and CSV export
+"""
+
+import csv
+import io
+import os
+import sys
+import tempfile
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from counseling_database import CounselingDatabase, USE_POSTGRES
+from analytics_rollups import SessionRollups, percentile
+
+
+def _session(db, topic, created, matched=None, started=None, ended=None, end_reason=None, rating=None, messages=0):
+    """Create a session and rewrite its timestamps as a past day would have left them"""
+    session_id = db.create_session_request(500, topic)
+    for i in range(messages):
+        db.add_message(session_id, 'user', 500, f"message {i}")
+    conn = db.get_connection()
+    conn.execute('''
+        UPDATE counseling_sessions
+        SET created_at = ?, matched_at = ?, started_at = ?, ended_at = ?, end_reason = ?, user_rating = ?,
+            status = CASE WHEN ? IS NOT NULL THEN 'ended' ELSE status END
+        WHERE session_id = ?
+    ''', (created, matched, started, ended, end_reason, rating, ended, session_id))
+    conn.commit()
+    conn.close()
+    return session_id
+
+
+def test_percentile():
+    assert percentile([], 95) is None
+    assert percentile([5.0], 95) == 5.0
+    assert percentile([float(i) for i in range(1, 101)], 95) == 95.0
+    assert percentile([1.0, 2.0, 3.0, 4.0], 50) == 2.0
+
+
+def test_bucket_metrics():
+    """Each event lands in the hour/day it happened, per topic and for all topics"""
+    if USE_POSTGRES:
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = CounselingDatabase(os.path.join(tmp, 'rollup_test.db'))
+        db.add_user(500)
+
+        _session(db, 'other', '2026-03-02 09:10:00', '2026-03-02 09:12:00', '2026-03-02 09:20:00',
+                 '2026-03-02 10:20:00', 'user_ended', rating=4, messages=3)
+        _session(db, 'other', '2026-03-02 09:30:00', '2026-03-02 09:31:00', '2026-03-02 09:40:00',
+                 '2026-03-02 10:10:00', 'timeout', rating=2, messages=1)
+        _session(db, 'academic_career', '2026-03-02 09:45:00', ended='2026-03-02 09:50:00', end_reason='cancelled')
+        _session(db, 'other', '2026-03-02 11:00:00')  # still waiting
+
+        rollups = SessionRollups(db, settle_hours=24)
+        result = rollups.run(now=datetime(2026, 3, 2, 12, 30))
+        assert result['sessions'] == 4
+
+        hour9 = {row['topic']: row for row in rollups.get_rollups('hour', datetime(2026, 3, 2, 9), topic=None)
+                 if row['bucket_start'] == datetime(2026, 3, 2, 9)}
+        assert hour9['*']['requests'] == 3 and hour9['other']['requests'] == 2
+        assert hour9['other']['matched'] == 2 and hour9['other']['match_wait_p50'] == 90
+        assert hour9['other']['start_wait_p95'] == 600
+        assert hour9['academic_career']['end_reasons'] == {'cancelled': 1}
+
+        hour10 = rollups.get_rollups('hour', datetime(2026, 3, 2, 10))[0]
+        assert hour10['bucket_start'] == datetime(2026, 3, 2, 10)
+        assert hour10['ended'] == 2 and hour10['duration_p50'] == 2700 and hour10['duration_p95'] == 3600
+        assert hour10['messages'] == 4 and hour10['messages_per_session'] == 2
+        assert hour10['avg_rating'] == 3 and hour10['end_reasons'] == {'timeout': 1, 'user_ended': 1}
+
+        day = rollups.get_rollups('day')
+        assert len(day) == 1 and day[0]['bucket_start'] == datetime(2026, 3, 2)
+        assert day[0]['requests'] == 4 and day[0]['ended'] == 3 and day[0]['started'] == 2
+        db.close()
+
+
+def test_incremental_runs_and_export():
+    """Recent buckets are refreshed, settled ones survive session cleanup"""
+    if USE_POSTGRES:
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = CounselingDatabase(os.path.join(tmp, 'rollup_test.db'))
+        db.add_user(500)
+        rollups = SessionRollups(db, settle_hours=6)
+
+        old = _session(db, 'other', '2026-03-01 08:00:00', started='2026-03-01 08:05:00',
+                       ended='2026-03-01 08:35:00', end_reason='user_ended')
+        rollups.run(now=datetime(2026, 3, 1, 9, 0))
+        assert rollups.get_watermark() == datetime(2026, 3, 1, 8)  # never before the first session
+
+        # A rating given after the first run is picked up while the bucket is young
+        db.add_session_rating(old, 5)
+        rollups.run(now=datetime(2026, 3, 1, 12, 0))
+        assert rollups.get_rollups('day')[0]['rating_count'] == 1
+
+        # Days later the old day is final: cleanup removes the session but not its rollups
+        _session(db, 'other', '2026-03-03 10:00:00')
+        rollups.run(now=datetime(2026, 3, 3, 10, 30))
+        assert rollups.get_watermark() == datetime(2026, 3, 3, 4)
+        db.delete_ended_sessions_before(datetime(2026, 3, 2))
+        result = rollups.run(now=datetime(2026, 3, 3, 11, 30))
+        assert result['window_start'] == datetime(2026, 3, 3)
+
+        days = rollups.get_rollups('day')
+        assert [d['bucket_start'].day for d in days] == [1, 3]
+        assert days[0]['requests'] == 1 and days[0]['avg_rating'] == 5
+        assert days[1]['requests'] == 1
+
+        checkouts_before = db.get_pool_stats()['checkouts']
+        exported = list(csv.DictReader(io.StringIO(rollups.export_csv('day'))))
+        assert db.get_pool_stats()['checkouts'] - checkouts_before == 1
+        assert len(exported) == 4  # two days x ('other', '*')
+        first = [row for row in exported if row['topic'] == '*'][0]
+        assert first['bucket_start'] == '2026-03-01 00:00:00'
+        assert first['duration_p50'] == '1800.0' and first['avg_rating'] == '5.0'
+        assert first['match_wait_p50'] == ''
+        db.close()
+
+
+if __name__ == '__main__':
+    test_percentile()
+    test_bucket_metrics()
+    test_incremental_runs_and_export()
+    print("✅ Analytics rollup tests passed")
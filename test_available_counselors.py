@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Test script for the load-aware available counselors query
+Verifies topic filtering, capacity limits and the specializations migration
+"""
+
+import json
+import os
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from counseling_database import CounselingDatabase, USE_POSTGRES
+
+
+def _approved_counselor(db, user_id, specializations):
+    db.add_user(user_id)
+    counselor_id = db.register_counselor(user_id, f"Counselor {user_id}", "bio", specializations)
+    db.approve_counselor(counselor_id, admin_id=1)
+    return counselor_id
+
+
+def test_topic_filter_and_capacity():
+    """Only counselors with the topic and spare capacity are returned"""
+    if USE_POSTGRES:
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = CounselingDatabase(os.path.join(tmp, 'available_test.db'))
+        db.max_sessions_per_counselor = 2
+
+        academic = _approved_counselor(db, 101, ['academic_career', 'other'])
+        growth = _approved_counselor(db, 102, ['life_skills_growth'])
+
+        ids = [c['counselor_id'] for c in db.get_available_counselors('academic_career')]
+        assert ids == [academic]
+        assert len(db.get_available_counselors()) == 2
+
+        # Fill the academic counselor up to the limit
+        db.add_user(500)
+        for _ in range(2):
+            session_id = db.create_session_request(500, 'academic_career')
+            db.match_session_with_counselor(session_id, academic)
+
+        assert db.get_available_counselors('academic_career') == []
+        remaining = db.get_available_counselors()
+        assert [c['counselor_id'] for c in remaining] == [growth]
+        assert remaining[0]['active_session_count'] == 0
+
+        # Ended sessions free up capacity again
+        db.end_session(session_id)
+        available = db.get_available_counselors('academic_career')
+        assert [c['counselor_id'] for c in available] == [academic]
+        assert available[0]['active_session_count'] == 1
+        assert available[0]['specializations'] == ['academic_career', 'other']
+
+        # Updating specializations keeps the normalized table in sync
+        db.update_counselor_info(growth, specializations=['academic_career'])
+        assert len(db.get_available_counselors('academic_career')) == 2
+        assert db.get_available_counselors('life_skills_growth') == []
+
+        # An empty list clears them (None leaves them alone)
+        db.update_counselor_info(growth, specializations=[])
+        assert [c['counselor_id'] for c in db.get_available_counselors('academic_career')] == [academic]
+        assert db.get_counselor(growth)['specializations'] == []
+        db.update_counselor_info(growth, bio="Peer mentor")
+        assert db.get_counselor(growth)['specializations'] == []
+        db.close()
+
+
+def test_specializations_migrated_from_json():
+    """Counselors stored before the normalized table existed are migrated on startup"""
+    if USE_POSTGRES:
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'migrate_test.db')
+        db = CounselingDatabase(path)
+        counselor_id = _approved_counselor(db, 201, ['mental_emotional'])
+
+        # Simulate a pre-migration database
+        with db.connection() as conn:
+            conn.execute('DELETE FROM counselor_specializations')
+            conn.execute('UPDATE counselors SET specializations = ? WHERE counselor_id = ?',
+                         (json.dumps(['mental_emotional', 'life_skills_growth']), counselor_id))
+            conn.commit()
+        assert db.get_available_counselors('life_skills_growth') == []
+        db.close()
+
+        db = CounselingDatabase(path)
+        assert [c['counselor_id'] for c in db.get_available_counselors('life_skills_growth')] == [counselor_id]
+        db.close()
+
+
+if __name__ == '__main__':
+    test_topic_filter_and_capacity()
+    test_specializations_migrated_from_json()
+    print("✅ Available counselors tests passed")
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Test script for batch auto-matching
+Verifies priority order, counselor capacity and the single write transaction
+"""
+
+import os
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from counseling_database import CounselingDatabase, USE_POSTGRES
+from matching_system import CounselingMatcher
+
+
+def test_batch_respects_priority_and_capacity():
+    """A backlog is spread across counselors without exceeding anyone's limit"""
+    if USE_POSTGRES:
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = CounselingDatabase(os.path.join(tmp, 'batch_test.db'))
+        db.max_sessions_per_counselor = 2
+
+        counselors = []
+        for user_id in (101, 102):
+            db.add_user(user_id)
+            counselor_id = db.register_counselor(user_id, f"C{user_id}", "bio", ['mental_emotional', 'crisis_substance'])
+            db.approve_counselor(counselor_id, admin_id=1)
+            counselors.append(counselor_id)
+
+        db.add_user(500)
+        regular = [db.create_session_request(500, 'mental_emotional') for _ in range(4)]
+        crisis = db.create_session_request(500, 'crisis_substance')
+        unmatched_topic = db.create_session_request(500, 'academic_career')
+
+        matcher = CounselingMatcher(db)
+        checkouts_before = db.get_pool_stats()['checkouts']
+        matched = matcher.auto_match_pending_sessions()
+        # One read for the queue, one for the index, one write transaction
+        assert db.get_pool_stats()['checkouts'] - checkouts_before <= 4
+
+        matched_ids = [session_id for session_id, _ in matched]
+        assert matched_ids[0] == crisis
+        assert unmatched_topic not in matched_ids
+        assert len(matched) == 4  # 2 counselors x capacity 2
+
+        load = {counselor_id: 0 for counselor_id in counselors}
+        for session_id, counselor_id in matched:
+            load[counselor_id] += 1
+            assert db.get_session(session_id)['status'] == 'matched'
+        assert load == {counselors[0]: 2, counselors[1]: 2}
+
+        # The last regular session waits; nobody has capacity left
+        waiting = [s['session_id'] for s in db.get_pending_sessions()]
+        assert sorted(waiting) == sorted([regular[-1], unmatched_topic])
+        assert matcher.auto_match_pending_sessions() == []
+        db.close()
+
+
+def test_bulk_match_skips_sessions_taken_elsewhere():
+    """Sessions matched by someone else in the meantime are left untouched"""
+    if USE_POSTGRES:
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = CounselingDatabase(os.path.join(tmp, 'batch_test.db'))
+        counselors = []
+        for user_id in (101, 102):
+            db.add_user(user_id)
+            counselor_id = db.register_counselor(user_id, f"C{user_id}", "bio", ['other'])
+            db.approve_counselor(counselor_id, admin_id=1)
+            counselors.append(counselor_id)
+        taken, ours = counselors
+
+        db.add_user(500)
+        first = db.create_session_request(500, 'other')
+        second = db.create_session_request(500, 'other')
+        db.match_session_with_counselor(first, taken)
+
+        assert db.match_sessions_bulk([(first, ours), (second, ours)]) == [(second, ours)]
+        assert db.get_session(first)['counselor_id'] == taken
+
+        # Offline counselors are skipped as well
+        third = db.create_session_request(500, 'other')
+        db.set_counselor_availability(taken, False)
+        assert db.match_sessions_bulk([(third, taken)]) == []
+        db.close()
+
+
+if __name__ == '__main__':
+    test_batch_respects_priority_and_capacity()
+    test_bulk_match_skips_sessions_taken_elsewhere()
+    print("✅ Batch matching tests passed")
@@ -6,9 +6,11 @@ This shows how counselors with active sessions can still be matched to new users
 
 import sys
 import os
+import tempfile
+import threading
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from counseling_database import CounselingDatabase
+from counseling_database import CounselingDatabase, USE_POSTGRES
 from matching_system import CounselingMatcher
 
 def test_concurrent_matching_issue():
@@ -72,5 +74,54 @@ def test_concurrent_matching_issue():
     print(f"   This leads to counselors being matched to multiple users simultaneously")
     print(f"   Fix: Update the SQL query to exclude counselors with active sessions")
 
+def test_concurrent_claims_respect_capacity():
+    """Parallel match_session calls never push a counselor past the session limit"""
+    if USE_POSTGRES:
+        return
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db = CounselingDatabase(os.path.join(tmp, 'claim_test.db'))
+        db.max_sessions_per_counselor = 1
+        
+        counselors = []
+        for user_id in (101, 102):
+            db.add_user(user_id)
+            counselor_id = db.register_counselor(user_id, f"C{user_id}", "bio", ['academic_career'])
+            db.approve_counselor(counselor_id, admin_id=1)
+            counselors.append(counselor_id)
+        
+        db.add_user(500)
+        sessions = [db.create_session_request(500, 'academic_career') for _ in range(6)]
+        
+        matcher = CounselingMatcher(db)
+        # Every thread ranks from the same snapshot, so all aim at the same top counselor
+        ranked = matcher.rank_counselors(sessions[0])
+        results = {}
+        barrier = threading.Barrier(len(sessions))
+        
+        def claim(session_id):
+            barrier.wait()
+            results[session_id] = db.claim_session(session_id, ranked)
+        
+        threads = [threading.Thread(target=claim, args=(sid,)) for sid in sessions]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        claimed = [cid for cid in results.values() if cid is not None]
+        print(f"Claims: {results}")
+        assert sorted(claimed) == sorted(counselors), "each counselor takes exactly one session"
+        for counselor_id in counselors:
+            assert db.count_active_sessions_by_counselor(counselor_id) == 0  # matched, not yet active
+            assert len(db.get_active_sessions_by_counselor(counselor_id)) == 1
+        
+        # Everyone is full now: claiming a waiting session falls through all candidates
+        waiting = [sid for sid, cid in results.items() if cid is None][0]
+        assert db.claim_session(waiting, ranked) is None
+        assert matcher.match_session(waiting) is None
+        db.close()
+
 if __name__ == '__main__':
     test_concurrent_matching_issue()
+    test_concurrent_claims_respect_capacity()
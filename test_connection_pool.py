@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Test script for the database connection pool
+Verifies connections are reused and released correctly
+"""
+
+import os
+import sys
+import tempfile
+import threading
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from counseling_database import CounselingDatabase, USE_POSTGRES
+from connection_pool import PostgresConnectionPool, PoolTimeout
+
+
+def test_sqlite_connections_are_reused():
+    """Many queries on one thread should share a single connection"""
+    if USE_POSTGRES:
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = CounselingDatabase(os.path.join(tmp, 'pool_test.db'))
+        created_before = db.get_pool_stats()['connections_created']
+
+        for i in range(20):
+            db.add_user(1000 + i)
+            db.get_user(1000 + i)
+
+        stats = db.get_pool_stats()
+        print(f"Pool stats after 40 calls: {stats}")
+        assert stats['connections_created'] == created_before
+        assert stats['checkouts'] >= 40
+
+        # A worker thread gets its own connection
+        worker = threading.Thread(target=db.get_user, args=(1000,))
+        worker.start()
+        worker.join()
+        assert db.get_pool_stats()['connections_created'] == created_before + 1
+        db.close()
+
+
+def test_uncommitted_work_is_rolled_back_on_release():
+    """Releasing a connection must not leak an open transaction to the next caller"""
+    if USE_POSTGRES:
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = CounselingDatabase(os.path.join(tmp, 'pool_test.db'))
+
+        conn = db.get_connection()
+        conn.execute("INSERT INTO users (user_id) VALUES (42)")
+        conn.close()  # no commit
+
+        assert db.get_user(42) is None
+
+        # Nested checkouts share the outer transaction until the outer release
+        with db.connection() as outer:
+            outer.execute("INSERT INTO users (user_id) VALUES (43)")
+            inner = db.get_connection()
+            inner.close()
+            assert outer.in_transaction
+            outer.commit()
+
+        assert db.get_user(43) is not None
+
+        # An error in a nested checkout leaves the rollback to the outer caller
+        with db.connection() as outer:
+            outer.execute("INSERT INTO users (user_id) VALUES (44)")
+            try:
+                with db.connection() as inner:
+                    inner.execute("INSERT INTO users (user_id) VALUES (43)")  # duplicate
+            except Exception:
+                pass
+            assert outer.in_transaction
+            outer.commit()
+
+        assert db.get_user(44) is not None
+        db.close()
+
+
+class _FakeConnection:
+    closed = 0
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = 1
+
+
+def test_bounded_pool_waits_and_times_out():
+    """A full pool blocks callers and reports waits"""
+    pool = PostgresConnectionPool(_FakeConnection, min_size=0, max_size=1, checkout_timeout=0.2)
+
+    first = pool.acquire()
+    try:
+        pool.acquire()
+        assert False, "checkout should time out while the only connection is in use"
+    except PoolTimeout:
+        pass
+
+    releaser = threading.Timer(0.05, first.close)
+    releaser.start()
+    second = pool.acquire()
+    second.close()
+
+    stats = pool.stats()
+    print(f"Bounded pool stats: {stats}")
+    assert stats['connections_created'] == 1
+    assert stats['waits'] == 2
+    assert stats['timeouts'] == 1
+
+
+if __name__ == '__main__':
+    test_sqlite_connections_are_reused()
+    test_uncommitted_work_is_rolled_back_on_release()
+    test_bounded_pool_waits_and_times_out()
+    print("✅ Connection pool tests passed")
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Test script for the conversation state store
+Verifies dict-style access, TTL expiry, the LRU bound and database persistence
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from counseling_database import CounselingDatabase, USE_POSTGRES
+from conversation_state import ConversationState, ConversationStateStore
+
+
+def test_dict_compatibility():
+    """Handlers use the store and its states exactly like the old nested dicts"""
+    store = ConversationStateStore(backend='memory', ttl=60, max_entries=10)
+
+    assert 1 not in store and store.get(1, {}) == {}
+    store[1] = {'topic': 'other'}
+    store[1]['awaiting_description'] = True
+    assert 1 in store and store[1]['topic'] == 'other'
+    assert store[1].get('description') is None and 'description' not in store[1]
+    assert store[1] == {'topic': 'other', 'awaiting_description': True}
+
+    store[1]['specializations'] = []
+    selected = store[1]['specializations']
+    selected.append('other')
+    store[1]['specializations'] = selected
+    assert store[1]['specializations'] == ['other']
+
+    store[1] = {}
+    assert 1 in store and not store[1] and 'editing' not in store[1]
+    del store[1]
+    assert 1 not in store
+
+    state = ConversationState(topic='other')
+    assert not hasattr(state, '__dict__')
+    try:
+        state['tpoic'] = 'typo'
+        assert False, "unknown keys must be rejected"
+    except KeyError:
+        pass
+
+
+def test_ttl_and_lru_bound():
+    """Entries expire after their last write and the least recently used are evicted"""
+    store = ConversationStateStore(backend='memory', ttl=0.2, max_entries=3)
+
+    store[1] = {'topic': 'other'}
+    time.sleep(0.12)
+    store[1]['awaiting_description'] = True  # a write refreshes the TTL
+    store[2] = {'topic': 'other'}
+    time.sleep(0.12)
+    assert 1 in store
+    time.sleep(0.12)
+    assert 1 not in store and 2 not in store
+    assert store.expirations == 2
+
+    for user_id in (10, 11, 12):
+        store[user_id] = {'editing': 'bio'}
+    assert 10 in store  # reading 10 makes 11 the least recently used
+    store[13] = {'editing': 'bio'}
+    assert 11 not in store and all(user_id in store for user_id in (10, 12, 13))
+    assert len(store) == 3 and store.evictions == 1
+
+
+def test_database_persistence():
+    """Flows survive a restart and are shared between workers, without database calls on the event loop"""
+    if USE_POSTGRES:
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = CounselingDatabase(os.path.join(tmp, 'state_test.db'))
+        calls = []
+        for name in ('get_conversation_state', 'save_conversation_state', 'delete_conversation_state'):
+            def recorded(*args, _original=getattr(db, name), _name=name):
+                calls.append((_name, threading.current_thread()))
+                return _original(*args)
+            setattr(db, name, recorded)
+
+        worker_a = ConversationStateStore(db, backend='database', ttl=60, cache_seconds=0)
+        worker_b = ConversationStateStore(db, backend='database', ttl=60, cache_seconds=0)
+
+        def handle(store, user_id):
+            """What the group -1 TypeHandler does before a handler runs"""
+            asyncio.run(store.load(user_id))
+            return store
+
+        handle(worker_a, 500)[500] = {'topic': 'other'}
+        worker_a[500]['awaiting_description'] = True
+        worker_a.flush()
+        assert handle(worker_b, 500)[500] == {'topic': 'other', 'awaiting_description': True}
+
+        worker_b[500]['description'] = "exam stress"
+        worker_b.flush()
+        assert handle(worker_a, 500)[500]['description'] == "exam stress"
+
+        # A write not yet saved is not overwritten by an older database copy
+        worker_a[500]['gender'] = 'female'
+        assert handle(worker_a, 500)[500]['gender'] == 'female'
+        worker_a.close()
+
+        restarted = ConversationStateStore(db, backend='database', ttl=60)
+        assert 500 not in restarted  # nothing is read on the event loop
+        assert handle(restarted, 500)[500].get('gender') == 'female'
+
+        del worker_b[500]
+        worker_b.flush()
+        assert 500 not in handle(worker_b, 500) and db.get_conversation_state(500) is None
+        calls.pop()  # the direct check above
+
+        assert calls and all(thread is not threading.main_thread() for _, thread in calls)
+
+        # Expired rows are invisible and purged by the cleanup task
+        short = ConversationStateStore(db, backend='database', ttl=0.05, cache_seconds=0)
+        short[501] = {'editing': 'bio'}
+        short.close()
+        time.sleep(0.1)
+        assert 501 not in handle(worker_b, 501)
+        assert db.delete_expired_conversation_states() == 1
+        for store in (worker_b, restarted):
+            store.close()
+        db.close()
+
+
+if __name__ == '__main__':
+    test_dict_compatibility()
+    test_ttl_and_lru_bound()
+    test_database_persistence()
+    print("✅ Conversation state tests passed")
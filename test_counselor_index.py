@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Test script for the in-memory counselor index
+Verifies incremental updates stay in line with the database query
+"""
+
+import os
+import sys
+import tempfile
+import threading
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from counseling_database import CounselingDatabase, USE_POSTGRES
+from counselor_index import CounselorIndex
+from matching_system import CounselingMatcher
+
+TOPICS = ['academic_career', 'mental_emotional', 'other', None]
+
+
+def _assert_in_sync(db, index):
+    for topic in TOPICS:
+        expected = sorted(c['counselor_id'] for c in db.get_available_counselors(topic))
+        actual = sorted(c['counselor_id'] for c in index.get_candidates(topic))
+        assert actual == expected, f"topic={topic}: index {actual} != database {expected}"
+
+
+def test_index_tracks_writes():
+    """Every write path keeps the index equal to get_available_counselors()"""
+    if USE_POSTGRES:
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = CounselingDatabase(os.path.join(tmp, 'index_test.db'))
+        db.max_sessions_per_counselor = 2
+        index = CounselorIndex(db)
+
+        counselors = []
+        for user_id, specs in [(101, ['academic_career']), (102, ['academic_career', 'other']), (103, ['mental_emotional'])]:
+            db.add_user(user_id)
+            counselors.append(db.register_counselor(user_id, f"C{user_id}", "bio", specs))
+        a, b, c = counselors
+
+        index.rebuild()
+        _assert_in_sync(db, index)
+
+        db.approve_counselor(a, admin_id=1)
+        db.approve_counselor(b, admin_id=1)
+        db.approve_counselor(c, admin_id=1)
+        _assert_in_sync(db, index)
+
+        db.set_counselor_availability(b, False)
+        _assert_in_sync(db, index)
+        db.set_counselor_availability(b, True)
+
+        db.add_user(500)
+        sessions = []
+        for _ in range(2):
+            session_id = db.create_session_request(500, 'academic_career')
+            db.match_session_with_counselor(session_id, a)
+            sessions.append(session_id)
+        _assert_in_sync(db, index)
+        assert a not in [x['counselor_id'] for x in index.get_candidates('academic_career')]
+
+        db.start_session(sessions[0])
+        db.release_session(sessions[1])
+        _assert_in_sync(db, index)
+
+        db.end_session(sessions[0])
+        db.add_session_rating(sessions[0], 5)
+        _assert_in_sync(db, index)
+        assert index.get_counselor(a)['rating_sum'] == 5
+        assert index.get_counselor(a)['total_sessions'] == 1
+
+        db.update_counselor_info(c, specializations=['academic_career'])
+        _assert_in_sync(db, index)
+
+        db.deactivate_counselor(b, admin_id=1)
+        _assert_in_sync(db, index)
+        db.reactivate_counselor(b, admin_id=1)
+        _assert_in_sync(db, index)
+        db.set_counselor_availability(b, True)
+        _assert_in_sync(db, index)
+
+        db.ban_counselor(c, admin_id=1)
+        _assert_in_sync(db, index)
+
+        # A fresh rebuild agrees with the incrementally maintained state
+        incremental = sorted(x['counselor_id'] for x in index.get_candidates())
+        index.rebuild()
+        assert sorted(x['counselor_id'] for x in index.get_candidates()) == incremental
+        db.close()
+
+
+def test_rebuild_queries_outside_the_lock():
+    """Writers are not blocked by a rebuild, and their events land on its snapshot"""
+    if USE_POSTGRES:
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = CounselingDatabase(os.path.join(tmp, 'index_test.db'))
+        db.add_user(101)
+        counselor_id = db.register_counselor(101, "C101", "bio", ['other'])
+        db.approve_counselor(counselor_id, admin_id=1)
+        index = CounselorIndex(db)
+        index.rebuild()
+
+        query = db.get_open_session_assignments
+        writers_done = []
+
+        def slow_query():
+            # Another thread writes while the rebuild is between its two queries
+            writer = threading.Thread(target=lambda: (db.set_counselor_availability(counselor_id, False),
+                                                      db.update_counselor_info(counselor_id, bio="new bio")))
+            writer.start()
+            writer.join(timeout=5)
+            writers_done.append(not writer.is_alive())
+            return query()
+
+        db.get_open_session_assignments = slow_query
+        index.rebuild()
+        db.get_open_session_assignments = query
+
+        assert writers_done == [True], "listener blocked behind the rebuild"
+        assert index.get_counselor(counselor_id)['is_available'] == 0
+        assert index.get_counselor(counselor_id)['bio'] == "new bio"
+        _assert_in_sync(db, index)
+        db.close()
+
+
+def test_matcher_uses_index_without_counselor_queries():
+    """find_best_match with a session row in hand never asks the database for counselors"""
+    if USE_POSTGRES:
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = CounselingDatabase(os.path.join(tmp, 'index_test.db'))
+        db.add_user(101)
+        counselor_id = db.register_counselor(101, "C101", "bio", ['other'])
+        db.approve_counselor(counselor_id, admin_id=1)
+        db.add_user(500)
+        session_id = db.create_session_request(500, 'other')
+
+        matcher = CounselingMatcher(db, index=CounselorIndex(db))
+        matcher.index.rebuild()
+        session = db.get_session(session_id)
+
+        checkouts_before = db.get_pool_stats()['checkouts']
+        assert matcher.find_best_match(session_id, session=session) == counselor_id
+        assert db.get_pool_stats()['checkouts'] == checkouts_before
+        db.close()
+
+
+if __name__ == '__main__':
+    test_index_tracks_writes()
+    test_rebuild_queries_outside_the_lock()
+    test_matcher_uses_index_without_counselor_queries()
+    print("✅ Counselor index tests passed")
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Test script for the admin dashboard snapshots
+Verifies that reads cost no queries, snapshots are read-only and refreshes are shared
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from counseling_database import CounselingDatabase, USE_POSTGRES
+from dashboard_snapshot import DashboardSnapshotService
+
+
+def _setup(tmp):
+    db = CounselingDatabase(os.path.join(tmp, 'dashboard_test.db'))
+    db.add_user(101)
+    counselor_id = db.register_counselor(101, "Counselor", "bio", ['other'])
+    db.approve_counselor(counselor_id, admin_id=1)
+    db.add_user(500)
+    db.create_session_request(500, 'other')
+    db.create_session_request(500, 'other')
+    db.create_session_request(500, 'academic_career')
+    return db
+
+
+def test_reads_are_free_and_snapshots_read_only():
+    """Once computed, views read the snapshot without touching the database"""
+    if USE_POSTGRES:
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = _setup(tmp)
+        dashboard = DashboardSnapshotService(db, interval=3600)
+
+        async def main():
+            first = await dashboard.get()
+            checkouts_before = db.get_pool_stats()['checkouts']
+            for _ in range(50):
+                assert await dashboard.get() is first
+                assert dashboard.current is first
+            assert db.get_pool_stats()['checkouts'] == checkouts_before
+            return first
+
+        snapshot = asyncio.run(main())
+        assert snapshot.summary['total_users'] == 2
+        assert snapshot.detailed['pending_sessions'] == 3
+        assert snapshot.matching['total_sessions'] == 3
+        assert dict(snapshot.topic_distribution) == {'other': 2, 'academic_career': 1}
+        assert list(snapshot.topic_distribution) == ['other', 'academic_career']
+
+        try:
+            snapshot.summary['total_users'] = 0
+            assert False, "snapshot mappings must be read-only"
+        except TypeError:
+            pass
+        try:
+            snapshot.computed_at = None
+            assert False, "snapshot fields must be read-only"
+        except AttributeError:
+            pass
+        db.close()
+
+
+def test_forced_and_concurrent_refreshes():
+    """Refresh picks up new writes; simultaneous refreshes run one computation"""
+    if USE_POSTGRES:
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = _setup(tmp)
+        dashboard = DashboardSnapshotService(db, interval=3600)
+
+        async def main():
+            first = await dashboard.get()
+            db.add_user(501)
+            assert (await dashboard.get()).summary['total_users'] == 2  # still the cached one
+
+            refreshed = await dashboard.get(force=True)
+            assert refreshed is not first
+            assert refreshed.computed_at >= first.computed_at
+            assert refreshed.summary['total_users'] == 3
+
+            results = await asyncio.gather(*(dashboard.refresh() for _ in range(10)))
+            assert all(result is results[0] for result in results)
+            return dashboard.refreshes
+
+        assert asyncio.run(main()) == 3
+        db.close()
+
+
+def test_background_loop_keeps_snapshot_fresh():
+    """start() recomputes every interval until stopped"""
+    if USE_POSTGRES:
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = _setup(tmp)
+        dashboard = DashboardSnapshotService(db, interval=0.05)
+
+        async def main():
+            asyncio.create_task(dashboard.start())
+            await asyncio.sleep(0.01)
+            db.add_user(501)
+            await asyncio.sleep(0.2)
+            await dashboard.stop()
+
+        asyncio.run(main())
+        assert dashboard.refreshes >= 2
+        assert dashboard.current.summary['total_users'] == 3
+        db.close()
+
+
+if __name__ == '__main__':
+    test_reads_are_free_and_snapshots_read_only()
+    test_forced_and_concurrent_refreshes()
+    test_background_loop_keeps_snapshot_fresh()
+    print("✅ Dashboard snapshot tests passed")
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Test script for the database retry policy
+Verifies error classification, backoff retries, metrics and non-blocking async retries
+"""
+
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from db_retry import classify_error, retry_on_locked, retry_on_transient, retry_metrics, retry_async, RetryPolicy
+
+
+class _PgError(Exception):
+    def __init__(self, pgcode):
+        super().__init__(pgcode)
+        self.pgcode = pgcode
+
+
+def test_classify_error():
+    """Only lock, busy, serialization and deadlock errors are transient"""
+    assert classify_error(sqlite3.OperationalError("database is locked")) == 'sqlite_locked'
+    assert classify_error(sqlite3.OperationalError("database is busy")) == 'sqlite_busy'
+    assert classify_error(sqlite3.OperationalError("no such table: users")) is None
+    assert classify_error(sqlite3.IntegrityError("UNIQUE constraint failed")) is None
+    assert classify_error(_PgError('40001')) == 'pg_serialization_failure'
+    assert classify_error(_PgError('40P01')) == 'pg_deadlock'
+    assert classify_error(_PgError('23505')) is None
+
+
+def test_sync_retry_recovers_and_counts():
+    """Transient failures are retried; other errors are raised at once"""
+    retry_metrics.reset()
+    calls = []
+
+    @retry_on_transient(max_retries=3, base_delay=0.001)
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise sqlite3.OperationalError("database is locked")
+        return 'done'
+
+    assert flaky() == 'done'
+    assert len(calls) == 3
+
+    @retry_on_transient(max_retries=3, base_delay=0.001)
+    def broken():
+        calls.append(1)
+        raise sqlite3.OperationalError("no such column: foo")
+
+    calls.clear()
+    try:
+        broken()
+        assert False, "non-transient errors must propagate"
+    except sqlite3.OperationalError:
+        pass
+    assert len(calls) == 1
+
+    @retry_on_transient(max_retries=2, base_delay=0.001)
+    def always_locked():
+        raise sqlite3.OperationalError("database is locked")
+
+    try:
+        always_locked()
+        assert False, "should give up after max_retries"
+    except sqlite3.OperationalError:
+        pass
+
+    stats = retry_metrics.snapshot()
+    print(f"Retry stats: {stats}")
+    assert stats['retries'] == 4
+    assert stats['recovered'] == 1
+    assert stats['giveups'] == 1
+    assert stats['by_error'] == {'sqlite_locked': 4}
+
+
+def test_retry_on_locked_counts_attempts():
+    """retry_on_locked(max_retries=n) still makes n attempts in total"""
+    calls = []
+
+    @retry_on_locked(max_retries=3, delay=0.001)
+    def always_locked():
+        calls.append(1)
+        raise sqlite3.OperationalError("database is locked")
+
+    try:
+        always_locked()
+        assert False, "should give up"
+    except sqlite3.OperationalError:
+        pass
+    assert len(calls) == 3
+
+
+def test_retried_method_releases_its_connection():
+    """A failed attempt has handed its connection back before the retry checks one out"""
+    from counseling_database import CounselingDatabase, USE_POSTGRES
+    if USE_POSTGRES:
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = CounselingDatabase(os.path.join(tmp, 'retry_test.db'))
+        session_id = db.create_session_request(987650101, 'academic_career', 'exam stress')
+        depths = []
+        kept = []  # e.g. an error reporter holding on to the traceback
+        original = db._bump_stats
+
+        def locked_once(cursor, deltas):
+            depths.append(db.pool._depth.get(id(cursor.connection)))
+            if len(depths) == 1:
+                kept.append(sqlite3.OperationalError("database is locked"))
+                raise kept[0]
+            return original(cursor, deltas)
+
+        db._bump_stats = locked_once
+        db.end_session(session_id)
+        db._bump_stats = original
+
+        assert depths == [1, 1], f"connection still checked out during the retry: {depths}"
+        assert db.get_session(session_id)['status'] == 'ended'
+        db.close()
+
+
+def test_async_retry_does_not_block_loop():
+    """Backoff in retry_async yields to other tasks instead of sleeping a thread"""
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise sqlite3.OperationalError("database is locked")
+        return len(calls)
+
+    async def run(func, *args):
+        return func(*args)  # inline "executor" - any blocking sleep would stall the ticker
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.005)
+
+        task = asyncio.create_task(ticker())
+        result = await retry_async(run, flaky, RetryPolicy(max_retries=3, base_delay=0.05, max_delay=0.05))
+        task.cancel()
+        return result, ticks
+
+    random_state = RetryPolicy.backoff
+    RetryPolicy.backoff = lambda self, attempt: self.max_delay  # deterministic 50 ms waits
+    try:
+        result, ticks = asyncio.run(main())
+    finally:
+        RetryPolicy.backoff = random_state
+
+    assert result == 3
+    assert ticks >= 10, f"event loop was blocked during backoff (ticks={ticks})"
+
+
+if __name__ == '__main__':
+    test_classify_error()
+    test_sync_retry_recovers_and_counts()
+    test_retry_on_locked_counts_attempts()
+    test_retried_method_releases_its_connection()
+    test_async_retry_does_not_block_loop()
+    print("✅ Retry policy tests passed")
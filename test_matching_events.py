@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Test script for event-driven matching
+Verifies that database events trigger debounced, targeted matching passes
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from counseling_database import CounselingDatabase, USE_POSTGRES
+from matching_events import MatchingEventBus
+from matching_system import CounselingMatcher
+
+
+def _setup(tmp):
+    db = CounselingDatabase(os.path.join(tmp, 'events_test.db'))
+    db.max_sessions_per_counselor = 2
+    db.add_user(101)
+    counselor_id = db.register_counselor(101, "Counselor", "bio", ['other'])
+    db.approve_counselor(counselor_id, admin_id=1)
+    db.set_counselor_availability(counselor_id, False)
+    db.add_user(500)
+    return db, counselor_id
+
+
+def test_counselor_online_matches_waiting_sessions():
+    """Sessions that arrived while nobody was free are matched once a counselor comes online"""
+    if USE_POSTGRES:
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db, counselor_id = _setup(tmp)
+        matcher = CounselingMatcher(db)
+        notified = []
+
+        async def on_matched(pairs):
+            notified.extend(pairs)
+
+        async def main():
+            bus = MatchingEventBus(db, matcher, on_matched=on_matched, debounce=0.05)
+            bus.start()
+            waiting = [await bus.async_db.create_session_request(500, 'other') for _ in range(3)]
+            await asyncio.sleep(0.2)
+            assert notified == []  # nobody online yet
+
+            await bus.async_db.set_counselor_availability(counselor_id, True)
+            await asyncio.sleep(0.2)
+            await bus.stop()
+            return bus, waiting
+
+        bus, waiting = asyncio.run(main())
+
+        # Capacity is 2, so the two oldest go to the counselor and the third keeps waiting
+        assert sorted(notified) == [(waiting[0], counselor_id), (waiting[1], counselor_id)]
+        assert db.get_session(waiting[2])['status'] == 'requested'
+
+        # Ending a session frees a slot, which pulls in the next waiting session
+        async def after_end():
+            bus.start()
+            await bus.async_db.end_session(waiting[0])
+            await bus.run_pending()
+            await bus.stop()
+
+        asyncio.run(after_end())
+        assert notified[-1] == (waiting[2], counselor_id)
+        db.close()
+
+
+def test_bursts_are_debounced():
+    """Many triggers inside the debounce window lead to a single pass"""
+    if USE_POSTGRES:
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db, counselor_id = _setup(tmp)
+        passes = []
+
+        async def on_matched(pairs):
+            passes.append(pairs)
+
+        async def main():
+            bus = MatchingEventBus(db, CounselingMatcher(db), on_matched=on_matched, debounce=0.1)
+            bus.start()
+            await bus.async_db.set_counselor_availability(counselor_id, True)
+            for _ in range(5):
+                await bus.async_db.create_session_request(500, 'other')
+            await asyncio.sleep(0.3)
+            await bus.stop()
+            return bus
+
+        bus = asyncio.run(main())
+        assert bus.stats()['events'] == 6
+        assert bus.stats()['passes'] == 1
+        assert len(passes) == 1 and len(passes[0]) == 2
+        db.close()
+
+
+def test_freed_counselor_takes_only_topics_they_serve():
+    """Waiting sessions in other topics do not use up a counselor's pass"""
+    if USE_POSTGRES:
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db, counselor_id = _setup(tmp)
+        notified = []
+
+        async def on_matched(pairs):
+            notified.extend(pairs)
+
+        async def main():
+            bus = MatchingEventBus(db, CounselingMatcher(db), on_matched=on_matched, debounce=0.01)
+            bus.start()
+            # Crisis requests nobody online can serve sit at the head of the queue
+            for _ in range(3):
+                await bus.async_db.create_session_request(500, 'crisis_substance')
+            servable = await bus.async_db.create_session_request(500, 'other')
+            await bus.async_db.set_counselor_availability(counselor_id, True)
+            await bus.run_pending()
+            await bus.stop()
+            return servable
+
+        servable = asyncio.run(main())
+        assert notified == [(servable, counselor_id)]
+        db.close()
+
+
+def test_events_without_new_capacity_are_ignored():
+    """Going offline, rejections and sessions ended before matching trigger nothing"""
+    if USE_POSTGRES:
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db, counselor_id = _setup(tmp)
+        bus = MatchingEventBus(db, CounselingMatcher(db), debounce=0.01)
+
+        async def main():
+            bus.start()
+            await bus.async_db.set_counselor_availability(counselor_id, False)
+            await bus.async_db.reject_counselor(counselor_id)
+            await asyncio.sleep(0.05)
+            await bus.stop()
+
+        asyncio.run(main())
+        assert bus.stats() == {'events': 0, 'passes': 0, 'matched': 0, 'waiting_triggers': 0}
+        db.close()
+
+
+if __name__ == '__main__':
+    test_counselor_online_matches_waiting_sessions()
+    test_bursts_are_debounced()
+    test_freed_counselor_takes_only_topics_they_serve()
+    test_events_without_new_capacity_are_ignored()
+    print("✅ Matching event bus tests passed")
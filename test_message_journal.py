@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Test script for the write-behind message journal
+Verifies batching, ordering, the flush-on-close guarantee, failed-flush recovery,
+dead-lettering of rows that can never be written and the queue bound
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from counseling_database import CounselingDatabase, USE_POSTGRES
+from message_journal import MessageJournal
+
+
+def _session(db):
+    db.add_user(500)
+    return db.create_session_request(500, 'other')
+
+
+def test_messages_are_written_in_batches():
+    """Appends are batched into few transactions and keep their order"""
+    if USE_POSTGRES:
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = CounselingDatabase(os.path.join(tmp, 'journal_test.db'))
+        session_id = _session(db)
+        journal = MessageJournal(db, batch_size=50, flush_interval=60)
+
+        checkouts_before = db.get_pool_stats()['checkouts']
+        for i in range(120):
+            journal.append(session_id, 'user', 500, f"message {i}")
+
+        # A full batch wakes the flusher long before the 60 s interval
+        deadline = time.time() + 5
+        while journal.stats()['written'] < 50 and time.time() < deadline:
+            time.sleep(0.01)
+        assert journal.stats()['written'] >= 50
+
+        journal.close()
+        stats = journal.stats()
+        assert stats['written'] == 120 and stats['pending'] == 0
+        assert stats['flushes'] <= 3
+        assert db.get_pool_stats()['checkouts'] - checkouts_before == stats['flushes']
+
+        texts = [m['message_text'] for m in db.get_session_messages(session_id, limit=200)]
+        assert texts == [f"message {i}" for i in range(120)]
+        db.close()
+
+
+def test_interval_flush_and_failed_flush():
+    """Quiet periods still flush within the interval; transiently failed rows are retried, not lost"""
+    if USE_POSTGRES:
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = CounselingDatabase(os.path.join(tmp, 'journal_test.db'))
+        session_id = _session(db)
+        journal = MessageJournal(db, batch_size=1000, flush_interval=0.05)
+
+        journal.append(session_id, 'user', 500, "hello")
+        deadline = time.time() + 5
+        while db.count_session_messages(session_id) == 0 and time.time() < deadline:
+            time.sleep(0.01)
+        assert db.count_session_messages(session_id) == 1
+
+        original = db.add_messages_bulk
+
+        def failing(messages, status_updates=None):
+            raise sqlite3.OperationalError("database is locked")
+
+        db.add_messages_bulk = failing
+        journal.append(session_id, 'counselor', 101, "reply")
+        time.sleep(0.2)
+        assert journal.pending_count() == 1
+        assert journal.stats()['failed_flushes'] >= 1
+
+        db.add_messages_bulk = original
+        journal.close()
+        assert db.count_session_messages(session_id) == 2
+        db.close()
+
+
+def test_bad_rows_are_dead_lettered():
+    """A row that can never be written is set aside; the rest of its batch and later ones are saved"""
+    if USE_POSTGRES:
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = CounselingDatabase(os.path.join(tmp, 'journal_test.db'))
+        session_id = _session(db)
+        journal = MessageJournal(db, batch_size=1000, flush_interval=60)
+
+        for i in range(10):
+            # message_text is NOT NULL: message 6 fails with an IntegrityError
+            journal.append(session_id, 'user', 500, None if i == 6 else f"message {i}", relay_key=f"k{i}")
+        journal.set_delivery_status('k2', 'failed')
+        assert journal.flush() == 9
+
+        texts = [m['message_text'] for m in db.get_session_messages(session_id)]
+        assert texts == [f"message {i}" for i in range(10) if i != 6]
+        statuses = {m['relay_key']: m['delivery_status'] for m in db.get_session_messages(session_id)}
+        assert statuses['k2'] == 'failed'
+        stats = journal.stats()
+        assert stats['pending'] == 0 and stats['dead_lettered'] == 1
+        assert journal.dead_letters[0][0][5] == 'k6'
+
+        journal.append(session_id, 'user', 500, "after")
+        journal.close()
+        assert db.count_session_messages(session_id) == 10
+        db.close()
+
+
+def test_queue_is_bounded():
+    """While the database is unavailable the queue stops growing at max_pending"""
+    if USE_POSTGRES:
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = CounselingDatabase(os.path.join(tmp, 'journal_test.db'))
+        session_id = _session(db)
+        journal = MessageJournal(db, batch_size=1000, flush_interval=60, max_pending=5)
+
+        results = [journal.append(session_id, 'user', 500, f"message {i}") for i in range(8)]
+        assert results == [True] * 5 + [False] * 3
+        assert journal.stats()['pending'] == 5 and journal.stats()['dropped'] == 3
+        journal.close()
+        assert db.count_session_messages(session_id) == 5
+        db.close()
+
+
+if __name__ == '__main__':
+    test_messages_are_written_in_batches()
+    test_interval_flush_and_failed_flush()
+    test_bad_rows_are_dead_lettered()
+    test_queue_is_bounded()
+    print("✅ Message journal tests passed")
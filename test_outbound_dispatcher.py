@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Test script for the outbound message dispatcher
+Verifies per-chat ordering, rate limits, RetryAfter handling and burst coalescing
+"""
+
+import asyncio
+import os
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from telegram.error import Forbidden, RetryAfter
+
+from outbound_dispatcher import OutboundDispatcher
+
+
+class FakeBot:
+    def __init__(self, failures=None):
+        self.failures = failures or {}   # text -> list of exceptions to raise first
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        errors = self.failures.get(text)
+        if errors:
+            raise errors.pop(0)
+        await asyncio.sleep(0)
+        self.sent.append((chat_id, text, time.monotonic()))
+        return f"message:{chat_id}:{len(self.sent)}"
+
+
+def test_per_chat_order_and_rate_limits():
+    """Each chat keeps its order and no bucket is ever overdrawn"""
+    async def main():
+        bot = FakeBot()
+        outbound = OutboundDispatcher(bot, global_rate=40, per_chat_rate=20, per_chat_burst=1, coalesce=False)
+        sends = [outbound.send_message(chat_id=chat, text=f"{chat}-{i}", reply_markup='kb')
+                 for i in range(6) for chat in (1, 2, 3)]
+        start = time.monotonic()
+        await asyncio.gather(*sends)
+        return bot, outbound, time.monotonic() - start
+
+    bot, outbound, elapsed = asyncio.run(main())
+
+    for chat in (1, 2, 3):
+        texts = [text for chat_id, text, _ in bot.sent if chat_id == chat]
+        assert texts == [f"{chat}-{i}" for i in range(6)]
+        times = [t for chat_id, _, t in bot.sent if chat_id == chat]
+        assert times[-1] - times[0] >= 5 / 20 * 0.9  # 20/s per chat, no burst
+
+    # 18 sends with 40 banked global tokens are only held back by the chat buckets
+    assert elapsed < 1.0
+    stats = outbound.stats()
+    assert stats['sent'] == 18 and stats['queue_depth'] == 0 and stats['active_chats'] == 0
+    assert stats['max_queue_depth'] >= 15
+
+
+def test_retry_after_is_honored():
+    """Flood control pauses sending and the message is retried in place"""
+    async def main():
+        bot = FakeBot(failures={'first': [RetryAfter(1)]})
+        outbound = OutboundDispatcher(bot, global_rate=100, per_chat_rate=100, per_chat_burst=10)
+        start = time.monotonic()
+        first = outbound.send_message(chat_id=1, text='first', reply_markup='kb')
+        second = outbound.send_message(chat_id=1, text='second', reply_markup='kb')
+        other = outbound.send_message(chat_id=2, text='other', reply_markup='kb')
+        await asyncio.gather(first, second, other)
+        return bot, outbound, time.monotonic() - start
+
+    bot, outbound, elapsed = asyncio.run(main())
+    assert [text for chat_id, text, _ in bot.sent if chat_id == 1] == ['first', 'second']
+    assert elapsed >= 0.95
+    assert outbound.stats()['retry_after_count'] == 1
+
+
+def test_failures_reach_the_caller():
+    """Non-retryable errors are raised from send_message like Bot.send_message"""
+    async def main():
+        bot = FakeBot(failures={'blocked': [Forbidden("bot was blocked by the user")]})
+        outbound = OutboundDispatcher(bot, global_rate=100, per_chat_rate=100, per_chat_burst=10)
+        try:
+            await outbound.send_message(chat_id=1, text='blocked')
+            assert False, "Forbidden must propagate"
+        except Forbidden:
+            pass
+        assert await outbound.send_message(chat_id=1, text='next') is not None
+        return outbound
+
+    outbound = asyncio.run(main())
+    assert outbound.stats()['failed'] == 1 and outbound.stats()['sent'] == 1
+
+
+def test_bursts_are_coalesced():
+    """Plain messages queued behind a busy chat go out as one send"""
+    async def main():
+        bot = FakeBot()
+        outbound = OutboundDispatcher(bot, global_rate=100, per_chat_rate=10, per_chat_burst=1)
+        await outbound.send_message(chat_id=1, text="line 0", parse_mode='Markdown')
+        results = await asyncio.gather(*(outbound.send_message(chat_id=1, text=f"line {i}", parse_mode='Markdown')
+                                         for i in range(1, 5)))
+        return bot, outbound, results
+
+    bot, outbound, results = asyncio.run(main())
+    # The chat's only token went to the first message; the burst behind it is merged
+    assert [text for _, text, _ in bot.sent] == ["line 0", "line 1\n\nline 2\n\nline 3\n\nline 4"]
+    assert len(set(results)) == 1
+    assert outbound.stats()['coalesced'] == 3
+
+
+def test_notify_does_not_wait_for_the_bucket():
+    """Handlers queue notifications and return at once; failures are only logged"""
+    async def main():
+        bot = FakeBot(failures={'blocked': [Forbidden("bot was blocked by the user")]})
+        outbound = OutboundDispatcher(bot, global_rate=100, per_chat_rate=2, per_chat_burst=1)
+        start = time.monotonic()
+        for i in range(3):
+            outbound.notify(chat_id=1, text=f"update {i}", reply_markup='kb')
+        outbound.notify(chat_id=2, text='blocked')
+        queued_in = time.monotonic() - start
+        await outbound.drain(timeout=5)
+        return bot, outbound, queued_in
+
+    bot, outbound, queued_in = asyncio.run(main())
+    assert queued_in < 0.05  # three sends to one chat at 2/s would take a second
+    assert [text for _, text, _ in bot.sent] == ["update 0", "update 1", "update 2"]
+    assert outbound.stats()['failed'] == 1
+
+
+if __name__ == '__main__':
+    test_per_chat_order_and_rate_limits()
+    test_retry_after_is_honored()
+    test_failures_reach_the_caller()
+    test_bursts_are_coalesced()
+    test_notify_does_not_wait_for_the_bucket()
+    print("✅ Outbound dispatcher tests passed")
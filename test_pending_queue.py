@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Test script for the in-memory pending session queue
+Verifies queue order with aging, per-topic lookups and that events keep it in line with the database
+"""
+
+import os
+import sys
+import tempfile
+import threading
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from counseling_database import CounselingDatabase, USE_POSTGRES
+from pending_queue import PendingQueue
+
+
+def _session(session_id, topic, priority, created_at):
+    return {'session_id': session_id, 'topic': topic, 'priority': priority, 'created_at': created_at}
+
+
+def test_order_topics_and_aging():
+    """Crisis requests go first, but only until older requests have aged past them"""
+    if USE_POSTGRES:
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = CounselingDatabase(os.path.join(tmp, 'queue_test.db'))
+        queue = PendingQueue(db, aging_seconds=60)
+        queue.ensure_loaded()
+
+        queue.push(_session(1, 'other', 0, '2026-01-01 10:00:00'))
+        queue.push(_session(2, 'academic_career', 0, '2026-01-01 10:05:00'))
+        queue.push(_session(3, 'crisis_substance', 10, '2026-01-01 10:06:00'))    # counts as 09:56
+        queue.push(_session(4, 'other', 10, '2026-01-01 10:20:00'))               # counts as 10:10
+        queue.push(_session(5, 'academic_career', 0, '2026-01-01 10:07:00'))
+
+        assert [s['session_id'] for s in queue.peek(10)] == [3, 1, 2, 5, 4]
+        assert [s['session_id'] for s in queue.peek(2, topics=['other', 'academic_career'])] == [1, 2]
+        assert [s['session_id'] for s in queue.peek(5, topics=['mental_emotional'])] == []
+
+        # peek does not consume; removals and re-queues keep one entry per session
+        assert len(queue) == 5
+        queue.remove(1)
+        queue.push(_session(2, 'academic_career', 0, '2026-01-01 10:05:00'))
+        assert [s['session_id'] for s in queue.peek(10)] == [3, 2, 5, 4]
+        assert queue.get(1) is None and queue.get(2)['topic'] == 'academic_career'
+        db.close()
+
+
+def test_queue_follows_database_writes():
+    """Requests, matches, releases and cancellations keep the queue equal to the database"""
+    if USE_POSTGRES:
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = CounselingDatabase(os.path.join(tmp, 'queue_test.db'))
+        db.add_user(101)
+        counselor_id = db.register_counselor(101, "Counselor", "bio", ['other'])
+        db.approve_counselor(counselor_id, admin_id=1)
+        db.add_user(500)
+
+        early = db.create_session_request(500, 'other')
+        queue = PendingQueue(db)
+        assert [s['session_id'] for s in queue.peek(10)] == [early]  # loaded from the database
+
+        regular = [db.create_session_request(500, 'other', "need help") for _ in range(3)]
+        crisis = db.create_session_request(500, 'crisis_substance')
+
+        def _in_sync():
+            expected = [s['session_id'] for s in db.get_pending_sessions(limit=None)]
+            assert sorted(s['session_id'] for s in queue.peek(100)) == sorted(expected)
+
+        _in_sync()
+        assert queue.peek(1)[0]['session_id'] == crisis
+        assert queue.get(regular[0])['description'] == "need help"
+
+        db.match_session_with_counselor(regular[0], counselor_id)
+        db.end_session(regular[1], 'cancelled')
+        _in_sync()
+
+        db.release_session(regular[0])
+        _in_sync()
+
+        checkouts_before = db.get_pool_stats()['checkouts']
+        for _ in range(100):
+            queue.peek(10)
+        assert db.get_pool_stats()['checkouts'] == checkouts_before
+
+        # Writers are not blocked by a rebuild, and their events land on its snapshot
+        query = db.get_pending_sessions
+        writers_done = []
+        added = []
+
+        def slow_query(limit=None):
+            snapshot = query(limit=limit)
+            writer = threading.Thread(target=lambda: (added.append(db.create_session_request(500, 'other')),
+                                                      db.match_session_with_counselor(early, counselor_id)))
+            writer.start()
+            writer.join(timeout=5)
+            writers_done.append(not writer.is_alive())
+            return snapshot
+
+        db.get_pending_sessions = slow_query
+        queue.rebuild()
+        db.get_pending_sessions = query
+        assert writers_done == [True], "listener blocked behind the rebuild"
+        assert queue.get(added[0]) is not None and queue.get(early) is None
+        _in_sync()
+        db.close()
+
+
+if __name__ == '__main__':
+    test_order_topics_and_aging()
+    test_queue_follows_database_writes()
+    print("✅ Pending queue tests passed")
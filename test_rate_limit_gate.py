@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Test script for the pre-dispatch rate limit gate
+Verifies update classification, that over-limit updates stop before the
+handlers, per-action limits from the environment and the dropped counters
+"""
+
+import asyncio
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from telegram.ext import ApplicationHandlerStop
+
+import rate_limiter
+from rate_limiter import MemoryRateLimiter, rate_limit
+from rate_limit_gate import RateLimitGate, classify_update
+
+
+class FakeUser:
+    def __init__(self, user_id):
+        self.id = user_id
+
+
+class FakeMessage:
+    def __init__(self):
+        self.replies = []
+
+    async def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+
+
+class FakeQuery:
+    def __init__(self, data):
+        self.data = data
+        self.alerts = []
+
+    async def answer(self, text=None, show_alert=False):
+        self.alerts.append(text)
+
+
+class FakeUpdate:
+    def __init__(self, user_id, data=None, message=None):
+        self.effective_user = FakeUser(user_id)
+        self.callback_query = FakeQuery(data) if data is not None else None
+        self.effective_message = message
+
+
+def _dispatch(gate, update):
+    """True if the update would reach the handlers"""
+    try:
+        asyncio.run(gate(update, None))
+        return True
+    except ApplicationHandlerStop:
+        return False
+
+
+def test_classification():
+    # Menu navigation is never a session request, even the "Request Counseling" button
+    assert classify_update(FakeUpdate(1, data='request_counseling')) == 'button_click'
+    assert classify_update(FakeUpdate(1, data='topic_other')) == 'button_click'
+    assert classify_update(FakeUpdate(1, message=FakeMessage())) == 'message'
+    assert classify_update(FakeUpdate(1)) is None
+
+
+def test_over_limit_updates_stop_at_the_gate():
+    """Messages past the limit are dropped with one warning; admins and other actions pass"""
+    os.environ['RATE_LIMIT_MESSAGE'] = '3/60'
+    os.environ['RATE_LIMIT_SESSION_REQUEST'] = 'not-a-limit'
+    try:
+        limiter = MemoryRateLimiter()
+    finally:
+        del os.environ['RATE_LIMIT_MESSAGE']
+        del os.environ['RATE_LIMIT_SESSION_REQUEST']
+    assert limiter.limits['message'] == (3, 60)
+    assert limiter.limits['session_request'] == (3, 3600)
+
+    gate = RateLimitGate(limiter, exempt_user_ids=[999])
+    message = FakeMessage()
+    results = [_dispatch(gate, FakeUpdate(1, message=message)) for _ in range(6)]
+    assert results == [True, True, True, False, False, False]
+    assert len(message.replies) == 1  # one warning, not one per dropped update
+
+    # Button presses are limited separately and always answered
+    query_update = FakeUpdate(1, data='main_menu')
+    assert _dispatch(gate, query_update) and query_update.callback_query.alerts == []
+
+    limiter.limits['button_click'] = (2, 60)
+    assert _dispatch(gate, FakeUpdate(1, data='request_counseling'))
+    blocked = FakeUpdate(1, data='topic_other')
+    assert not _dispatch(gate, blocked) and len(blocked.callback_query.alerts) == 1
+
+    assert all(_dispatch(gate, FakeUpdate(999, message=FakeMessage())) for _ in range(10))
+
+    stats = gate.stats()
+    assert stats['dropped'] == {'message': 3, 'button_click': 1}
+    assert stats['dropped_total'] == 4
+    assert stats['passed'] == {'message': 3, 'button_click': 2}
+
+
+def test_session_submissions_are_charged_as_session_requests():
+    """Only the handlers that create a session spend the session_request allowance"""
+    limiter = MemoryRateLimiter()
+    limiter.limits['session_request'] = (2, 3600)
+    created = []
+
+    @rate_limit('session_request', exempt_user_ids=[99])
+    async def skip_description(update, context):
+        created.append(update.effective_user.id)
+
+    original, rate_limiter.rate_limiter = rate_limiter.rate_limiter, limiter
+    try:
+        updates = [FakeUpdate(1, data='skip_description') for _ in range(3)]
+        for update in updates:
+            asyncio.run(skip_description(update, None))
+        # Admins are exempt here too, as at the gate
+        for _ in range(3):
+            asyncio.run(skip_description(FakeUpdate(99, data='skip_description'), None))
+    finally:
+        rate_limiter.rate_limiter = original
+
+    assert skip_description.__name__ == 'skip_description'
+    assert created == [1, 1, 99, 99, 99]
+    assert updates[2].callback_query.alerts and not updates[0].callback_query.alerts
+
+
+if __name__ == '__main__':
+    test_classification()
+    test_over_limit_updates_stop_at_the_gate()
+    test_session_submissions_are_charged_as_session_requests()
+    print("✅ Rate limit gate tests passed")
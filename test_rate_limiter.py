@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Test script for the rate limiter
+Verifies burst and refill behaviour, idle key eviction, the memory cap
+and limits shared through the database backend
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from counseling_database import CounselingDatabase, USE_POSTGRES
+from rate_limiter import MemoryRateLimiter, SQLRateLimiter
+
+
+def test_burst_then_refill():
+    """max_actions pass at once, then one more every time_window / max_actions"""
+    limiter = MemoryRateLimiter()
+    limiter.limits['session_request'] = (3, 3600)
+
+    assert all(limiter.check_rate_limit(1, 'session_request', now=0)[0] for _ in range(3))
+    assert limiter.check_rate_limit(1, 'session_request', now=0) == (False, 1200)
+    assert limiter.check_rate_limit(1, 'session_request', now=1000) == (False, 200)
+    assert limiter.check_rate_limit(1, 'session_request', now=1200) == (True, 0)
+    assert limiter.check_rate_limit(1, 'session_request', now=1201)[0] is False
+
+    # Other users and actions are independent; unknown actions are not limited
+    assert limiter.check_rate_limit(2, 'session_request', now=0) == (True, 0)
+    assert limiter.check_rate_limit(1, 'message', now=0) == (True, 0)
+    assert limiter.check_rate_limit(1, 'unknown_action', now=0) == (True, 0)
+
+    limiter.reset_user(1, 'session_request')
+    assert limiter.check_rate_limit(1, 'session_request', now=1201) == (True, 0)
+    assert limiter.stats()['limited'] == 3
+
+
+def test_idle_keys_are_evicted():
+    """Keys disappear once their users are idle; the table never exceeds max_keys"""
+    limiter = MemoryRateLimiter(max_keys=1000)
+    limiter.limits['message'] = (20, 60)
+
+    for user_id in range(500):
+        limiter.check_rate_limit(user_id, 'message', now=0)
+    assert limiter.stats()['tracked_keys'] == 500
+
+    # Later traffic from a few users sweeps the idle ones out a couple at a time
+    for i in range(300):
+        limiter.check_rate_limit(10000 + i % 5, 'message', now=10 + i)
+    assert limiter.stats()['tracked_keys'] <= 5
+    limiter.cleanup_old_data(now=10000)
+    assert limiter.stats()['tracked_keys'] == 0
+
+    for user_id in range(1500):
+        limiter.check_rate_limit(user_id, 'message', now=20000)
+    stats = limiter.stats()
+    assert stats['tracked_keys'] == 1000 and stats['evicted_keys'] == 500
+
+
+def test_database_backend_is_shared():
+    """Two processes (limiter instances) on one database spend the same allowance"""
+    if USE_POSTGRES:
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = CounselingDatabase(os.path.join(tmp, 'rate_limit_test.db'))
+        worker_a = SQLRateLimiter(db, expire_interval=60)
+        worker_b = SQLRateLimiter(db, expire_interval=60)
+        now = 1_000_000.0
+
+        assert worker_a.check_rate_limit(1, 'session_request', now=now) == (True, 0)
+        assert worker_b.check_rate_limit(1, 'session_request', now=now) == (True, 0)
+        assert worker_a.check_rate_limit(1, 'session_request', now=now) == (True, 0)
+        assert worker_b.check_rate_limit(1, 'session_request', now=now) == (False, 1200)
+        assert worker_a.check_rate_limit(1, 'session_request', now=now + 1200) == (True, 0)
+        assert worker_a.check_rate_limit(2, 'message', now=now) == (True, 0)
+
+        # Idle rows go in one batch, at most once per expire_interval
+        assert worker_b.cleanup_old_data(now=now + 2000) == 1  # user 2's message row
+        worker_b.reset_user(1)
+        assert asyncio.run(worker_b.check_async(1, 'session_request')) == (True, 0)
+        assert worker_a.stats()['allowed'] == 4 and worker_b.stats()['limited'] == 1
+        db.close()
+
+
+if __name__ == '__main__':
+    test_burst_then_refill()
+    test_idle_keys_are_evicted()
+    test_database_backend_is_shared()
+    print("✅ Rate limiter tests passed")
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Test script for the message relay pipeline
+Verifies delivery states, retries of failed sends and that relaying never waits on the database
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from telegram.error import Forbidden, TimedOut
+
+from counseling_database import CounselingDatabase, USE_POSTGRES
+from message_journal import MessageJournal
+from relay_pipeline import RelayPipeline
+
+
+class FakeBot:
+    def __init__(self, failures=()):
+        self.failures = list(failures)
+        self.sent = []
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        if self.failures:
+            raise self.failures.pop(0)
+        self.sent.append((chat_id, text))
+
+
+def _statuses(db, session_id):
+    return [m['delivery_status'] for m in db.get_session_messages(session_id)]
+
+
+def test_delivery_states_and_retry():
+    """Sent, retried-then-sent and permanently failed messages are all recorded"""
+    if USE_POSTGRES:
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = CounselingDatabase(os.path.join(tmp, 'relay_test.db'))
+        db.add_user(500)
+        session_id = db.create_session_request(500, 'other')
+        journal = MessageJournal(db, batch_size=100, flush_interval=60)
+        pipeline = RelayPipeline(journal, max_attempts=3, retry_interval=0)
+
+        async def main():
+            bot = FakeBot(failures=[TimedOut()])
+            assert await pipeline.relay(bot, session_id, 'user', 500, "first", chat_id=101, text="first") is False
+            assert pipeline.stats()['retry_queue'] == 1
+
+            journal.flush()  # status change now has to reach an already written row
+            assert _statuses(db, session_id) == ['queued']
+
+            assert await pipeline.retry_failed(bot) == 1
+            assert bot.sent == [(101, "first")]
+
+            blocked = FakeBot(failures=[Forbidden("bot was blocked by the user")])
+            assert await pipeline.relay(blocked, session_id, 'counselor', 101, "second", chat_id=500, text="second") is False
+            assert pipeline.stats()['retry_queue'] == 0  # permanent errors are not retried
+
+            assert await pipeline.relay(bot, session_id, 'user', 500, "third", chat_id=101, text="third") is True
+
+        asyncio.run(main())
+        journal.close()
+
+        assert _statuses(db, session_id) == ['sent', 'failed', 'sent']
+        assert pipeline.stats() == {'sent': 2, 'failed': 1, 'retried': 1, 'retry_queue': 0}
+        db.close()
+
+
+def test_gives_up_after_max_attempts():
+    """Transient failures are retried up to max_attempts, then marked failed"""
+    if USE_POSTGRES:
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = CounselingDatabase(os.path.join(tmp, 'relay_test.db'))
+        db.add_user(500)
+        session_id = db.create_session_request(500, 'other')
+        journal = MessageJournal(db, flush_interval=60)
+        pipeline = RelayPipeline(journal, max_attempts=2, retry_interval=0)
+
+        async def main():
+            bot = FakeBot(failures=[TimedOut(), TimedOut(), TimedOut()])
+            await pipeline.relay(bot, session_id, 'user', 500, "hello", chat_id=101, text="hello")
+            await pipeline.retry_failed(bot)
+            assert await pipeline.retry_failed(bot) == 0
+
+        asyncio.run(main())
+        journal.close()
+        assert _statuses(db, session_id) == ['failed']
+        db.close()
+
+
+def test_relay_does_not_wait_for_database():
+    """Relay latency is the send alone, even when commits are slow"""
+    if USE_POSTGRES:
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = CounselingDatabase(os.path.join(tmp, 'relay_test.db'))
+        db.add_user(500)
+        session_id = db.create_session_request(500, 'other')
+
+        original = db.add_messages_bulk
+
+        def slow_commit(*args, **kwargs):
+            time.sleep(0.2)
+            return original(*args, **kwargs)
+
+        db.add_messages_bulk = slow_commit
+        journal = MessageJournal(db, batch_size=1, flush_interval=0.01)
+        pipeline = RelayPipeline(journal)
+
+        async def main():
+            bot = FakeBot()
+            start = time.perf_counter()
+            for i in range(5):
+                await pipeline.relay(bot, session_id, 'user', 500, f"m{i}", chat_id=101, text=f"m{i}")
+            return time.perf_counter() - start
+
+        elapsed = asyncio.run(main())
+        assert elapsed < 0.1, f"relay waited on the database ({elapsed:.3f}s)"
+        journal.close()
+        assert db.count_session_messages(session_id) == 5
+        db.close()
+
+
+if __name__ == '__main__':
+    test_delivery_states_and_retry()
+    test_gives_up_after_max_attempts()
+    test_relay_does_not_wait_for_database()
+    print("✅ Relay pipeline tests passed")
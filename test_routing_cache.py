@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Test script for the message routing cache
+Verifies cached routes need no queries and are dropped by every routing write
+"""
+
+import os
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from counseling_database import CounselingDatabase, USE_POSTGRES
+from routing_cache import RoutingCache
+
+
+def test_cached_routes_need_no_queries():
+    """A warm route is served from memory until a write touches it"""
+    if USE_POSTGRES:
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = CounselingDatabase(os.path.join(tmp, 'routing_test.db'))
+        cache = RoutingCache(db, ttl=60)
+
+        db.add_user(101)
+        counselor_id = db.register_counselor(101, "Counselor", "bio", ['other'])
+        db.approve_counselor(counselor_id, admin_id=1)
+        db.add_user(500)
+        session_id = db.create_session_request(500, 'other')
+        db.match_session_with_counselor(session_id, counselor_id)
+        db.start_session(session_id)
+
+        user_route = cache.get_route(500)
+        counselor_route = cache.get_route(101)
+        assert user_route['context']['active_session']['session_id'] == session_id
+        assert user_route['counselor_user_id'] == 101
+        assert [s['session_id'] for s in counselor_route['counselor_sessions']] == [session_id]
+
+        checkouts_before = db.get_pool_stats()['checkouts']
+        for _ in range(20):
+            assert cache.get_route(500) is user_route
+            assert cache.get_route(101) is counselor_route
+        assert db.get_pool_stats()['checkouts'] == checkouts_before
+        assert cache.stats()['hits'] == 40
+
+        # Ending the session drops both ends of it
+        db.end_session(session_id, 'completed')
+        assert cache.lookup(500) is None and cache.lookup(101) is None
+        assert cache.get_route(500)['context']['active_session'] is None
+        assert cache.get_route(101)['counselor_sessions'] == []
+        db.close()
+
+
+def test_routing_writes_invalidate():
+    """Approval, profile edits, matches and transfers all refresh the route"""
+    if USE_POSTGRES:
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = CounselingDatabase(os.path.join(tmp, 'routing_test.db'))
+        cache = RoutingCache(db, ttl=60)
+
+        db.add_user(101)
+        assert cache.get_route(101)['context']['counselor'] is None
+        first = db.register_counselor(101, "First", "bio", ['other'])
+        assert cache.lookup(101) is None
+        assert cache.get_route(101)['context']['is_counselor'] is False
+
+        db.approve_counselor(first, admin_id=1)
+        assert cache.get_route(101)['context']['is_counselor'] is True
+        db.update_counselor_info(first, display_name="Renamed")
+        assert cache.get_route(101)['context']['counselor']['display_name'] == "Renamed"
+
+        db.add_user(102)
+        second = db.register_counselor(102, "Second", "bio", ['other'])
+        db.approve_counselor(second, admin_id=1)
+
+        db.add_user(500)
+        session_id = db.create_session_request(500, 'other')
+        cache.get_route(500)
+        cache.get_route(102)
+        assert db.claim_session(session_id, [first]) == first
+        assert cache.get_route(500)['counselor_user_id'] == 101
+
+        # Transfer: release then match with another counselor
+        cache.get_route(101)
+        db.release_session(session_id)
+        db.match_sessions_bulk([(session_id, second)])
+        assert cache.get_route(500)['counselor_user_id'] == 102
+        assert cache.get_route(101)['counselor_sessions'] == []
+        assert [s['session_id'] for s in cache.get_route(102)['counselor_sessions']] == [session_id]
+
+        db.deactivate_counselor(second, admin_id=1)
+        assert cache.get_route(102)['context']['is_counselor'] is False
+        db.close()
+
+
+def test_write_during_load_is_not_cached():
+    """A route read before a concurrent write lands is served once, not cached"""
+    if USE_POSTGRES:
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = CounselingDatabase(os.path.join(tmp, 'routing_test.db'))
+        cache = RoutingCache(db, ttl=60)
+        db.add_user(500)
+
+        original = db.get_user_context
+
+        def racing_context(user_id):
+            context = original(user_id)
+            cache.handle_event('session_ended', session_id=1, counselor_id=None, user_id=user_id)
+            return context
+
+        db.get_user_context = racing_context
+        cache.get_route(500)
+        assert cache.lookup(500) is None
+        db.get_user_context = original
+        cache.get_route(500)
+        assert cache.lookup(500) is not None
+
+        # Writes to other users (or to nobody in particular) do not stop caching
+        db.add_user(501)
+
+        def unrelated_writes(user_id):
+            context = original(user_id)
+            cache.handle_event('session_ended', session_id=2, counselor_id=None, user_id=502)
+            cache.handle_event('session_matched', session_id=3, counselor_id=77, user_id=None)
+            return context
+
+        db.get_user_context = unrelated_writes
+        cache.get_route(501)
+        db.get_user_context = original
+        assert cache.lookup(501) is not None
+
+        # A counselor's first load is caught by events on their counselor id
+        db.add_user(101)
+        counselor_id = db.register_counselor(101, "Counselor", "bio", ['other'])
+        cache.clear()
+
+        def approval_during_load(user_id):
+            context = original(user_id)
+            cache.handle_event('counselor_status_changed', counselor_id=counselor_id, status='approved')
+            return context
+
+        db.get_user_context = approval_during_load
+        cache.get_route(101)
+        db.get_user_context = original
+        assert cache.lookup(101) is None
+        db.close()
+
+
+if __name__ == '__main__':
+    test_cached_routes_need_no_queries()
+    test_routing_writes_invalidate()
+    test_write_during_load_is_not_cached()
+    print("✅ Routing cache tests passed")
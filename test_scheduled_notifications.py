@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Test script for scheduled match notifications
+Verifies one bot is reused and notifications run concurrently but bounded
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from counseling_database import CounselingDatabase, USE_POSTGRES
+from scheduled_tasks import ScheduledTasksManager, NOTIFY_CONCURRENCY
+
+
+class SlowBot:
+    def __init__(self):
+        self.in_flight = 0
+        self.peak = 0
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(0.02)
+        self.in_flight -= 1
+        self.sent.append(chat_id)
+
+
+def test_notifications_are_bounded_and_share_one_bot():
+    """Every matched counselor is notified through the given bot, a few at a time"""
+    if USE_POSTGRES:
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = CounselingDatabase(os.path.join(tmp, 'notify_test.db'))
+        db.max_sessions_per_counselor = 100
+        db.add_user(101)
+        counselor_id = db.register_counselor(101, "Counselor", "bio", ['other'])
+        db.approve_counselor(counselor_id, admin_id=1)
+
+        db.add_user(500)
+        pairs = []
+        for _ in range(3 * NOTIFY_CONCURRENCY):
+            session_id = db.create_session_request(500, 'other')
+            db.match_session_with_counselor(session_id, counselor_id)
+            pairs.append((session_id, counselor_id))
+        pairs.append((10 ** 6, counselor_id))  # vanished session is skipped quietly
+
+        bot = SlowBot()
+        manager = ScheduledTasksManager(db, bot=bot)
+        asyncio.run(manager.notify_matches(pairs))
+
+        assert bot.sent == [101] * (3 * NOTIFY_CONCURRENCY)
+        assert 1 < bot.peak <= NOTIFY_CONCURRENCY
+        db.close()
+
+
+if __name__ == '__main__':
+    test_notifications_are_bounded_and_share_one_bot()
+    print("✅ Scheduled notification tests passed")
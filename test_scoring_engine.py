@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Test script for the vectorized scoring engine
+Verifies NumPy scores and assignments match the per-counselor scorer exactly
+"""
+
+import os
+import random
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark_scoring import make_counselors, make_sessions
+from matching_system import CounselingMatcher
+from scoring_engine import ScoringEngine, HAS_NUMPY
+
+scalar = CounselingMatcher._calculate_counselor_score.__get__(object())
+
+
+def test_matrix_matches_scalar_scorer():
+    """Every session x counselor score is identical to _calculate_counselor_score"""
+    if not HAS_NUMPY:
+        return
+
+    rng = random.Random(7)
+    counselors = make_counselors(120, rng)
+    sessions = make_sessions(80, rng)
+
+    scores, eligible = ScoringEngine(scalar, use_numpy=True).score_matrix(sessions, counselors)
+    for i, session in enumerate(sessions):
+        for j, counselor in enumerate(counselors):
+            assert scores[i, j] == scalar(counselor, session['topic'], session['priority'])
+            assert eligible[i, j] == (session['topic'] in counselor['specializations'])
+
+
+def test_assignments_match_python_fallback():
+    """Batch assignment picks the same counselors with and without NumPy"""
+    if not HAS_NUMPY:
+        return
+
+    rng = random.Random(11)
+    counselors = make_counselors(60, rng)
+    sessions = make_sessions(150, rng)
+    capacity = [3 - c['active_session_count'] for c in counselors]
+
+    python_result = ScoringEngine(scalar, use_numpy=False).assign(sessions, counselors, capacity, 15.0)
+    numpy_result = ScoringEngine(scalar, use_numpy=True).assign(sessions, counselors, capacity, 15.0)
+    assert numpy_result == python_result
+    assert len(numpy_result) > 0
+
+
+if __name__ == '__main__':
+    test_matrix_matches_scalar_scorer()
+    test_assignments_match_python_fallback()
+    print("✅ Scoring engine tests passed")
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Test script for the session lifecycle log and lifecycle indexes
+Verifies matched_at is written, every lifecycle step is logged with its actor,
+and the lifecycle queries use the composite indexes
+"""
+
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from counseling_database import CounselingDatabase, USE_POSTGRES
+from matching_system import CounselingMatcher
+
+
+def _setup(tmp):
+    db = CounselingDatabase(os.path.join(tmp, 'events_log_test.db'))
+    counselors = []
+    for user_id in (101, 102):
+        db.add_user(user_id)
+        counselor_id = db.register_counselor(user_id, f"C{user_id}", "bio", ['other'])
+        db.approve_counselor(counselor_id, admin_id=1)
+        counselors.append(counselor_id)
+    db.add_user(500)
+    return db, counselors
+
+
+def test_session_request_returns_id_and_logs_it():
+    """The new session's id is returned, logged and sent with session_requested (on both backends)"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db = CounselingDatabase(os.path.join(tmp, 'events_id_test.db'))
+        db.add_user(987650001)
+        requested = []
+        db.add_listener(lambda event, **payload: requested.append(payload['session_id'])
+                        if event == 'session_requested' else None)
+
+        session_id = db.create_session_request(987650001, 'other', "exam stress")
+        assert isinstance(session_id, int)
+        assert db.get_session(session_id)['user_id'] == 987650001
+        assert requested == [session_id]
+
+        events = db.get_session_events(session_id)
+        assert [(e['session_id'], e['event_type'], e['actor_id'], e['detail']) for e in events] == [
+            (session_id, 'requested', 987650001, 'other')
+        ]
+        db.end_session(session_id, 'user_cancelled', 'user', 987650001)
+        db.close()
+
+
+def test_lifecycle_is_logged():
+    """Requested -> matched -> declined -> matched -> accepted -> transferred -> ended"""
+    if USE_POSTGRES:
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db, (a, b) = _setup(tmp)
+
+        session_id = db.create_session_request(500, 'other')
+        assert db.get_session(session_id)['matched_at'] is None
+
+        db.match_session_with_counselor(session_id, a)
+        first_match = db.get_session(session_id)['matched_at']
+        assert first_match is not None
+        db.release_session(session_id, 'declined', actor_id=101)
+        # A decline keeps the match time for the match-wait metrics
+        assert db.get_session(session_id)['matched_at'] == first_match
+
+        assert db.claim_session(session_id, [b]) == b
+        assert db.get_session(session_id)['matched_at'] is not None
+        db.start_session(session_id, actor_id=102)
+        db.release_session(session_id, 'transferred', actor_id=102)
+        db.match_session_with_counselor(session_id, a, 'admin', 1)
+        db.end_session(session_id, 'user_cancelled', 'user', 500)
+
+        events = [(e['event_type'], e['actor_role'], e['actor_id'], e['counselor_id'], e['detail'])
+                  for e in db.get_session_events(session_id)]
+        assert events == [
+            ('requested', 'user', 500, None, 'other'),
+            ('matched', 'system', None, a, None),
+            ('declined', 'counselor', 101, a, None),
+            ('matched', 'system', None, b, None),
+            ('accepted', 'counselor', 102, b, None),
+            ('transferred', 'counselor', 102, b, None),
+            ('matched', 'admin', 1, a, None),
+            ('ended', 'user', 500, a, 'user_cancelled'),
+        ]
+
+        # Batch matching logs too, and cleanup removes the log with the session
+        other = db.create_session_request(500, 'other')
+        assert CounselingMatcher(db).match_sessions([db.get_session(other)])
+        assert db.get_session(other)['matched_at'] is not None
+        assert [e['event_type'] for e in db.get_session_events(other)] == ['requested', 'matched']
+
+        db.delete_ended_sessions_before(datetime.now() + timedelta(days=1))
+        assert db.get_session_events(session_id) == []
+        assert len(db.get_session_events(other)) == 2
+        db.close()
+
+
+def test_lifecycle_queries_use_composite_indexes():
+    """The pending queue, per-user/per-counselor lookups and cleanup are index searches"""
+    if USE_POSTGRES:
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db, _ = _setup(tmp)
+        conn = db.get_connection()
+
+        def _plan(sql, params=()):
+            return ' '.join(row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params).fetchall())
+
+        pending = _plan("SELECT * FROM counseling_sessions WHERE status = 'requested' "
+                        "ORDER BY priority DESC, created_at ASC LIMIT 10")
+        assert 'idx_sessions_pending' in pending and 'TEMP B-TREE' not in pending
+
+        by_user = _plan("SELECT * FROM counseling_sessions WHERE user_id = ? AND status IN ('matched', 'active') "
+                        "ORDER BY created_at DESC LIMIT 1", (500,))
+        assert 'idx_sessions_user_status' in by_user
+
+        by_counselor = _plan("SELECT COUNT(*) FROM counseling_sessions WHERE counselor_id = ? AND status = 'active'", (1,))
+        assert 'idx_sessions_counselor_status' in by_counselor
+
+        cleanup = _plan("SELECT session_id FROM counseling_sessions WHERE status = 'ended' AND ended_at < ?",
+                        ('2026-01-01',))
+        assert 'idx_sessions_status_ended' in cleanup
+
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert not indexes & {'idx_sessions_status', 'idx_sessions_user', 'idx_sessions_counselor'}
+        conn.close()
+        db.close()
+
+
+if __name__ == '__main__':
+    test_session_request_returns_id_and_logs_it()
+    test_lifecycle_is_logged()
+    test_lifecycle_queries_use_composite_indexes()
+    print("✅ Session lifecycle log tests passed")
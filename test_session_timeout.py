@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Test script for the session inactivity timeout scheduler
+Verifies deadline ordering, that only idle sessions are ended (in one batch)
+and that both sides are notified
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from counseling_database import CounselingDatabase, USE_POSTGRES
+from session_timeout import SessionTimeoutManager
+
+
+class _RecordingBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent.append(chat_id)
+
+
+def _ago(**delta):
+    return (datetime.now(timezone.utc) - timedelta(**delta)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _backdate(db, session_id, **columns):
+    conn = db.get_connection()
+    for column, value in columns.items():
+        conn.execute(f"UPDATE counseling_sessions SET {column} = ? WHERE session_id = ?", (value, session_id))
+    conn.commit()
+    conn.close()
+
+
+def test_deadline_heap():
+    """The earliest live deadline comes first; moved and forgotten sessions are skipped"""
+    if USE_POSTGRES:
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = CounselingDatabase(os.path.join(tmp, 'timeout_test.db'))
+        manager = SessionTimeoutManager(db, bot_context=None, timeout_hours=1)
+        now = datetime.now(timezone.utc).timestamp()
+
+        manager.touch(1, now - 3000)   # due in 600s
+        manager.touch(2, now - 3500)   # due in 100s
+        manager.touch(3, now - 3400)   # due in 200s
+        manager.touch(2, now)          # activity pushes 2 back to 3600s
+        manager.forget(3)
+
+        assert 590 < manager.seconds_until_next() <= 600
+        assert manager.pop_due(now + 700) == [1]
+        assert manager.pop_due(now + 3000) == []
+        assert manager.pop_due(now + 3600) == [2]
+        assert manager.seconds_until_next() == float('inf')
+        db.close()
+
+
+def test_idle_sessions_time_out_in_one_batch():
+    """Sessions idle past the timeout end with both sides notified; recent activity keeps a session open"""
+    if USE_POSTGRES:
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = CounselingDatabase(os.path.join(tmp, 'timeout_test.db'))
+        db.max_sessions_per_counselor = 5
+        db.add_user(101)
+        counselor_id = db.register_counselor(101, "Counselor", "bio", ['other'])
+        db.approve_counselor(counselor_id, admin_id=1)
+        for user_id in (500, 501, 502):
+            db.add_user(user_id)
+
+        stale_active = db.create_session_request(500, 'other')
+        db.match_session_with_counselor(stale_active, counselor_id)
+        db.start_session(stale_active)
+        db.add_message(stale_active, 'user', 500, "hello")
+        _backdate(db, stale_active, created_at=_ago(hours=5), matched_at=_ago(hours=5),
+                  started_at=_ago(hours=5), last_message_at=_ago(hours=3))
+
+        stale_matched = db.create_session_request(501, 'other')
+        db.match_session_with_counselor(stale_matched, counselor_id)
+        _backdate(db, stale_matched, created_at=_ago(hours=2), matched_at=_ago(hours=2))
+
+        recent = db.create_session_request(502, 'other')
+        db.match_session_with_counselor(recent, counselor_id)
+        db.start_session(recent)
+        _backdate(db, recent, created_at=_ago(hours=3), matched_at=_ago(hours=3), started_at=_ago(hours=3),
+                  last_message_at=_ago(minutes=30))
+
+        bot = _RecordingBot()
+        manager = SessionTimeoutManager(db, bot_context=None, timeout_hours=1, bot=bot)
+
+        async def main():
+            task = asyncio.create_task(manager.start())
+            await asyncio.sleep(0.2)
+            # The loop now sleeps until the remaining session is due
+            assert 1700 < manager.seconds_until_next() <= 1800
+            assert set(manager._deadlines) == {recent}
+
+            # New matches are picked up from database events
+            fresh = await manager.async_db.create_session_request(500, 'other')
+            await manager.async_db.match_session_with_counselor(fresh, counselor_id)
+            await asyncio.sleep(0.05)
+            assert fresh in manager._deadlines
+            await manager.async_db.end_session(fresh, 'user_cancelled')
+            await asyncio.sleep(0.05)
+            assert fresh not in manager._deadlines
+
+            await manager.stop()
+            await asyncio.gather(task, return_exceptions=True)
+
+        asyncio.run(main())
+
+        assert db.get_session(stale_active)['end_reason'] == 'timeout'
+        assert db.get_session(stale_matched)['end_reason'] == 'timeout'
+        assert db.get_session(recent)['status'] == 'active'
+        assert manager.timed_out == 2
+        # Users of both sessions; the counselor only for the one that had started
+        assert sorted(bot.sent) == [101, 500, 501]
+        assert db.reconcile_stats() == {}
+
+        # A session that became active again since it was scheduled is left alone
+        db.add_message(recent, 'counselor', 101, "still here")
+        assert db.end_idle_sessions([recent], datetime.now(timezone.utc) - timedelta(hours=1)) == []
+        db.close()
+
+
+if __name__ == '__main__':
+    test_deadline_heap()
+    test_idle_sessions_time_out_in_one_batch()
+    print("✅ Session timeout tests passed")
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Test script for the materialized statistics counters
+Verifies every write path keeps bot_stats exact and that reconcile repairs drift
+"""
+
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from counseling_database import CounselingDatabase, USE_POSTGRES
+from matching_system import CounselingMatcher
+
+
+def test_write_paths_keep_counters_exact():
+    """After any sequence of writes the counters equal a full recount"""
+    if USE_POSTGRES:
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = CounselingDatabase(os.path.join(tmp, 'stats_test.db'))
+        db.max_sessions_per_counselor = 5
+
+        def _assert_exact():
+            assert db.reconcile_stats() == {}
+
+        counselors = []
+        for user_id in (101, 102, 103, 104):
+            db.add_user(user_id)
+            db.add_user(user_id)  # returning user is not counted twice
+            counselors.append(db.register_counselor(user_id, f"C{user_id}", "bio", ['other']))
+        a, b, c, d = counselors
+        _assert_exact()
+
+        # A returning /start keeps the rest of the user's row and needs no SELECT
+        db.update_user_gender(101, 'female')
+        statements = []
+        conn = db.get_connection()
+        conn.set_trace_callback(statements.append)
+        db.add_user(101)
+        conn.set_trace_callback(None)
+        conn.close()
+        assert db.get_user(101)['gender'] == 'female'
+        assert not any(sql.lstrip().upper().startswith('SELECT') for sql in statements), statements
+        _assert_exact()
+
+        db.approve_counselor(a, admin_id=1)
+        db.approve_counselor(b, admin_id=1)
+        db.reject_counselor(c)
+        db.set_counselor_availability(b, False)
+        db.set_counselor_availability(b, True)
+        db.deactivate_counselor(b, admin_id=1)
+        db.reactivate_counselor(b, admin_id=1)
+        db.ban_counselor(d, admin_id=1)
+        _assert_exact()
+
+        db.add_user(500)
+        sessions = [db.create_session_request(500, topic) for topic in ('other', 'other', 'other', 'academic_career')]
+        db.match_session_with_counselor(sessions[0], a)
+        db.claim_session(sessions[1], [a])
+        CounselingMatcher(db).match_sessions([db.get_session(sessions[2])])
+        _assert_exact()
+
+        db.start_session(sessions[0])
+        db.add_message(sessions[0], 'user', 500, "hello")
+        db.add_messages_bulk([(sessions[0], 'counselor', 101, "hi", '2026-01-01 10:00:00', None, 'sent')])
+        db.end_session(sessions[0])
+        db.add_session_rating(sessions[0], 4)
+        db.release_session(sessions[1])
+        db.end_session(sessions[3], 'cancelled')
+        _assert_exact()
+
+        db.delete_counselor(c, admin_id=1)
+        db.delete_ended_sessions_before(datetime.now() + timedelta(days=1))
+        _assert_exact()
+
+        stats = db.get_detailed_stats()
+        assert stats['total_users'] == 5
+        assert stats['total_counselors'] == 3 and stats['banned_counselors'] == 1
+        assert stats['approved_counselors'] == 2 and stats['online_counselors'] == 1
+        assert stats['total_sessions'] == 2 and stats['pending_sessions'] == 1 and stats['matched_sessions'] == 1
+        assert stats['top_topics'] == [('other', 2)]
+        assert stats['total_messages'] == 0 and stats['total_ratings'] == 1 and stats['avg_rating'] == 4
+        db.close()
+
+
+def test_dashboard_is_one_read_and_reconcile_repairs_drift():
+    """The detailed stats screen costs one query; out-of-band writes are repaired"""
+    if USE_POSTGRES:
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = CounselingDatabase(os.path.join(tmp, 'stats_test.db'))
+        db.add_user(500)
+        db.create_session_request(500, 'other')
+
+        checkouts_before = db.get_pool_stats()['checkouts']
+        db.get_detailed_stats()
+        assert db.get_pool_stats()['checkouts'] - checkouts_before == 1
+
+        # A maintenance script writing straight to the tables
+        conn = db.get_connection()
+        conn.execute("INSERT INTO users (user_id) VALUES (501)")
+        conn.execute("UPDATE counseling_sessions SET status = 'ended'")
+        conn.commit()
+        conn.close()
+
+        assert db.reconcile_stats() == {
+            'sessions.status.ended': (0, 1),
+            'sessions.status.requested': (1, 0),
+            'users.total': (1, 2),
+        }
+        assert db.get_detailed_stats()['completed_sessions'] == 1
+        assert db.reconcile_stats() == {}
+        db.close()
+
+
+if __name__ == '__main__':
+    test_write_paths_keep_counters_exact()
+    test_dashboard_is_one_read_and_reconcile_repairs_drift()
+    print("✅ Statistics counter tests passed")
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Test script for the combined user context lookup
+Verifies get_user_context agrees with the individual lookups in one round-trip
+"""
+
+import os
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from counseling_database import CounselingDatabase, USE_POSTGRES
+
+
+def test_user_context_matches_individual_lookups():
+    """Ban, admin, counselor and active session flags come from a single query"""
+    if USE_POSTGRES:
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = CounselingDatabase(os.path.join(tmp, 'context_test.db'))
+
+        # Unknown user: nothing set, still one row back
+        context = db.get_user_context(999)
+        assert context['is_registered'] is False
+        assert context['is_banned'] is False
+        assert context['is_admin'] is False
+        assert context['counselor'] is None and context['active_session'] is None
+
+        db.add_user(101)
+        counselor_id = db.register_counselor(101, "Counselor", "bio", ['mental_emotional'])
+        context = db.get_user_context(101)
+        assert context['counselor_status'] == 'pending'
+        assert context['is_counselor'] is False
+
+        db.approve_counselor(counselor_id, admin_id=1)
+        db.add_admin(101, added_by=1)
+        context = db.get_user_context(101)
+        assert context['is_counselor'] is True
+        assert context['is_admin'] is True
+        assert context['counselor'] == db.get_counselor_by_user_id(101)
+        assert context['counselor']['specializations'] == ['mental_emotional']
+
+        db.add_user(500)
+        db.create_session_request(500, 'other')
+        assert db.get_user_context(500)['active_session'] is None  # requested is not active yet
+
+        session_id = db.create_session_request(500, 'mental_emotional')
+        db.match_session_with_counselor(session_id, counselor_id)
+        checkouts_before = db.get_pool_stats()['checkouts']
+        context = db.get_user_context(500)
+        assert db.get_pool_stats()['checkouts'] - checkouts_before == 1
+        assert context['active_session'] == db.get_active_session_by_user(500)
+        assert context['active_session']['session_id'] == session_id
+        assert context['is_counselor'] is False
+
+        conn = db.get_connection()
+        conn.execute("UPDATE users SET is_banned = 1 WHERE user_id = 500")
+        conn.commit()
+        conn.close()
+        assert db.get_user_context(500)['is_banned'] is True
+        db.close()
+
+
+if __name__ == '__main__':
+    test_user_context_matches_individual_lookups()
+    print("✅ User context tests passed")